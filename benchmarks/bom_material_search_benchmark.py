@@ -0,0 +1,180 @@
+# benchmarks/bom_material_search_benchmark.py
+"""
+Benchmark de la busqueda de materiales del editor de BOM: DISTINCT ON sobre
+todas las coincidencias + orden/limite en Python (implementacion anterior)
+contra el ranking con LIMIT dentro de la BD sobre la proyeccion de ultimo
+precio (BomDBService.buscar_materiales_para_bom, migrations/006 y 007).
+
+Genera una tabla temporal de historial con 500k filas sinteticas (descripciones
+armadas con un vocabulario de materiales electricos, ~20k descripciones
+distintas con varias compras cada una) y mide la mediana de latencia
+(incluye transferencia y el orden en Python de la variante anterior) y las
+filas que viajan al cliente para varios terminos, incluidos terminos cortos.
+
+Requiere la extension pg_trgm.
+
+Uso:
+    python -m benchmarks.bom_material_search_benchmark [--dsn postgresql://...] [--filas 500000] [--runs 15]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+
+TERMINOS = ("cab", "cable thw", "interruptor", "tubo conduit 3/4", "xyz123")
+UMBRAL = 0.15
+LIMITE = 15
+
+QUERY_ANTERIOR = """
+    SELECT DISTINCT ON (m.descripcion_proveedor)
+        m.id, m.descripcion_proveedor, m.precio_unitario, m.unidad, m.fecha_factura,
+        GREATEST(
+            similarity(m.descripcion_proveedor, $1),
+            word_similarity($1, m.descripcion_proveedor)
+        ) AS similitud
+    FROM bench_materiales m
+    WHERE m.descripcion_proveedor ILIKE '%' || $1 || '%'
+       OR word_similarity($1, m.descripcion_proveedor) >= $2
+    ORDER BY m.descripcion_proveedor, m.fecha_factura DESC
+"""
+
+QUERY_RANKING = """
+    WITH candidatos AS (
+        SELECT
+            m.descripcion_proveedor,
+            GREATEST(
+                similarity(m.descripcion_proveedor, $1),
+                word_similarity($1, m.descripcion_proveedor)
+            ) AS similitud,
+            MAX(m.fecha_factura) AS ultima_fecha
+        FROM bench_ultimo_precio m
+        WHERE m.descripcion_proveedor ILIKE '%' || $1 || '%'
+           OR $1 <% m.descripcion_proveedor
+        GROUP BY m.descripcion_proveedor
+        ORDER BY similitud DESC, ultima_fecha DESC NULLS LAST
+        LIMIT $2
+    )
+    SELECT r.id, c.descripcion_proveedor, r.precio_unitario, r.unidad, r.fecha_factura, c.similitud
+    FROM candidatos c
+    CROSS JOIN LATERAL (
+        SELECT m.id, m.precio_unitario, m.unidad, m.fecha_factura
+        FROM bench_ultimo_precio m
+        WHERE m.descripcion_proveedor = c.descripcion_proveedor
+        ORDER BY m.fecha_factura DESC NULLS LAST
+        LIMIT 1
+    ) r
+    ORDER BY c.similitud DESC, c.ultima_fecha DESC NULLS LAST
+"""
+
+
+async def preparar_tabla(conn, filas: int):
+    await conn.execute("DROP TABLE IF EXISTS bench_materiales")
+    await conn.execute("""
+        CREATE TEMP TABLE bench_materiales (
+            id BIGSERIAL PRIMARY KEY,
+            descripcion_proveedor TEXT,
+            precio_unitario NUMERIC(14, 4),
+            unidad TEXT,
+            fecha_factura DATE
+        )
+    """)
+    # Descripcion = tipo + medida + marca + modelo; ~20k combinaciones distintas
+    await conn.execute("""
+        INSERT INTO bench_materiales (descripcion_proveedor, precio_unitario, unidad, fecha_factura)
+        SELECT
+            (ARRAY['CABLE THW', 'CABLE THHW-LS', 'TUBO CONDUIT', 'INTERRUPTOR TERMOMAGNETICO',
+                   'CONECTOR MC4', 'MODULO FOTOVOLTAICO', 'INVERSOR CENTRAL', 'CHAROLA PORTACABLES',
+                   'ZAPATA PONCHABLE', 'TABLERO DE DISTRIBUCION'])[1 + (h % 10)]
+            || ' ' || (ARRAY['1/2', '3/4', '1', '2', '10 AWG', '12 AWG', '4/0', '500 KCM'])[1 + ((h / 10) % 8)]
+            || ' ' || (ARRAY['CONDUMEX', 'VIAKON', 'SQUARE D', 'SCHNEIDER', 'SIEMENS', 'ABB'])[1 + ((h / 80) % 6)]
+            || ' MOD ' || ((h / 480) % 42)
+            AS descripcion_proveedor,
+            round((random() * 5000)::numeric, 2),
+            'PZA',
+            DATE '2022-01-01' + (g % 1200)
+        FROM generate_series(1, $1) g
+        CROSS JOIN LATERAL (SELECT (hashint4(g) & 2147483647) % 20160 AS h) x
+    """, filas)
+    await conn.execute(
+        "CREATE INDEX ON bench_materiales USING GIN (descripcion_proveedor gin_trgm_ops)"
+    )
+    await conn.execute(
+        "CREATE INDEX ON bench_materiales (descripcion_proveedor, fecha_factura DESC NULLS LAST)"
+    )
+    # Proyeccion de ultimo precio (migrations/007); sin proveedores: una fila por descripcion
+    await conn.execute("DROP TABLE IF EXISTS bench_ultimo_precio")
+    await conn.execute("""
+        CREATE TEMP TABLE bench_ultimo_precio AS
+        SELECT DISTINCT ON (descripcion_proveedor)
+            id, descripcion_proveedor, precio_unitario, unidad, fecha_factura
+        FROM bench_materiales
+        ORDER BY descripcion_proveedor, fecha_factura DESC NULLS LAST
+    """)
+    await conn.execute(
+        "CREATE INDEX ON bench_ultimo_precio USING GIN (descripcion_proveedor gin_trgm_ops)"
+    )
+    await conn.execute(
+        "CREATE INDEX ON bench_ultimo_precio (descripcion_proveedor, fecha_factura DESC NULLS LAST)"
+    )
+    await conn.execute("ANALYZE bench_materiales")
+    await conn.execute("ANALYZE bench_ultimo_precio")
+
+
+async def medir_anterior(conn, termino: str, runs: int):
+    tiempos, filas = [], 0
+    for _ in range(runs):
+        inicio = time.perf_counter()
+        rows = await conn.fetch(QUERY_ANTERIOR, termino, UMBRAL)
+        result = sorted([dict(r) for r in rows], key=lambda x: x['similitud'], reverse=True)[:LIMITE]
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        filas = len(rows)
+    return statistics.median(tiempos), filas
+
+
+async def medir_ranking(conn, termino: str, runs: int):
+    tiempos, filas = [], 0
+    for _ in range(runs):
+        inicio = time.perf_counter()
+        async with conn.transaction():
+            await conn.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', $1, true)", str(UMBRAL)
+            )
+            rows = await conn.fetch(QUERY_RANKING, termino, LIMITE)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        filas = len(rows)
+    return statistics.median(tiempos), filas
+
+
+async def main(dsn: str, filas: int, runs: int):
+    conn = await asyncpg.connect(dsn, statement_cache_size=0)
+    try:
+        await preparar_tabla(conn, filas)
+        total = await conn.fetchval("SELECT COUNT(*) FROM bench_materiales")
+        distintas = await conn.fetchval("SELECT COUNT(DISTINCT descripcion_proveedor) FROM bench_materiales")
+        print(f"Historial sintetico: {total} filas, {distintas} descripciones distintas\n")
+        print(f"{'termino':>18} {'anterior ms':>12} {'filas':>7} {'ranking ms':>11} {'filas':>6}")
+
+        for termino in TERMINOS:
+            t_anterior, f_anterior = await medir_anterior(conn, termino, runs)
+            t_ranking, f_ranking = await medir_ranking(conn, termino, runs)
+            print(f"{termino:>18} {t_anterior:>12.2f} {f_anterior:>7} {t_ranking:>11.2f} {f_ranking:>6}")
+    finally:
+        await conn.execute("DROP TABLE IF EXISTS bench_materiales, bench_ultimo_precio")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="DSN de Postgres (default: settings.DB_URL_SSE, conexion directa)")
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if not dsn:
+        from core.config import settings
+        dsn = settings.DB_URL_SSE
+
+    asyncio.run(main(dsn, args.filas, args.runs))
@@ -0,0 +1,166 @@
+# benchmarks/conceptos_ingesta_benchmark.py
+"""
+Benchmark de la ingesta de conceptos CFDI a tb_materiales_historial: un
+INSERT ... ON CONFLICT DO NOTHING por concepto (implementacion anterior)
+contra COPY binario a una tabla temporal + un INSERT ... SELECT por batch
+(ComprasDBService.guardar_conceptos_historial_lote).
+
+Simula un lote de N facturas con M conceptos cada una (default 100 x 30 =
+3000 conceptos) sobre una tabla temporal con la misma llave de duplicados
+que el historial, y reporta la mediana de tiempo y los conceptos/segundo.
+La segunda pasada de cada variante reingesta el mismo lote para medir el
+camino de duplicados (ON CONFLICT DO NOTHING).
+
+Uso:
+    python -m benchmarks.conceptos_ingesta_benchmark [--dsn postgresql://...] [--facturas 100] [--conceptos 30] [--runs 5]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import asyncpg
+
+COLUMNAS = [
+    'uuid_factura', 'id_comprobante', 'id_proveedor',
+    'descripcion_proveedor', 'cantidad', 'precio_unitario',
+    'importe', 'unidad', 'clave_prod_serv', 'clave_unidad',
+    'id_categoria', 'origen', 'fecha_factura', 'created_by_id',
+]
+
+QUERY_INSERT_FILA = f"""
+    INSERT INTO bench_historial ({', '.join(COLUMNAS)})
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+    ON CONFLICT (uuid_factura, descripcion_proveedor, cantidad, precio_unitario)
+    DO NOTHING
+"""
+
+QUERY_STAGING = f"""
+    CREATE TEMP TABLE IF NOT EXISTS bench_staging ON COMMIT DROP AS
+    SELECT {', '.join(COLUMNAS)} FROM bench_historial WITH NO DATA
+"""
+
+QUERY_INSERT_STAGING = f"""
+    INSERT INTO bench_historial ({', '.join(COLUMNAS)})
+    SELECT {', '.join(COLUMNAS)} FROM bench_staging
+    ON CONFLICT (uuid_factura, descripcion_proveedor, cantidad, precio_unitario)
+    DO NOTHING
+"""
+
+
+def generar_registros(facturas: int, conceptos: int) -> list:
+    """Registros con la forma que arma guardar_conceptos_historial_lote."""
+    rnd = random.Random(42)
+    usuario = uuid.uuid4()
+    registros = []
+    for _ in range(facturas):
+        uuid_factura = str(uuid.uuid4()).upper()
+        proveedor = uuid.uuid4()
+        fecha = date(2024, 1, 1) + timedelta(days=rnd.randrange(600))
+        for j in range(conceptos):
+            cantidad = Decimal(rnd.randrange(1, 500))
+            precio = Decimal(rnd.randrange(100, 500000)) / 100
+            registros.append((
+                uuid_factura, None, proveedor,
+                f"MATERIAL {rnd.randrange(20000)} PARTIDA {j}", cantidad, precio,
+                cantidad * precio, 'PZA', '39121000', 'H87',
+                None, 'XML', fecha, usuario
+            ))
+    return registros
+
+
+async def preparar_tabla(conn):
+    await conn.execute("DROP TABLE IF EXISTS bench_historial")
+    await conn.execute("""
+        CREATE TEMP TABLE bench_historial (
+            id BIGSERIAL PRIMARY KEY,
+            uuid_factura TEXT,
+            id_comprobante UUID,
+            id_proveedor UUID,
+            descripcion_proveedor TEXT,
+            cantidad NUMERIC,
+            precio_unitario NUMERIC,
+            importe NUMERIC,
+            unidad TEXT,
+            clave_prod_serv TEXT,
+            clave_unidad TEXT,
+            id_categoria INTEGER,
+            origen TEXT,
+            fecha_factura DATE,
+            created_by_id UUID,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            UNIQUE (uuid_factura, descripcion_proveedor, cantidad, precio_unitario)
+        )
+    """)
+
+
+async def ingesta_fila_por_fila(conn, registros):
+    async with conn.transaction():
+        for r in registros:
+            await conn.execute(QUERY_INSERT_FILA, *r)
+
+
+async def ingesta_copy(conn, registros, batch_size: int = 5000):
+    for i in range(0, len(registros), batch_size):
+        async with conn.transaction():
+            await conn.execute(QUERY_STAGING)
+            await conn.execute("TRUNCATE bench_staging")
+            await conn.copy_records_to_table(
+                'bench_staging', records=registros[i:i + batch_size], columns=COLUMNAS
+            )
+            await conn.execute(QUERY_INSERT_STAGING)
+
+
+async def medir(conn, ingesta, registros, runs: int):
+    """(mediana ms primera carga, mediana ms recarga con duplicados)."""
+    nuevos, duplicados = [], []
+    for _ in range(runs):
+        await conn.execute("TRUNCATE bench_historial")
+        inicio = time.perf_counter()
+        await ingesta(conn, registros)
+        nuevos.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await ingesta(conn, registros)
+        duplicados.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(nuevos), statistics.median(duplicados)
+
+
+async def main(dsn: str, facturas: int, conceptos: int, runs: int):
+    conn = await asyncpg.connect(dsn, statement_cache_size=0)
+    try:
+        await preparar_tabla(conn)
+        registros = generar_registros(facturas, conceptos)
+        total = len(registros)
+        print(f"Lote sintetico: {facturas} facturas x {conceptos} conceptos = {total} conceptos\n")
+        print(f"{'variante':>14} {'nuevos ms':>10} {'conceptos/s':>12} {'duplicados ms':>14}")
+
+        for nombre, ingesta in (("fila por fila", ingesta_fila_por_fila), ("COPY + staging", ingesta_copy)):
+            t_nuevos, t_duplicados = await medir(conn, ingesta, registros, runs)
+            print(f"{nombre:>14} {t_nuevos:>10.1f} {total / (t_nuevos / 1000):>12.0f} {t_duplicados:>14.1f}")
+
+        filas = await conn.fetchval("SELECT COUNT(*) FROM bench_historial")
+        print(f"\nFilas en historial tras recarga: {filas} (esperadas {total})")
+    finally:
+        await conn.execute("DROP TABLE IF EXISTS bench_historial")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="DSN de Postgres (default: settings.DB_URL_SSE, conexion directa)")
+    parser.add_argument("--facturas", type=int, default=100)
+    parser.add_argument("--conceptos", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if not dsn:
+        from core.config import settings
+        dsn = settings.DB_URL_SSE
+
+    asyncio.run(main(dsn, args.facturas, args.conceptos, args.runs))
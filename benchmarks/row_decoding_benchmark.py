@@ -0,0 +1,152 @@
+# benchmarks/row_decoding_benchmark.py
+"""
+Benchmark del decodificado de filas en el pool de asyncpg (core/database.py:
+init_connection).
+
+Compara, sobre N filas sinteticas (generate_series):
+  - jsonb: codec por default (texto) + json.loads por fila en Python (como
+    hacian los servicios) contra el codec jsonb con orjson.loads.
+  - numeric: Decimal + loop float() por fila (como hacian get_materiales y
+    get_comprobantes) contra el cast ::float8 en la query y contra el codec
+    numeric -> float (DB_NUMERIC_AS_FLOAT).
+
+Reporta la mediana de ms por fetch completo (incluye la conversion en Python).
+
+Uso:
+    python -m benchmarks.row_decoding_benchmark [--dsn postgresql://...] [--filas 50000] [--runs 7]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from decimal import Decimal
+
+import asyncpg
+import orjson
+
+QUERY_JSONB = """
+    SELECT g AS id,
+           jsonb_build_object(
+               'tipo_cambio', 'ESTATUS', 'valor', g,
+               'detalle', jsonb_build_array('a', 'b', g % 7),
+               'usuario', md5(g::text)
+           ) AS metadata
+    FROM generate_series(1, $1) g
+"""
+
+QUERY_NUMERIC = """
+    SELECT g AS id,
+           (g % 500 + 1)::numeric AS cantidad,
+           round((random() * 5000)::numeric, 4) AS precio_unitario,
+           round((random() * 500000)::numeric, 2) AS importe
+    FROM generate_series(1, $1) g
+"""
+
+QUERY_FLOAT8 = """
+    SELECT id, cantidad::float8 AS cantidad,
+           precio_unitario::float8 AS precio_unitario,
+           importe::float8 AS importe
+    FROM ({}) x
+""".format(QUERY_NUMERIC)
+
+COLUMNAS_MONTO = ('cantidad', 'precio_unitario', 'importe')
+
+
+async def registrar_jsonb(conn):
+    await conn.set_type_codec(
+        'jsonb', schema='pg_catalog',
+        encoder=lambda v: v if isinstance(v, str) else orjson.dumps(v).decode(),
+        decoder=orjson.loads, format='text'
+    )
+
+
+async def registrar_numeric(conn):
+    await conn.set_type_codec(
+        'numeric', schema='pg_catalog',
+        encoder=str, decoder=float, format='text'
+    )
+
+
+async def jsonb_loads_por_fila(conn, filas):
+    rows = await conn.fetch(QUERY_JSONB, filas)
+    result = []
+    for r in rows:
+        d = dict(r)
+        if isinstance(d['metadata'], str):
+            d['metadata'] = json.loads(d['metadata'])
+        result.append(d)
+    return result
+
+
+async def jsonb_codec(conn, filas):
+    return [dict(r) for r in await conn.fetch(QUERY_JSONB, filas)]
+
+
+async def numeric_loop_float(conn, filas):
+    rows = await conn.fetch(QUERY_NUMERIC, filas)
+    result = []
+    for r in rows:
+        d = dict(r)
+        for key in COLUMNAS_MONTO:
+            if d.get(key) and isinstance(d[key], Decimal):
+                d[key] = float(d[key])
+        result.append(d)
+    return result
+
+
+async def numeric_cast_float8(conn, filas):
+    return [dict(r) for r in await conn.fetch(QUERY_FLOAT8, filas)]
+
+
+async def numeric_codec(conn, filas):
+    return [dict(r) for r in await conn.fetch(QUERY_NUMERIC, filas)]
+
+
+async def medir(conn, variante, filas: int, runs: int) -> float:
+    await variante(conn, filas)  # calentamiento
+    tiempos = []
+    for _ in range(runs):
+        inicio = time.perf_counter()
+        await variante(conn, filas)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+async def main(dsn: str, filas: int, runs: int):
+    # Una conexion por configuracion de codecs para no mezclar resultados
+    base = await asyncpg.connect(dsn, statement_cache_size=0)
+    con_jsonb = await asyncpg.connect(dsn, statement_cache_size=0)
+    con_numeric = await asyncpg.connect(dsn, statement_cache_size=0)
+    try:
+        await registrar_jsonb(con_jsonb)
+        await registrar_numeric(con_numeric)
+
+        print(f"Filas por fetch: {filas}\n")
+        print(f"{'variante':>32} {'ms':>9}")
+        for nombre, conn, variante in (
+            ("jsonb texto + json.loads", base, jsonb_loads_por_fila),
+            ("jsonb codec orjson", con_jsonb, jsonb_codec),
+            ("numeric Decimal + loop float", base, numeric_loop_float),
+            ("numeric cast ::float8", base, numeric_cast_float8),
+            ("numeric codec float", con_numeric, numeric_codec),
+        ):
+            print(f"{nombre:>32} {await medir(conn, variante, filas, runs):>9.1f}")
+    finally:
+        for conn in (base, con_jsonb, con_numeric):
+            await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="DSN de Postgres (default: settings.DB_URL_SSE, conexion directa)")
+    parser.add_argument("--filas", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if not dsn:
+        from core.config import settings
+        dsn = settings.DB_URL_SSE
+
+    asyncio.run(main(dsn, args.filas, args.runs))
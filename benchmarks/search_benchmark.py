@@ -0,0 +1,117 @@
+# benchmarks/search_benchmark.py
+"""
+Benchmark de la busqueda de oportunidades: ILIKE '%q%' sobre varias columnas
+(implementacion anterior) contra el documento `search_doc` con indice GIN
+trigram (migrations/004, core/search.py).
+
+Genera tablas temporales con 1x, 10x y 100x el numero actual de filas de
+tb_oportunidades (textos muestreados de los datos reales) y mide la mediana
+de latencia de cada variante con varios terminos.
+
+Requiere la migracion 004 aplicada (funcion f_unaccent y pg_trgm).
+
+Uso:
+    python -m benchmarks.search_benchmark [--dsn postgresql://...] [--runs 15]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+
+ESCALAS = (1, 10, 100)
+TERMINOS = ("solar", "cfe", "energia", "OP-2", "xyz123")
+
+QUERY_ANTERIOR = """
+    SELECT id FROM bench_oportunidades
+    WHERE titulo_proyecto ILIKE $1 OR nombre_proyecto ILIKE $1
+       OR cliente_nombre ILIKE $1 OR op_id_estandar ILIKE $1
+    ORDER BY fecha_solicitud DESC
+    LIMIT 15
+"""
+
+QUERY_TRIGRAM = """
+    SELECT id FROM bench_oportunidades
+    WHERE search_doc LIKE '%' || lower(f_unaccent($1)) || '%'
+    ORDER BY word_similarity(lower(f_unaccent($1)), search_doc) DESC, fecha_solicitud DESC
+    LIMIT 15
+"""
+
+
+async def preparar_tabla(conn, escala: int):
+    await conn.execute("DROP TABLE IF EXISTS bench_oportunidades")
+    await conn.execute("""
+        CREATE TEMP TABLE bench_oportunidades (
+            id BIGSERIAL PRIMARY KEY,
+            op_id_estandar TEXT,
+            titulo_proyecto TEXT,
+            nombre_proyecto TEXT,
+            cliente_nombre TEXT,
+            fecha_solicitud TIMESTAMPTZ,
+            search_doc TEXT GENERATED ALWAYS AS (
+                lower(f_unaccent(
+                    coalesce(op_id_estandar, '') || ' ' || coalesce(titulo_proyecto, '') || ' ' ||
+                    coalesce(nombre_proyecto, '') || ' ' || coalesce(cliente_nombre, '')
+                ))
+            ) STORED
+        )
+    """)
+    # Se replican las filas reales con sufijo para que los textos sean distintos
+    await conn.execute("""
+        INSERT INTO bench_oportunidades
+            (op_id_estandar, titulo_proyecto, nombre_proyecto, cliente_nombre, fecha_solicitud)
+        SELECT
+            o.op_id_estandar || '-' || g,
+            o.titulo_proyecto,
+            o.nombre_proyecto || ' ' || g,
+            o.cliente_nombre,
+            o.fecha_solicitud - (g || ' minutes')::interval
+        FROM tb_oportunidades o
+        CROSS JOIN generate_series(1, $1) g
+    """, escala)
+    await conn.execute("CREATE INDEX ON bench_oportunidades USING GIN (search_doc gin_trgm_ops)")
+    await conn.execute("CREATE INDEX ON bench_oportunidades (fecha_solicitud DESC)")
+    await conn.execute("ANALYZE bench_oportunidades")
+
+
+async def medir(conn, query: str, param: str, runs: int) -> float:
+    tiempos = []
+    for _ in range(runs):
+        inicio = time.perf_counter()
+        await conn.fetch(query, param)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+async def main(dsn: str, runs: int):
+    conn = await asyncpg.connect(dsn, statement_cache_size=0)
+    try:
+        filas_base = await conn.fetchval("SELECT COUNT(*) FROM tb_oportunidades")
+        print(f"Filas actuales en tb_oportunidades: {filas_base}\n")
+        print(f"{'escala':>7} {'filas':>9} {'termino':>10} {'ILIKE ms':>10} {'trigram ms':>11}")
+
+        for escala in ESCALAS:
+            await preparar_tabla(conn, escala)
+            filas = await conn.fetchval("SELECT COUNT(*) FROM bench_oportunidades")
+            for termino in TERMINOS:
+                t_anterior = await medir(conn, QUERY_ANTERIOR, f"%{termino}%", runs)
+                t_trigram = await medir(conn, QUERY_TRIGRAM, termino, runs)
+                print(f"{escala:>6}x {filas:>9} {termino:>10} {t_anterior:>10.2f} {t_trigram:>11.2f}")
+    finally:
+        await conn.execute("DROP TABLE IF EXISTS bench_oportunidades")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="DSN de Postgres (default: settings.DB_URL_SSE, conexion directa)")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if not dsn:
+        from core.config import settings
+        dsn = settings.DB_URL_SSE
+
+    asyncio.run(main(dsn, args.runs))
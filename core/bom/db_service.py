@@ -3,13 +3,102 @@ DB Service para BOM (Lista de Materiales).
 Queries SQL puras con asyncpg. Recibe conn como parametro.
 """
 
+import json
 import logging
 from uuid import UUID
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 
 logger = logging.getLogger("BOM.DBService")
 
+# Cabecera del BOM: nombres, conteos y costo vienen de la proyeccion
+# tb_bom_resumen (una fila por PK) en lugar de 4 joins a tb_usuarios y un
+# conteo de items por request.
+QUERY_SELECT_BOM_CABECERA = """
+    SELECT b.*,
+           r.elaborado_por_nombre,
+           r.responsable_ing_nombre,
+           r.jefe_construccion_nombre,
+           r.coordinador_obra_nombre,
+           o.nombre_proyecto AS proyecto_nombre,
+           p.proyecto_id_estandar,
+           COALESCE(r.total_items, 0) AS total_items,
+           COALESCE(r.items_entregados, 0) AS items_entregados,
+           COALESCE(r.costo_total, 0) AS costo_total
+    FROM tb_bom b
+    LEFT JOIN tb_bom_resumen r ON r.id_bom = b.id_bom
+    LEFT JOIN tb_proyectos_gate p ON p.id_proyecto = b.id_proyecto
+    LEFT JOIN tb_oportunidades o ON o.id_oportunidad = p.id_oportunidad
+"""
+
+QUERY_REFRESCAR_RESUMEN_BOM = """
+    INSERT INTO tb_bom_resumen (
+        id_bom, elaborado_por_nombre, responsable_ing_nombre, jefe_construccion_nombre,
+        coordinador_obra_nombre, total_items, items_entregados, costo_total, updated_at
+    )
+    SELECT b.id_bom, u1.nombre, u2.nombre, u3.nombre, u4.nombre,
+           i.total, i.entregados, i.costo, NOW()
+    FROM tb_bom b
+    LEFT JOIN tb_usuarios u1 ON u1.id_usuario = b.elaborado_por
+    LEFT JOIN tb_usuarios u2 ON u2.id_usuario = b.responsable_ing
+    LEFT JOIN tb_usuarios u3 ON u3.id_usuario = b.jefe_construccion
+    LEFT JOIN tb_usuarios u4 ON u4.id_usuario = b.coordinador_obra
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE entregado) AS entregados,
+               COALESCE(SUM(cantidad * COALESCE(precio_unitario, 0)), 0) AS costo
+        FROM tb_bom_items
+        WHERE id_bom = b.id_bom AND activo = TRUE
+    ) i
+    WHERE b.id_bom = ANY($1::uuid[])
+    ON CONFLICT (id_bom) DO UPDATE SET
+        elaborado_por_nombre = EXCLUDED.elaborado_por_nombre,
+        responsable_ing_nombre = EXCLUDED.responsable_ing_nombre,
+        jefe_construccion_nombre = EXCLUDED.jefe_construccion_nombre,
+        coordinador_obra_nombre = EXCLUDED.coordinador_obra_nombre,
+        total_items = EXCLUDED.total_items,
+        items_entregados = EXCLUDED.items_entregados,
+        costo_total = EXCLUDED.costo_total,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# Columnas de tb_bom_items editables en lote y su tipo para el cast desde jsonb
+COLUMNAS_ITEM_LOTE = {
+    'id_categoria': 'int',
+    'descripcion': 'text',
+    'cantidad': 'numeric',
+    'unidad_medida': 'text',
+    'fecha_requerida': 'date',
+    'fecha_llegada_real': 'date',
+    'id_proveedor': 'uuid',
+    'tipo_entrega': 'text',
+    'fecha_estimada_entrega': 'date',
+    'comentarios': 'text',
+    'entregado': 'boolean',
+    'fecha_entrega_check': 'timestamptz',
+    'orden': 'int',
+    'precio_unitario': 'numeric',
+    'origen_precio': 'text',
+    'id_material_ref': 'uuid',
+    'activo': 'boolean',
+}
+
+# Un solo UPDATE para todos los items: cada item trae su parche jsonb y solo
+# se tocan las columnas presentes en el parche (null explicito = NULL).
+QUERY_UPDATE_ITEMS_LOTE = f"""
+    UPDATE tb_bom_items i SET
+        {', '.join(
+            f"{col} = CASE WHEN c.campos ? '{col}' THEN (c.campos->>'{col}')::{tipo} ELSE i.{col} END"
+            for col, tipo in COLUMNAS_ITEM_LOTE.items()
+        )},
+        updated_at = NOW()
+    FROM (
+        SELECT u.id_item, u.campos::jsonb AS campos
+        FROM unnest($1::uuid[], $2::text[]) AS u(id_item, campos)
+    ) c
+    WHERE i.id_item = c.id_item
+"""
+
 
 class BomDBService:
     """Capa de acceso a datos para BOM."""
@@ -37,28 +126,8 @@ class BomDBService:
 
     async def get_bom_by_proyecto(self, conn, id_proyecto: UUID) -> Optional[dict]:
         """Obtiene el BOM mas reciente (mayor version) de un proyecto."""
-        row = await conn.fetchrow("""
-            SELECT b.*,
-                   u1.nombre AS elaborado_por_nombre,
-                   u2.nombre AS responsable_ing_nombre,
-                   u3.nombre AS jefe_construccion_nombre,
-                   u4.nombre AS coordinador_obra_nombre,
-                   o.nombre_proyecto AS proyecto_nombre,
-                   p.proyecto_id_estandar,
-                   COALESCE(items.total, 0) AS total_items,
-                   COALESCE(items.entregados, 0) AS items_entregados
-            FROM tb_bom b
-            LEFT JOIN tb_usuarios u1 ON u1.id_usuario = b.elaborado_por
-            LEFT JOIN tb_usuarios u2 ON u2.id_usuario = b.responsable_ing
-            LEFT JOIN tb_usuarios u3 ON u3.id_usuario = b.jefe_construccion
-            LEFT JOIN tb_usuarios u4 ON u4.id_usuario = b.coordinador_obra
-            LEFT JOIN tb_proyectos_gate p ON p.id_proyecto = b.id_proyecto
-            LEFT JOIN tb_oportunidades o ON o.id_oportunidad = p.id_oportunidad
-            LEFT JOIN LATERAL (
-                SELECT COUNT(*) FILTER (WHERE activo) AS total,
-                       COUNT(*) FILTER (WHERE activo AND entregado) AS entregados
-                FROM tb_bom_items WHERE id_bom = b.id_bom
-            ) items ON TRUE
+        row = await conn.fetchrow(f"""
+            {QUERY_SELECT_BOM_CABECERA}
             WHERE b.id_proyecto = $1
             ORDER BY b.version DESC
             LIMIT 1
@@ -67,32 +136,23 @@ class BomDBService:
 
     async def get_bom_by_id(self, conn, id_bom: UUID) -> Optional[dict]:
         """Obtiene un BOM por su ID con datos de usuarios y proyecto."""
-        row = await conn.fetchrow("""
-            SELECT b.*,
-                   u1.nombre AS elaborado_por_nombre,
-                   u2.nombre AS responsable_ing_nombre,
-                   u3.nombre AS jefe_construccion_nombre,
-                   u4.nombre AS coordinador_obra_nombre,
-                   o.nombre_proyecto AS proyecto_nombre,
-                   p.proyecto_id_estandar,
-                   COALESCE(items.total, 0) AS total_items,
-                   COALESCE(items.entregados, 0) AS items_entregados
-            FROM tb_bom b
-            LEFT JOIN tb_usuarios u1 ON u1.id_usuario = b.elaborado_por
-            LEFT JOIN tb_usuarios u2 ON u2.id_usuario = b.responsable_ing
-            LEFT JOIN tb_usuarios u3 ON u3.id_usuario = b.jefe_construccion
-            LEFT JOIN tb_usuarios u4 ON u4.id_usuario = b.coordinador_obra
-            LEFT JOIN tb_proyectos_gate p ON p.id_proyecto = b.id_proyecto
-            LEFT JOIN tb_oportunidades o ON o.id_oportunidad = p.id_oportunidad
-            LEFT JOIN LATERAL (
-                SELECT COUNT(*) FILTER (WHERE activo) AS total,
-                       COUNT(*) FILTER (WHERE activo AND entregado) AS entregados
-                FROM tb_bom_items WHERE id_bom = b.id_bom
-            ) items ON TRUE
+        row = await conn.fetchrow(f"""
+            {QUERY_SELECT_BOM_CABECERA}
             WHERE b.id_bom = $1
         """, id_bom)
         return dict(row) if row else None
 
+    async def refrescar_resumen(self, conn, ids_bom: List[UUID]) -> None:
+        """Recalcula la proyeccion tb_bom_resumen (migrations/008) de los BOMs dados.
+
+        Llamar despues de crear un BOM, escribir sus items o asignar
+        responsables: una sola sentencia (upsert) por llamada.
+        """
+        ids_bom = list(set(ids_bom))
+        if not ids_bom:
+            return
+        await conn.execute(QUERY_REFRESCAR_RESUMEN_BOM, ids_bom)
+
     async def get_bom_borrador_by_proyecto(self, conn, id_proyecto: UUID) -> Optional[dict]:
         """Verifica si existe un BOM en BORRADOR para el proyecto."""
         row = await conn.fetchrow("""
@@ -149,14 +209,104 @@ class BomDBService:
         """Lista todas las versiones de BOM de un proyecto."""
         rows = await conn.fetch("""
             SELECT b.id_bom, b.version, b.estatus, b.created_at,
-                   u.nombre AS elaborado_por_nombre
+                   r.elaborado_por_nombre,
+                   COALESCE(r.total_items, 0) AS total_items,
+                   COALESCE(r.costo_total, 0) AS costo_total
             FROM tb_bom b
-            LEFT JOIN tb_usuarios u ON u.id_usuario = b.elaborado_por
+            LEFT JOIN tb_bom_resumen r ON r.id_bom = b.id_bom
             WHERE b.id_proyecto = $1
             ORDER BY b.version DESC
         """, id_proyecto)
         return [dict(r) for r in rows]
 
+    async def comparar_versiones(self, conn, id_bom_base: UUID, id_bom_nuevo: UUID) -> List[dict]:
+        """Diferencias de items activos entre dos BOMs (una sola query).
+
+        Cada version clona los items con id nuevo, asi que se emparejan por
+        llave natural: material de catalogo (id_material_ref) o descripcion
+        normalizada, mas el numero de ocurrencia para descripciones repetidas.
+
+        Retorna una fila por item AGREGADO/ELIMINADO/MODIFICADO con los
+        valores anterior (a_*) y nuevo (b_*) y `campos_modificados`; todas las
+        filas traen los totales de ambas versiones. Sin diferencias retorna
+        una sola fila con tipo NULL (solo totales).
+        """
+        rows = await conn.fetch("""
+            WITH items AS (
+                SELECT i.id_bom, i.id_item, i.orden, i.descripcion, i.cantidad,
+                       i.unidad_medida, i.precio_unitario, i.origen_precio,
+                       i.tipo_entrega, i.fecha_requerida, i.fecha_estimada_entrega,
+                       i.comentarios,
+                       c.nombre AS categoria_nombre,
+                       p.nombre_comercial AS proveedor_nombre,
+                       i.cantidad * COALESCE(i.precio_unitario, 0) AS importe,
+                       COALESCE(i.id_material_ref::text, lower(btrim(i.descripcion))) AS clave
+                FROM tb_bom_items i
+                LEFT JOIN tb_cat_categorias_compra c ON c.id = i.id_categoria
+                LEFT JOIN tb_proveedores p ON p.id_proveedor = i.id_proveedor
+                WHERE i.id_bom = ANY(ARRAY[$1::uuid, $2::uuid]) AND i.activo = TRUE
+            ),
+            numerados AS (
+                SELECT it.*,
+                       row_number() OVER (
+                           PARTITION BY it.id_bom, it.clave ORDER BY it.orden, it.id_item
+                       ) AS ocurrencia
+                FROM items it
+            ),
+            a AS (SELECT * FROM numerados WHERE id_bom = $1),
+            b AS (SELECT * FROM numerados WHERE id_bom = $2),
+            totales AS (
+                SELECT COALESCE(SUM(importe) FILTER (WHERE id_bom = $1), 0) AS total_base,
+                       COALESCE(SUM(importe) FILTER (WHERE id_bom = $2), 0) AS total_nuevo,
+                       COUNT(*) FILTER (WHERE id_bom = $1) AS items_base,
+                       COUNT(*) FILTER (WHERE id_bom = $2) AS items_nuevo
+                FROM items
+            ),
+            diff AS (
+                SELECT
+                    CASE WHEN a.id_item IS NULL THEN 'AGREGADO'
+                         WHEN b.id_item IS NULL THEN 'ELIMINADO'
+                         ELSE 'MODIFICADO' END AS tipo,
+                    COALESCE(b.orden, a.orden) AS orden,
+                    a.descripcion AS a_descripcion, b.descripcion AS b_descripcion,
+                    a.categoria_nombre AS a_categoria_nombre, b.categoria_nombre AS b_categoria_nombre,
+                    a.cantidad AS a_cantidad, b.cantidad AS b_cantidad,
+                    a.unidad_medida AS a_unidad_medida, b.unidad_medida AS b_unidad_medida,
+                    a.precio_unitario AS a_precio_unitario, b.precio_unitario AS b_precio_unitario,
+                    a.origen_precio AS a_origen_precio, b.origen_precio AS b_origen_precio,
+                    a.proveedor_nombre AS a_proveedor_nombre, b.proveedor_nombre AS b_proveedor_nombre,
+                    a.tipo_entrega AS a_tipo_entrega, b.tipo_entrega AS b_tipo_entrega,
+                    a.fecha_requerida AS a_fecha_requerida, b.fecha_requerida AS b_fecha_requerida,
+                    a.fecha_estimada_entrega AS a_fecha_estimada_entrega,
+                    b.fecha_estimada_entrega AS b_fecha_estimada_entrega,
+                    a.comentarios AS a_comentarios, b.comentarios AS b_comentarios,
+                    COALESCE(a.importe, 0) AS importe_base,
+                    COALESCE(b.importe, 0) AS importe_nuevo,
+                    array_remove(ARRAY[
+                        CASE WHEN a.descripcion IS DISTINCT FROM b.descripcion THEN 'descripcion' END,
+                        CASE WHEN a.categoria_nombre IS DISTINCT FROM b.categoria_nombre THEN 'id_categoria' END,
+                        CASE WHEN a.cantidad IS DISTINCT FROM b.cantidad THEN 'cantidad' END,
+                        CASE WHEN a.unidad_medida IS DISTINCT FROM b.unidad_medida THEN 'unidad_medida' END,
+                        CASE WHEN a.precio_unitario IS DISTINCT FROM b.precio_unitario THEN 'precio_unitario' END,
+                        CASE WHEN a.origen_precio IS DISTINCT FROM b.origen_precio THEN 'origen_precio' END,
+                        CASE WHEN a.proveedor_nombre IS DISTINCT FROM b.proveedor_nombre THEN 'id_proveedor' END,
+                        CASE WHEN a.tipo_entrega IS DISTINCT FROM b.tipo_entrega THEN 'tipo_entrega' END,
+                        CASE WHEN a.fecha_requerida IS DISTINCT FROM b.fecha_requerida THEN 'fecha_requerida' END,
+                        CASE WHEN a.fecha_estimada_entrega IS DISTINCT FROM b.fecha_estimada_entrega
+                             THEN 'fecha_estimada_entrega' END,
+                        CASE WHEN a.comentarios IS DISTINCT FROM b.comentarios THEN 'comentarios' END
+                    ], NULL) AS campos_modificados
+                FROM a
+                FULL JOIN b ON b.clave = a.clave AND b.ocurrencia = a.ocurrencia
+            )
+            SELECT t.*, d.*
+            FROM totales t
+            LEFT JOIN diff d
+                   ON d.tipo <> 'MODIFICADO' OR cardinality(d.campos_modificados) > 0
+            ORDER BY d.orden NULLS FIRST, d.tipo
+        """, id_bom_base, id_bom_nuevo)
+        return [dict(r) for r in rows]
+
     # ─── BOM ITEMS ──────────────────────────────────────────
 
     async def agregar_item(
@@ -215,42 +365,39 @@ class BomDBService:
         """, id_item)
         return dict(row) if row else None
 
-    async def update_item(self, conn, id_item: UUID, **campos) -> dict:
-        """Actualiza campos de un item. Solo actualiza los campos proporcionados."""
-        sets = ["updated_at = NOW()"]
-        params = [id_item]
-        idx = 2
-
-        allowed = {
-            'id_categoria', 'descripcion', 'cantidad', 'unidad_medida',
-            'fecha_requerida', 'fecha_llegada_real', 'id_proveedor',
-            'tipo_entrega', 'fecha_estimada_entrega', 'comentarios',
-            'entregado', 'fecha_entrega_check', 'orden',
-            'precio_unitario', 'origen_precio', 'id_material_ref'
-        }
+    async def get_items_by_ids(self, conn, ids: List[UUID]) -> List[dict]:
+        """Varios items por ID con datos de BOM (misma forma que get_item_by_id)."""
+        rows = await conn.fetch("""
+            SELECT i.*,
+                   c.nombre AS categoria_nombre,
+                   p.nombre_comercial AS proveedor_nombre,
+                   b.estatus AS bom_estatus,
+                   b.id_proyecto,
+                   b.version AS bom_version,
+                   (i.cantidad * COALESCE(i.precio_unitario, 0)) AS importe
+            FROM tb_bom_items i
+            LEFT JOIN tb_cat_categorias_compra c ON c.id = i.id_categoria
+            LEFT JOIN tb_proveedores p ON p.id_proveedor = i.id_proveedor
+            JOIN tb_bom b ON b.id_bom = i.id_bom
+            WHERE i.id_item = ANY($1::uuid[])
+        """, ids)
+        return [dict(r) for r in rows]
 
-        for key, val in campos.items():
-            if key in allowed:
-                sets.append(f"{key} = ${idx}")
-                params.append(val)
-                idx += 1
+    async def update_items_lote(self, conn, cambios: List[Tuple[UUID, dict]]) -> int:
+        """Actualiza varios items en un solo UPDATE (set-based).
 
-        query = f"""
-            UPDATE tb_bom_items SET {', '.join(sets)}
-            WHERE id_item = $1
-            RETURNING *
+        cambios: tuplas (id_item, campos); campos solo con llaves de
+        COLUMNAS_ITEM_LOTE. Retorna el numero de items actualizados.
         """
-        row = await conn.fetchrow(query, *params)
-        return dict(row) if row else None
-
-    async def soft_delete_item(self, conn, id_item: UUID) -> dict:
-        """Marca un item como inactivo (soft delete)."""
-        row = await conn.fetchrow("""
-            UPDATE tb_bom_items SET activo = FALSE, updated_at = NOW()
-            WHERE id_item = $1
-            RETURNING *
-        """, id_item)
-        return dict(row) if row else None
+        if not cambios:
+            return 0
+        ids = [id_item for id_item, _ in cambios]
+        parches = [
+            json.dumps({k: v for k, v in campos.items() if k in COLUMNAS_ITEM_LOTE}, default=str)
+            for _, campos in cambios
+        ]
+        result = await conn.execute(QUERY_UPDATE_ITEMS_LOTE, ids, parches)
+        return int(result.split()[-1])
 
     async def restaurar_item(self, conn, id_item: UUID) -> dict:
         """Restaura un item eliminado."""
@@ -312,6 +459,24 @@ class BomDBService:
             valor_anterior, valor_nuevo, version_bom, realizado_por)
         return dict(row)
 
+    async def registrar_historial_lote(self, conn, registros: List[tuple]) -> int:
+        """Registra varios cambios en un solo INSERT (set-based).
+
+        registros: tuplas (id_bom, id_item, accion, campo_modificado,
+        valor_anterior, valor_nuevo, version_bom, realizado_por).
+        """
+        if not registros:
+            return 0
+        columnas = list(zip(*registros))
+        result = await conn.execute("""
+            INSERT INTO tb_bom_historial (id_bom, id_item, accion, campo_modificado,
+                                          valor_anterior, valor_nuevo, version_bom,
+                                          realizado_por)
+            SELECT * FROM unnest($1::uuid[], $2::uuid[], $3::text[], $4::text[],
+                                 $5::text[], $6::text[], $7::int[], $8::uuid[])
+        """, *[list(c) for c in columnas])
+        return int(result.split()[-1])
+
     async def get_historial_by_bom(self, conn, id_bom: UUID) -> List[dict]:
         """Lista historial de cambios de un BOM."""
         rows = await conn.fetch("""
@@ -417,49 +582,88 @@ class BomDBService:
         self, conn, query: str, umbral: float = 0.15, limite: int = 15
     ) -> List[dict]:
         """Busca materiales en historial. Usa ILIKE + word_similarity (pg_trgm)
-        para encontrar palabras dentro de descripciones largas."""
-        rows = await conn.fetch("""
-            SELECT DISTINCT ON (m.descripcion_proveedor)
-                m.id,
-                m.descripcion_proveedor,
-                m.precio_unitario,
-                m.unidad,
-                m.clave_prod_serv,
-                m.fecha_factura,
-                p.razon_social AS proveedor_nombre,
-                GREATEST(
-                    similarity(m.descripcion_proveedor, $1),
-                    word_similarity($1, m.descripcion_proveedor)
-                ) AS similitud
-            FROM tb_materiales_historial m
-            LEFT JOIN tb_proveedores p ON m.id_proveedor = p.id_proveedor
-            WHERE m.descripcion_proveedor ILIKE '%' || $1 || '%'
-               OR word_similarity($1, m.descripcion_proveedor) >= $2
-            ORDER BY m.descripcion_proveedor, m.fecha_factura DESC
-        """, query, umbral)
-        # Ordenar por similitud descendente y limitar
-        result = sorted([dict(r) for r in rows], key=lambda x: x['similitud'], reverse=True)
-        return result[:limite]
+        para encontrar palabras dentro de descripciones largas.
+
+        El ranking y el limite se resuelven en la BD sobre la proyeccion de
+        ultimo precio (una fila por descripcion/proveedor, migrations/007):
+        primero las `limite` descripciones mas relevantes (indice GIN trigram)
+        y solo para esas se toma la compra mas reciente. Solo viajan `limite`
+        filas.
+        """
+        async with conn.transaction():
+            # Umbral del operador <% (indexable) solo para esta transaccion
+            await conn.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', $1, true)",
+                str(umbral)
+            )
+            rows = await conn.fetch("""
+                WITH candidatos AS (
+                    SELECT
+                        u.descripcion_proveedor,
+                        GREATEST(
+                            similarity(u.descripcion_proveedor, $1),
+                            word_similarity($1, u.descripcion_proveedor)
+                        ) AS similitud,
+                        MAX(u.fecha_factura) AS ultima_fecha
+                    FROM tb_materiales_ultimo_precio u
+                    WHERE u.descripcion_proveedor ILIKE '%' || $1 || '%'
+                       OR $1 <% u.descripcion_proveedor
+                    GROUP BY u.descripcion_proveedor
+                    ORDER BY similitud DESC, ultima_fecha DESC NULLS LAST
+                    LIMIT $2
+                )
+                SELECT
+                    r.id_material AS id,
+                    c.descripcion_proveedor,
+                    r.precio_unitario,
+                    r.unidad,
+                    r.clave_prod_serv,
+                    r.fecha_factura,
+                    p.razon_social AS proveedor_nombre,
+                    c.similitud
+                FROM candidatos c
+                CROSS JOIN LATERAL (
+                    SELECT u.id_material, u.precio_unitario, u.unidad, u.clave_prod_serv,
+                           u.fecha_factura, u.id_proveedor
+                    FROM tb_materiales_ultimo_precio u
+                    WHERE u.descripcion_proveedor = c.descripcion_proveedor
+                    ORDER BY u.fecha_factura DESC NULLS LAST
+                    LIMIT 1
+                ) r
+                LEFT JOIN tb_proveedores p ON r.id_proveedor = p.id_proveedor
+                ORDER BY c.similitud DESC, c.ultima_fecha DESC NULLS LAST
+            """, query, limite)
+        return [dict(r) for r in rows]
 
     async def get_materiales_recientes(self, conn, limite: int = 10) -> List[dict]:
-        """Lista materiales mas recientes del historial (para dropdown inicial sin busqueda)."""
+        """Lista materiales mas recientes del historial (para dropdown inicial sin busqueda).
+
+        Recorre la proyeccion de ultimo precio por fecha (indice) y se detiene
+        al juntar `limite` descripciones distintas: una descripcion comprada a
+        varios proveedores aparece una vez, con su compra mas reciente.
+        """
         rows = await conn.fetch("""
-            SELECT DISTINCT ON (m.descripcion_proveedor)
-                m.id,
-                m.descripcion_proveedor,
-                m.precio_unitario,
-                m.unidad,
-                m.clave_prod_serv,
-                m.fecha_factura,
+            SELECT
+                u.id_material AS id,
+                u.descripcion_proveedor,
+                u.precio_unitario,
+                u.unidad,
+                u.clave_prod_serv,
+                u.fecha_factura,
                 p.razon_social AS proveedor_nombre,
                 1.0::real AS similitud
-            FROM tb_materiales_historial m
-            LEFT JOIN tb_proveedores p ON m.id_proveedor = p.id_proveedor
-            ORDER BY m.descripcion_proveedor, m.fecha_factura DESC
-        """)
-        # Los mas recientes primero, limitados
-        result = sorted([dict(r) for r in rows], key=lambda x: x['fecha_factura'] or '', reverse=True)
-        return result[:limite]
+            FROM tb_materiales_ultimo_precio u
+            LEFT JOIN tb_proveedores p ON u.id_proveedor = p.id_proveedor
+            WHERE NOT EXISTS (
+                SELECT 1 FROM tb_materiales_ultimo_precio o
+                WHERE o.descripcion_proveedor = u.descripcion_proveedor
+                  AND (COALESCE(o.fecha_factura, '-infinity'), o.id_material)
+                    > (COALESCE(u.fecha_factura, '-infinity'), u.id_material)
+            )
+            ORDER BY u.fecha_factura DESC NULLS LAST
+            LIMIT $1
+        """, limite)
+        return [dict(r) for r in rows]
 
     async def get_proyecto_info(self, conn, id_proyecto: UUID) -> Optional[dict]:
         """Obtiene info basica del proyecto."""
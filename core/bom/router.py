@@ -8,6 +8,7 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import Response
 from uuid import UUID
 from datetime import datetime
+from typing import Optional
 import asyncpg
 import logging
 
@@ -15,6 +16,7 @@ from core.database import get_db_connection
 from core.security import get_current_user_context
 from core.permissions import require_module_access, require_manager_access, get_user_module_role
 from core.config import settings
+from .schemas import BomItemsPatchLote
 from .service import BomService, get_bom_service
 
 logger = logging.getLogger("BOM.Router")
@@ -301,99 +303,49 @@ async def agregar_item(
         })
 
 
-@router.patch("/items/{id_item}", include_in_schema=False)
-async def editar_item(
+@router.patch("/{id_bom}/items", include_in_schema=False)
+async def editar_items_lote(
     request: Request,
-    id_item: UUID,
+    id_bom: UUID,
+    datos: BomItemsPatchLote,
     context=Depends(get_current_user_context),
     conn=Depends(get_db_connection),
     service: BomService = Depends(get_bom_service),
     _=require_module_access("ingenieria"),
 ):
-    """Edita un item del BOM."""
-    form = await request.form()
-    user_id = context.get("user_db_id")
-    area_editor = _get_area_editor(context)
-
-    # Construir campos desde el form
-    campos = {}
-    for key in form.keys():
-        val = form.get(key)
-        if key == "id_categoria":
-            campos[key] = int(val) if val else None
-        elif key == "cantidad":
-            from decimal import Decimal
-            campos[key] = Decimal(val) if val else None
-        elif key == "id_proveedor":
-            campos[key] = UUID(val) if val else None
-        elif key == "entregado":
-            campos[key] = val in ("true", "True", "1", "on")
-        elif key in ("fecha_requerida", "fecha_llegada_real", "fecha_estimada_entrega"):
-            from datetime import date as date_type
-            campos[key] = date_type.fromisoformat(val) if val else None
-        elif key == "precio_unitario":
-            from decimal import Decimal as Dec
-            campos[key] = Dec(val) if val and val.strip() else None
-        elif key == "origen_precio":
-            if val and val.strip() in ('CATALOGO', 'MANUAL'):
-                campos[key] = val.strip()
-        elif key in ("descripcion", "unidad_medida", "tipo_entrega", "comentarios"):
-            campos[key] = val.strip() if val else None
-
-    try:
-        await service.editar_item(
-            conn, id_item, user_id, area_editor, **campos
-        )
-
-        # Retornar fila actualizada
-        item = await service.get_item(conn, id_item)
-        bom = await service.get_bom(conn, item['id_bom'])
-
-        ctx = _build_bom_context(request, context, bom, item=item)
-        return templates.TemplateResponse("bom/partials/row_item.html", ctx)
-
-    except ValueError as e:
-        return templates.TemplateResponse("shared/toast.html", {
-            "request": request,
-            "message": str(e),
-            "type": "error",
-        })
-    except asyncpg.PostgresError:
-        logger.exception("Error de BD al editar item BOM")
-        return templates.TemplateResponse("shared/toast.html", {
-            "request": request,
-            "message": "Error interno al editar el item",
-            "type": "error",
-        })
-
-
-@router.delete("/items/{id_item}", include_in_schema=False)
-async def eliminar_item(
-    request: Request,
-    id_item: UUID,
-    context=Depends(get_current_user_context),
-    conn=Depends(get_db_connection),
-    service: BomService = Depends(get_bom_service),
-):
-    """Elimina (soft) un item del BOM. Permite Ingenieria y Construccion."""
+    """
+    Edita, reordena, elimina y restaura varios items en una sola transaccion.
+    Payload esperado: JSON (hx-ext="json-enc"). Lo envia la barra de cambios
+    pendientes de tabla_items.html. Retorna la tabla una sola vez; en error
+    solo el toast (HX-Reswap: none) para no perder los cambios pendientes.
+    """
     user_id = context.get("user_db_id")
     area_editor = _get_area_editor(context)
 
-    if area_editor not in ("ingenieria", "construccion"):
+    if area_editor == "viewer":
         return templates.TemplateResponse("shared/toast.html", {
             "request": request,
-            "message": "No tienes permisos para eliminar items",
+            "message": "No tienes permisos para editar items",
             "type": "error",
-        })
+        }, headers={"HX-Reswap": "none"})
+
+    # Solo los campos enviados; mismas normalizaciones que la edicion individual
+    cambios = []
+    for item in datos.items:
+        campos = item.model_dump(exclude_unset=True)
+        for key in ("descripcion", "unidad_medida", "tipo_entrega", "comentarios"):
+            if key in campos:
+                campos[key] = campos[key].strip() if campos[key] else None
+        if "origen_precio" in campos and campos["origen_precio"] not in ("CATALOGO", "MANUAL"):
+            del campos["origen_precio"]
+        cambios.append(campos)
 
     try:
-        item = await service.get_item(conn, id_item)
-        await service.eliminar_item(conn, id_item, user_id, area_editor=area_editor)
+        await service.aplicar_cambios_items(conn, id_bom, cambios, user_id, area_editor)
 
-        # Retornar tabla actualizada
-        bom = await service.get_bom(conn, item['id_bom'])
-        items = await service.get_items(conn, bom['id_bom'])
-        estadisticas = await service.get_estadisticas(conn, bom['id_bom'])
+        bom = await service.get_bom(conn, id_bom)
+        items = await service.get_items(conn, id_bom)
+        estadisticas = await service.get_estadisticas(conn, id_bom)
 
         ctx = _build_bom_context(
             request, context, bom,
@@ -406,14 +358,14 @@ async def eliminar_item(
             "request": request,
             "message": str(e),
             "type": "error",
-        })
+        }, headers={"HX-Reswap": "none"})
     except asyncpg.PostgresError:
-        logger.exception("Error de BD al eliminar item BOM")
+        logger.exception("Error de BD al editar items BOM en lote")
         return templates.TemplateResponse("shared/toast.html", {
             "request": request,
-            "message": "Error interno al eliminar el item",
+            "message": "Error interno al guardar los cambios",
             "type": "error",
-        })
+        }, headers={"HX-Reswap": "none"})
 
 
 @router.get("/items/{id_item}/modal", include_in_schema=False)
@@ -774,6 +726,32 @@ async def get_historial(
     })
 
 
+@router.get("/{id_bom}/comparar", include_in_schema=False)
+async def comparar_versiones(
+    request: Request,
+    id_bom: UUID,
+    base: Optional[UUID] = None,
+    context=Depends(get_current_user_context),
+    conn=Depends(get_db_connection),
+    service: BomService = Depends(get_bom_service),
+    _=require_module_access("ingenieria"),
+):
+    """Diferencias contra otra version del BOM (default: la version anterior)."""
+    try:
+        comparacion = await service.comparar_versiones(conn, id_bom, base)
+    except ValueError as e:
+        return templates.TemplateResponse("shared/toast.html", {
+            "request": request,
+            "message": str(e),
+            "type": "error",
+        })
+
+    return templates.TemplateResponse("bom/partials/comparacion_versiones.html", {
+        "request": request,
+        **comparacion,
+    })
+
+
 @router.get("/{id_bom}/aprobaciones", include_in_schema=False)
 async def get_aprobaciones(
     request: Request,
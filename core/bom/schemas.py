@@ -77,6 +77,7 @@ class BomRead(BaseModel):
     proyecto_id_estandar: Optional[str] = None
     total_items: int = 0
     items_entregados: int = 0
+    costo_total: Decimal = Decimal(0)
 
     model_config = {"from_attributes": True}
 
@@ -110,6 +111,18 @@ class BomItemUpdate(BaseModel):
     origen_precio: Optional[str] = None
 
 
+class BomItemPatch(BomItemUpdate):
+    """Cambio de un item dentro de una edicion en lote (solo campos enviados)."""
+    id_item: UUID
+    orden: Optional[int] = Field(default=None, ge=0)
+    activo: Optional[bool] = None
+
+
+class BomItemsPatchLote(BaseModel):
+    """Edicion en lote de items (JSON, hx-ext="json-enc")."""
+    items: List[BomItemPatch] = Field(..., min_length=1)
+
+
 class BomItemRead(BaseModel):
     id_item: UUID
     id_bom: UUID
@@ -5,7 +5,7 @@ Logica de negocio, workflow de aprobaciones, versionado y exportacion Excel.
 
 import logging
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, timezone
 
 from core.bom.db_service import BomDBService
@@ -44,9 +44,62 @@ CAMPO_LABELS = {
     'entregado': 'Entregado',
     'precio_unitario': 'Precio unitario',
     'origen_precio': 'Origen precio',
+    'orden': 'Orden',
+}
+
+# Campo -> columna mostrada en la comparacion de versiones (nombres, no IDs)
+COLUMNAS_COMPARACION = {
+    'id_categoria': 'categoria_nombre',
+    'id_proveedor': 'proveedor_nombre',
 }
 
 
+class HistorialLote:
+    """
+    Acumula los cambios de una operacion (uno o varios items) y los guarda
+    en tb_bom_historial con un solo INSERT al final.
+    """
+
+    def __init__(self, realizado_por: UUID):
+        self.realizado_por = realizado_por
+        self._registros: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._registros)
+
+    def registrar(
+        self, id_bom: UUID, accion: AccionHistorial, version_bom: int,
+        id_item: Optional[UUID] = None,
+        campo_modificado: Optional[str] = None,
+        valor_anterior: Optional[str] = None,
+        valor_nuevo: Optional[str] = None
+    ):
+        self._registros.append((
+            id_bom, id_item, AccionHistorial(accion).value, campo_modificado,
+            valor_anterior, valor_nuevo, version_bom, self.realizado_por
+        ))
+
+    def registrar_cambios(self, item: dict, campos: dict) -> int:
+        """Un registro EDITADO por cada campo cuyo valor cambia. Retorna cuantos."""
+        antes = len(self._registros)
+        for campo, valor_nuevo in campos.items():
+            valor_anterior = item.get(campo)
+            if str(valor_anterior) != str(valor_nuevo):
+                self.registrar(
+                    item['id_bom'], AccionHistorial.EDITADO, item['bom_version'],
+                    id_item=item['id_item'],
+                    campo_modificado=CAMPO_LABELS.get(campo, campo),
+                    valor_anterior=str(valor_anterior) if valor_anterior is not None else None,
+                    valor_nuevo=str(valor_nuevo) if valor_nuevo is not None else None
+                )
+        return len(self._registros) - antes
+
+    async def guardar(self, conn, db: BomDBService) -> int:
+        """Persiste todo lo acumulado (un INSERT) y vacia el lote."""
+        registros, self._registros = self._registros, []
+        return await db.registrar_historial_lote(conn, registros)
+
+
 class BomService:
     """Logica de negocio para BOM."""
 
@@ -94,6 +147,7 @@ class BomService:
             conn, bom['id_bom'], AccionHistorial.CREADO,
             nueva_version, elaborado_por
         )
+        await self.db.refrescar_resumen(conn, [bom['id_bom']])
 
         logger.info(
             "BOM creado: proyecto=%s, version=%d, por=%s",
@@ -151,18 +205,92 @@ class BomService:
             campo_modificado='item',
             valor_nuevo=descripcion
         )
+        await self.db.refrescar_resumen(conn, [id_bom])
 
         return item
 
-    async def editar_item(
-        self, conn, id_item: UUID, user_id: UUID,
-        area_editor: str, **campos
-    ) -> dict:
+    async def aplicar_cambios_items(
+        self, conn, id_bom: UUID, cambios: List[dict], user_id: UUID, area_editor: str
+    ) -> int:
         """
-        Edita un item del BOM. Valida permisos segun area del editor.
-        area_editor: 'ingenieria', 'construccion', 'compras'
+        Aplica en una transaccion los cambios de varios items de un BOM:
+        campos editables, `orden` (reordenar) y `activo` (eliminar/restaurar).
+
+        Cada cambio es un dict con `id_item` y solo los campos a modificar.
+        Todo se valida antes de escribir (si un cambio es invalido no se
+        aplica ninguno); los items se actualizan con un solo UPDATE y el
+        historial con un solo INSERT.
+
+        Returns:
+            Numero de items actualizados.
         """
-        item = await self.db.get_item_by_id(conn, id_item)
+        if not cambios:
+            raise ValueError("No hay cambios para aplicar")
+
+        ids = [c['id_item'] for c in cambios]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Un item aparece mas de una vez en los cambios")
+
+        items = {i['id_item']: i for i in await self.db.get_items_by_ids(conn, ids)}
+
+        # Reordenar, eliminar y restaurar son edicion estructural del BOM:
+        # solo Ingenieria y Construccion (el validador rechaza otras areas)
+        if any('orden' in c or 'activo' in c for c in cambios):
+            await self._validar_edicion_items(conn, id_bom, area_editor)
+
+        historial = HistorialLote(user_id)
+        por_aplicar = []
+        for cambio in cambios:
+            campos = dict(cambio)
+            id_item = campos.pop('id_item')
+            orden = campos.pop('orden', None)
+            activo = campos.pop('activo', None)
+
+            item = items.get(id_item)
+            if not item or item['id_bom'] != id_bom:
+                raise ValueError("Item no encontrado en este BOM")
+
+            campos_filtrados = {}
+            if campos:
+                # Un item que se restaura en el mismo lote ya se puede editar
+                efectivo = dict(item, activo=True) if activo else item
+                campos_filtrados = self._filtrar_campos_edicion(efectivo, area_editor, campos)
+                historial.registrar_cambios(item, campos_filtrados)
+
+            if orden is not None and orden != item['orden']:
+                campos_filtrados['orden'] = orden
+                historial.registrar_cambios(item, {'orden': orden})
+
+            if activo is not None and activo != item['activo']:
+                campos_filtrados['activo'] = activo
+                historial.registrar(
+                    id_bom,
+                    AccionHistorial.RESTAURADO if activo else AccionHistorial.ELIMINADO,
+                    item['bom_version'],
+                    id_item=id_item,
+                    campo_modificado='item',
+                    valor_anterior=None if activo else item.get('descripcion'),
+                    valor_nuevo=item.get('descripcion') if activo else None
+                )
+
+            if campos_filtrados:
+                por_aplicar.append((id_item, campos_filtrados))
+
+        if not por_aplicar:
+            return 0
+
+        async with conn.transaction():
+            actualizados = await self.db.update_items_lote(conn, por_aplicar)
+            await historial.guardar(conn, self.db)
+            await self.db.refrescar_resumen(conn, [id_bom])
+
+        logger.info(
+            "BOM %s: %d items actualizados en lote por %s", id_bom, actualizados, user_id
+        )
+        return actualizados
+
+    def _filtrar_campos_edicion(self, item: Optional[dict], area_editor: str, campos: dict) -> dict:
+        """Campos que el area puede editar en este item. Lanza ValueError si no es editable."""
         if not item:
             raise ValueError("Item no encontrado")
         if not item.get('activo', True):
@@ -206,42 +334,7 @@ class BomService:
 
         if not campos_filtrados:
             raise ValueError("No hay campos validos para actualizar")
-
-        # Registrar cambios en historial
-        for campo, valor_nuevo in campos_filtrados.items():
-            valor_anterior = item.get(campo)
-            if str(valor_anterior) != str(valor_nuevo):
-                await self.db.registrar_historial(
-                    conn, item['id_bom'], AccionHistorial.EDITADO,
-                    item['bom_version'], user_id,
-                    id_item=id_item,
-                    campo_modificado=CAMPO_LABELS.get(campo, campo),
-                    valor_anterior=str(valor_anterior) if valor_anterior is not None else None,
-                    valor_nuevo=str(valor_nuevo) if valor_nuevo is not None else None
-                )
-
-        updated = await self.db.update_item(conn, id_item, **campos_filtrados)
-        return updated
-
-    async def eliminar_item(self, conn, id_item: UUID, user_id: UUID, area_editor: str = 'ingenieria') -> dict:
-        """Soft delete de un item. Valida permisos segun area."""
-        item = await self.db.get_item_by_id(conn, id_item)
-        if not item:
-            raise ValueError("Item no encontrado")
-
-        await self._validar_edicion_items(conn, item['id_bom'], area_editor)
-
-        deleted = await self.db.soft_delete_item(conn, id_item)
-
-        await self.db.registrar_historial(
-            conn, item['id_bom'], AccionHistorial.ELIMINADO,
-            item['bom_version'], user_id,
-            id_item=id_item,
-            campo_modificado='item',
-            valor_anterior=item.get('descripcion')
-        )
-
-        return deleted
+        return campos_filtrados
 
     async def get_items(self, conn, id_bom: UUID) -> list:
         """Lista items activos del BOM."""
@@ -280,6 +373,8 @@ class BomService:
         updated = await self.db.update_bom_estatus(
             conn, id_bom, EstatusBOM.EN_REVISION_ING, **update_kwargs
         )
+        if responsable_ing:
+            await self.db.refrescar_resumen(conn, [id_bom])
 
         await self.db.registrar_aprobacion(
             conn, id_bom, TipoAprobacion.ENVIO_REVISION_ING,
@@ -353,6 +448,8 @@ class BomService:
         await self.db.update_bom_estatus(
             conn, id_bom, EstatusBOM.EN_REVISION_CONST, **update_kwargs
         )
+        if coordinador_obra:
+            await self.db.refrescar_resumen(conn, [id_bom])
 
         await self.db.registrar_aprobacion(
             conn, id_bom, TipoAprobacion.ENVIO_REVISION_CONST,
@@ -448,6 +545,7 @@ class BomService:
             valor_anterior=str(bom['version']),
             valor_nuevo=str(nueva_version)
         )
+        await self.db.refrescar_resumen(conn, [nuevo_bom['id_bom']])
 
         logger.info(
             "Nueva version BOM creada: proyecto=%s, v%d->v%d, %d items copiados",
@@ -470,6 +568,68 @@ class BomService:
         """Estadisticas del BOM."""
         return await self.db.get_estadisticas_bom(conn, id_bom)
 
+    # ─── COMPARACION DE VERSIONES ───────────────────────────
+
+    async def comparar_versiones(
+        self, conn, id_bom: UUID, id_bom_base: Optional[UUID] = None
+    ) -> dict:
+        """
+        Diferencias entre dos versiones de BOM del mismo proyecto: items
+        agregados, eliminados y modificados (con delta por campo) e impacto
+        en costo. Sin `id_bom_base` compara contra la version anterior.
+        """
+        bom = await self.get_bom(conn, id_bom)
+
+        if id_bom_base is None:
+            versiones = await self.db.get_all_bom_versions(conn, bom['id_proyecto'])
+            anteriores = [v for v in versiones if v['version'] < bom['version']]
+            if not anteriores:
+                raise ValueError("No hay una version anterior para comparar")
+            id_bom_base = anteriores[0]['id_bom']
+
+        base = await self.get_bom(conn, id_bom_base)
+        if base['id_proyecto'] != bom['id_proyecto']:
+            raise ValueError("Solo se pueden comparar versiones del mismo proyecto")
+
+        rows = await self.db.comparar_versiones(conn, id_bom_base, id_bom)
+
+        cambios = []
+        for r in rows:
+            if r['tipo'] is None:
+                continue
+            deltas = [
+                {
+                    'campo': CAMPO_LABELS.get(campo, campo),
+                    'anterior': r[f"a_{COLUMNAS_COMPARACION.get(campo, campo)}"],
+                    'nuevo': r[f"b_{COLUMNAS_COMPARACION.get(campo, campo)}"],
+                }
+                for campo in r['campos_modificados']
+            ] if r['tipo'] == 'MODIFICADO' else []
+            cambios.append({
+                'tipo': r['tipo'],
+                'descripcion': r['b_descripcion'] or r['a_descripcion'],
+                'unidad_medida': r['b_unidad_medida'] or r['a_unidad_medida'],
+                'cantidad_base': r['a_cantidad'],
+                'cantidad_nueva': r['b_cantidad'],
+                'importe_base': float(r['importe_base']),
+                'importe_nuevo': float(r['importe_nuevo']),
+                'impacto': float(r['importe_nuevo'] - r['importe_base']),
+                'deltas': deltas,
+            })
+
+        totales = rows[0]
+        resumen = {
+            'agregados': sum(1 for c in cambios if c['tipo'] == 'AGREGADO'),
+            'eliminados': sum(1 for c in cambios if c['tipo'] == 'ELIMINADO'),
+            'modificados': sum(1 for c in cambios if c['tipo'] == 'MODIFICADO'),
+            'items_base': totales['items_base'],
+            'items_nuevo': totales['items_nuevo'],
+            'total_base': float(totales['total_base']),
+            'total_nuevo': float(totales['total_nuevo']),
+            'impacto_total': float(totales['total_nuevo'] - totales['total_base']),
+        }
+        return {'bom': bom, 'base': base, 'cambios': cambios, 'resumen': resumen}
+
     # ─── CATALOGOS ──────────────────────────────────────────
 
     async def get_catalogos(self, conn) -> dict:
@@ -496,115 +656,78 @@ class BomService:
     # ─── EXPORT EXCEL ────────────────────────────────────────
 
     async def export_to_excel(self, conn, id_bom: UUID) -> bytes:
-        """Genera archivo Excel con los items del BOM."""
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        from io import BytesIO
+        """Genera archivo Excel con los items del BOM (escritura en hilo, core.excel_export)."""
+        from core.excel_export import XlsxColumn, build_xlsx
 
         bom = await self.get_bom(conn, id_bom)
         items = await self.db.get_items_by_bom(conn, id_bom)
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Lista de Materiales"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
-
-        # Info cabecera BOM (filas 1-5)
-        info_font = Font(bold=True, size=10)
-        ws.cell(row=1, column=1, value="Proyecto:").font = info_font
-        ws.cell(row=1, column=2, value=f"{bom.get('proyecto_id_estandar', '')} - {bom.get('proyecto_nombre', '')}")
-        ws.cell(row=2, column=1, value="Version:").font = info_font
-        ws.cell(row=2, column=2, value=bom.get('version', 1))
-        ws.cell(row=3, column=1, value="Estatus:").font = info_font
-        ws.cell(row=3, column=2, value=bom.get('estatus', ''))
-        ws.cell(row=4, column=1, value="Elaborado por:").font = info_font
-        ws.cell(row=4, column=2, value=bom.get('elaborado_por_nombre', ''))
-        ws.cell(row=5, column=1, value="Responsable Ing:").font = info_font
-        ws.cell(row=5, column=2, value=bom.get('responsable_ing_nombre', ''))
-
-        # Headers de tabla (fila 7)
-        headers_row = 7
-        headers = [
-            "#", "Categoria", "Descripcion", "Cantidad", "Unidad",
-            "Precio Unitario", "Importe",
-            "Fecha Requerida", "Fecha Llegada Real", "Proveedor",
-            "Tipo Entrega", "Fecha Estimada Entrega", "Comentarios", "Entregado"
+        columnas = [
+            XlsxColumn("#", 5),
+            XlsxColumn("Categoria", 20),
+            XlsxColumn("Descripcion", 40),
+            XlsxColumn("Cantidad", 12, "qty4"),
+            XlsxColumn("Unidad", 10),
+            XlsxColumn("Precio Unitario", 16, "currency"),
+            XlsxColumn("Importe", 16, "currency"),
+            XlsxColumn("Fecha Requerida", 16),
+            XlsxColumn("Fecha Llegada Real", 16),
+            XlsxColumn("Proveedor", 25),
+            XlsxColumn("Tipo Entrega", 16),
+            XlsxColumn("Fecha Estimada Entrega", 18),
+            XlsxColumn("Comentarios", 30),
+            XlsxColumn("Entregado", 10),
         ]
 
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=headers_row, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-
-        # Datos
-        total_importe = 0
-        for row_num, item in enumerate(items, headers_row + 1):
-            precio = item.get('precio_unitario') or 0
-            cantidad = item.get('cantidad') or 0
-            importe = float(cantidad) * float(precio)
-            total_importe += importe
-
-            row_data = [
-                row_num - headers_row,
-                item.get('categoria_nombre', ''),
-                item.get('descripcion', ''),
-                item.get('cantidad', 0),
-                item.get('unidad_medida', ''),
-                float(precio) if precio else None,
-                importe if precio else None,
-                item['fecha_requerida'].strftime("%d/%m/%Y") if item.get('fecha_requerida') else '',
-                item['fecha_llegada_real'].strftime("%d/%m/%Y") if item.get('fecha_llegada_real') else '',
-                item.get('proveedor_nombre', ''),
-                item.get('tipo_entrega', ''),
-                item['fecha_estimada_entrega'].strftime("%d/%m/%Y") if item.get('fecha_estimada_entrega') else '',
-                item.get('comentarios', ''),
-                'Si' if item.get('entregado') else 'No',
-            ]
-
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num, value=value)
-                cell.border = thin_border
-                if col_num == 4:
-                    cell.number_format = '#,##0.0000'
-                    cell.alignment = Alignment(horizontal="right")
-                elif col_num in (6, 7):
-                    cell.number_format = '$#,##0.00'
-                    cell.alignment = Alignment(horizontal="right")
-
-        # Fila de total
-        if items:
-            total_row = headers_row + len(items) + 1
-            total_font = Font(bold=True, size=11)
-            ws.cell(row=total_row, column=3, value="TOTAL").font = total_font
-            ws.cell(row=total_row, column=3).border = thin_border
-            cell_total = ws.cell(row=total_row, column=7, value=total_importe)
-            cell_total.font = total_font
-            cell_total.number_format = '$#,##0.00'
-            cell_total.alignment = Alignment(horizontal="right")
-            cell_total.border = thin_border
-
-        # Anchos de columna
-        column_widths = [5, 20, 40, 12, 10, 16, 16, 16, 16, 25, 16, 18, 30, 10]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-
-        ws.freeze_panes = f"A{headers_row + 1}"
-
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue()
+        def _fecha(item, key):
+            return item[key].strftime("%d/%m/%Y") if item.get(key) else ''
+
+        def _build(wb):
+            ws = wb.add_sheet("Lista de Materiales", columnas)
+
+            # Info cabecera BOM (filas 1-5)
+            ws.write_info("Proyecto:", f"{bom.get('proyecto_id_estandar', '')} - {bom.get('proyecto_nombre', '')}")
+            ws.write_info("Version:", bom.get('version', 1))
+            ws.write_info("Estatus:", bom.get('estatus', ''))
+            ws.write_info("Elaborado por:", bom.get('elaborado_por_nombre', ''))
+            ws.write_info("Responsable Ing:", bom.get('responsable_ing_nombre', ''))
+
+            # Headers de tabla (fila 7)
+            ws.skip()
+            ws.write_header()
+
+            total_importe = 0
+            for num, item in enumerate(items, 1):
+                precio = item.get('precio_unitario') or 0
+                cantidad = item.get('cantidad') or 0
+                importe = float(cantidad) * float(precio)
+                total_importe += importe
+
+                ws.append([
+                    num,
+                    item.get('categoria_nombre', ''),
+                    item.get('descripcion', ''),
+                    item.get('cantidad', 0),
+                    item.get('unidad_medida', ''),
+                    float(precio) if precio else None,
+                    importe if precio else None,
+                    _fecha(item, 'fecha_requerida'),
+                    _fecha(item, 'fecha_llegada_real'),
+                    item.get('proveedor_nombre', ''),
+                    item.get('tipo_entrega', ''),
+                    _fecha(item, 'fecha_estimada_entrega'),
+                    item.get('comentarios', ''),
+                    'Si' if item.get('entregado') else 'No',
+                ])
+
+            # Fila de total
+            if items:
+                ws.write_cells({
+                    2: ("TOTAL", "total_cell"),
+                    6: (total_importe, "total_currency"),
+                })
+
+        return await build_xlsx(_build)
 
     # ─── HELPERS INTERNOS ────────────────────────────────────
 
@@ -623,11 +746,9 @@ class BomService:
                  raise ValueError(
                     f"El BOM estÃ¡ en estado {estatus} y no permite ediciÃ³n estructural por ConstrucciÃ³n."
                 )
-        # Compras no suele agregar/eliminar items, pero si fuera necesario se agrega aqui.
         else:
-            # Fallback seguro
-             if estatus not in ESTATUS_EDITABLE_ING:
-                raise ValueError("Area de edicion no reconocida o estado invalido.")
+            # Compras (y cualquier otra area) no agrega, elimina, restaura ni reordena items
+            raise ValueError("No tienes permisos para agregar, eliminar o reordenar items.")
         
         return bom
 
@@ -59,5 +59,19 @@ class Settings(BaseSettings):
     TOKEN_REFRESH_MARGIN_SECONDS: int = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))  # 5 min
     DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
     DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # numeric -> float en todas las conexiones del pool (default: Decimal)
+    DB_NUMERIC_AS_FLOAT: bool = os.getenv("DB_NUMERIC_AS_FLOAT", "False").lower() == "true"
+
+    # --- Reportes asincronos (core/report_jobs) ---
+    REPORT_JOBS_MAX_CONCURRENT: int = int(os.getenv("REPORT_JOBS_MAX_CONCURRENT", "2"))  # por worker
+    REPORT_JOBS_TTL_SECONDS: int = int(os.getenv("REPORT_JOBS_TTL_SECONDS", "7200"))  # 2h
+    REPORT_JOBS_STALE_SECONDS: int = int(os.getenv("REPORT_JOBS_STALE_SECONDS", "180"))  # sin latido -> ERROR
+
+    # --- Presets de reportes pre-generados (modules/simulacion/report_presets) ---
+    REPORT_PRESETS_INTERVAL_SECONDS: int = int(os.getenv("REPORT_PRESETS_INTERVAL_SECONDS", "3600"))  # 1h
+    REPORT_PRESETS_MAX_AGE_SECONDS: int = int(os.getenv("REPORT_PRESETS_MAX_AGE_SECONDS", "7200"))  # 2h
+
+    # --- Dashboards (core/dashboard_stats) ---
+    DASHBOARD_CACHE_TTL_SECONDS: int = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))  # 0 = sin cache
 
 settings = Settings()
\ No newline at end of file
@@ -44,6 +44,11 @@ class ConfigService:
     _cache_umbrales: Dict[str, Tuple[float, UmbralesKPI]] = {}
     _cache_global: Dict[str, Tuple[float, Any]] = {}
     _CACHE_TTL = 30.0  # 30 segundos de vida
+    # Tope de _cache_global: las llaves de dashboard incluyen los filtros, asi que
+    # cada combinacion probada agrega una entrada. Al pasarlo se barren las
+    # entradas mas viejas que el mayor TTL en uso y, si no basta, las mas antiguas.
+    _CACHE_GLOBAL_MAX_ITEMS = 2048
+    _CACHE_GLOBAL_MAX_AGE = 3600.0
     _cache_lock: asyncio.Lock = asyncio.Lock()
 
     # Regex para validar nombres de tabla y columna (prevenir SQL injection)
@@ -65,7 +70,21 @@ class ConfigService:
     async def set_cached_value(cls, key: str, value: Any):
         """Guarda valor en cache con timestamp actual. Thread-safe via asyncio.Lock."""
         async with cls._cache_lock:
-            cls._cache_global[key] = (time.time(), value)
+            now = time.time()
+            # Reinsertar al final: el orden del dict es el de escritura (mas antigua primero)
+            cls._cache_global.pop(key, None)
+            cls._cache_global[key] = (now, value)
+            if len(cls._cache_global) > cls._CACHE_GLOBAL_MAX_ITEMS:
+                cls._podar_cache_global(now)
+
+    @classmethod
+    def _podar_cache_global(cls, now: float):
+        """Barre entradas vencidas y, si sigue lleno, descarta las escritas hace mas tiempo."""
+        limite = now - cls._CACHE_GLOBAL_MAX_AGE
+        for key in [k for k, (ts, _) in cls._cache_global.items() if ts < limite]:
+            del cls._cache_global[key]
+        while len(cls._cache_global) > cls._CACHE_GLOBAL_MAX_ITEMS:
+            del cls._cache_global[next(iter(cls._cache_global))]
 
     @classmethod
     async def get_catalog_map(cls, conn: asyncpg.Connection, table: str, key_col: str = "nombre", val_col: str = "id") -> Dict[str, Any]:
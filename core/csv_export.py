@@ -0,0 +1,66 @@
+# Archivo: core/csv_export.py
+"""
+Exportacion CSV en streaming.
+
+El cuerpo de la respuesta se genera mientras se recorre un cursor del lado
+del servidor (core.database.iter_cursor_batches): el primer byte sale en
+cuanto llega el primer lote y la memoria queda acotada a un lote, sin
+importar el tamano de la exportacion.
+
+El generador toma su propia conexion del pool: la conexion de la dependencia
+`get_db_connection` no debe quedar atada a la vida del StreamingResponse.
+"""
+import csv
+import io
+import logging
+from typing import AsyncIterator, Callable, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from core.database import get_db_pool, iter_cursor_batches
+
+logger = logging.getLogger("CsvExport")
+
+CSV_BATCH_SIZE = 2000
+# BOM para que Excel detecte UTF-8 (acentos en nombres)
+_UTF8_BOM = "﻿"
+
+
+async def stream_csv_rows(
+    query: str,
+    params: Sequence,
+    headers: Sequence[str],
+    row_mapper: Callable[[object], Sequence],
+    batch_size: int = CSV_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """Genera el CSV por bloques (un bloque por lote del cursor)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def _flush() -> bytes:
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    buffer.write(_UTF8_BOM)
+    writer.writerow(headers)
+    yield _flush()
+
+    pool = await get_db_pool()
+    total = 0
+    async with pool.acquire() as conn:
+        async for batch in iter_cursor_batches(conn, query, *params, batch_size=batch_size):
+            writer.writerows(row_mapper(r) for r in batch)
+            total += len(batch)
+            yield _flush()
+    logger.debug(f"CSV exportado: {total} filas")
+
+
+def csv_streaming_response(filename: str, chunks: AsyncIterator[bytes]) -> StreamingResponse:
+    """StreamingResponse de descarga (attachment) para un CSV generado por bloques."""
+    return StreamingResponse(
+        chunks,
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,143 @@
+# Archivo: core/dashboard_stats.py
+"""
+Motor de consultas para dashboards: todos los KPIs y series en UNA pasada.
+
+En lugar de una query por KPI y otra por grafica sobre el mismo conjunto
+filtrado, `DashboardScan` arma una sola consulta:
+
+    SELECT GROUPING(d0, d1, ...) AS _g, d0, d1, ..., count(*),
+           count(*) FILTER (WHERE k0), ...
+    FROM (<conjunto filtrado con dimensiones y banderas>) b
+    GROUP BY GROUPING SETS ((), (d0, d1), (d2), ...)
+
+- La fila del grouping set vacio trae los KPIs (agregados con FILTER).
+- Cada serie es un grouping set; su fila se identifica por la mascara
+  GROUPING() (bit en 1 = dimension no agrupada en esa fila).
+- Un NULL real en una dimension (p.ej. sin tecnologia) se distingue del NULL
+  de "no agrupado" por la mascara; las series omiten los NULL reales.
+
+`cached_dashboard` agrega el cache corto (ConfigService) por filtros y alcance
+de visibilidad, para que cada carga del dashboard cueste a lo mas una query.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from core.config import settings
+from core.config_service import ConfigService
+
+logger = logging.getLogger("DashboardStats")
+
+
+class DashboardScan:
+    """Constructor de la consulta de un solo escaneo (KPIs + series)."""
+
+    def __init__(self, from_sql: str, where_sql: str, params: Sequence[Any] = ()):
+        self._from_sql = from_sql
+        self._where_sql = where_sql
+        self.params: List[Any] = list(params)
+        self._dims: List[Tuple[str, str]] = []          # (alias, expresion)
+        self._kpis: List[Tuple[str, str]] = []          # (nombre, condicion)
+        self._series: Dict[str, Tuple[str, ...]] = {}   # nombre -> aliases de dimensiones
+
+    def param(self, value: Any) -> str:
+        """Agrega un parametro y retorna su placeholder ($n)."""
+        self.params.append(value)
+        return f"${len(self.params)}"
+
+    def kpi(self, name: str, condition: str = "true") -> "DashboardScan":
+        """KPI = conteo de filas que cumplen `condition` (sobre el FROM base)."""
+        self._kpis.append((name, condition))
+        return self
+
+    def series(self, name: str, **dimensions: str) -> "DashboardScan":
+        """Serie agrupada por las expresiones dadas (alias=expresion)."""
+        aliases = []
+        for alias, expr in dimensions.items():
+            if alias not in dict(self._dims):
+                self._dims.append((alias, expr))
+            aliases.append(alias)
+        self._series[name] = tuple(aliases)
+        return self
+
+    def _mask(self, aliases: Sequence[str]) -> int:
+        """Valor de GROUPING(todas las dims) para una fila agrupada por `aliases`."""
+        n = len(self._dims)
+        mask = 0
+        for i, (alias, _) in enumerate(self._dims):
+            if alias not in aliases:
+                mask |= 1 << (n - 1 - i)
+        return mask
+
+    def build(self) -> str:
+        inner_cols = [f"{expr} AS {alias}" for alias, expr in self._dims]
+        inner_cols += [f"({cond}) AS _k{i}" for i, (_, cond) in enumerate(self._kpis)]
+        dim_aliases = [alias for alias, _ in self._dims]
+
+        outer_cols = []
+        if dim_aliases:
+            outer_cols.append(f"GROUPING({', '.join(dim_aliases)}) AS _g")
+            outer_cols += dim_aliases
+        else:
+            outer_cols.append("0 AS _g")
+        outer_cols.append("count(*) AS _count")
+        outer_cols += [f"count(*) FILTER (WHERE _k{i}) AS {name}" for i, (name, _) in enumerate(self._kpis)]
+
+        sets = ["()"] + [f"({', '.join(aliases)})" for aliases in self._series.values()]
+
+        return f"""
+            SELECT {', '.join(outer_cols)}
+            FROM (
+                SELECT {', '.join(inner_cols) or '1 AS _uno'}
+                FROM {self._from_sql}
+                {self._where_sql}
+            ) b
+            GROUP BY GROUPING SETS ({', '.join(sets)})
+        """
+
+    async def fetch(self, conn) -> Dict[str, Any]:
+        """
+        Ejecuta el escaneo.
+
+        Returns:
+            {"total": int, "kpis": {nombre: int}, "series": {nombre: [dict(dims + count)]}}
+        """
+        rows = await conn.fetch(self.build(), *self.params)
+
+        by_mask = {self._mask(aliases): (name, aliases) for name, aliases in self._series.items()}
+        result = {"total": 0, "kpis": {name: 0 for name, _ in self._kpis}, "series": {name: [] for name in self._series}}
+        full_mask = self._mask(())
+
+        for row in rows:
+            g = row["_g"]
+            if g == full_mask:
+                result["total"] = row["_count"]
+                result["kpis"] = {name: row[name] for name, _ in self._kpis}
+                continue
+            name, aliases = by_mask.get(g, (None, ()))
+            if name is None:
+                continue
+            values = {alias: row[alias] for alias in aliases}
+            if any(v is None for v in values.values()):
+                continue
+            values["count"] = row["_count"]
+            result["series"][name].append(values)
+        return result
+
+
+async def cached_dashboard(key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Cache corto de resultados de dashboard (por worker, con tope de entradas:
+    ver ConfigService._CACHE_GLOBAL_MAX_ITEMS).
+
+    `key` debe incluir los filtros y el alcance de visibilidad (usuario o
+    'all'), para no mezclar datos entre usuarios con distintos permisos.
+    """
+    ttl = settings.DASHBOARD_CACHE_TTL_SECONDS
+    if ttl > 0:
+        cached = await ConfigService.get_cached_value(key, ttl=ttl)
+        if cached is not None:
+            return cached
+    stats = await compute()
+    if ttl > 0:
+        await ConfigService.set_cached_value(key, stats)
+    return stats
@@ -2,6 +2,7 @@
 
 import asyncpg
 import logging
+import orjson
 from core.config import settings
 from typing import Optional, Dict, List
 from uuid import UUID
@@ -11,6 +12,32 @@ logger = logging.getLogger("Database")
 # Almacenamos el pool de conexiones globalmente
 _connection_pool: Optional[asyncpg.Pool] = None
 
+def _json_encoder(value) -> str:
+    # Texto ya serializado (json.dumps(...)::jsonb) pasa tal cual
+    if isinstance(value, str):
+        return value
+    return orjson.dumps(value).decode()
+
+
+async def init_connection(conn):
+    """
+    Codecs por conexion (init del pool):
+    - json/jsonb <-> dict/list con orjson: ya no hace falta json.loads por fila.
+    - numeric -> float solo si DB_NUMERIC_AS_FLOAT (opt-in; default Decimal).
+      Para rutas puntuales es preferible castear a float8 en el SQL.
+    """
+    for tipo in ("json", "jsonb"):
+        await conn.set_type_codec(
+            tipo, schema="pg_catalog",
+            encoder=_json_encoder, decoder=orjson.loads, format="text"
+        )
+    if settings.DB_NUMERIC_AS_FLOAT:
+        await conn.set_type_codec(
+            "numeric", schema="pg_catalog",
+            encoder=str, decoder=float, format="text"
+        )
+
+
 async def connect_to_db():
     """Inicializa el pool de conexiones al inicio de la aplicación (startup)."""
     global _connection_pool
@@ -24,7 +51,8 @@ async def connect_to_db():
                 max_size=settings.DB_POOL_MAX_SIZE,
                 timeout=settings.DB_POOL_TIMEOUT,
                 statement_cache_size=0,  # OBLIGATORIO para Transaction Mode (6543)
-                max_inactive_connection_lifetime=300  # Cierra conexiones inactivas tras 5 min
+                max_inactive_connection_lifetime=300,  # Cierra conexiones inactivas tras 5 min
+                init=init_connection
             )
             # NOTA PARA PRODUCCION (>25 usuarios concurrentes):
             # Cambiar a "Transaction Mode" en Supabase (Puerto 6543)
@@ -59,4 +87,21 @@ async def get_db_pool():
     global _connection_pool
     if not _connection_pool:
         raise Exception("DB Pool no inicializado.")
-    return _connection_pool
\ No newline at end of file
+    return _connection_pool
+
+async def iter_cursor_batches(conn, query: str, *params, batch_size: int = 2000):
+    """
+    Itera el resultado de `query` en lotes usando un cursor del lado del servidor.
+
+    Para exportaciones grandes: la memoria queda acotada a `batch_size` filas.
+    El cursor vive en una transaccion de solo lectura (requisito de Postgres y
+    compatible con pgbouncer en Transaction Mode); REPEATABLE READ garantiza
+    que todos los lotes vean el mismo snapshot.
+    """
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        cursor = await conn.cursor(query, *params)
+        while True:
+            batch = await cursor.fetch(batch_size)
+            if not batch:
+                break
+            yield batch
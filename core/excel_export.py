@@ -0,0 +1,192 @@
+# Archivo: core/excel_export.py
+"""
+Exportacion a Excel compartida (xlsxwriter en modo constant_memory).
+
+- Los formatos se crean una sola vez por workbook y se reutilizan por nombre
+  (`ESTILOS`), en lugar de asignar Font/Fill/Border celda por celda.
+- constant_memory escribe cada fila a disco en cuanto se pasa a la siguiente:
+  la memoria no crece con el numero de filas. Requisito: dentro de cada hoja
+  las filas se escriben en orden.
+- La construccion del archivo corre en un hilo (`build_xlsx` / `stream_xlsx`)
+  para no bloquear el event loop.
+
+`stream_xlsx` conecta un productor async (p.ej. `iter_cursor_batches` de
+core.database) con el hilo que escribe el workbook mediante una cola acotada.
+"""
+import asyncio
+import logging
+import queue
+from io import BytesIO
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Sequence
+
+import xlsxwriter
+
+logger = logging.getLogger("ExcelExport")
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Lotes en vuelo entre el event loop y el hilo escritor (memoria acotada)
+_QUEUE_MAX_BATCHES = 4
+_FIN = object()
+
+_BORDE = {"border": 1}
+
+ESTILOS: Dict[str, dict] = {
+    "header": {
+        "bold": True, "font_color": "#FFFFFF", "bg_color": "#1F4E79",
+        "align": "center", "valign": "vcenter", "text_wrap": True, **_BORDE,
+    },
+    "cell": {**_BORDE},
+    "money": {"num_format": "#,##0.00", "align": "right", **_BORDE},
+    "currency": {"num_format": "$#,##0.00", "align": "right", **_BORDE},
+    "qty4": {"num_format": "#,##0.0000", "align": "right", **_BORDE},
+    "label": {"bold": True, "font_size": 10},
+    "title": {"bold": True, "font_size": 14, "font_color": "#1F4E79", "align": "center"},
+    "subtitle": {"bold": True, "font_size": 11, "font_color": "#333333"},
+    "total": {"bold": True, "font_size": 11},
+    "total_cell": {"bold": True, "font_size": 11, **_BORDE},
+    "total_money": {"bold": True, "font_size": 11, "num_format": "#,##0.00"},
+    "total_currency": {"bold": True, "font_size": 11, "num_format": "$#,##0.00", "align": "right", **_BORDE},
+}
+
+
+class XlsxColumn(NamedTuple):
+    """Columna de una tabla: encabezado, ancho y estilo de sus celdas."""
+    header: str
+    width: float
+    style: str = "cell"
+
+
+class XlsxSheet:
+    """Hoja que se escribe de arriba hacia abajo (requisito de constant_memory)."""
+
+    def __init__(self, workbook: "XlsxWorkbook", worksheet, columns: Sequence[XlsxColumn]):
+        self._wb = workbook
+        self.ws = worksheet
+        self.columns = list(columns)
+        self.next_row = 0
+        self._col_styles = [workbook.styles[c.style] for c in self.columns]
+        for i, col in enumerate(self.columns):
+            worksheet.set_column(i, i, col.width)
+
+    def set_width(self, col: int, width: float):
+        """Ancho de una columna fuera de la tabla (titulos combinados, notas)."""
+        self.ws.set_column(col, col, width)
+
+    def skip(self, rows: int = 1):
+        self.next_row += rows
+
+    def write_title(self, text: str, last_col: int, style: str = "title"):
+        """Titulo combinado de la columna 0 a `last_col`."""
+        self.ws.merge_range(self.next_row, 0, self.next_row, last_col, text, self._wb.styles[style])
+        self.next_row += 1
+
+    def write_text(self, text: str, style: str = "subtitle"):
+        self.ws.write(self.next_row, 0, text, self._wb.styles[style])
+        self.next_row += 1
+
+    def write_info(self, label: str, value: Any, style: str = "label"):
+        """Fila 'Etiqueta: valor' para cabeceras de reporte."""
+        self.ws.write(self.next_row, 0, label, self._wb.styles[style])
+        self.ws.write(self.next_row, 1, value)
+        self.next_row += 1
+
+    def write_header(self, freeze: bool = True):
+        """Encabezados de la tabla; congela las filas superiores."""
+        header = self._wb.styles["header"]
+        for i, col in enumerate(self.columns):
+            self.ws.write_string(self.next_row, i, col.header, header)
+        self.next_row += 1
+        if freeze:
+            self.ws.freeze_panes(self.next_row, 0)
+
+    def append(self, values: Sequence[Any]):
+        """Fila de datos con el estilo de cada columna."""
+        row = self.next_row
+        write = self.ws.write
+        for i, value in enumerate(values):
+            write(row, i, value, self._col_styles[i])
+        self.next_row += 1
+
+    def write_cells(self, cells: Dict[int, tuple]):
+        """Fila libre: {columna: (valor, estilo)}. Para totales y similares."""
+        for col, (value, style) in sorted(cells.items()):
+            self.ws.write(self.next_row, col, value, self._wb.styles[style])
+        self.next_row += 1
+
+
+class XlsxWorkbook:
+    """Workbook en memoria acotada con los formatos de ESTILOS ya registrados."""
+
+    def __init__(self):
+        self._buffer = BytesIO()
+        self._wb = xlsxwriter.Workbook(self._buffer, {"constant_memory": True})
+        self.styles = {name: self._wb.add_format(spec) for name, spec in ESTILOS.items()}
+
+    def add_sheet(self, title: str, columns: Sequence[XlsxColumn]) -> XlsxSheet:
+        return XlsxSheet(self, self._wb.add_worksheet(title[:31]), columns)
+
+    def close(self) -> bytes:
+        self._wb.close()
+        return self._buffer.getvalue()
+
+
+async def build_xlsx(build: Callable[[XlsxWorkbook], None]) -> bytes:
+    """Ejecuta `build` (sincrono) en un hilo y retorna el archivo .xlsx."""
+    def _run() -> bytes:
+        wb = XlsxWorkbook()
+        build(wb)
+        return wb.close()
+
+    return await asyncio.to_thread(_run)
+
+
+async def stream_xlsx(
+    build: Callable[[XlsxWorkbook, Iterator[Any]], None],
+    batches: AsyncIterator[List[Any]],
+) -> bytes:
+    """
+    Construye un .xlsx consumiendo lotes producidos en el event loop.
+
+    `build(wb, rows)` corre en un hilo y recibe un iterador plano de filas
+    (p.ej. Records de asyncpg); el mapeo a celdas ocurre en ese hilo.
+    Solo hay `_QUEUE_MAX_BATCHES` lotes en memoria a la vez.
+    """
+    cola: "queue.Queue" = queue.Queue(maxsize=_QUEUE_MAX_BATCHES)
+    estado = {"fin": False, "abortado": False}
+
+    def _filas() -> Iterator[Any]:
+        while True:
+            batch = cola.get()
+            if batch is _FIN:
+                estado["fin"] = True
+                return
+            yield from batch
+
+    def _run() -> bytes:
+        try:
+            wb = XlsxWorkbook()
+            build(wb, _filas())
+            return wb.close()
+        except Exception:
+            estado["abortado"] = True
+            raise
+        finally:
+            # Si build fallo o no consumio todo, vaciar la cola para no bloquear al productor
+            while not estado["fin"]:
+                if cola.get() is _FIN:
+                    estado["fin"] = True
+
+    worker = asyncio.ensure_future(asyncio.to_thread(_run))
+    try:
+        async for batch in batches:
+            if estado["abortado"]:
+                break
+            await asyncio.to_thread(cola.put, batch)
+    finally:
+        await asyncio.to_thread(cola.put, _FIN)
+        # Cierra el cursor/transaccion del productor si se corto antes de agotarlo
+        if hasattr(batches, "aclose"):
+            await batches.aclose()
+
+    return await worker
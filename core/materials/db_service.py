@@ -6,11 +6,144 @@ Queries puras con asyncpg, recibe conn.
 
 from uuid import UUID
 from typing import List, Optional, Tuple
+from datetime import date, timedelta
 from decimal import Decimal
 import logging
 
+from core.query_builder import Filtro, FiltroSQL, contiene
+
 logger = logging.getLogger("Materials.DBService")
 
+# Filtros de la lista, exportacion y estadisticas de materiales (alias m, c)
+FILTROS_MATERIALES = FiltroSQL(
+    Filtro('id_proveedor', 'm.id_proveedor = {p}'),
+    Filtro('id_categoria', 'm.id_categoria = {p}'),
+    Filtro('id_proyecto', 'c.id_proyecto = {p}'),
+    Filtro('fecha_inicio', 'm.fecha_factura >= {p}'),
+    Filtro('fecha_fin', 'm.fecha_factura <= {p}'),
+    Filtro('origen', 'm.origen = {p}'),
+    Filtro('q', '(m.descripcion_proveedor ILIKE {p} OR m.descripcion_interna ILIKE {p})', contiene),
+)
+
+# Proyeccion de ultimo precio (migrations/007): recalcula los pares dados
+QUERY_REFRESCAR_ULTIMO_PRECIO = """
+    WITH claves AS (
+        SELECT DISTINCT k.descripcion, k.id_proveedor
+        FROM unnest($1::text[], $2::uuid[]) AS k(descripcion, id_proveedor)
+    ),
+    nuevos AS (
+        SELECT DISTINCT ON (m.descripcion_proveedor, m.id_proveedor)
+            m.descripcion_proveedor, m.id_proveedor, m.id AS id_material,
+            m.precio_unitario, m.unidad, m.clave_prod_serv, m.fecha_factura,
+            COUNT(*) OVER w AS total_compras,
+            MIN(m.precio_unitario) OVER w AS min_precio,
+            MAX(m.precio_unitario) OVER w AS max_precio,
+            SUM(m.precio_unitario) OVER w AS suma_precios
+        FROM claves k
+        JOIN tb_materiales_historial m
+          ON m.descripcion_proveedor = k.descripcion
+         AND m.id_proveedor IS NOT DISTINCT FROM k.id_proveedor
+        WINDOW w AS (PARTITION BY m.descripcion_proveedor, m.id_proveedor)
+        ORDER BY m.descripcion_proveedor, m.id_proveedor, m.fecha_factura DESC NULLS LAST, m.created_at DESC
+    ),
+    huerfanos AS (
+        DELETE FROM tb_materiales_ultimo_precio u
+        USING claves k
+        WHERE u.descripcion_proveedor = k.descripcion
+          AND u.id_proveedor IS NOT DISTINCT FROM k.id_proveedor
+          AND NOT EXISTS (
+              SELECT 1 FROM nuevos n
+              WHERE n.descripcion_proveedor = u.descripcion_proveedor
+                AND n.id_proveedor IS NOT DISTINCT FROM u.id_proveedor
+          )
+    )
+    INSERT INTO tb_materiales_ultimo_precio (
+        descripcion_proveedor, id_proveedor, id_material, precio_unitario, unidad,
+        clave_prod_serv, fecha_factura, total_compras, min_precio, max_precio, suma_precios
+    )
+    SELECT descripcion_proveedor, id_proveedor, id_material, precio_unitario, unidad,
+           clave_prod_serv, fecha_factura, total_compras, min_precio, max_precio, suma_precios
+    FROM nuevos
+    ON CONFLICT ON CONSTRAINT uq_materiales_ultimo_precio DO UPDATE SET
+        id_material = EXCLUDED.id_material,
+        precio_unitario = EXCLUDED.precio_unitario,
+        unidad = EXCLUDED.unidad,
+        clave_prod_serv = EXCLUDED.clave_prod_serv,
+        fecha_factura = EXCLUDED.fecha_factura,
+        total_compras = EXCLUDED.total_compras,
+        min_precio = EXCLUDED.min_precio,
+        max_precio = EXCLUDED.max_precio,
+        suma_precios = EXCLUDED.suma_precios,
+        updated_at = now()
+"""
+
+# Rollup mensual de precios (migrations/010): filtros que puede resolver por
+# si solo (las fechas deben caer en limites de mes)
+FILTROS_PRECIO_MENSUAL = FiltroSQL(
+    Filtro('id_proveedor', 'r.id_proveedor = {p}'),
+    Filtro('id_categoria', 'r.id_categoria = {p}'),
+    Filtro('fecha_inicio', 'r.mes >= {p}'),
+    Filtro('fecha_fin', 'r.mes <= {p}'),
+    Filtro('origen', 'r.origen = {p}'),
+)
+
+# Rollup mensual de precios: recalcula los (descripcion, proveedor, mes) dados
+QUERY_REFRESCAR_PRECIO_MENSUAL = """
+    WITH claves AS (
+        SELECT DISTINCT k.descripcion, k.id_proveedor,
+               date_trunc('month', k.fecha)::date AS mes
+        FROM unnest($1::text[], $2::uuid[], $3::date[]) AS k(descripcion, id_proveedor, fecha)
+    ),
+    nuevos AS (
+        SELECT k.mes, m.descripcion_proveedor, m.id_proveedor, m.clave_prod_serv,
+               m.id_categoria, m.origen,
+               COUNT(*) AS total_compras,
+               MIN(m.precio_unitario) AS min_precio,
+               MAX(m.precio_unitario) AS max_precio,
+               SUM(m.precio_unitario) AS suma_precios,
+               SUM(m.importe) AS suma_importe,
+               MAX(m.fecha_factura) AS ultima_fecha
+        FROM claves k
+        JOIN tb_materiales_historial m
+          ON m.descripcion_proveedor = k.descripcion
+         AND m.id_proveedor IS NOT DISTINCT FROM k.id_proveedor
+         AND date_trunc('month', m.fecha_factura)::date IS NOT DISTINCT FROM k.mes
+        GROUP BY k.mes, m.descripcion_proveedor, m.id_proveedor, m.clave_prod_serv,
+                 m.id_categoria, m.origen
+    ),
+    huerfanos AS (
+        DELETE FROM tb_materiales_precio_mensual r
+        USING claves k
+        WHERE r.descripcion_proveedor = k.descripcion
+          AND r.id_proveedor IS NOT DISTINCT FROM k.id_proveedor
+          AND r.mes IS NOT DISTINCT FROM k.mes
+          AND NOT EXISTS (
+              SELECT 1 FROM nuevos n
+              WHERE n.descripcion_proveedor = r.descripcion_proveedor
+                AND n.id_proveedor IS NOT DISTINCT FROM r.id_proveedor
+                AND n.mes IS NOT DISTINCT FROM r.mes
+                AND n.clave_prod_serv IS NOT DISTINCT FROM r.clave_prod_serv
+                AND n.id_categoria IS NOT DISTINCT FROM r.id_categoria
+                AND n.origen IS NOT DISTINCT FROM r.origen
+          )
+    )
+    INSERT INTO tb_materiales_precio_mensual (
+        mes, descripcion_proveedor, id_proveedor, clave_prod_serv, id_categoria, origen,
+        total_compras, min_precio, max_precio, suma_precios, suma_importe, ultima_fecha
+    )
+    SELECT mes, descripcion_proveedor, id_proveedor, clave_prod_serv, id_categoria, origen,
+           total_compras, min_precio, max_precio, suma_precios, suma_importe, ultima_fecha
+    FROM nuevos
+    ON CONFLICT ON CONSTRAINT uq_materiales_precio_mensual DO UPDATE SET
+        total_compras = EXCLUDED.total_compras,
+        min_precio = EXCLUDED.min_precio,
+        max_precio = EXCLUDED.max_precio,
+        suma_precios = EXCLUDED.suma_precios,
+        suma_importe = EXCLUDED.suma_importe,
+        ultima_fecha = EXCLUDED.ultima_fecha,
+        updated_at = now()
+"""
+
 
 class MaterialsDBService:
     """Queries SQL para modulo de Materiales."""
@@ -40,9 +173,9 @@ class MaterialsDBService:
                     m.id_proveedor,
                     m.descripcion_proveedor,
                     m.descripcion_interna,
-                    m.cantidad,
-                    m.precio_unitario,
-                    m.importe,
+                    m.cantidad::float8 AS cantidad,
+                    m.precio_unitario::float8 AS precio_unitario,
+                    m.importe::float8 AS importe,
                     m.unidad,
                     m.clave_prod_serv,
                     m.clave_unidad,
@@ -61,43 +194,9 @@ class MaterialsDBService:
                 WHERE 1=1
             """
 
-        params = []
-        param_idx = 1
-
-        if filtros.get('id_proveedor'):
-            base_query += f" AND m.id_proveedor = ${param_idx}"
-            params.append(filtros['id_proveedor'])
-            param_idx += 1
-
-        if filtros.get('id_categoria'):
-            base_query += f" AND m.id_categoria = ${param_idx}"
-            params.append(filtros['id_categoria'])
-            param_idx += 1
-
-        if filtros.get('id_proyecto'):
-            base_query += f" AND c.id_proyecto = ${param_idx}"
-            params.append(filtros['id_proyecto'])
-            param_idx += 1
-
-        if filtros.get('fecha_inicio'):
-            base_query += f" AND m.fecha_factura >= ${param_idx}"
-            params.append(filtros['fecha_inicio'])
-            param_idx += 1
-
-        if filtros.get('fecha_fin'):
-            base_query += f" AND m.fecha_factura <= ${param_idx}"
-            params.append(filtros['fecha_fin'])
-            param_idx += 1
-
-        if filtros.get('origen'):
-            base_query += f" AND m.origen = ${param_idx}"
-            params.append(filtros['origen'])
-            param_idx += 1
-
-        if filtros.get('q'):
-            base_query += f" AND (m.descripcion_proveedor ILIKE ${param_idx} OR m.descripcion_interna ILIKE ${param_idx})"
-            params.append(f"%{filtros['q']}%")
-            param_idx += 1
+        filtros_sql, params = self._build_materiales_filters(filtros)
+        base_query += filtros_sql
+        param_idx = len(params) + 1
 
         if count_only:
             return await conn.fetchval(base_query, *params)
@@ -110,36 +209,110 @@ class MaterialsDBService:
 
         return await conn.fetch(base_query, *params)
 
+    @staticmethod
+    def _build_materiales_filters(filtros: dict) -> Tuple[str, list]:
+        """Condiciones AND (alias m, c) y parametros para los filtros de materiales."""
+        return FILTROS_MATERIALES.bind(filtros)
+
+    def build_export_query(self, filtros: dict) -> Tuple[str, list]:
+        """Query de exportacion (sin paginacion) para iterar con cursor."""
+        filtros_sql, params = self._build_materiales_filters(filtros)
+        query = f"""
+            SELECT
+                p.razon_social as proveedor_nombre,
+                p.rfc as proveedor_rfc,
+                m.descripcion_proveedor,
+                m.descripcion_interna,
+                cat.nombre as categoria_nombre,
+                m.cantidad,
+                m.precio_unitario,
+                m.importe,
+                m.unidad,
+                m.clave_prod_serv,
+                m.fecha_factura,
+                m.origen,
+                pr.proyecto_id_estandar as proyecto_nombre
+            FROM tb_materiales_historial m
+            LEFT JOIN tb_proveedores p ON m.id_proveedor = p.id_proveedor
+            LEFT JOIN tb_cat_categorias_compra cat ON m.id_categoria = cat.id
+            LEFT JOIN tb_comprobantes_pago c ON m.id_comprobante = c.id_comprobante
+            LEFT JOIN tb_proyectos_gate pr ON c.id_proyecto = pr.id_proyecto
+            WHERE 1=1{filtros_sql}
+            ORDER BY m.fecha_factura DESC, m.created_at DESC
+        """
+        return query, params
+
     async def get_material_precios(
         self, conn, descripcion: str, id_proveedor: Optional[UUID] = None
     ) -> List[dict]:
-        """Analisis de precios agrupado por proveedor para una descripcion."""
+        """Analisis de precios agrupado por proveedor para una descripcion.
+
+        Lee la proyeccion tb_materiales_ultimo_precio (una fila por proveedor),
+        no el historial completo.
+        """
         query = """
             SELECT
                 p.razon_social as proveedor_nombre,
                 p.rfc as proveedor_rfc,
-                MIN(m.precio_unitario) as min_precio,
-                MAX(m.precio_unitario) as max_precio,
-                AVG(m.precio_unitario) as avg_precio,
-                COUNT(*) as total_compras,
-                MAX(m.fecha_factura) as ultima_compra
-            FROM tb_materiales_historial m
-            JOIN tb_proveedores p ON m.id_proveedor = p.id_proveedor
-            WHERE m.descripcion_proveedor = $1
+                u.min_precio::float8 AS min_precio,
+                u.max_precio::float8 AS max_precio,
+                (u.suma_precios / NULLIF(u.total_compras, 0))::float8 as avg_precio,
+                u.total_compras,
+                u.fecha_factura as ultima_compra,
+                u.precio_unitario::float8 as ultimo_precio
+            FROM tb_materiales_ultimo_precio u
+            JOIN tb_proveedores p ON u.id_proveedor = p.id_proveedor
+            WHERE u.descripcion_proveedor = $1
         """
         params = [descripcion]
         param_idx = 2
 
         if id_proveedor:
-            query += f" AND m.id_proveedor != ${param_idx}"
+            query += f" AND u.id_proveedor != ${param_idx}"
             params.append(id_proveedor)
             param_idx += 1
 
-        query += " GROUP BY p.razon_social, p.rfc ORDER BY avg_precio ASC"
+        query += " ORDER BY avg_precio ASC"
 
         rows = await conn.fetch(query, *params)
         return [dict(r) for r in rows]
 
+    async def refrescar_ultimo_precio(
+        self, conn, claves: List[Tuple[str, Optional[UUID]]]
+    ) -> None:
+        """Recalcula la proyeccion de ultimo precio para pares (descripcion, proveedor).
+
+        Llamar despues de escribir en tb_materiales_historial (ingesta de XML,
+        ediciones manuales). Solo se recorren las filas del historial de los
+        pares indicados (indice por descripcion, migrations/006); los pares que
+        ya no tienen filas se eliminan de la proyeccion.
+        """
+        claves = list({(d, p) for d, p in claves if d})
+        if not claves:
+            return
+        await conn.execute(QUERY_REFRESCAR_ULTIMO_PRECIO,
+                           [d for d, _ in claves], [p for _, p in claves])
+
+    async def refrescar_precio_mensual(
+        self, conn, claves: List[Tuple[str, Optional[UUID], Optional[date]]]
+    ) -> None:
+        """Recalcula el rollup mensual de precios para (descripcion, proveedor, fecha_factura).
+
+        Llamar junto con refrescar_ultimo_precio despues de escribir en
+        tb_materiales_historial. Cada fecha se lleva a su mes y solo se
+        recorren las filas del historial de esos (descripcion, proveedor, mes);
+        los grupos que ya no tienen filas (p.ej. cambio de categoria) se
+        eliminan del rollup.
+        """
+        claves = list({
+            (d, p, date(f.year, f.month, 1) if f else None) for d, p, f in claves if d
+        })
+        if not claves:
+            return
+        await conn.execute(QUERY_REFRESCAR_PRECIO_MENSUAL,
+                           [d for d, _, _ in claves], [p for _, p, _ in claves],
+                           [m for _, _, m in claves])
+
     async def get_precios_por_clave_sat(
         self, conn, clave_prod_serv: str,
         exclude_descripcion: Optional[str] = None
@@ -147,38 +320,62 @@ class MaterialsDBService:
         """Precios agrupados por proveedor+descripcion para misma clave SAT.
 
         Excluye la descripcion exacta del material actual para no duplicar
-        datos con la comparativa por descripcion.
+        datos con la comparativa por descripcion. Lee el rollup mensual
+        (tb_materiales_precio_mensual), no el historial completo.
         """
         query = """
             SELECT
                 p.razon_social as proveedor_nombre,
                 p.rfc as proveedor_rfc,
-                m.descripcion_proveedor,
-                MIN(m.precio_unitario) as min_precio,
-                MAX(m.precio_unitario) as max_precio,
-                AVG(m.precio_unitario) as avg_precio,
-                COUNT(*) as total_compras,
-                MAX(m.fecha_factura) as ultima_compra
-            FROM tb_materiales_historial m
-            JOIN tb_proveedores p ON m.id_proveedor = p.id_proveedor
-            WHERE m.clave_prod_serv = $1
+                r.descripcion_proveedor,
+                MIN(r.min_precio)::float8 as min_precio,
+                MAX(r.max_precio)::float8 as max_precio,
+                (SUM(r.suma_precios) / NULLIF(SUM(r.total_compras), 0))::float8 as avg_precio,
+                SUM(r.total_compras) as total_compras,
+                MAX(r.ultima_fecha) as ultima_compra
+            FROM tb_materiales_precio_mensual r
+            JOIN tb_proveedores p ON r.id_proveedor = p.id_proveedor
+            WHERE r.clave_prod_serv = $1
         """
         params = [clave_prod_serv]
         param_idx = 2
 
         if exclude_descripcion:
-            query += f" AND m.descripcion_proveedor != ${param_idx}"
+            query += f" AND r.descripcion_proveedor != ${param_idx}"
             params.append(exclude_descripcion)
             param_idx += 1
 
         query += """
-            GROUP BY p.razon_social, p.rfc, m.descripcion_proveedor
+            GROUP BY p.razon_social, p.rfc, r.descripcion_proveedor
             ORDER BY avg_precio ASC
         """
 
         rows = await conn.fetch(query, *params)
         return [dict(r) for r in rows]
 
+    async def get_tendencia_precios(
+        self, conn, descripcion: str, meses: int = 12
+    ) -> List[dict]:
+        """Serie mensual de precios de una descripcion (todos los proveedores).
+
+        Ultimos `meses` meses con compras, del mas reciente al mas antiguo.
+        """
+        rows = await conn.fetch("""
+            SELECT
+                r.mes,
+                MIN(r.min_precio)::float8 as min_precio,
+                MAX(r.max_precio)::float8 as max_precio,
+                (SUM(r.suma_precios) / NULLIF(SUM(r.total_compras), 0))::float8 as avg_precio,
+                SUM(r.total_compras) as total_compras
+            FROM tb_materiales_precio_mensual r
+            WHERE r.descripcion_proveedor = $1
+              AND r.mes IS NOT NULL
+            GROUP BY r.mes
+            ORDER BY r.mes DESC
+            LIMIT $2
+        """, descripcion, meses)
+        return [dict(r) for r in rows]
+
     async def get_material_by_id(self, conn, material_id: UUID) -> Optional[dict]:
         """Obtiene un material por ID con JOINs."""
         row = await conn.fetchrow("""
@@ -226,8 +423,43 @@ class MaterialsDBService:
         result = await conn.execute(query, *params)
         return result == "UPDATE 1"
 
+    @staticmethod
+    def _estadisticas_desde_rollup(filtros: dict) -> bool:
+        """True si los filtros activos se pueden resolver con el rollup mensual.
+
+        Sin busqueda de texto ni proyecto, y con fechas en limites de mes
+        (fecha_inicio dia 1, fecha_fin ultimo dia del mes).
+        """
+        activos = {k: v for k, v in filtros.items() if v}
+        claves = {f.clave for f in FILTROS_PRECIO_MENSUAL.filtros}
+        if not activos.keys() <= claves:
+            return False
+        inicio, fin = activos.get('fecha_inicio'), activos.get('fecha_fin')
+        if inicio and not (isinstance(inicio, date) and inicio.day == 1):
+            return False
+        if fin and not (isinstance(fin, date) and (fin + timedelta(days=1)).day == 1):
+            return False
+        return True
+
     async def get_estadisticas(self, conn, filtros: dict) -> dict:
-        """Estadisticas de materiales con filtros."""
+        """Estadisticas de materiales con filtros.
+
+        Sin filtros de texto/proyecto y con fechas por mes completo se leen del
+        rollup mensual; en otro caso se cuentan sobre el historial.
+        """
+        if self._estadisticas_desde_rollup(filtros):
+            filtros_sql, params = FILTROS_PRECIO_MENSUAL.bind(filtros)
+            row = await conn.fetchrow(f"""
+                SELECT
+                    COALESCE(SUM(r.total_compras), 0) as total,
+                    COUNT(DISTINCT r.id_proveedor) as proveedores_distintos,
+                    COALESCE(SUM(r.total_compras) FILTER (WHERE r.id_categoria IS NOT NULL), 0) as categorizados,
+                    COALESCE(SUM(r.total_compras) FILTER (WHERE r.id_categoria IS NULL), 0) as sin_categoria
+                FROM tb_materiales_precio_mensual r
+                WHERE 1=1{filtros_sql}
+            """, *params)
+            return dict(row)
+
         base_query = """
             SELECT
                 COUNT(*) as total,
@@ -238,37 +470,8 @@ class MaterialsDBService:
             LEFT JOIN tb_comprobantes_pago c ON m.id_comprobante = c.id_comprobante
             WHERE 1=1
         """
-        params = []
-        param_idx = 1
-
-        if filtros.get('id_proveedor'):
-            base_query += f" AND m.id_proveedor = ${param_idx}"
-            params.append(filtros['id_proveedor'])
-            param_idx += 1
-        if filtros.get('id_categoria'):
-            base_query += f" AND m.id_categoria = ${param_idx}"
-            params.append(filtros['id_categoria'])
-            param_idx += 1
-        if filtros.get('id_proyecto'):
-            base_query += f" AND c.id_proyecto = ${param_idx}"
-            params.append(filtros['id_proyecto'])
-            param_idx += 1
-        if filtros.get('fecha_inicio'):
-            base_query += f" AND m.fecha_factura >= ${param_idx}"
-            params.append(filtros['fecha_inicio'])
-            param_idx += 1
-        if filtros.get('fecha_fin'):
-            base_query += f" AND m.fecha_factura <= ${param_idx}"
-            params.append(filtros['fecha_fin'])
-            param_idx += 1
-        if filtros.get('origen'):
-            base_query += f" AND m.origen = ${param_idx}"
-            params.append(filtros['origen'])
-            param_idx += 1
-        if filtros.get('q'):
-            base_query += f" AND (m.descripcion_proveedor ILIKE ${param_idx} OR m.descripcion_interna ILIKE ${param_idx})"
-            params.append(f"%{filtros['q']}%")
-            param_idx += 1
+        filtros_sql, params = self._build_materiales_filters(filtros)
+        base_query += filtros_sql
 
         row = await conn.fetchrow(base_query, *params)
         return dict(row)
@@ -302,8 +505,8 @@ class MaterialsDBService:
             SELECT
                 m.id,
                 m.descripcion_proveedor,
-                m.precio_unitario,
-                m.importe,
+                m.precio_unitario::float8 AS precio_unitario,
+                m.importe::float8 AS importe,
                 m.unidad,
                 m.clave_prod_serv,
                 m.fecha_factura,
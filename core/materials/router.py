@@ -13,6 +13,7 @@ from datetime import datetime
 import logging
 
 from core.database import get_db_connection
+from core.csv_export import csv_streaming_response
 from core.security import get_current_user_context
 from core.permissions import require_module_access, ROLE_HIERARCHY
 from core.config import settings
@@ -182,6 +183,7 @@ async def get_material_precios(
     material, precios, precios_sat = await service.get_material_precios(conn, material_id)
     if not material:
         raise HTTPException(status_code=404, detail="Material no encontrado")
+    tendencia = await service.get_tendencia_precios(conn, material['descripcion_proveedor'])
 
     return templates.TemplateResponse(
         "materials/partials/modal_precios.html",
@@ -190,6 +192,7 @@ async def get_material_precios(
             "material": material,
             "precios": precios,
             "precios_sat": precios_sat,
+            "tendencia": tendencia,
         }
     )
 
@@ -269,6 +272,22 @@ async def export_materials_excel(
     )
 
 
+@router.get("/export-csv")
+async def export_materials_csv(
+    filtros: Annotated[MaterialFilter, Query()],
+    service: MaterialsService = Depends(get_materials_service),
+    _=Depends(require_materials_view_access),
+):
+    """Exporta materiales a CSV en streaming (cursor en servidor, memoria constante)."""
+    filtro_dict = filtros.model_dump(exclude_none=True)
+    filtro_dict.pop('page', None)
+    filtro_dict.pop('per_page', None)
+
+    chunks = service.export_csv(filtro_dict)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return csv_streaming_response(f"materiales_{timestamp}.csv", chunks)
+
+
 # ========================================
 # BUSQUEDA FUZZY
 # ========================================
@@ -9,10 +9,47 @@ from typing import List, Dict, Optional, Tuple
 from decimal import Decimal
 import logging
 
+from core.excel_export import XlsxColumn
 from .db_service import MaterialsDBService, get_materials_db_service
 
 logger = logging.getLogger("MaterialsService")
 
+# Columnas de exportacion (Excel y CSV comparten encabezados y orden)
+EXPORT_COLUMNS = [
+    XlsxColumn("Proveedor", 30),
+    XlsxColumn("RFC", 15),
+    XlsxColumn("Descripcion Proveedor", 40),
+    XlsxColumn("Descripcion Interna", 35),
+    XlsxColumn("Categoria", 20),
+    XlsxColumn("Cantidad", 12, "money"),
+    XlsxColumn("P. Unitario", 14, "money"),
+    XlsxColumn("Importe", 14, "money"),
+    XlsxColumn("Unidad", 10),
+    XlsxColumn("Clave SAT", 12),
+    XlsxColumn("Fecha Factura", 14),
+    XlsxColumn("Origen", 10),
+    XlsxColumn("Proyecto", 25),
+]
+
+
+def _export_row(m) -> list:
+    """Fila de exportacion a partir de un registro de build_export_query."""
+    return [
+        m['proveedor_nombre'],
+        m['proveedor_rfc'],
+        m['descripcion_proveedor'],
+        m['descripcion_interna'],
+        m['categoria_nombre'],
+        m['cantidad'] or 0,
+        m['precio_unitario'] or 0,
+        m['importe'] or 0,
+        m['unidad'],
+        m['clave_prod_serv'],
+        m['fecha_factura'].strftime("%d/%m/%Y") if m['fecha_factura'] else '',
+        m['origen'],
+        m['proyecto_nombre'],
+    ]
+
 
 class MaterialsService:
     """Logica de negocio del modulo Materiales."""
@@ -27,19 +64,11 @@ class MaterialsService:
         total = await self.db.get_materiales_filtered(
             conn, filtros, page, per_page, count_only=True
         )
+        # Montos ya llegan como float (cast float8 en la query)
         rows = await self.db.get_materiales_filtered(
             conn, filtros, page, per_page, count_only=False
         )
-
-        materiales = []
-        for row in rows:
-            m = dict(row)
-            for key in ('cantidad', 'precio_unitario', 'importe'):
-                if m.get(key) and isinstance(m[key], Decimal):
-                    m[key] = float(m[key])
-            materiales.append(m)
-
-        return materiales, total
+        return [dict(row) for row in rows], total
 
     async def get_material_precios(
         self, conn, material_id: UUID
@@ -52,11 +81,6 @@ class MaterialsService:
         precios = await self.db.get_material_precios(
             conn, material['descripcion_proveedor']
         )
-        # Convertir Decimal a float
-        for p in precios:
-            for key in ('min_precio', 'max_precio', 'avg_precio'):
-                if p.get(key) and isinstance(p[key], Decimal):
-                    p[key] = float(p[key])
 
         # Productos similares por clave SAT (excluye misma descripcion)
         precios_sat = []
@@ -65,13 +89,16 @@ class MaterialsService:
                 conn, material['clave_prod_serv'],
                 exclude_descripcion=material['descripcion_proveedor']
             )
-            for p in precios_sat:
-                for key in ('min_precio', 'max_precio', 'avg_precio'):
-                    if p.get(key) and isinstance(p[key], Decimal):
-                        p[key] = float(p[key])
 
         return material, precios, precios_sat
 
+    async def get_tendencia_precios(
+        self, conn, descripcion: str, meses: int = 12
+    ) -> List[dict]:
+        """Tendencia mensual de precios (orden cronologico) desde el rollup."""
+        serie = await self.db.get_tendencia_precios(conn, descripcion, meses)
+        return list(reversed(serie))
+
     async def update_material(
         self, conn, material_id: UUID, updates: dict
     ) -> Optional[dict]:
@@ -81,6 +108,12 @@ class MaterialsService:
             return None
         material = await self.db.get_material_by_id(conn, material_id)
         if material:
+            # id_categoria es parte del rollup mensual; la proyeccion de ultimo
+            # precio no guarda campos editables, no se refresca
+            await self.db.refrescar_precio_mensual(
+                conn, [(material['descripcion_proveedor'], material['id_proveedor'],
+                        material['fecha_factura'])]
+            )
             for key in ('cantidad', 'precio_unitario', 'importe'):
                 if material.get(key) and isinstance(material[key], Decimal):
                     material[key] = float(material[key])
@@ -98,101 +131,34 @@ class MaterialsService:
         self, conn, query: str, threshold: float = 0.3, limit: int = 20
     ) -> List[dict]:
         """Busqueda fuzzy de materiales por descripcion."""
-        rows = await self.db.buscar_similar_materiales(
+        return await self.db.buscar_similar_materiales(
             conn, query, threshold, limit
         )
-        for r in rows:
-            for key in ('precio_unitario', 'importe', 'similitud'):
-                if r.get(key) and isinstance(r[key], Decimal):
-                    r[key] = float(r[key])
-        return rows
 
     async def export_to_excel(self, conn, filtros: dict) -> bytes:
-        """Genera archivo Excel con materiales filtrados."""
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        from io import BytesIO
-
-        materiales, _ = await self.get_materiales(
-            conn, filtros=filtros, per_page=100000
-        )
+        """
+        Genera archivo Excel con materiales filtrados.
+        Lectura por cursor y escritura en un hilo (core.excel_export).
+        """
+        from core.database import iter_cursor_batches
+        from core.excel_export import stream_xlsx
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Materiales"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        query, params = self.db.build_export_query(filtros)
+
+        def _build(wb, rows):
+            ws = wb.add_sheet("Materiales", EXPORT_COLUMNS)
+            ws.write_header()
+            for m in rows:
+                ws.append(_export_row(m))
+
+        return await stream_xlsx(_build, iter_cursor_batches(conn, query, *params))
+
+    def export_csv(self, filtros: dict):
+        """CSV de materiales filtrados como generador de bloques (streaming)."""
+        from core.csv_export import stream_csv_rows
 
-        headers = [
-            "Proveedor",
-            "RFC",
-            "Descripcion Proveedor",
-            "Descripcion Interna",
-            "Categoria",
-            "Cantidad",
-            "P. Unitario",
-            "Importe",
-            "Unidad",
-            "Clave SAT",
-            "Fecha Factura",
-            "Origen",
-            "Proyecto",
-        ]
-
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-
-        for row_num, m in enumerate(materiales, 2):
-            row_data = [
-                m.get('proveedor_nombre', ''),
-                m.get('proveedor_rfc', ''),
-                m.get('descripcion_proveedor', ''),
-                m.get('descripcion_interna', ''),
-                m.get('categoria_nombre', ''),
-                m.get('cantidad', 0),
-                m.get('precio_unitario', 0),
-                m.get('importe', 0),
-                m.get('unidad', ''),
-                m.get('clave_prod_serv', ''),
-                m['fecha_factura'].strftime("%d/%m/%Y") if m.get('fecha_factura') else '',
-                m.get('origen', ''),
-                m.get('proyecto_nombre', ''),
-            ]
-
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num, value=value)
-                cell.border = thin_border
-
-                # Formato numerico para cantidad, precio e importe
-                if col_num in (6, 7, 8):
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal="right")
-
-        # Anchos de columna
-        column_widths = [30, 15, 40, 35, 20, 12, 14, 14, 10, 12, 14, 10, 25]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-
-        ws.freeze_panes = "A2"
-
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue()
+        query, params = self.db.build_export_query(filtros)
+        return stream_csv_rows(query, params, [c.header for c in EXPORT_COLUMNS], _export_row)
 
 
 def get_materials_service():
@@ -117,8 +117,14 @@ async def stream_notifications(
                     # Esperar notificación del Queue
                     notification_data = await asyncio.wait_for(queue.get(), timeout=15.0)
                     
+                    # Progreso de reportes asincronos viaja como evento propio
+                    # para no contarse como notificacion no leida
+                    event_name = (
+                        "report_job" if notification_data.get("kind") == "report_job"
+                        else "notification"
+                    )
                     yield {
-                        "event": "notification",
+                        "event": event_name,
                         "data": json.dumps(notification_data),
                         "retry": 5000
                     }
@@ -0,0 +1,71 @@
+"""
+Paginacion por cursor (keyset) para listas con scroll infinito.
+
+Las listas se ordenan por (fecha DESC, id DESC) y cada pagina pide las filas
+estrictamente anteriores al ultimo par (fecha, id) entregado, de modo que la
+pagina N cuesta lo mismo que la pagina 1 (sin OFFSET ni LIMIT creciente).
+Con busqueda el orden es (relevancia DESC, fecha DESC, id DESC); la relevancia
+del ultimo registro se recalcula en SQL a partir de su id, asi que el cursor
+es el mismo.
+
+El cursor es opaco para el cliente: base64 url-safe de "fecha_iso|id".
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request
+
+# Filas por pagina cuando el usuario elige "Mostrar Todo" (se carga por scroll)
+SCROLL_PAGE_SIZE = 100
+
+
+def encode_cursor(fecha: datetime, id_value: Any) -> str:
+    raw = f"{fecha.isoformat()}|{id_value}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """
+    Decodifica un cursor. Retorna None si viene vacio o mal formado
+    (se trata como primera pagina).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        fecha_iso, id_value = raw.split("|", 1)
+        return datetime.fromisoformat(fecha_iso), id_value
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def next_page_url(
+    request: Request,
+    rows: List[Dict[str, Any]],
+    page_size: int,
+    fecha_key: str,
+    id_key: str,
+    path: Optional[str] = None
+) -> Optional[str]:
+    """
+    URL de la siguiente pagina (mismos query params + cursor del ultimo
+    registro), o None si esta pagina no se lleno.
+
+    `path` permite apuntar al endpoint del partial cuando la primera pagina
+    se renderizo desde otra ruta (ej. la vista /ui).
+    """
+    if page_size <= 0 or len(rows) < page_size:
+        return None
+
+    last = rows[-1]
+    if last.get(fecha_key) is None:
+        return None
+
+    params = dict(request.query_params)
+    params["cursor"] = encode_cursor(last[fecha_key], last[id_key])
+    # Ruta relativa: detras del proxy el esquema de request.url puede no ser https
+    return f"{path or request.url.path}?{urlencode(params)}"
@@ -0,0 +1,84 @@
+# Archivo: core/query_builder.py
+"""
+Filtros de listas compilados a SQL canonico.
+
+Antes cada endpoint concatenaba solo los filtros presentes, con indices $n
+llevados a mano: cada combinacion de filtros era un texto SQL distinto (hasta
+2^n variantes por endpoint) y el texto se rearmaba en cada request.
+
+`FiltroSQL` declara los filtros de un endpoint una sola vez y siempre emite
+TODAS las condiciones con la forma
+
+    (<condicion con $n> OR $n IS NULL)
+
+y un parametro por filtro (None = filtro inactivo). Resultado:
+
+- Un solo texto SQL por endpoint (y por offset de parametros): la compilacion
+  se cachea y el texto es estable para el cache de sentencias y para
+  pg_stat_statements.
+- El layout de parametros es fijo (mismo orden que la declaracion).
+- Con parametros enlazados Postgres planea la sentencia con los valores reales
+  (plan custom), asi que `$n IS NULL` se resuelve al planear y el filtro
+  inactivo no cuesta nada ni impide usar indices.
+
+Nota: la condicion va ANTES de `$n IS NULL` a proposito. Postgres deduce el
+tipo del parametro en su primera referencia; `$n IS NULL` sola no aporta tipo
+("could not determine data type of parameter").
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Filtro(NamedTuple):
+    """
+    Un filtro opcional.
+
+    clave: llave en el dict de filtros.
+    condicion: SQL con `{p}` donde va el parametro (puede repetirse).
+    valor: transformacion del valor antes de enlazarlo (p.ej. '%q%').
+    """
+    clave: str
+    condicion: str
+    valor: Optional[Callable[[Any], Any]] = None
+
+
+class FiltroSQL:
+    """Conjunto de filtros de un endpoint, compilado una vez por offset."""
+
+    def __init__(self, *filtros: Filtro):
+        self.filtros: Tuple[Filtro, ...] = filtros
+        self._compilados: Dict[int, Tuple[str, ...]] = {}
+
+    def condiciones(self, offset: int = 0) -> Tuple[str, ...]:
+        """Condiciones canonicas; el primer parametro es ${offset + 1}."""
+        compiladas = self._compilados.get(offset)
+        if compiladas is None:
+            compiladas = tuple(
+                f"({f.condicion.format(p=f'${offset + i}')} OR ${offset + i} IS NULL)"
+                for i, f in enumerate(self.filtros, start=1)
+            )
+            self._compilados[offset] = compiladas
+        return compiladas
+
+    def sql(self, offset: int = 0) -> str:
+        """Condiciones como sufijo ' AND ...' para anexar a un WHERE existente."""
+        return "".join(f" AND {c}" for c in self.condiciones(offset))
+
+    def valores(self, filtros: Dict[str, Any]) -> List[Any]:
+        """Un parametro por filtro, en orden; valores vacios -> None (inactivo)."""
+        params = []
+        for f in self.filtros:
+            valor = filtros.get(f.clave)
+            if not valor:
+                params.append(None)
+            else:
+                params.append(f.valor(valor) if f.valor else valor)
+        return params
+
+    def bind(self, filtros: Dict[str, Any], offset: int = 0) -> Tuple[str, List[Any]]:
+        """(sufijo SQL, parametros) para los filtros dados."""
+        return self.sql(offset), self.valores(filtros)
+
+
+def contiene(valor: Any) -> str:
+    """Patron ILIKE de 'contiene' para filtros de texto libre."""
+    return f"%{valor}%"
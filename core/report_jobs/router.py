@@ -0,0 +1,101 @@
+# Archivo: core/report_jobs/router.py
+"""
+Router de trabajos de reporte asincronos.
+Registro de trabajos, consulta de estatus y descarga del archivo generado.
+"""
+
+from fastapi import APIRouter, Depends, Body, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import ValidationError
+import logging
+
+from core.security import get_current_user_context
+from .service import (
+    ReportJobsService,
+    get_report_jobs_service,
+    JOB_TYPES,
+    ESTATUS_COMPLETADO,
+)
+
+logger = logging.getLogger("ReportJobsRouter")
+
+router = APIRouter(
+    prefix="/report-jobs",
+    tags=["Reportes Asincronos"],
+)
+
+
+def _public_job(job: dict) -> dict:
+    """Campos del trabajo expuestos al cliente."""
+    return {
+        "id_job": job['id_job'],
+        "tipo": job['tipo'],
+        "titulo": job['titulo'],
+        "estatus": job['estatus'],
+        "progreso": job['progreso'],
+        "mensaje": job.get('mensaje'),
+        "download_url": f"/report-jobs/{job['id_job']}/download"
+        if job['estatus'] == ESTATUS_COMPLETADO else None,
+    }
+
+
+def _get_owned_job(service: ReportJobsService, id_job: str, context: dict) -> dict:
+    job = service.get_job(id_job)
+    if not job or job['usuario_id'] != str(context.get("user_db_id")):
+        raise HTTPException(status_code=404, detail="Reporte no encontrado o expirado")
+    return job
+
+
+@router.post("/{tipo}")
+async def submit_report_job(
+    tipo: str,
+    params: dict = Body(default={}),
+    context=Depends(get_current_user_context),
+    service: ReportJobsService = Depends(get_report_jobs_service),
+):
+    """
+    Registra un reporte para generarse en segundo plano.
+    El progreso llega por SSE (evento report_job); el archivo se descarga
+    desde download_url cuando el estatus es COMPLETADO.
+    """
+    if tipo not in JOB_TYPES:
+        raise HTTPException(status_code=404, detail="Tipo de reporte no soportado")
+    if not service.user_can_submit(tipo, context):
+        raise HTTPException(status_code=403, detail="No tienes acceso a este reporte")
+
+    # Parametros invalidos se rechazan aqui (422), no en segundo plano
+    try:
+        params = service.validar_params(tipo, params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    job = service.submit(tipo, params, context.get("user_db_id"))
+    return JSONResponse(status_code=202, content=_public_job(job))
+
+
+@router.get("/{id_job}")
+async def get_report_job(
+    id_job: str,
+    context=Depends(get_current_user_context),
+    service: ReportJobsService = Depends(get_report_jobs_service),
+):
+    """Estatus actual del trabajo (fallback si SSE no esta disponible)."""
+    job = _get_owned_job(service, id_job, context)
+    return _public_job(job)
+
+
+@router.get("/{id_job}/download")
+async def download_report_job(
+    id_job: str,
+    context=Depends(get_current_user_context),
+    service: ReportJobsService = Depends(get_report_jobs_service),
+):
+    """Descarga el archivo generado."""
+    job = _get_owned_job(service, id_job, context)
+    path = service.get_artifact_path(job) if job['estatus'] == ESTATUS_COMPLETADO else None
+    if not path:
+        raise HTTPException(status_code=409, detail="El reporte aun no esta listo")
+
+    return FileResponse(path, media_type=job['media_type'], filename=job['filename'])
@@ -0,0 +1,474 @@
+# Archivo: core/report_jobs/service.py
+"""
+Service Layer para trabajos de reporte asincronos.
+
+Los exports pesados (PDF de simulacion, Excel de comprobantes, materiales y BOM)
+se ejecutan fuera del request HTTP:
+- El request solo registra el trabajo y responde inmediatamente.
+- Un worker en segundo plano lo ejecuta con concurrencia acotada (Semaphore).
+- El progreso se envia al usuario por el canal SSE existente (pg_notify).
+- El archivo final se guarda en disco con TTL y se limpia en core/tasks.py.
+
+El estado de cada trabajo vive en un archivo JSON junto al artefacto, de modo
+que cualquier worker de gunicorn puede responder el estatus y la descarga.
+Mientras corre, el worker dueno escribe un latido (heartbeat_at); si el
+worker muere, el trabajo se marca ERROR al consultarlo o en la limpieza en
+lugar de quedar EN_PROCESO hasta que expire.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from uuid import UUID, uuid4
+
+from core.config import settings
+from core.database import get_db_pool
+from core.permissions import user_has_module_access
+
+logger = logging.getLogger("ReportJobsService")
+
+REPORT_JOBS_DIR = "temp_reports"
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_PDF = "application/pdf"
+
+# Estatus de un trabajo
+ESTATUS_PENDIENTE = "PENDIENTE"
+ESTATUS_EN_PROCESO = "EN_PROCESO"
+ESTATUS_COMPLETADO = "COMPLETADO"
+ESTATUS_ERROR = "ERROR"
+
+# Tipo de evento SSE para progreso de trabajos
+SSE_KIND_REPORT_JOB = "report_job"
+
+# Cada cuanto el worker dueno refresca heartbeat_at de sus trabajos activos
+HEARTBEAT_SECONDS = 30
+
+ProgressCallback = Callable[[int, str], Awaitable[None]]
+JobResult = Tuple[bytes, str, str]  # (contenido, filename, media_type)
+
+
+# =============================================================================
+# HANDLERS POR TIPO DE TRABAJO
+# =============================================================================
+
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+async def _job_simulacion_pdf(conn, params: dict, progress: ProgressCallback) -> JobResult:
+    """PDF del reporte de simulacion (graficas renderizadas en servidor)."""
+    from modules.simulacion.report_router import parse_filtros
+    from modules.simulacion.report_service import get_reportes_service
+    from modules.simulacion.pdf_generator import ReportePDFGenerator
+    from modules.simulacion.chart_renderer import get_chart_renderer
+    from modules.simulacion.report_presets import get_report_presets_service
+
+    service = get_reportes_service()
+    filtros = parse_filtros(
+        start_date=params.get('fecha_inicio'),
+        end_date=params.get('fecha_fin'),
+        tech_id=str(params.get('tecnologia') or ''),
+        type_id=str(params.get('tipo') or ''),
+        status_id=str(params.get('estatus') or ''),
+        user_id=str(params.get('usuario') or '')
+    )
+    filename = f"Reporte_Simulacion_{filtros.fecha_inicio}_{filtros.fecha_fin}.pdf"
+
+    # Preset pre-generado (mes actual, mes anterior, año en curso)
+    preset = await get_report_presets_service().get_preset(conn, filtros)
+    if preset:
+        return preset['pdf'], filename, MIME_PDF
+
+    await progress(10, "Consultando metricas")
+    datos_reporte = await service.get_all_report_data(conn, filtros)
+
+    await progress(50, "Generando graficas")
+    graficas = await service.get_datos_graficas(conn, filtros, datos_reporte['metricas'])
+    chart_images = await get_chart_renderer().render_report_charts(graficas)
+
+    await progress(75, "Generando PDF")
+    generator = ReportePDFGenerator(filtros, datos_reporte, chart_images)
+    pdf_content = await asyncio.to_thread(generator.generate)
+
+    return bytes(pdf_content), filename, MIME_PDF
+
+
+async def _job_compras_excel(conn, params: dict, progress: ProgressCallback) -> JobResult:
+    """Excel de comprobantes de pago con filtros."""
+    from modules.compras.service import get_compras_service
+    from modules.compras.schemas import ComprobanteFilter
+
+    filtros = ComprobanteFilter(**params).model_dump(exclude_none=True)
+
+    await progress(10, "Consultando comprobantes")
+    excel_bytes = await get_compras_service().export_to_excel(conn, filtros=filtros)
+
+    return excel_bytes, f"comprobantes_pago_{_timestamp()}.xlsx", MIME_XLSX
+
+
+async def _job_materiales_excel(conn, params: dict, progress: ProgressCallback) -> JobResult:
+    """Excel de historial de materiales con filtros."""
+    from core.materials.service import get_materials_service
+    from core.materials.schemas import MaterialFilter
+
+    filtros = MaterialFilter(**params).model_dump(exclude_none=True)
+    filtros.pop('page', None)
+    filtros.pop('per_page', None)
+
+    await progress(10, "Consultando materiales")
+    excel_bytes = await get_materials_service().export_to_excel(conn, filtros=filtros)
+
+    return excel_bytes, f"materiales_{_timestamp()}.xlsx", MIME_XLSX
+
+
+async def _job_bom_excel(conn, params: dict, progress: ProgressCallback) -> JobResult:
+    """Excel del BOM vigente de un proyecto."""
+    from core.bom.service import get_bom_service
+
+    service = get_bom_service()
+    id_proyecto = UUID(str(params.get('id_proyecto')))
+
+    await progress(10, "Consultando BOM")
+    bom = await service.get_bom_proyecto(conn, id_proyecto)
+    if not bom:
+        raise ValueError("No existe BOM para este proyecto")
+
+    excel_bytes = await service.export_to_excel(conn, bom['id_bom'])
+
+    proyecto_id = bom.get('proyecto_id_estandar', 'BOM')
+    filename = f"BOM_{proyecto_id}_v{bom['version']}_{_timestamp()}.xlsx"
+    return excel_bytes, filename, MIME_XLSX
+
+
+# =============================================================================
+# VALIDACION DE PARAMETROS (al registrar el trabajo)
+# =============================================================================
+# Cada validador lanza ValueError (incluye ValidationError de Pydantic) si los
+# parametros no son validos y devuelve los parametros normalizados (JSON).
+
+def _validar_simulacion_pdf(params: dict) -> dict:
+    for campo in ('fecha_inicio', 'fecha_fin'):
+        if params.get(campo):
+            try:
+                date.fromisoformat(str(params[campo]))
+            except ValueError:
+                raise ValueError(f"{campo}: fecha invalida (AAAA-MM-DD)")
+    for campo in ('tecnologia', 'tipo', 'estatus'):
+        valor = params.get(campo)
+        if valor not in (None, '') and not str(valor).isdigit():
+            raise ValueError(f"{campo}: debe ser un id numerico")
+    if params.get('usuario'):
+        try:
+            UUID(str(params['usuario']))
+        except ValueError:
+            raise ValueError("usuario: id invalido")
+    return {k: params.get(k) for k in ('fecha_inicio', 'fecha_fin', 'tecnologia', 'tipo', 'estatus', 'usuario')}
+
+
+def _validar_compras_excel(params: dict) -> dict:
+    from modules.compras.schemas import ComprobanteFilter
+    return ComprobanteFilter(**params).model_dump(mode='json', exclude_none=True)
+
+
+def _validar_materiales_excel(params: dict) -> dict:
+    from core.materials.schemas import MaterialFilter
+    return MaterialFilter(**params).model_dump(mode='json', exclude_none=True)
+
+
+def _validar_bom_excel(params: dict) -> dict:
+    try:
+        return {'id_proyecto': str(UUID(str(params.get('id_proyecto'))))}
+    except ValueError:
+        raise ValueError("id_proyecto: id invalido")
+
+
+# Registro de tipos: handler + validador + modulos que dan acceso (basta con uno)
+JOB_TYPES: Dict[str, dict] = {
+    "simulacion_pdf": {
+        "handler": _job_simulacion_pdf,
+        "validar": _validar_simulacion_pdf,
+        "modulos": ["simulacion"],
+        "titulo": "Reporte de Simulacion (PDF)",
+    },
+    "compras_excel": {
+        "handler": _job_compras_excel,
+        "validar": _validar_compras_excel,
+        "modulos": ["compras"],
+        "titulo": "Comprobantes de pago (Excel)",
+    },
+    "materiales_excel": {
+        "handler": _job_materiales_excel,
+        "validar": _validar_materiales_excel,
+        "modulos": ["compras", "ingenieria", "construccion", "oym"],
+        "titulo": "Materiales (Excel)",
+    },
+    "bom_excel": {
+        "handler": _job_bom_excel,
+        "validar": _validar_bom_excel,
+        "modulos": ["ingenieria"],
+        "titulo": "Lista de Materiales (Excel)",
+    },
+}
+
+
+# =============================================================================
+# ESTADO GLOBAL (por worker)
+# =============================================================================
+
+# Limita cuantos trabajos corren a la vez en este worker (cada uno retiene una conexion)
+_job_semaphore: Optional[asyncio.Semaphore] = None
+
+# Referencias fuertes a las tasks para que el GC no las cancele
+_running_tasks: set = set()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _job_semaphore
+    if _job_semaphore is None:
+        _job_semaphore = asyncio.Semaphore(settings.REPORT_JOBS_MAX_CONCURRENT)
+    return _job_semaphore
+
+
+class ReportJobsService:
+    """Registro, ejecucion y consulta de trabajos de reporte."""
+
+    # ─── ARCHIVOS DE ESTADO ───
+
+    @staticmethod
+    def _state_path(id_job: str) -> str:
+        return os.path.join(REPORT_JOBS_DIR, f"{id_job}.json")
+
+    @staticmethod
+    def _artifact_path(id_job: str) -> str:
+        return os.path.join(REPORT_JOBS_DIR, f"{id_job}.bin")
+
+    def _write_state(self, job: dict):
+        """
+        Escritura atomica (tmp + replace) para que otro worker nunca lea JSON parcial.
+        Cada escritura usa su propio temporal: el heartbeat y el marcado de
+        huerfanos pueden escribir el mismo trabajo a la vez.
+        """
+        os.makedirs(REPORT_JOBS_DIR, exist_ok=True)
+        path = self._state_path(job['id_job'])
+        f = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=REPORT_JOBS_DIR,
+            prefix=f"{job['id_job']}.", suffix=".tmp", delete=False
+        )
+        try:
+            with f:
+                json.dump(job, f)
+            os.replace(f.name, path)
+        except BaseException:
+            os.remove(f.name)
+            raise
+
+    def get_job(self, id_job: str) -> Optional[dict]:
+        """Lee el estado de un trabajo. None si no existe o ya expiro."""
+        try:
+            UUID(id_job)
+        except ValueError:
+            return None
+
+        path = self._state_path(id_job)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if job.get('expires_at') and job['expires_at'] < time.time():
+            return None
+        return self._marcar_si_huerfano(job)
+
+    def _marcar_si_huerfano(self, job: dict) -> dict:
+        """
+        Un trabajo PENDIENTE/EN_PROCESO sin latido reciente quedo huerfano
+        (el worker que lo corria murio o se reinicio): se marca ERROR.
+        """
+        if job['estatus'] not in (ESTATUS_PENDIENTE, ESTATUS_EN_PROCESO):
+            return job
+        latido = job.get('heartbeat_at') or job.get('created_at') or 0
+        if time.time() - latido <= settings.REPORT_JOBS_STALE_SECONDS:
+            return job
+
+        logger.warning(f"[JOB] {job['id_job'][:8]} sin latido desde hace {time.time() - latido:.0f}s, se marca ERROR")
+        job['estatus'] = ESTATUS_ERROR
+        job['mensaje'] = "El proceso que generaba el reporte se detuvo. Intenta de nuevo."
+        self._write_state(job)
+        return job
+
+    def get_artifact_path(self, job: dict) -> Optional[str]:
+        path = self._artifact_path(job['id_job'])
+        return path if os.path.exists(path) else None
+
+    # ─── PERMISOS ───
+
+    def user_can_submit(self, tipo: str, context: dict) -> bool:
+        modulos = JOB_TYPES[tipo]["modulos"]
+        return any(user_has_module_access(m, context) for m in modulos)
+
+    def validar_params(self, tipo: str, params: dict) -> dict:
+        """Parametros normalizados del trabajo; ValueError si no son validos."""
+        return JOB_TYPES[tipo]["validar"](params)
+
+    # ─── NOTIFICACION SSE ───
+
+    async def _notify(self, conn, job: dict):
+        """Envia el estado del trabajo al usuario por el canal SSE."""
+        from core.notifications.service import get_notifications_service
+
+        payload = {
+            "kind": SSE_KIND_REPORT_JOB,
+            "id_job": job['id_job'],
+            "tipo": job['tipo'],
+            "titulo": job['titulo'],
+            "estatus": job['estatus'],
+            "progreso": job['progreso'],
+            "mensaje": job.get('mensaje'),
+            "download_url": f"/report-jobs/{job['id_job']}/download"
+            if job['estatus'] == ESTATUS_COMPLETADO else None,
+        }
+        await get_notifications_service().broadcast_to_user(conn, UUID(job['usuario_id']), payload)
+
+    # ─── CICLO DE VIDA ───
+
+    def submit(self, tipo: str, params: dict, usuario_id: UUID) -> dict:
+        """
+        Registra un trabajo y lo agenda en segundo plano.
+
+        Returns:
+            Estado inicial del trabajo (estatus PENDIENTE).
+        """
+        if tipo not in JOB_TYPES:
+            raise ValueError(f"Tipo de reporte no soportado: {tipo}")
+
+        now = time.time()
+        job = {
+            "id_job": str(uuid4()),
+            "tipo": tipo,
+            "titulo": JOB_TYPES[tipo]["titulo"],
+            "usuario_id": str(usuario_id),
+            "params": params,
+            "estatus": ESTATUS_PENDIENTE,
+            "progreso": 0,
+            "mensaje": "En cola",
+            "filename": None,
+            "media_type": None,
+            "created_at": now,
+            "heartbeat_at": now,
+            "expires_at": now + settings.REPORT_JOBS_TTL_SECONDS,
+        }
+        self._write_state(job)
+
+        task = asyncio.create_task(self._run(job))
+        _running_tasks.add(task)
+        task.add_done_callback(_running_tasks.discard)
+
+        logger.info(f"[JOB] {job['id_job'][:8]} registrado ({tipo}) por {usuario_id}")
+        return job
+
+    async def _heartbeat(self, job: dict):
+        """Refresca heartbeat_at mientras el trabajo siga en este worker."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            job['heartbeat_at'] = time.time()
+            self._write_state(job)
+
+    async def _run(self, job: dict):
+        """Ejecuta un trabajo respetando el limite de concurrencia."""
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._run_handler(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _run_handler(self, job: dict):
+        handler = JOB_TYPES[job['tipo']]["handler"]
+
+        async with _get_semaphore():
+            pool = await get_db_pool()
+            async with pool.acquire() as conn:
+
+                async def progress(pct: int, mensaje: str):
+                    job['progreso'] = pct
+                    job['mensaje'] = mensaje
+                    job['heartbeat_at'] = time.time()
+                    self._write_state(job)
+                    await self._notify(conn, job)
+
+                try:
+                    job['estatus'] = ESTATUS_EN_PROCESO
+                    await progress(1, "Iniciando")
+
+                    content, filename, media_type = await handler(conn, job['params'], progress)
+
+                    with open(self._artifact_path(job['id_job']), "wb") as f:
+                        f.write(content)
+
+                    job['filename'] = filename
+                    job['media_type'] = media_type
+                    job['estatus'] = ESTATUS_COMPLETADO
+                    # El TTL corre a partir de que el archivo esta listo
+                    job['expires_at'] = time.time() + settings.REPORT_JOBS_TTL_SECONDS
+                    await progress(100, "Listo para descargar")
+                    logger.info(f"[JOB] {job['id_job'][:8]} completado ({len(content)} bytes)")
+
+                except Exception as e:
+                    logger.error(f"[JOB] {job['id_job'][:8]} fallo: {e}", exc_info=True)
+                    job['estatus'] = ESTATUS_ERROR
+                    try:
+                        await progress(job['progreso'], str(e) if isinstance(e, ValueError) else "Error generando el reporte")
+                    except Exception as notify_err:
+                        logger.error(f"[JOB] Error notificando fallo: {notify_err}")
+
+    # ─── LIMPIEZA ───
+
+    def cleanup_expired(self) -> int:
+        """
+        Elimina estado y artefactos de trabajos expirados y marca ERROR los
+        huerfanos vigentes. Retorna cuantos se borraron.
+        """
+        if not os.path.exists(REPORT_JOBS_DIR):
+            return 0
+
+        now = time.time()
+        count = 0
+        for filename in os.listdir(REPORT_JOBS_DIR):
+            if not filename.endswith(".json"):
+                continue
+            id_job = filename[:-len(".json")]
+            state_path = self._state_path(id_job)
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+                expires_at = job.get('expires_at') or 0
+            except (OSError, json.JSONDecodeError):
+                # Estado corrupto: usar mtime + TTL
+                job = None
+                expires_at = os.path.getmtime(state_path) + settings.REPORT_JOBS_TTL_SECONDS
+
+            if expires_at >= now:
+                if job:
+                    self._marcar_si_huerfano(job)
+                continue
+
+            for path in (state_path, self._artifact_path(id_job)):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.error(f"Error eliminando {path}: {e}")
+            count += 1
+        return count
+
+
+def get_report_jobs_service() -> ReportJobsService:
+    return ReportJobsService()
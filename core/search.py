@@ -0,0 +1,31 @@
+"""
+Busqueda de texto para listas de oportunidades y proyectos.
+
+Cada tabla tiene una columna generada `search_doc` (migrations/004): texto en
+minusculas y sin acentos con los campos buscables, indexada con GIN trigram.
+Las queries filtran con LIKE sobre ese documento (usa el indice incluso con
+comodin inicial) y ordenan por word_similarity, de modo que las coincidencias
+mas cercanas al termino aparecen primero.
+
+La normalizacion del termino se hace en SQL con la misma funcion que genera el
+documento (f_unaccent + lower), asi ambos lados coinciden siempre.
+"""
+from typing import Optional
+
+
+def prepare_search_term(q: Optional[str]) -> Optional[str]:
+    """Limpia el termino de busqueda (espacios). Retorna None si no hay nada que buscar."""
+    if not q:
+        return None
+    term = " ".join(q.split())
+    return term or None
+
+
+def search_match(column: str, param: str) -> str:
+    """Condicion de coincidencia: `column` contiene el termino normalizado."""
+    return f"{column} LIKE '%' || lower(f_unaccent({param})) || '%'"
+
+
+def search_rank(column: str, param: str) -> str:
+    """Expresion de relevancia (0..1) para ordenar resultados."""
+    return f"word_similarity(lower(f_unaccent({param})), {column})"
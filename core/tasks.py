@@ -43,3 +43,57 @@ async def cleanup_temp_uploads_periodically(interval_seconds: int = 3600, max_ag
             
         # Esperar para la siguiente ejecución
         await asyncio.sleep(interval_seconds)
+
+
+async def cleanup_report_jobs_periodically(interval_seconds: int = 600):
+    """
+    Tarea en segundo plano que elimina reportes asincronos expirados (temp_reports).
+    El TTL de cada trabajo se define en REPORT_JOBS_TTL_SECONDS.
+    
+    Args:
+        interval_seconds: Cada cuánto tiempo se ejecuta la limpieza (default 10 min).
+    """
+    from core.report_jobs.service import get_report_jobs_service
+    
+    service = get_report_jobs_service()
+    
+    while True:
+        try:
+            count = service.cleanup_expired()
+            if count > 0:
+                logger.info(f"Limpieza de reportes completada. {count} trabajos expirados eliminados.")
+        except Exception as e:
+            logger.error(f"Error en limpieza de reportes: {e}")
+            
+        await asyncio.sleep(interval_seconds)
+
+
+async def pregenerate_report_presets_periodically(interval_seconds: int = None):
+    """
+    Tarea en segundo plano que pre-genera los reportes de simulacion recurrentes
+    (mes actual, mes anterior, año en curso).
+    
+    Todos los workers ejecutan el timer, pero solo el que obtiene el lease
+    en Postgres (tb_tareas_lease) genera; los demas retornan sin hacer nada.
+    
+    Args:
+        interval_seconds: Cada cuánto tiempo se regeneran (default REPORT_PRESETS_INTERVAL_SECONDS).
+    """
+    from core.config import settings
+    from core.database import get_db_pool
+    from modules.simulacion.report_presets import get_report_presets_service
+    
+    interval_seconds = interval_seconds or settings.REPORT_PRESETS_INTERVAL_SECONDS
+    service = get_report_presets_service()
+    
+    while True:
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as conn:
+                count = await service.generar_presets(conn, interval_seconds)
+            if count > 0:
+                logger.info(f"Presets de reportes regenerados: {count}")
+        except Exception as e:
+            logger.error(f"Error pre-generando presets de reportes: {e}")
+            
+        await asyncio.sleep(interval_seconds)
@@ -6,6 +6,9 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID
 import logging
 
+from core.pagination import decode_cursor
+from core.search import prepare_search_term, search_match, search_rank
+
 logger = logging.getLogger("TransferDBService")
 
 
@@ -97,7 +100,8 @@ class TransferDBService:
         area_filter: Optional[str] = None,
         status_filter: Optional[str] = None,
         q: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         query = """
             SELECT
@@ -140,16 +144,39 @@ class TransferDBService:
                 AND tp2.status = ${len(params)}
             )"""
 
-        if q:
-            params.append(f"%{q}%")
+        # Busqueda sobre el documento del proyecto y el de su oportunidad (core/search.py)
+        search_term = prepare_search_term(q)
+        if search_term:
+            params.append(search_term)
             ph = f"${len(params)}"
             query += f""" AND (
-                p.proyecto_id_estandar ILIKE {ph}
-                OR o.nombre_proyecto ILIKE {ph}
-                OR o.cliente_nombre ILIKE {ph}
+                {search_match('p.search_doc', ph)}
+                OR {search_match('o.search_doc', ph)}
             )"""
-
-        query += " ORDER BY p.created_at DESC"
+            rank = f"GREATEST({search_rank('p.search_doc', ph)}, COALESCE({search_rank('o.search_doc', ph)}, 0))"
+
+        # Keyset sobre (created_at, id_proyecto); con busqueda sobre
+        # (relevancia, created_at, id_proyecto), recalculando en SQL la
+        # relevancia del ultimo proyecto entregado
+        cursor_values = decode_cursor(cursor)
+        if cursor_values:
+            params.extend(cursor_values)
+            fecha_ph, id_ph = f"${len(params) - 1}", f"${len(params)}::uuid"
+            if search_term:
+                rank_cursor = f"""(
+                    SELECT GREATEST({search_rank('cp.search_doc', ph)}, COALESCE({search_rank('co.search_doc', ph)}, 0))
+                    FROM tb_proyectos_gate cp
+                    LEFT JOIN tb_oportunidades co ON cp.id_oportunidad = co.id_oportunidad
+                    WHERE cp.id_proyecto = {id_ph}
+                )"""
+                query += f" AND ({rank}, p.created_at, p.id_proyecto) < ({rank_cursor}, {fecha_ph}, {id_ph})"
+            else:
+                query += f" AND (p.created_at, p.id_proyecto) < ({fecha_ph}, {id_ph})"
+
+        if search_term:
+            query += f" ORDER BY {rank} DESC, p.created_at DESC, p.id_proyecto DESC"
+        else:
+            query += " ORDER BY p.created_at DESC, p.id_proyecto DESC"
 
         if limit > 0:
             query += f" LIMIT {limit}"
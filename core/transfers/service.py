@@ -51,10 +51,11 @@ class TransferService:
         area_filter: Optional[str] = None,
         status_filter: Optional[str] = None,
         q: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         return await self.db.get_all_proyectos(
-            conn, area_filter, status_filter, q, limit
+            conn, area_filter, status_filter, q, limit, cursor
         )
 
     async def get_proyecto_detalle(
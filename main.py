@@ -92,6 +92,10 @@ app.include_router(materials_router)
 from core.bom.router import router as bom_router
 app.include_router(bom_router)
 
+# Reportes asincronos (PDF/Excel en segundo plano)
+from core.report_jobs.router import router as report_jobs_router
+app.include_router(report_jobs_router)
+
 # Workflow: Comentarios centralizados
 from core.workflow.router import router as workflow_router
 app.include_router(workflow_router)
@@ -118,15 +122,25 @@ app.include_router(projects_router)
 
 # --- Background Tasks ---
 import asyncio
-from core.tasks import cleanup_temp_uploads_periodically
+from core.tasks import (
+    cleanup_temp_uploads_periodically,
+    cleanup_report_jobs_periodically,
+    pregenerate_report_presets_periodically,
+)
 
 async def start_background_tasks():
     """Lanza tareas en segundo plano al inicio."""
     asyncio.create_task(cleanup_temp_uploads_periodically())
+    asyncio.create_task(cleanup_report_jobs_periodically())
+    asyncio.create_task(pregenerate_report_presets_periodically())
     
 # Actualizamos el on_startup
 app.router.on_startup.append(start_background_tasks)
 
+# Pool de procesos del render de gráficas (PDF de simulación)
+from modules.simulacion.chart_renderer import shutdown_chart_renderer
+app.router.on_shutdown.append(shutdown_chart_renderer)
+
 from core.security import get_current_user_context
 from fastapi import Depends
 from fastapi.responses import RedirectResponse, JSONResponse
@@ -0,0 +1,54 @@
+-- migrations/001_intervalos_estatus.sql
+-- Tabla derivada de intervalos por estatus (una fila por estancia de una
+-- oportunidad en un estatus). Se alimenta en la misma transaccion que inserta
+-- en tb_historial_estatus (ver insertar_historial_estatus): se cierra el
+-- intervalo abierto y se abre uno nuevo.
+--
+-- MetricsService (tiempo por estatus, ciclos, transiciones) lee de aqui en
+-- lugar de recalcular LEAD() sobre todo el historial en cada request.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tb_intervalos_estatus (
+    id BIGSERIAL PRIMARY KEY,
+    id_oportunidad UUID NOT NULL REFERENCES tb_oportunidades(id_oportunidad) ON DELETE CASCADE,
+    id_estatus INTEGER NOT NULL REFERENCES tb_cat_estatus_global(id),
+    id_estatus_origen INTEGER REFERENCES tb_cat_estatus_global(id),  -- NULL = alta de la oportunidad
+    entered_at TIMESTAMPTZ NOT NULL,
+    exited_at TIMESTAMPTZ,  -- NULL = estatus actual
+    duracion_dias DOUBLE PRECISION GENERATED ALWAYS AS (
+        EXTRACT(EPOCH FROM (exited_at - entered_at)) / 86400.0
+    ) STORED
+);
+
+-- Intervalo abierto por oportunidad (cierre en cada cambio y pipeline actual).
+-- migrations/012 lo reemplaza por un indice UNIQUE (a lo mas uno abierto).
+CREATE INDEX IF NOT EXISTS ix_intervalos_estatus_abierto
+    ON tb_intervalos_estatus (id_oportunidad)
+    WHERE exited_at IS NULL;
+
+-- Metricas por rango de fechas
+CREATE INDEX IF NOT EXISTS ix_intervalos_estatus_entered
+    ON tb_intervalos_estatus (entered_at)
+    INCLUDE (id_estatus, id_oportunidad, duracion_dias);
+
+-- Ciclos de retrabajo (self-join por oportunidad en orden cronologico)
+CREATE INDEX IF NOT EXISTS ix_intervalos_estatus_op_entered
+    ON tb_intervalos_estatus (id_oportunidad, entered_at);
+
+-- Backfill desde el historial existente
+INSERT INTO tb_intervalos_estatus (id_oportunidad, id_estatus, id_estatus_origen, entered_at, exited_at)
+SELECT
+    h.id_oportunidad,
+    h.id_estatus_nuevo,
+    h.id_estatus_anterior,
+    h.fecha_cambio_sla,
+    LEAD(h.fecha_cambio_sla) OVER (
+        PARTITION BY h.id_oportunidad
+        ORDER BY h.fecha_cambio_sla, h.fecha_cambio_real
+    )
+FROM tb_historial_estatus h
+WHERE h.fecha_cambio_sla IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM tb_intervalos_estatus);
+
+COMMIT;
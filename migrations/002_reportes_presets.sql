@@ -0,0 +1,23 @@
+-- migrations/002_reportes_presets.sql
+-- Reportes de simulacion pre-generados para los presets recurrentes
+-- (mes actual, mes anterior, año en curso). Los genera un solo worker
+-- desde core/tasks.py (lease en tb_tareas_lease, ver migrations/011) y
+-- cualquier worker los sirve cuando los filtros del request coinciden con
+-- el preset.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tb_reportes_presets (
+    clave TEXT PRIMARY KEY,             -- mes_actual | mes_anterior | anio_actual
+    fecha_inicio DATE NOT NULL,
+    fecha_fin DATE NOT NULL,
+    snapshot BYTEA NOT NULL,            -- resultado de get_all_report_data (JSONB desde migrations/011)
+    pdf BYTEA NOT NULL,
+    generado_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Busqueda por rango exacto de fechas (los presets no llevan otros filtros)
+CREATE INDEX IF NOT EXISTS ix_reportes_presets_rango
+    ON tb_reportes_presets (fecha_inicio, fecha_fin);
+
+COMMIT;
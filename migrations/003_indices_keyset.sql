@@ -0,0 +1,21 @@
+-- migrations/003_indices_keyset.sql
+-- Indices para la paginacion por cursor (core/pagination.py) de las listas de
+-- oportunidades (Comercial, Simulacion) y de proyectos (vista global).
+-- El orden del indice coincide con el ORDER BY de las queries, por lo que
+-- cada pagina es un index scan acotado a partir del cursor.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS ix_oportunidades_keyset
+    ON tb_oportunidades (fecha_solicitud DESC, id_oportunidad DESC);
+
+-- Simulacion solo lista oportunidades con correo enviado
+CREATE INDEX IF NOT EXISTS ix_oportunidades_keyset_enviadas
+    ON tb_oportunidades (fecha_solicitud DESC, id_oportunidad DESC)
+    WHERE email_enviado = true;
+
+CREATE INDEX IF NOT EXISTS ix_proyectos_gate_keyset
+    ON tb_proyectos_gate (created_at DESC, id_proyecto DESC)
+    WHERE aprobacion_direccion = true;
+
+COMMIT;
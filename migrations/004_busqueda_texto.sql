@@ -0,0 +1,44 @@
+-- migrations/004_busqueda_texto.sql
+-- Documento de busqueda (sin acentos, minusculas) por oportunidad y proyecto,
+-- con indice GIN trigram. Lo usan las busquedas de las listas de Comercial,
+-- Simulacion y Proyectos (ver core/search.py) en lugar de varios ILIKE '%q%'.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE (depende del diccionario); las columnas generadas e
+-- indices requieren una funcion IMMUTABLE con el diccionario explicito.
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+-- Oportunidades: folio, titulo, nombre de proyecto y cliente
+ALTER TABLE tb_oportunidades
+    ADD COLUMN IF NOT EXISTS search_doc TEXT GENERATED ALWAYS AS (
+        lower(f_unaccent(
+            coalesce(op_id_estandar, '') || ' ' ||
+            coalesce(titulo_proyecto, '') || ' ' ||
+            coalesce(nombre_proyecto, '') || ' ' ||
+            coalesce(cliente_nombre, '')
+        ))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_oportunidades_search_trgm
+    ON tb_oportunidades USING GIN (search_doc gin_trgm_ops);
+
+-- Proyectos: folio y nombre corto (nombre de proyecto y cliente vienen de la oportunidad)
+ALTER TABLE tb_proyectos_gate
+    ADD COLUMN IF NOT EXISTS search_doc TEXT GENERATED ALWAYS AS (
+        lower(f_unaccent(
+            coalesce(proyecto_id_estandar, '') || ' ' ||
+            coalesce(nombre_corto, '')
+        ))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_proyectos_gate_search_trgm
+    ON tb_proyectos_gate USING GIN (search_doc gin_trgm_ops);
+
+COMMIT;
@@ -0,0 +1,16 @@
+-- migrations/005_dias_festivos.sql
+-- Calendario de dias festivos para el calculo de SLA (ver
+-- modules/comercial/sla_calculator.py: calculate_deadlines_bulk).
+-- Un festivo cuenta como dia no habil igual que el fin de semana configurado:
+-- una solicitud recibida en festivo es fuera de horario y ningun deadline
+-- vence en festivo.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tb_dias_festivos (
+    fecha DATE PRIMARY KEY,
+    descripcion TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMIT;
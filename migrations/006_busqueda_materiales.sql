@@ -0,0 +1,20 @@
+-- migrations/006_busqueda_materiales.sql
+-- Indices para la busqueda de materiales del editor de BOM
+-- (core/bom/db_service.py: buscar_materiales_para_bom).
+-- - GIN trigram: candidatos por ILIKE '%q%' y por el operador <% (word_similarity).
+--   Ya no se usa desde que la busqueda lee tb_materiales_ultimo_precio
+--   (migrations/007); migrations/013 lo elimina.
+-- - (descripcion, fecha DESC): compra mas reciente de cada descripcion candidata
+--   con un solo index scan, sin DISTINCT ON sobre todo el historial.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_materiales_historial_desc_trgm
+    ON tb_materiales_historial USING GIN (descripcion_proveedor gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_materiales_historial_desc_fecha
+    ON tb_materiales_historial (descripcion_proveedor, fecha_factura DESC NULLS LAST);
+
+COMMIT;
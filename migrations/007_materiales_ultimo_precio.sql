@@ -0,0 +1,58 @@
+-- migrations/007_materiales_ultimo_precio.sql
+-- Proyeccion "ultimo precio por material": una fila por
+-- (descripcion_proveedor, id_proveedor) con la compra mas reciente y los
+-- agregados de precio del par. La mantiene la aplicacion
+-- (core/materials/db_service.py: refrescar_ultimo_precio) al ingerir conceptos
+-- de XML y al editar materiales; la leen el panel de materiales recientes y la
+-- busqueda del BOM y el analisis de precios por proveedor, sin recorrer
+-- tb_materiales_historial.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS tb_materiales_ultimo_precio (
+    descripcion_proveedor TEXT NOT NULL,
+    id_proveedor UUID,
+    id_material UUID NOT NULL,          -- fila de tb_materiales_historial de la compra mas reciente
+    precio_unitario NUMERIC,
+    unidad TEXT,
+    clave_prod_serv TEXT,
+    fecha_factura DATE,
+    total_compras INTEGER NOT NULL,
+    min_precio NUMERIC,
+    max_precio NUMERIC,
+    suma_precios NUMERIC,               -- avg = suma_precios / total_compras
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT uq_materiales_ultimo_precio UNIQUE NULLS NOT DISTINCT (descripcion_proveedor, id_proveedor)
+);
+
+-- Materiales recientes: recorrido por fecha con LIMIT
+CREATE INDEX IF NOT EXISTS ix_materiales_ultimo_precio_fecha
+    ON tb_materiales_ultimo_precio (fecha_factura DESC NULLS LAST);
+
+-- Ultimo precio por descripcion (todas las fuentes) en busqueda del BOM
+CREATE INDEX IF NOT EXISTS ix_materiales_ultimo_precio_desc_fecha
+    ON tb_materiales_ultimo_precio (descripcion_proveedor, fecha_factura DESC NULLS LAST);
+
+-- Candidatos de la busqueda del BOM (una fila por descripcion/proveedor, no por compra)
+CREATE INDEX IF NOT EXISTS ix_materiales_ultimo_precio_desc_trgm
+    ON tb_materiales_ultimo_precio USING GIN (descripcion_proveedor gin_trgm_ops);
+
+-- Carga inicial desde el historial
+INSERT INTO tb_materiales_ultimo_precio (
+    descripcion_proveedor, id_proveedor, id_material, precio_unitario, unidad,
+    clave_prod_serv, fecha_factura, total_compras, min_precio, max_precio, suma_precios
+)
+SELECT DISTINCT ON (m.descripcion_proveedor, m.id_proveedor)
+    m.descripcion_proveedor, m.id_proveedor, m.id, m.precio_unitario, m.unidad,
+    m.clave_prod_serv, m.fecha_factura,
+    COUNT(*) OVER w, MIN(m.precio_unitario) OVER w, MAX(m.precio_unitario) OVER w,
+    SUM(m.precio_unitario) OVER w
+FROM tb_materiales_historial m
+WHERE m.descripcion_proveedor IS NOT NULL
+WINDOW w AS (PARTITION BY m.descripcion_proveedor, m.id_proveedor)
+ORDER BY m.descripcion_proveedor, m.id_proveedor, m.fecha_factura DESC NULLS LAST, m.created_at DESC
+ON CONFLICT ON CONSTRAINT uq_materiales_ultimo_precio DO NOTHING;
+
+COMMIT;
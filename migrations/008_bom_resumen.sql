@@ -0,0 +1,47 @@
+-- migrations/008_bom_resumen.sql
+-- Proyeccion "resumen de BOM": una fila por BOM con los nombres de
+-- elaborador/responsables (desnormalizados de tb_usuarios), el conteo de
+-- items y el costo estimado. La mantiene la aplicacion
+-- (core/bom/db_service.py: refrescar_resumen) al crear BOMs, al escribir
+-- items y al asignar responsables en el flujo de aprobacion; la cabecera del
+-- BOM (get_bom_by_id / get_bom_by_proyecto) la lee por PK en lugar de unir
+-- tb_usuarios cuatro veces y contar items en cada request.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tb_bom_resumen (
+    id_bom UUID PRIMARY KEY REFERENCES tb_bom (id_bom) ON DELETE CASCADE,
+    elaborado_por_nombre TEXT,
+    responsable_ing_nombre TEXT,
+    jefe_construccion_nombre TEXT,
+    coordinador_obra_nombre TEXT,
+    total_items INTEGER NOT NULL DEFAULT 0,       -- items activos
+    items_entregados INTEGER NOT NULL DEFAULT 0,  -- items activos entregados
+    costo_total NUMERIC NOT NULL DEFAULT 0,       -- SUM(cantidad * precio_unitario) de items activos
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Carga inicial
+INSERT INTO tb_bom_resumen (
+    id_bom, elaborado_por_nombre, responsable_ing_nombre, jefe_construccion_nombre,
+    coordinador_obra_nombre, total_items, items_entregados, costo_total
+)
+SELECT b.id_bom, u1.nombre, u2.nombre, u3.nombre, u4.nombre,
+       COALESCE(i.total, 0), COALESCE(i.entregados, 0), COALESCE(i.costo, 0)
+FROM tb_bom b
+LEFT JOIN tb_usuarios u1 ON u1.id_usuario = b.elaborado_por
+LEFT JOIN tb_usuarios u2 ON u2.id_usuario = b.responsable_ing
+LEFT JOIN tb_usuarios u3 ON u3.id_usuario = b.jefe_construccion
+LEFT JOIN tb_usuarios u4 ON u4.id_usuario = b.coordinador_obra
+LEFT JOIN (
+    SELECT id_bom,
+           COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE entregado) AS entregados,
+           SUM(cantidad * COALESCE(precio_unitario, 0)) AS costo
+    FROM tb_bom_items
+    WHERE activo = TRUE
+    GROUP BY id_bom
+) i ON i.id_bom = b.id_bom
+ON CONFLICT (id_bom) DO NOTHING;
+
+COMMIT;
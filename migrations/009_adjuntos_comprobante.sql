@@ -0,0 +1,28 @@
+-- migrations/009_adjuntos_comprobante.sql
+-- Relacion tipada adjunto -> comprobante de pago.
+-- Antes el vinculo solo vivia en metadata->>'id_comprobante' (texto dentro de
+-- jsonb): la lista de comprobantes contaba archivos con una subconsulta
+-- correlacionada que recorria tb_documentos_attachments por cada fila.
+-- Ahora la columna id_comprobante (FK) con indice parcial de activos resuelve
+-- el conteo y el popover de archivos con un index scan, sin importar el
+-- tamano de la tabla de adjuntos. metadata se conserva tal cual.
+
+BEGIN;
+
+ALTER TABLE tb_documentos_attachments
+    ADD COLUMN IF NOT EXISTS id_comprobante UUID
+    REFERENCES tb_comprobantes_pago (id_comprobante) ON DELETE SET NULL;
+
+-- Carga inicial desde metadata (solo comprobantes existentes)
+UPDATE tb_documentos_attachments da
+SET id_comprobante = c.id_comprobante
+FROM tb_comprobantes_pago c
+WHERE da.id_comprobante IS NULL
+  AND da.metadata ? 'id_comprobante'
+  AND c.id_comprobante::text = da.metadata->>'id_comprobante';
+
+CREATE INDEX IF NOT EXISTS ix_documentos_attachments_comprobante
+    ON tb_documentos_attachments (id_comprobante)
+    WHERE activo AND id_comprobante IS NOT NULL;
+
+COMMIT;
@@ -0,0 +1,56 @@
+-- migrations/010_materiales_precio_mensual.sql
+-- Rollup mensual de precios de materiales: una fila por mes de factura y
+-- (descripcion_proveedor, id_proveedor, clave_prod_serv, id_categoria, origen)
+-- con conteo y agregados de precio/importe. La mantiene la aplicacion
+-- (core/materials/db_service.py: refrescar_precio_mensual) al ingerir
+-- conceptos de XML y al editar la clasificacion de un material, recalculando
+-- solo los (descripcion, proveedor, mes) tocados. La leen la comparativa por
+-- clave SAT, la tendencia mensual de precios del modal y las tarjetas de
+-- estadisticas (cuando los filtros lo permiten), sin recorrer
+-- tb_materiales_historial.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tb_materiales_precio_mensual (
+    mes DATE,                           -- date_trunc('month', fecha_factura)
+    descripcion_proveedor TEXT NOT NULL,
+    id_proveedor UUID,
+    clave_prod_serv TEXT,
+    id_categoria INTEGER,
+    origen TEXT,
+    total_compras INTEGER NOT NULL,
+    min_precio NUMERIC,
+    max_precio NUMERIC,
+    suma_precios NUMERIC,               -- avg = suma_precios / total_compras
+    suma_importe NUMERIC,
+    ultima_fecha DATE,                  -- fecha_factura mas reciente del grupo
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT uq_materiales_precio_mensual UNIQUE NULLS NOT DISTINCT (
+        descripcion_proveedor, id_proveedor, mes, clave_prod_serv, id_categoria, origen
+    )
+);
+
+-- Comparativa por clave SAT
+CREATE INDEX IF NOT EXISTS ix_materiales_precio_mensual_clave
+    ON tb_materiales_precio_mensual (clave_prod_serv)
+    WHERE clave_prod_serv IS NOT NULL;
+
+-- Estadisticas por rango de meses
+CREATE INDEX IF NOT EXISTS ix_materiales_precio_mensual_mes
+    ON tb_materiales_precio_mensual (mes);
+
+-- Carga inicial desde el historial
+INSERT INTO tb_materiales_precio_mensual (
+    mes, descripcion_proveedor, id_proveedor, clave_prod_serv, id_categoria, origen,
+    total_compras, min_precio, max_precio, suma_precios, suma_importe, ultima_fecha
+)
+SELECT date_trunc('month', m.fecha_factura)::date,
+       m.descripcion_proveedor, m.id_proveedor, m.clave_prod_serv, m.id_categoria, m.origen,
+       COUNT(*), MIN(m.precio_unitario), MAX(m.precio_unitario),
+       SUM(m.precio_unitario), SUM(m.importe), MAX(m.fecha_factura)
+FROM tb_materiales_historial m
+WHERE m.descripcion_proveedor IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6
+ON CONFLICT ON CONSTRAINT uq_materiales_precio_mensual DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- migrations/011_reportes_presets_jsonb.sql
+-- Presets de reportes (migrations/002):
+-- - El snapshot pasa de BYTEA a JSONB (dataclasses.asdict, con Decimal,
+--   fechas y UUID marcados con su tipo) y se reconstruye explicitamente en
+--   modules/simulacion/report_presets.py: leer la tabla ya no puede ejecutar
+--   codigo y un snapshot de otra version de las dataclasses se descarta en
+--   lugar de fallar silenciosamente. Los snapshots existentes se borran; la
+--   tarea periodica los regenera en su siguiente corrida.
+-- - tb_tareas_lease: lease con expiracion para elegir al worker que genera.
+--   Sustituye al lock consultivo de transaccion, que obligaba a mantener una
+--   transaccion (y una conexion de pgbouncer) abierta durante toda la
+--   generacion.
+
+BEGIN;
+
+DELETE FROM tb_reportes_presets;
+
+ALTER TABLE tb_reportes_presets
+    ALTER COLUMN snapshot TYPE JSONB USING NULL;
+
+COMMENT ON COLUMN tb_reportes_presets.snapshot IS
+    'get_all_report_data serializado con dataclasses.asdict';
+
+CREATE TABLE IF NOT EXISTS tb_tareas_lease (
+    tarea TEXT PRIMARY KEY,             -- p.ej. reportes_presets
+    lider TEXT NOT NULL,                -- host:pid del worker que la tomo
+    expira_at TIMESTAMPTZ NOT NULL
+);
+
+COMMIT;
@@ -0,0 +1,35 @@
+-- migrations/012_intervalos_estatus_abierto_unico.sql
+-- A lo mas un intervalo abierto (exited_at IS NULL) por oportunidad en
+-- tb_intervalos_estatus (migrations/001). insertar_historial_estatus
+-- (modules/comercial/db_service.py) siempre cierra el intervalo abierto, con
+-- exited_at = GREATEST(entered_at, fecha_cambio_sla), y despues abre el nuevo
+-- en una segunda sentencia de la misma transaccion; el indice unico parcial
+-- lo garantiza y evita filas duplicadas en las metricas que leen el estatus
+-- actual (ultima transicion, pipeline).
+--
+-- Antes se cierran los intervalos abiertos duplicados que dejo la version
+-- anterior con cambios de fecha retroactiva: se conserva abierto el mas
+-- reciente y los demas se cierran a la entrada de ese.
+
+BEGIN;
+
+UPDATE tb_intervalos_estatus i
+SET exited_at = GREATEST(i.entered_at, d.entered_at_actual)
+FROM (
+    SELECT id,
+           FIRST_VALUE(entered_at) OVER w AS entered_at_actual,
+           ROW_NUMBER() OVER w AS rn
+    FROM tb_intervalos_estatus
+    WHERE exited_at IS NULL
+    WINDOW w AS (PARTITION BY id_oportunidad ORDER BY entered_at DESC, id DESC)
+) d
+WHERE i.id = d.id
+  AND d.rn > 1;
+
+DROP INDEX IF EXISTS ix_intervalos_estatus_abierto;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_intervalos_estatus_abierto
+    ON tb_intervalos_estatus (id_oportunidad)
+    WHERE exited_at IS NULL;
+
+COMMIT;
@@ -0,0 +1,16 @@
+-- migrations/013_drop_materiales_historial_trgm.sql
+-- Quita el indice GIN trigram de tb_materiales_historial.descripcion_proveedor
+-- (migrations/006). La busqueda de materiales del editor de BOM lee
+-- tb_materiales_ultimo_precio, que tiene su propio indice trigram
+-- (migrations/007), y el filtro `q` de la lista de materiales combina
+-- descripcion_proveedor y descripcion_interna con OR, asi que tampoco lo usa.
+-- Solo agregaba costo a cada insercion de facturas.
+--
+-- Se conserva ix_materiales_historial_desc_fecha: lo usan la proyeccion de
+-- ultimo precio y la tendencia de precios por descripcion.
+
+BEGIN;
+
+DROP INDEX IF EXISTS ix_materiales_historial_desc_trgm;
+
+COMMIT;
@@ -8,16 +8,20 @@ from core.permissions import require_module_access
 from core.config import settings
 from .service import AdminService, get_admin_service
 import asyncpg
+import logging
 
 from . import endpoints_correos_notif
 from .schemas import ConfiguracionGlobalUpdate, TecnologiaCreate
 from core.config_service import ConfigService
+from modules.comercial.services import SLARecalculoService, get_sla_recalculo_service
 
 router = APIRouter(
     prefix="/admin",
     tags=["Admin"]
 )
 
+logger = logging.getLogger("AdminRouter")
+
 templates = Jinja2Templates(directory="templates")
 templates.env.globals["DEBUG_MODE"] = settings.DEBUG_MODE
 
@@ -232,6 +236,7 @@ async def update_global_config_endpoint(
     # Comercial Config
     comercial_popup_targets: str = Form(""),
     service: AdminService = Depends(get_admin_service),
+    sla_service: SLARecalculoService = Depends(get_sla_recalculo_service),
     conn = Depends(get_db_connection),
     context = Depends(get_current_user_context),
     _ = require_module_access("admin")
@@ -293,12 +298,23 @@ async def update_global_config_endpoint(
     
     # 2. Guardar en base de datos
     await service.update_global_config(conn, datos)
-    
-    # 3. Retornar mensaje de éxito
+
+    # 3. Recalcular deadlines de oportunidades abiertas con las reglas nuevas
+    try:
+        actualizadas = await sla_service.recalcular_abiertas(conn)
+    except Exception as e:
+        logger.error(f"Error recalculando deadlines SLA: {e}", exc_info=True)
+        return templates.TemplateResponse("admin/partials/messages/error.html", {
+            "request": request,
+            "title": "Configuración guardada con advertencia",
+            "message": "La configuración se guardó, pero no se pudieron recalcular los deadlines de las oportunidades abiertas."
+        }, status_code=500)
+
+    # 4. Retornar mensaje de éxito
     return templates.TemplateResponse("admin/partials/messages/success.html", {
         "request": request,
         "title": "Configuración Actualizada",
-        "message": f"Reglas de negocio y parámetros de SharePoint actualizados correctamente."
+        "message": f"Reglas de negocio y parámetros de SharePoint actualizados correctamente. Deadlines recalculados: {actualizadas} oportunidades abiertas."
     })
 
 @router.post("/config/global/reset-simulation")
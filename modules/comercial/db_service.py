@@ -1,6 +1,8 @@
 
 # SQL Queries for Commercial Module
 
+from core.query_builder import Filtro, FiltroSQL
+
 QUERY_GET_OPORTUNIDADES_LIST = """
     SELECT
         o.id_oportunidad, o.op_id_estandar, o.nombre_proyecto, o.cliente_nombre, o.canal_venta,
@@ -29,15 +31,74 @@ QUERY_GET_OPORTUNIDADES_LIST = """
     WHERE o.email_enviado = true
 """
 
+# Filtros globales de la lista y del dashboard (forma canónica, ver core/query_builder.py)
+FILTROS_OPORTUNIDADES = FiltroSQL(
+    Filtro('filtro_usuario_id', 'o.creado_por_id = {p}'),
+    Filtro('filtro_tipo_id', 'o.id_tipo_solicitud = {p}'),
+    Filtro('filtro_estatus_id', 'o.id_estatus_global = {p}'),
+    Filtro('filtro_tecnologia_id', 'o.id_tecnologia = {p}'),
+    Filtro('filtro_fecha_inicio', "(o.fecha_solicitud AT TIME ZONE 'America/Mexico_City')::date >= {p}::date"),
+    Filtro('filtro_fecha_fin', "(o.fecha_solicitud AT TIME ZONE 'America/Mexico_City') < ({p}::date + INTERVAL '1 day')"),
+)
+
+# Cambio de estatus: se registra en el historial y se mantiene tb_intervalos_estatus
+# (cierra el intervalo abierto de la oportunidad y abre el del nuevo estatus).
+# Son dos sentencias en la misma transaccion (ver insertar_historial_estatus): los
+# CTEs que modifican datos no tienen orden garantizado y el indice unico parcial
+# (migrations/012) exige que el cierre ocurra antes de abrir el nuevo intervalo.
+# Un cambio con fecha anterior (o fuera de orden) cierra igual el intervalo abierto,
+# con duracion cero, y el nuevo empieza donde termino el anterior.
 QUERY_INSERT_HISTORIAL_ESTATUS = """
-    INSERT INTO tb_historial_estatus (
-        id_oportunidad, id_estatus_anterior, id_estatus_nuevo, 
-        fecha_cambio_real, fecha_cambio_sla, cambiado_por_id
+    WITH historial AS (
+        INSERT INTO tb_historial_estatus (
+            id_oportunidad, id_estatus_anterior, id_estatus_nuevo, 
+            fecha_cambio_real, fecha_cambio_sla, cambiado_por_id
+        ) VALUES (
+            $1, $2, $3, $4, $5, $6
+        )
+        RETURNING id_oportunidad, fecha_cambio_sla
+    ),
+    cierre AS (
+        UPDATE tb_intervalos_estatus i
+        SET exited_at = GREATEST(i.entered_at, h.fecha_cambio_sla)
+        FROM historial h
+        WHERE i.id_oportunidad = h.id_oportunidad
+          AND i.exited_at IS NULL
+        RETURNING i.exited_at
+    )
+    SELECT MAX(exited_at) FROM cierre
+"""
+
+QUERY_ABRIR_INTERVALO_ESTATUS = """
+    INSERT INTO tb_intervalos_estatus (
+        id_oportunidad, id_estatus, id_estatus_origen, entered_at
     ) VALUES (
-        $1, $2, $3, $4, $5, $6
+        $1, $2, $3, GREATEST($4::timestamptz, $5::timestamptz)
     )
 """
 
+
+async def insertar_historial_estatus(
+    conn, id_oportunidad, id_estatus_anterior, id_estatus_nuevo,
+    fecha_cambio_real, fecha_cambio_sla, cambiado_por_id
+) -> None:
+    """
+    Registra un cambio de estatus: historial + cierre del intervalo abierto y,
+    despues, apertura del intervalo del nuevo estatus (misma transaccion).
+    """
+    async with conn.transaction():
+        cierre_anterior = await conn.fetchval(
+            QUERY_INSERT_HISTORIAL_ESTATUS,
+            id_oportunidad, id_estatus_anterior, id_estatus_nuevo,
+            fecha_cambio_real, fecha_cambio_sla, cambiado_por_id
+        )
+        # GREATEST ignora NULL: sin intervalo previo empieza en fecha_cambio_sla
+        await conn.execute(
+            QUERY_ABRIR_INTERVALO_ESTATUS,
+            id_oportunidad, id_estatus_nuevo, id_estatus_anterior,
+            fecha_cambio_sla, cierre_anterior
+        )
+
 QUERY_GET_OPORTUNIDAD_OWNER = "SELECT creado_por_id FROM tb_oportunidades WHERE id_oportunidad = $1"
 QUERY_GET_OPORTUNIDAD_FROM_SITIO = "SELECT id_oportunidad FROM tb_sitios_oportunidad WHERE id_sitio = $1"
 
@@ -158,6 +219,11 @@ QUERY_INSERT_SITIO_BULK = """
     )
     VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
 """
+# Mismas columnas que QUERY_INSERT_SITIO_BULK, para copy_records_to_table
+COLUMNS_COPY_SITIOS = [
+    'id_sitio', 'id_oportunidad', 'nombre_sitio', 'direccion', 'tipo_tarifa',
+    'google_maps_link', 'numero_servicio', 'comentarios', 'id_estatus_global', 'id_tipo_solicitud'
+]
 QUERY_DELETE_SITIO = "DELETE FROM tb_sitios_oportunidad WHERE id_sitio = $1"
 QUERY_GET_SITIOS_SIMPLE = "SELECT * FROM tb_sitios_oportunidad WHERE id_oportunidad = $1 ORDER BY id_sitio"
 
@@ -181,13 +247,6 @@ QUERY_DELETE_LEVANTAMIENTOS = "DELETE FROM tb_levantamientos WHERE id_oportunida
 QUERY_DELETE_BESS = "DELETE FROM tb_detalles_bess WHERE id_oportunidad = $1"
 
 # Clients
-QUERY_SEARCH_CLIENTES = """
-    SELECT id, nombre_fiscal
-    FROM tb_clientes
-    WHERE nombre_fiscal ILIKE $1
-    ORDER BY nombre_fiscal
-    LIMIT 10
-"""
 QUERY_GET_CLIENTE_BY_ID = "SELECT nombre_fiscal, id_interno_simulacion FROM tb_clientes WHERE id = $1"
 QUERY_GET_OLDEST_OP_BY_CLIENTE = "SELECT op_id_estandar FROM tb_oportunidades WHERE cliente_id = $1 ORDER BY fecha_solicitud ASC LIMIT 1"
 QUERY_UPDATE_CLIENTE_ID_INTERNO = "UPDATE tb_clientes SET id_interno_simulacion = $1 WHERE id = $2"
@@ -223,3 +282,24 @@ QUERY_UPDATE_SITIOS_ESTATUS_ALL = """
     UPDATE tb_sitios_oportunidad SET id_estatus_global = $1
     WHERE id_oportunidad = $2
 """
+
+# SLA: calendario y recalculo masivo de deadlines
+QUERY_GET_DIAS_FESTIVOS = "SELECT fecha FROM tb_dias_festivos ORDER BY fecha"
+QUERY_GET_OPORTUNIDADES_ABIERTAS_SLA = """
+    SELECT o.id_oportunidad, o.fecha_solicitud
+    FROM tb_oportunidades o
+    JOIN tb_cat_estatus_global e ON o.id_estatus_global = e.id
+    WHERE o.deadline_calculado IS NOT NULL
+      AND o.fecha_solicitud IS NOT NULL
+      AND LOWER(e.nombre) <> ALL($1::text[])
+"""
+# Un solo UPDATE para todo el lote; solo escribe filas cuyo valor cambia
+QUERY_UPDATE_SLA_BULK = """
+    UPDATE tb_oportunidades o
+    SET deadline_calculado = u.deadline,
+        es_fuera_horario = u.fuera
+    FROM unnest($1::uuid[], $2::timestamptz[], $3::bool[]) AS u(id, deadline, fuera)
+    WHERE o.id_oportunidad = u.id
+      AND (o.deadline_calculado IS DISTINCT FROM u.deadline
+           OR o.es_fuera_horario IS DISTINCT FROM u.fuera)
+"""
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Form, UploadFile, File, status, Response
 from fastapi.templating import Jinja2Templates
-from datetime import date
+from datetime import date, datetime
 from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
 from uuid import UUID, uuid4
 from typing import Optional, List
@@ -16,6 +16,8 @@ from core.database import get_db_connection
 from core.microsoft import get_ms_auth
 from core.security import get_current_user_context, get_valid_graph_token
 from core.permissions import require_module_access, require_manager_access
+from core.pagination import next_page_url, SCROLL_PAGE_SIZE
+from core.csv_export import csv_streaming_response
 from core.config import settings
 from .schemas import OportunidadCreateCompleta, DetalleBessCreate
 from .service import ComercialService, get_comercial_service
@@ -186,12 +188,16 @@ async def get_cards_partial(
     filtro_tecnologia_id: Optional[str] = None,
     filtro_fecha_inicio: Optional[str] = None,
     filtro_fecha_fin: Optional[str] = None,
+    cursor: Optional[str] = None,
     service: ComercialService = Depends(get_comercial_service),
     conn = Depends(get_db_connection),
     user_context: dict = Depends(get_current_user_context),
     _ = require_module_access("comercial")
 ):
-    """Partial: List of Opportunities (Cards/Grid)."""
+    """
+    Partial: List of Opportunities (Cards/Grid).
+    Con `cursor` devuelve solo las filas de la siguiente página (scroll infinito).
+    """
     f_user = _safe_uuid(filtro_usuario_id)
     f_tipo = _safe_int(filtro_tipo_id)
     f_estatus = _safe_int(filtro_estatus_id)
@@ -206,19 +212,23 @@ async def get_cards_partial(
         user_context['user_db_id']
     )
     
+    # "Mostrar Todo" (limit=0) también pagina; el resto llega por scroll
+    page_size = limit if limit > 0 else SCROLL_PAGE_SIZE
+    
     items = await service.get_oportunidades_list(
         conn, 
         user_context=user_context, 
         tab=tab, 
         q=q, 
-        limit=limit, 
+        limit=page_size, 
         subtab=subtab,
         filtro_usuario_id=f_user,
         filtro_tipo_id=f_tipo,
         filtro_estatus_id=f_estatus,
         filtro_tecnologia_id=f_tecnologia,
         filtro_fecha_inicio=f_inicio,
-        filtro_fecha_fin=f_fin
+        filtro_fecha_fin=f_fin,
+        cursor=cursor
     )
 
     # Inject persistent multisite flag
@@ -228,8 +238,9 @@ async def get_cards_partial(
         d['es_multisitio'] = ComercialService.is_originally_multisite(d)
         ops_processed.append(d)
     
+    template = "comercial/partials/cards_rows.html" if cursor else "comercial/partials/cards.html"
     return templates.TemplateResponse(
-        "comercial/partials/cards.html", 
+        template, 
         {
             "request": request, 
             "oportunidades": ops_processed,
@@ -237,10 +248,45 @@ async def get_cards_partial(
             "current_tab": tab,
             "subtab": subtab,
             "q": q,
-            "limit": limit
+            "limit": limit,
+            "cursor": cursor,
+            "next_url": next_page_url(request, items, page_size, "fecha_solicitud", "id_oportunidad")
         }
     )
 
+@router.get("/export-csv")
+async def export_oportunidades_csv(
+    tab: str = "activos",
+    q: Optional[str] = None,
+    subtab: Optional[str] = None,
+    filtro_usuario_id: Optional[str] = None,
+    filtro_tipo_id: Optional[str] = None,
+    filtro_estatus_id: Optional[str] = None,
+    filtro_tecnologia_id: Optional[str] = None,
+    filtro_fecha_inicio: Optional[str] = None,
+    filtro_fecha_fin: Optional[str] = None,
+    service: ComercialService = Depends(get_comercial_service),
+    conn = Depends(get_db_connection),
+    user_context: dict = Depends(get_current_user_context),
+    _ = require_module_access("comercial")
+):
+    """Exporta la lista de oportunidades (mismos filtros que las cards) a CSV en streaming."""
+    chunks = await service.export_oportunidades_csv(
+        conn,
+        user_context,
+        tab=tab,
+        q=q,
+        subtab=subtab,
+        filtro_usuario_id=_safe_uuid(filtro_usuario_id),
+        filtro_tipo_id=_safe_int(filtro_tipo_id),
+        filtro_estatus_id=_safe_int(filtro_estatus_id),
+        filtro_tecnologia_id=_safe_int(filtro_tecnologia_id),
+        filtro_fecha_inicio=filtro_fecha_inicio if filtro_fecha_inicio and filtro_fecha_inicio.strip() else None,
+        filtro_fecha_fin=filtro_fecha_fin if filtro_fecha_fin and filtro_fecha_fin.strip() else None,
+    )
+    filename = f"oportunidades_{tab}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return csv_streaming_response(filename, chunks)
+
 @router.get("/partials/sitios/{id_oportunidad}", include_in_schema=False)
 async def get_sitios_partial(
     request: Request,
@@ -406,11 +452,14 @@ async def search_clientes(
     user_context: dict = Depends(get_current_user_context),
     _ = require_module_access("comercial")
 ):
-    """API para búsqueda inteligente de clientes."""
+    """API para búsqueda inteligente de clientes (autocompletado)."""
     if not q:
         return []
     
-    results = await service.buscar_clientes(conn, q)
+    results = await service.buscar_clientes(conn, q, session_key=str(user_context.get("user_db_id")))
+    if results is None:
+        # Superada por una búsqueda más reciente de la misma sesión
+        return Response(status_code=204)
     return JSONResponse(results)
 
 
@@ -817,7 +866,8 @@ async def upload_preview_endpoint(
             "columns": result["columns"],
             "preview_rows": result["preview_rows"],
             "total_rows": result["total_rows"],
-            "json_data": result["json_data"],
+            "invalid_rows": result["invalid_rows"],
+            "upload_token": result["upload_token"],
             "op_id": id_oportunidad,
             "extraordinaria": extraordinaria
         })
@@ -831,7 +881,7 @@ async def upload_preview_endpoint(
 @router.post("/upload-confirm", response_class=HTMLResponse)
 async def upload_confirm_endpoint(
     request: Request,
-    sitios_json: str = Form(...),
+    upload_token: str = Form(...),
     op_id: str = Form(...),
     extraordinaria: int = Form(0),
     service: ComercialService = Depends(get_comercial_service),
@@ -842,7 +892,7 @@ async def upload_confirm_endpoint(
     try:
         uuid_op = UUID(op_id)
         
-        count = await service.confirm_site_upload(conn, uuid_op, sitios_json, user_context)
+        count = await service.confirm_site_upload(conn, uuid_op, upload_token, user_context)
         
         if extraordinaria == 1:
             return templates.TemplateResponse("comercial/partials/messages/success_redirect.html", {
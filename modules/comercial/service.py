@@ -11,10 +11,12 @@ import io
 from openpyxl import load_workbook
 from .schemas import SitioImportacion, DetalleBessCreate
 from .constants import STATUS_PENDIENTE, DEFAULT_STATUS_ID_PENDIENTE
+from .sla_calculator import HORA_CORTE_DEFAULT
 import asyncio
 from core.config_service import ConfigService
 from .db_service import (
     QUERY_GET_OPORTUNIDADES_LIST,
+    FILTROS_OPORTUNIDADES,
     QUERY_INSERT_OPORTUNIDAD,
     QUERY_INSERT_FOLLOWUP,
     QUERY_CLONE_SITIOS,
@@ -39,6 +41,7 @@ from .db_service import (
     QUERY_GET_TIPO_SOLICITUD_FROM_OP,
     QUERY_DELETE_SITIOS_OP,
     QUERY_INSERT_SITIO_BULK,
+    COLUMNS_COPY_SITIOS,
     QUERY_DELETE_SITIO,
     QUERY_GET_SITIOS_SIMPLE,
     QUERY_INSERT_SITIO_UNICO,
@@ -50,7 +53,6 @@ from .db_service import (
     QUERY_DELETE_DOCS,
     QUERY_DELETE_LEVANTAMIENTOS,
     QUERY_DELETE_BESS,
-    QUERY_SEARCH_CLIENTES,
     # Fase 5: queries extraídas de inline
     QUERY_GET_CLIENTE_BY_ID,
     QUERY_GET_OLDEST_OP_BY_CLIENTE,
@@ -70,16 +72,17 @@ from .db_service import (
 )
 
 # Shared Services
-from modules.shared.services import IdGeneratorService, ClientService, BessService
+from modules.shared.services import IdGeneratorService, ClientService, BessService, get_client_autocomplete
 
 # Sub-Services
-from .services import DashboardService, NotificationService
-from .sla_calculator import SLACalculator
+from .services import DashboardService, NotificationService, SiteUploadStaging, SLARecalculoService
 from core.config_service import ConfigService
 import logging
 
 logger = logging.getLogger("ComercialModule")
 from core.permissions import user_has_module_access
+from core.pagination import decode_cursor
+from core.search import prepare_search_term, search_match, search_rank
 
 logger = logging.getLogger("ComercialModule")
 
@@ -87,16 +90,54 @@ logger = logging.getLogger("ComercialModule")
 # Constante para evitar magic strings
 EVENTO_EXTRAORDINARIA = "EXTRAORDINARIA"
 
+# Columnas del CSV de oportunidades (export_oportunidades_csv)
+EXPORT_OPORTUNIDADES_HEADERS = [
+    "OP-ID", "Título", "Proyecto", "Cliente", "Tipo Solicitud", "Estatus",
+    "Fecha Solicitud", "Deadline", "Solicitado Por", "Responsable Simulación",
+    "Prioridad", "Sitios", "Canal Venta", "Estatus Levantamiento",
+]
+
+
+def _fecha_export(value) -> str:
+    if isinstance(value, datetime):
+        return value.astimezone(ZoneInfo("America/Mexico_City")).strftime("%d/%m/%Y %H:%M")
+    return value.strftime("%d/%m/%Y") if value else ''
+
+
+def _export_oportunidad_row(op) -> list:
+    """Fila del CSV a partir de un registro de QUERY_GET_OPORTUNIDADES_LIST."""
+    return [
+        op['op_id_estandar'],
+        op['titulo_proyecto'],
+        op['nombre_proyecto'],
+        op['cliente_nombre'],
+        op['tipo_solicitud'],
+        op['status_global'],
+        _fecha_export(op['fecha_solicitud']),
+        _fecha_export(op['deadline_negociado'] or op['deadline_calculado']),
+        op['solicitado_por'],
+        op['responsable_simulacion'],
+        op['prioridad'],
+        op['cantidad_sitios'],
+        op['canal_venta'],
+        op['status_levantamiento'],
+    ]
+
+
 class ComercialService:
     """Encapsula la lógica de negocio del módulo Comercial."""
 
     def __init__(
         self,
         dashboard_service: Optional[DashboardService] = None,
-        notification_service: Optional[NotificationService] = None
+        notification_service: Optional[NotificationService] = None,
+        upload_staging: Optional[SiteUploadStaging] = None,
+        sla_service: Optional[SLARecalculoService] = None
     ):
         self.dashboard_service = dashboard_service or DashboardService()
         self.notification_service = notification_service or NotificationService()
+        self.upload_staging = upload_staging or SiteUploadStaging()
+        self.sla_service = sla_service or SLARecalculoService()
         
         # Shared Helpers
         # (Static methods don't need instantiation but we use them directly)
@@ -250,7 +291,7 @@ class ComercialService:
     async def get_configuracion_global(self, conn):
         """Obtiene la configuración de horarios desde la BD (usando cache)."""
         # Obtenemos valores individuales cacheados
-        hora_corte = await ConfigService.get_global_config(conn, "HORA_CORTE_L_V", "18:00")
+        hora_corte = await ConfigService.get_global_config(conn, "HORA_CORTE_L_V", HORA_CORTE_DEFAULT)
         return {"HORA_CORTE_L_V": hora_corte}
 
 
@@ -273,22 +314,29 @@ class ComercialService:
 
     async def calcular_fuera_de_horario(self, conn, fecha_creacion: datetime) -> bool:
         """
-        Valida si la fecha dada cae fuera del horario laboral configurado.
-        Delegación: SLACalculator.
+        Valida si la fecha dada cae fuera del horario laboral configurado
+        (hora de corte, fin de semana y días festivos).
+        Delegación: SLARecalculoService (mismo motor que el recálculo masivo).
         """
-        config = await self.get_configuracion_global(conn)
-        hora_corte, dias_fin_semana, _ = SLACalculator.parse_config(config)
-        return SLACalculator.is_out_of_hours(fecha_creacion, hora_corte, dias_fin_semana)
+        _, es_fuera_horario = await self.sla_service.calcular(conn, fecha_creacion)
+        return es_fuera_horario
 
     async def calcular_deadline_inicial(self, conn, fecha_creacion: datetime) -> datetime:
         """
-        Calcula el deadline inicial (Meta).
-        Delegación: SLACalculator.
+        Calcula el deadline inicial (Meta) con DIAS_SLA_DEFAULT, fin de semana
+        y días festivos configurados.
+        Delegación: SLARecalculoService (mismo motor que el recálculo masivo).
         """
-        config = await self.get_configuracion_global(conn)
-        hora_corte, _, dias_sla = SLACalculator.parse_config(config)
-        
-        return SLACalculator.calculate_deadline(fecha_creacion, hora_corte, dias_sla)
+        deadline, _ = await self.sla_service.calcular(conn, fecha_creacion)
+        return deadline
+
+    async def calcular_inicio_sla(self, conn, fecha_cambio: datetime) -> datetime:
+        """
+        Fecha de inicio de SLA (fecha_cambio_sla) de un cambio de estatus, con
+        el mismo calendario (fin de semana y días festivos) que el deadline.
+        Delegación: SLARecalculoService.
+        """
+        return await self.sla_service.calcular_inicio(conn, fecha_cambio)
 
     async def get_catalogos_ui(self, conn) -> dict:
         """Recupera los catálogos para llenar los <select> del formulario y filtros."""
@@ -602,20 +650,12 @@ class ComercialService:
             await BessService.create_bess_details(conn, new_id, datos.detalles_bess)
 
         # 6. Insertar Historial Estatus Inicial (Reemplazo de Trigger)
-        # Calculamos la fecha SLA usando la misma lógica que el deadline inicial pero con offset 0
-        # O simplemente usamos el deadline inicial si asumimos que el primer paso consume tiempo?
-        # NO, fecha_cambio_sla es la FECHA DE INICIO del estatus ajustada a horario laboral.
-        # Es decir, si se crea sábado, cuenta desde lunes.
+        # fecha_cambio_sla es la FECHA DE INICIO del estatus ajustada a horario laboral.
+        # Es decir, si se crea sábado (o en día festivo), cuenta desde el siguiente día hábil.
+        fecha_inicio_sla = await self.calcular_inicio_sla(conn, fecha_solicitud)
         
-        config = await self.get_configuracion_global(conn)
-        hora_corte, dias_fin_semana, _ = SLACalculator.parse_config(config)
-        
-        # Ajustar fecha de inicio si es fuera de horario (Lógica SLACalculator.adjust_start_date interna o similar)
-        # Dado que calculate_deadline hace "start + dias", si usamos dias=0 obtenemos el start ajustado.
-        fecha_inicio_sla = SLACalculator.calculate_deadline(fecha_solicitud, hora_corte, 0)
-        
-        from .db_service import QUERY_INSERT_HISTORIAL_ESTATUS
-        await conn.execute(QUERY_INSERT_HISTORIAL_ESTATUS,
+        from .db_service import insertar_historial_estatus
+        await insertar_historial_estatus(conn,
             new_id,             # $1 id_oportunidad
             None,               # $2 id_estatus_anterior (NULL al inicio)
             id_status_inicial,  # $3 id_estatus_nuevo
@@ -686,9 +726,50 @@ class ComercialService:
         filtro_estatus_id: Optional[int] = None,
         filtro_tecnologia_id: Optional[int] = None,
         filtro_fecha_inicio: Optional[str] = None, # YYYY-MM-DD
-        filtro_fecha_fin: Optional[str] = None     # YYYY-MM-DD
+        filtro_fecha_fin: Optional[str] = None,    # YYYY-MM-DD
+        cursor: Optional[str] = None               # Keyset (core.pagination)
     ) -> List[dict]:
-        """Recupera lista filtrada de oportunidades con permisos y paginación."""
+        """
+        Recupera lista filtrada de oportunidades con permisos y paginación.
+
+        Paginación por cursor sobre (fecha_solicitud, id_oportunidad): con
+        `cursor` se devuelven las `limit` filas siguientes a ese registro.
+        """
+        query, params = await self.build_oportunidades_query(
+            conn, user_context, tab=tab, q=q, limit=limit, subtab=subtab,
+            filtro_usuario_id=filtro_usuario_id,
+            filtro_tipo_id=filtro_tipo_id,
+            filtro_estatus_id=filtro_estatus_id,
+            filtro_tecnologia_id=filtro_tecnologia_id,
+            filtro_fecha_inicio=filtro_fecha_inicio,
+            filtro_fecha_fin=filtro_fecha_fin,
+            cursor=cursor
+        )
+        rows = await conn.fetch(query, *params)
+        
+        logger.debug(f"Retornando {len(rows)} oportunidades")
+        return [dict(row) for row in rows]
+
+    async def build_oportunidades_query(
+        self,
+        conn,
+        user_context: dict,
+        tab: str = "activos",
+        q: str = None,
+        limit: int = 15,
+        subtab: str = None,
+        filtro_usuario_id: Optional[UUID] = None,
+        filtro_tipo_id: Optional[int] = None,
+        filtro_estatus_id: Optional[int] = None,
+        filtro_tecnologia_id: Optional[int] = None,
+        filtro_fecha_inicio: Optional[str] = None,
+        filtro_fecha_fin: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[str, list]:
+        """
+        Arma la query (SQL, params) de la lista de oportunidades con los
+        mismos filtros y permisos de la UI. limit=0 = sin límite (exportación).
+        """
         user_id = user_context.get("user_db_id")  # CORREGIDO: era "user_id"
         role = user_context.get("role", "USER")
         
@@ -714,42 +795,17 @@ class ComercialService:
 
 
 
-        query = QUERY_GET_OPORTUNIDADES_LIST
-        
-        params = []
-        param_idx = 1
-
         # --- Lógica de Filtros Globales ---
-        if filtro_usuario_id:
-            query += f" AND o.creado_por_id = ${param_idx}"
-            params.append(filtro_usuario_id)
-            param_idx += 1
-            
-        if filtro_tipo_id:
-            query += f" AND o.id_tipo_solicitud = ${param_idx}"
-            params.append(filtro_tipo_id)
-            param_idx += 1
-            
-        if filtro_estatus_id:
-            query += f" AND o.id_estatus_global = ${param_idx}"
-            params.append(filtro_estatus_id)
-            param_idx += 1
-            
-        if filtro_tecnologia_id:
-            query += f" AND o.id_tecnologia = ${param_idx}"
-            params.append(filtro_tecnologia_id)
-            param_idx += 1
-            
-        if filtro_fecha_inicio:
-            query += f" AND (o.fecha_solicitud AT TIME ZONE 'America/Mexico_City')::date >= ${param_idx}::date"
-            params.append(filtro_fecha_inicio)
-            param_idx += 1
-            
-        if filtro_fecha_fin:
-            # +1 day para incluir todo el día final si es timestamp, o cast a date
-            query += f" AND (o.fecha_solicitud AT TIME ZONE 'America/Mexico_City') < (${param_idx}::date + INTERVAL '1 day')"
-            params.append(filtro_fecha_fin)
-            param_idx += 1
+        filtros_sql, params = FILTROS_OPORTUNIDADES.bind({
+            'filtro_usuario_id': filtro_usuario_id,
+            'filtro_tipo_id': filtro_tipo_id,
+            'filtro_estatus_id': filtro_estatus_id,
+            'filtro_tecnologia_id': filtro_tecnologia_id,
+            'filtro_fecha_inicio': filtro_fecha_inicio,
+            'filtro_fecha_fin': filtro_fecha_fin,
+        })
+        query = QUERY_GET_OPORTUNIDADES_LIST + filtros_sql
+        param_idx = len(params) + 1
 
         # Filtro por tab (Usa IDs)
         if tab == "historial": # Renombrado en UI a "Solicitudes (Entregadas)"
@@ -769,10 +825,9 @@ class ComercialService:
                 ]
                 ids_fallidos = [i for i in ids_fallidos if i is not None]
                 if ids_fallidos:
-                    placeholders = ','.join([f'${i}' for i in range(param_idx, param_idx + len(ids_fallidos))])
-                    query += f" AND o.id_estatus_global IN ({placeholders})"
-                    params.extend(ids_fallidos)
-                    param_idx += len(ids_fallidos)
+                    query += f" AND o.id_estatus_global = ANY(${param_idx}::int[])"
+                    params.append(ids_fallidos)
+                    param_idx += 1
                 
         elif tab == "levantamientos":
             # Buscar ID del tipo "levantamiento"
@@ -787,18 +842,16 @@ class ComercialService:
                 # Realizados: Completado (11), Entregado (12)
                 # Se filtra por el estatus del LEVANTAMIENTO (lev.id_estatus_global)
                 ids_realizados = [11, 12]
-                placeholders = ','.join([f'${param_idx + i}' for i in range(len(ids_realizados))])
-                query += f" AND lev.id_estatus_global IN ({placeholders})"
-                params.extend(ids_realizados)
-                param_idx += len(ids_realizados)
+                query += f" AND lev.id_estatus_global = ANY(${param_idx}::int[])"
+                params.append(ids_realizados)
+                param_idx += 1
 
             else:
                 # Solicitados (Default): Pendiente (8), Agendado (9), En Proceso (10), Pospuesto (13)
                 ids_solicitados = [8, 9, 10, 13]
-                placeholders = ','.join([f'${param_idx + i}' for i in range(len(ids_solicitados))])
-                query += f" AND lev.id_estatus_global IN ({placeholders})"
-                params.extend(ids_solicitados)
-                param_idx += len(ids_solicitados)
+                query += f" AND lev.id_estatus_global = ANY(${param_idx}::int[])"
+                params.append(ids_solicitados)
+                param_idx += 1
                     
         elif tab == "ganadas":
             id_ganada = cats['estatus'].get('ganada')
@@ -826,10 +879,9 @@ class ComercialService:
             #    Dejaremos que SQL filtre: (Global=X) AND (TabLimit IN (X,Y,Z)). Si X no está en TabLimit, retorna 0. Correcto.
             
             if ids_activos:
-                placeholders = ','.join([f'${i}' for i in range(param_idx, param_idx + len(ids_activos))])
-                query += f" AND o.id_estatus_global IN ({placeholders})"
-                params.extend(ids_activos)
-                param_idx += len(ids_activos)
+                query += f" AND o.id_estatus_global = ANY(${param_idx}::int[])"
+                params.append(ids_activos)
+                param_idx += 1
                 
             # Excluir levantamientos de activos
             id_levantamiento = cats['tipos'].get('levantamiento')
@@ -838,10 +890,12 @@ class ComercialService:
                 params.append(id_levantamiento)
                 param_idx += 1
 
-        # Búsqueda
-        if q:
-            query += f" AND (o.titulo_proyecto ILIKE ${param_idx} OR o.nombre_proyecto ILIKE ${param_idx} OR o.cliente_nombre ILIKE ${param_idx})"
-            params.append(f"%{q}%")
+        # Búsqueda (documento sin acentos con índice trigram, ver core/search.py)
+        search_term = prepare_search_term(q)
+        search_param = f"${param_idx}"
+        if search_term:
+            query += f" AND {search_match('o.search_doc', search_param)}"
+            params.append(search_term)
             param_idx += 1
 
         # Filtro de seguridad (solo ADMIN, MANAGER ven todo)
@@ -852,15 +906,47 @@ class ComercialService:
             params.append(user_id)
             param_idx += 1
 
-        query += " ORDER BY o.fecha_solicitud DESC"
+        # Keyset: registros estrictamente anteriores al último de la página previa.
+        # Con búsqueda el orden es (relevancia, fecha, id); la relevancia del
+        # último registro se recalcula en SQL a partir de su id.
+        cursor_values = decode_cursor(cursor)
+        if cursor_values:
+            fecha_ph, id_ph = f"${param_idx}", f"${param_idx + 1}::uuid"
+            if search_term:
+                rank_cursor = (
+                    f"(SELECT {search_rank('c.search_doc', search_param)} "
+                    f"FROM tb_oportunidades c WHERE c.id_oportunidad = {id_ph})"
+                )
+                query += (
+                    f" AND ({search_rank('o.search_doc', search_param)}, o.fecha_solicitud, o.id_oportunidad)"
+                    f" < ({rank_cursor}, {fecha_ph}, {id_ph})"
+                )
+            else:
+                query += f" AND (o.fecha_solicitud, o.id_oportunidad) < ({fecha_ph}, {id_ph})"
+            params.extend(cursor_values)
+            param_idx += 2
+
+        if search_term:
+            query += f" ORDER BY {search_rank('o.search_doc', search_param)} DESC, o.fecha_solicitud DESC, o.id_oportunidad DESC"
+        else:
+            query += " ORDER BY o.fecha_solicitud DESC, o.id_oportunidad DESC"
         
         if limit > 0:
             query += f" LIMIT {limit}"
-        
-        rows = await conn.fetch(query, *params)
-        
-        logger.debug(f"Retornando {len(rows)} oportunidades")
-        return [dict(row) for row in rows]
+
+        return query, params
+
+    async def export_oportunidades_csv(self, conn, user_context: dict, **filtros):
+        """
+        CSV de la lista de oportunidades (mismos filtros/permisos que la UI),
+        como generador de bloques en streaming (ver core.csv_export).
+        """
+        from core.csv_export import stream_csv_rows
+
+        filtros.pop("limit", None)
+        filtros.pop("cursor", None)
+        query, params = await self.build_oportunidades_query(conn, user_context, limit=0, **filtros)
+        return stream_csv_rows(query, params, EXPORT_OPORTUNIDADES_HEADERS, _export_oportunidad_row)
 
 
     async def update_email_status(self, conn, id_oportunidad: UUID, user_context: dict):
@@ -1091,8 +1177,10 @@ class ComercialService:
 
     async def preview_site_upload(self, conn, file_contents: bytes, id_oportunidad: UUID, user_context: dict) -> dict:
         """
-        Procesa el Excel en memoria y valida estructura/cantidad.
-        Retorna dict con datos para previsualización o raises HTTPException.
+        Procesa el Excel, valida estructura/cantidad y deja las filas validadas
+        en staging server-side (ver SiteUploadStaging).
+        Retorna dict con datos para previsualización y el token de la carga,
+        o raises HTTPException.
         
         EJECUCIÓN: CPU-Bound. Se ejecuta en ThreadPoolExecutor para no bloquear el Event Loop.
         """
@@ -1108,41 +1196,57 @@ class ComercialService:
 
         # Función auxiliar para ejecutar en thread pool
         def _process_excel_sync(contents: bytes, expected_qty: int):
+            # read_only: lectura en streaming por filas, sin cargar estilos ni el árbol completo
+            wb = load_workbook(filename=io.BytesIO(contents), read_only=True, data_only=True)
             try:
-                # load_workbook es bloqueante
-                wb = load_workbook(filename=io.BytesIO(contents), data_only=True)
                 ws = wb.active
-                headers = [str(cell.value).strip().upper() for cell in ws[1] if cell.value]
+                rows_iter = ws.iter_rows(values_only=True)
+                first_row = next(rows_iter, None) or ()
+                headers = [str(value).strip().upper() for value in first_row if value]
                 
-                full_data_list = []
+                # Validaciones de Negocio (Sync)
+                cols_req = ["NOMBRE", "DIRECCION"]
+                missing = [c for c in cols_req if c not in headers]
+                if missing:
+                    raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+
                 preview_rows = []
+                staged_rows = []
+                invalid_rows = 0
                 
-                for row in ws.iter_rows(min_row=2, values_only=True):
+                for row in rows_iter:
                     row_data = dict(zip(headers, row))
                     if not any(row_data.values()): continue
                     
                     clean_data = {k: (v if v is not None else "") for k, v in row_data.items()}
                     preview_rows.append(list(clean_data.values()))
-                    full_data_list.append(clean_data)
-                
-                # Validaciones de Negocio (Sync)
-                cols_req = ["NOMBRE", "DIRECCION"]
-                missing = [c for c in cols_req if c not in headers]
-                if missing:
-                    raise ValueError(f"Faltan columnas: {', '.join(missing)}")
-
-                if len(full_data_list) != expected_qty:
-                    raise ValueError(f"Cantidad incorrecta. Esperados: {expected_qty}, Encontrados: {len(full_data_list)}")
+                    
+                    try:
+                        # Celdas no texto (fechas, números) se validan como texto
+                        sitio = SitioImportacion(**{
+                            k: v if isinstance(v, str) else str(v) for k, v in clean_data.items()
+                        })
+                    except Exception as e:
+                        logger.warning(f"Fila inválida en carga de sitios: {e}")
+                        invalid_rows += 1
+                        continue
+                    staged_rows.append([
+                        sitio.nombre_sitio, sitio.direccion, sitio.tipo_tarifa,
+                        sitio.google_maps_link, sitio.numero_servicio, sitio.comentarios
+                    ])
+
+                if len(preview_rows) != expected_qty:
+                    raise ValueError(f"Cantidad incorrecta. Esperados: {expected_qty}, Encontrados: {len(preview_rows)}")
 
                 return {
                     "columns": headers,
                     "preview_rows": preview_rows,
-                    "total_rows": len(full_data_list),
-                    "json_data": json.dumps(full_data_list, default=str)
+                    "total_rows": len(preview_rows),
+                    "invalid_rows": invalid_rows,
+                    "staged_rows": staged_rows
                 }
-            except Exception as e:
-                # Re-raise para que el thread capture
-                raise e
+            finally:
+                wb.close()
 
         # Ejecutar en Thread Pool
         try:
@@ -1153,7 +1257,6 @@ class ComercialService:
                 file_contents, 
                 expected_qty
             )
-            return result
         except ValueError as ve:
              # Errores de negocio conocidos
              raise HTTPException(status_code=400, detail=str(ve))
@@ -1163,25 +1266,18 @@ class ComercialService:
             # Errores inesperados de parsing
             raise HTTPException(status_code=400, detail=f"Error leyendo Excel: {str(e)}")
 
-    async def confirm_site_upload(self, conn, id_oportunidad: UUID, json_data: str, user_context: dict) -> int:
-        """Deserializa JSON, valida y realiza INSERT masivo ATÓMICO."""
+        result["upload_token"] = self.upload_staging.stage(
+            id_oportunidad, user_context.get("user_db_id"), result.pop("staged_rows")
+        )
+        return result
+
+    async def confirm_site_upload(self, conn, id_oportunidad: UUID, upload_token: str, user_context: dict) -> int:
+        """Recupera las filas validadas del staging y realiza la carga masiva ATÓMICA (COPY)."""
         await self.verify_ownership(conn, id_oportunidad, user_context)
-        try:
-            raw_data = json.loads(json_data)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="JSON corrupto")
 
-        records = []
-        for item in raw_data:
-            try:
-                sitio = SitioImportacion(**item)
-                records.append((
-                    uuid4(), id_oportunidad, sitio.nombre_sitio, sitio.direccion,
-                    sitio.tipo_tarifa, sitio.google_maps_link, sitio.numero_servicio, sitio.comentarios
-                ))
-            except Exception as e:
-                logger.warning(f"Saltando fila inválida: {e}")
-                continue
+        staged_rows = self.upload_staging.load(upload_token, id_oportunidad, user_context.get("user_db_id"))
+        if staged_rows is None:
+            raise HTTPException(status_code=400, detail="La carga expiró o no es válida. Vuelva a subir el archivo.")
 
         # Bloque Atómico: reads + writes en la misma transacción (fix race condition B12)
         async with conn.transaction():
@@ -1195,11 +1291,18 @@ class ComercialService:
             old_rows = await conn.fetch(QUERY_GET_SITIO_IDS_BY_OP, id_oportunidad)
             old_ids_list = [r['id_sitio'] for r in old_rows]
 
-            # 1. Insertar NUEVOS sitios
+            records = [
+                (uuid4(), id_oportunidad, *row, id_status_inicial, id_tipo_solicitud)
+                for row in staged_rows
+            ]
+
+            # 1. Insertar NUEVOS sitios (COPY: un solo round-trip para cualquier cantidad)
             if records:
-                q = QUERY_INSERT_SITIO_BULK
-                records_with_status_and_type = [r + (id_status_inicial, id_tipo_solicitud) for r in records]
-                await conn.executemany(q, records_with_status_and_type)
+                await conn.copy_records_to_table(
+                    'tb_sitios_oportunidad',
+                    records=records,
+                    columns=COLUMNS_COPY_SITIOS
+                )
 
             # 2. Desvincular/Re-vincular Levantamientos (FIX FK Constraint)
             if records:
@@ -1214,6 +1317,7 @@ class ComercialService:
             new_count = len(records)
             await conn.execute(QUERY_UPDATE_CANTIDAD_SITIOS, new_count, id_oportunidad)
 
+        self.upload_staging.discard(upload_token)
         return len(records)
 
     async def delete_sitio(self, conn, id_sitio: UUID, user_context: dict):
@@ -1282,24 +1386,17 @@ class ComercialService:
     async def enviar_notificacion_extraordinaria(self, conn, ms_auth, token: str, id_oportunidad: UUID, base_url: str, user_email: str):
         await self.notification_service.enviar_notificacion_extraordinaria(conn, ms_auth, token, id_oportunidad, base_url, user_email)
 
-    async def buscar_clientes(self, conn, query: str) -> List[dict]:
+    async def buscar_clientes(self, conn, query: str, session_key: Optional[str] = None) -> Optional[List[dict]]:
         """
-        Búsqueda inteligente de clientes por nombre fiscal.
+        Autocompletado de clientes por nombre fiscal (índice en memoria, sin query por tecla).
         Args:
-            conn: Conexión BD
-            query: Texto a buscar (case insensitive)
+            conn: Conexión BD (solo si el índice necesita cargarse)
+            query: Texto a buscar (case insensitive, prefijo por palabra)
+            session_key: Identificador de sesión para descartar búsquedas superadas
         Returns:
-            List[dict]: [{id, nombre_fiscal}, ...] lim 10
+            List[dict]: [{id, nombre_fiscal}, ...] lim 10, o None si la búsqueda fue superada
         """
-        if not query or len(query.strip()) < 2:
-            return []
-            
-        # Normalizar query para búsqueda ILIKE segura
-        search_term = f"%{query.strip()}%"
-        
-        rows = await conn.fetch(QUERY_SEARCH_CLIENTES, search_term)
-        
-        return [{"id": str(r["id"]), "nombre_fiscal": r["nombre_fiscal"]} for r in rows]
+        return await get_client_autocomplete().suggest(conn, query, session_key)
 
     def get_redirection_params(
         self,
@@ -1424,14 +1521,11 @@ class ComercialService:
             await conn.execute(QUERY_UPDATE_OP_ESTATUS, id_ganada, id_oportunidad)
             
             # Insertar Historial (Ganada)
-            # Reutilizamos lógica de SLACalculator
-            config = await self.get_configuracion_global(conn)
-            hora_corte, dias_fin_semana, _ = SLACalculator.parse_config(config)
             now_mx = await self.get_current_datetime_mx(conn)
-            fecha_inicio_sla = SLACalculator.calculate_deadline(now_mx, hora_corte, 0)
+            fecha_inicio_sla = await self.calcular_inicio_sla(conn, now_mx)
             
-            from .db_service import QUERY_INSERT_HISTORIAL_ESTATUS
-            await conn.execute(QUERY_INSERT_HISTORIAL_ESTATUS,
+            from .db_service import insertar_historial_estatus
+            await insertar_historial_estatus(conn,
                 id_oportunidad,
                 current_status, # Anterior (Entregado)
                 id_ganada,      # Nuevo
@@ -1,4 +1,6 @@
 from .dashboard_service import DashboardService
 from .notification_service import NotificationService
+from .upload_staging import SiteUploadStaging
+from .sla_recalculo import SLARecalculoService, get_sla_recalculo_service
 
-__all__ = ["DashboardService", "NotificationService"]
+__all__ = ["DashboardService", "NotificationService", "SiteUploadStaging", "SLARecalculoService", "get_sla_recalculo_service"]
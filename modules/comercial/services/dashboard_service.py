@@ -1,11 +1,12 @@
 import logging
-import io
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
-import pandas as pd
 from collections import defaultdict
 from core.permissions import user_has_module_access
+from core.excel_export import XlsxColumn, build_xlsx, MIME_XLSX
+from core.dashboard_stats import DashboardScan, cached_dashboard
+from ..db_service import FILTROS_OPORTUNIDADES
 
 logger = logging.getLogger("ComercialServices")
 
@@ -55,124 +56,97 @@ class DashboardService:
         conditions = ["o.email_enviado = true"] # Solo activas
         
         # Roles que pueden ver data de todos: ADMIN del módulo
-        if not user_has_module_access("comercial", user_context, "admin"):
+        es_admin = user_has_module_access("comercial", user_context, "admin")
+        if not es_admin:
             conditions.append(f"o.creado_por_id = ${len(params)+1}")
             params.append(user_id)
         
-        # --- Filtros Globales ---
-        if filtro_usuario_id:
-            conditions.append(f"o.creado_por_id = ${len(params)+1}")
-            params.append(filtro_usuario_id)
-            
-        if filtro_tipo_id:
-            conditions.append(f"o.id_tipo_solicitud = ${len(params)+1}")
-            params.append(filtro_tipo_id)
-            
-        if filtro_estatus_id:
-            conditions.append(f"o.id_estatus_global = ${len(params)+1}")
-            params.append(filtro_estatus_id)
-            
-        if filtro_tecnologia_id:
-            conditions.append(f"o.id_tecnologia = ${len(params)+1}")
-            params.append(filtro_tecnologia_id)
-            
-        if filtro_fecha_inicio:
-            conditions.append(f"(o.fecha_solicitud AT TIME ZONE 'America/Mexico_City')::date >= ${len(params)+1}::date")
-            params.append(filtro_fecha_inicio)
-            
-        if filtro_fecha_fin:
-            conditions.append(f"(o.fecha_solicitud AT TIME ZONE 'America/Mexico_City') < (${len(params)+1}::date + INTERVAL '1 day')")
-            params.append(filtro_fecha_fin)
-            
+        # --- Filtros Globales (forma canónica compartida con la lista) ---
+        conditions.extend(FILTROS_OPORTUNIDADES.condiciones(len(params)))
+        params.extend(FILTROS_OPORTUNIDADES.valores({
+            'filtro_usuario_id': filtro_usuario_id,
+            'filtro_tipo_id': filtro_tipo_id,
+            'filtro_estatus_id': filtro_estatus_id,
+            'filtro_tecnologia_id': filtro_tecnologia_id,
+            'filtro_fecha_inicio': filtro_fecha_inicio,
+            'filtro_fecha_fin': filtro_fecha_fin,
+        }))
+
         where_str = "WHERE " + " AND ".join(conditions)
-        
+
+        # Cache por filtros + alcance (admin ve todo; el resto solo lo suyo)
+        scope = "all" if es_admin else str(user_id)
+        cache_key = "|".join(["DASH_COMERCIAL", scope, where_str] + [str(v) for v in params])
+
+        return await cached_dashboard(
+            cache_key,
+            lambda: self._compute_dashboard_stats(conn, cats, where_str, params, es_admin)
+        )
+
+    async def _compute_dashboard_stats(self, conn, cats: dict, where_str: str, params: list, es_admin: bool) -> dict:
+        """KPIs y todas las gráficas en un solo escaneo (core.dashboard_stats)."""
+        fecha_local = "(o.fecha_solicitud AT TIME ZONE 'America/Mexico_City')"
+        hoy_local = "(NOW() AT TIME ZONE 'America/Mexico_City')::date"
+
+        scan = DashboardScan(
+            """tb_oportunidades o
+                LEFT JOIN tb_cat_tipos_solicitud t ON o.id_tipo_solicitud = t.id
+                LEFT JOIN tb_cat_tecnologias tec ON o.id_tecnologia = tec.id
+                LEFT JOIN tb_cat_estatus_global e ON o.id_estatus_global = e.id
+                LEFT JOIN tb_usuarios u ON o.creado_por_id = u.id_usuario""",
+            where_str,
+            params
+        )
+
         # KPIs
-        id_ganada = cats['estatus'].get('ganada')
-        id_perdido = cats['estatus'].get('perdido')
-        
-        idx_ganada = len(params) + 1
-        idx_perdido = len(params) + 2
-        
-        q_kpis = f"""
-            SELECT 
-                count(*) FILTER (WHERE t.codigo_interno != 'LEVANTAMIENTO') as total,
-                count(*) FILTER (WHERE t.codigo_interno = 'LEVANTAMIENTO') as levantamientos,
-                count(*) FILTER (WHERE o.id_estatus_global = ${idx_ganada}) as ganadas,
-                count(*) FILTER (WHERE o.id_estatus_global = ${idx_perdido}) as perdidas
-            FROM tb_oportunidades o
-            LEFT JOIN tb_cat_tipos_solicitud t ON o.id_tipo_solicitud = t.id
-            {where_str}
-        """
-        
-        # KPI Query
-        row_kpis = await conn.fetchrow(q_kpis, *params, id_ganada, id_perdido)
-        
-        # Stats dictionary init
+        idx_ganada = scan.param(cats['estatus'].get('ganada'))
+        idx_perdido = scan.param(cats['estatus'].get('perdido'))
+        scan.kpi("total", "t.codigo_interno != 'LEVANTAMIENTO'")
+        scan.kpi("levantamientos", "t.codigo_interno = 'LEVANTAMIENTO'")
+        scan.kpi("ganadas", f"o.id_estatus_global = {idx_ganada}")
+        scan.kpi("perdidas", f"o.id_estatus_global = {idx_perdido}")
+
+        # Series
+        scan.series("week", dia=f"""
+            CASE WHEN {fecha_local}::date >= DATE_TRUNC('week', {hoy_local})
+                  AND {fecha_local}::date < DATE_TRUNC('week', {hoy_local}) + INTERVAL '7 days'
+                 THEN EXTRACT(ISODOW FROM {fecha_local})::int END""")
+        scan.series(
+            "monthly",
+            mes_date=f"DATE_TRUNC('month', {fecha_local})",
+            mes=f"TO_CHAR({fecha_local}, 'Mon YY')",
+            vendedor="COALESCE(u.nombre, 'Sin asignar')"
+        )
+        scan.series("mix", tecnologia="tec.nombre")
+        scan.series("status", estatus="e.nombre")
+        scan.series("request_types", tipo="t.nombre")
+
+        result = await scan.fetch(conn)
+        series = result["series"]
+
         stats = {
-            "kpis": {
-                "total": row_kpis['total'],
-                "levantamientos": row_kpis['levantamientos'],
-                "ganadas": row_kpis['ganadas'],
-                "perdidas": row_kpis['perdidas']
-            },
+            "kpis": result["kpis"],
             "charts": {}
         }
 
         # --- Gráfica Semanal ---
-        q_week = f"""
-            WITH semana_actual AS (
-                SELECT 
-                    EXTRACT(ISODOW FROM (fecha_solicitud AT TIME ZONE 'America/Mexico_City'))::int as day_num,
-                    count(*) as count
-                FROM tb_oportunidades o
-                {where_str}
-                AND (fecha_solicitud AT TIME ZONE 'America/Mexico_City')::date 
-                    >= DATE_TRUNC('week', (NOW() AT TIME ZONE 'America/Mexico_City')::date)
-                AND (fecha_solicitud AT TIME ZONE 'America/Mexico_City')::date
-                    < DATE_TRUNC('week', (NOW() AT TIME ZONE 'America/Mexico_City')::date) + INTERVAL '7 days'
-                GROUP BY day_num
-            )
-            SELECT s.day_num, COALESCE(sa.count, 0) as count
-            FROM generate_series(1, 7) AS s(day_num)
-            LEFT JOIN semana_actual sa ON s.day_num = sa.day_num
-            ORDER BY s.day_num
-        """
-        rows_week = await conn.fetch(q_week, *params)
         day_map = {1: 'Lun', 2: 'Mar', 3: 'Mié', 4: 'Jue', 5: 'Vie', 6: 'Sáb', 7: 'Dom'}
+        por_dia = {r['dia']: r['count'] for r in series["week"]}
         stats["charts"]["week"] = {
-            "labels": [day_map[r['day_num']] for r in rows_week],
-            "data": [r['count'] for r in rows_week]
+            "labels": list(day_map.values()),
+            "data": [por_dia.get(d, 0) for d in day_map]
         }
 
         # --- Gráfica Mensual ---
-        condition_monthly = ""
-        # if not filtro_fecha_inicio and not filtro_fecha_fin:
-        #      condition_monthly = "AND fecha_solicitud >= NOW() - INTERVAL '6 months'"
-        
-        if user_has_module_access("comercial", user_context, "admin"):
-            q_monthly = f"""
-                SELECT 
-                    TO_CHAR((o.fecha_solicitud AT TIME ZONE 'America/Mexico_City'), 'Mon YY') as mes,
-                    DATE_TRUNC('month', (o.fecha_solicitud AT TIME ZONE 'America/Mexico_City')) as mes_date,
-                    COALESCE(u.nombre, 'Sin asignar') as vendedor,
-                    count(*) as count
-                FROM tb_oportunidades o
-                LEFT JOIN tb_usuarios u ON o.creado_por_id = u.id_usuario
-                {where_str}
-                {condition_monthly}
-                GROUP BY mes_date, mes, u.nombre
-                ORDER BY mes_date, u.nombre
-            """
-            rows_monthly = await conn.fetch(q_monthly, *params)
-            
-            meses_unicos = []
+        rows_monthly = sorted(series["monthly"], key=lambda r: (r['mes_date'], r['vendedor']))
+        meses_unicos = []
+        for row in rows_monthly:
+            if row['mes'] not in meses_unicos: meses_unicos.append(row['mes'])
+
+        if es_admin:
             vendedores_data = defaultdict(lambda: defaultdict(int))
-            
             for row in rows_monthly:
-                mes = row['mes']
-                vendedor = row['vendedor']
-                if mes not in meses_unicos: meses_unicos.append(mes)
-                vendedores_data[vendedor][mes] = row['count']
+                vendedores_data[row['vendedor']][row['mes']] = row['count']
             
             datasets = []
             colors = ['#00BABB', '#123456', '#22c55e', '#f97316', '#8b5cf6', '#ec4899', '#fbbf24']
@@ -189,66 +163,26 @@ class DashboardService:
                 "stacked": True
             }
         else:
-            q_monthly = f"""
-                SELECT 
-                    TO_CHAR((fecha_solicitud AT TIME ZONE 'America/Mexico_City'), 'Mon YY') as mes,
-                    count(*) as count
-                FROM tb_oportunidades o
-                {where_str}
-                {condition_monthly}
-                GROUP BY 
-                    DATE_TRUNC('month', (fecha_solicitud AT TIME ZONE 'America/Mexico_City')),
-                    TO_CHAR((fecha_solicitud AT TIME ZONE 'America/Mexico_City'), 'Mon YY')
-                ORDER BY DATE_TRUNC('month', (fecha_solicitud AT TIME ZONE 'America/Mexico_City'))
-            """
-            rows_m = await conn.fetch(q_monthly, *params)
+            por_mes = defaultdict(int)
+            for row in rows_monthly:
+                por_mes[row['mes']] += row['count']
             stats["charts"]["monthly"] = {
-                "labels": [r['mes'] for r in rows_m],
-                "data": [r['count'] for r in rows_m],
+                "labels": meses_unicos,
+                "data": [por_mes[mes] for mes in meses_unicos],
                 "stacked": False
             }
 
-        # --- Mix Tecnológico ---
-        q_mix = f"""
-            SELECT t.nombre as label, count(*) as count
-            FROM tb_oportunidades o
-            JOIN tb_cat_tecnologias t ON o.id_tecnologia = t.id
-            {where_str}
-            GROUP BY t.nombre ORDER BY count DESC
-        """
-        rows_mix = await conn.fetch(q_mix, *params)
-        stats["charts"]["mix"] = {
-            "labels": [r['label'] for r in rows_mix],
-            "data": [r['count'] for r in rows_mix]
-        }
-
-        # --- Estatus ---
-        q_status = f"""
-            SELECT e.nombre as label, count(*) as count
-            FROM tb_oportunidades o
-            JOIN tb_cat_estatus_global e ON o.id_estatus_global = e.id
-            {where_str}
-            GROUP BY e.nombre ORDER BY count DESC LIMIT 5
-        """
-        rows_status = await conn.fetch(q_status, *params)
-        stats["charts"]["status"] = {
-            "labels": [r['label'] for r in rows_status],
-            "data": [r['count'] for r in rows_status]
-        }
+        # --- Mix Tecnológico / Estatus (top 5) / Tipos Solicitud ---
+        def _chart(rows, label_key, limit=None):
+            ordered = sorted(rows, key=lambda r: r['count'], reverse=True)[:limit]
+            return {
+                "labels": [r[label_key] for r in ordered],
+                "data": [r['count'] for r in ordered]
+            }
 
-        # --- Tipos Solicitud ---
-        q_types = f"""
-            SELECT t.nombre as label, count(*) as count
-            FROM tb_oportunidades o
-            JOIN tb_cat_tipos_solicitud t ON o.id_tipo_solicitud = t.id
-            {where_str}
-            GROUP BY t.nombre ORDER BY count DESC
-        """
-        rows_types = await conn.fetch(q_types, *params)
-        stats["charts"]["request_types"] = {
-            "labels": [r['label'] for r in rows_types],
-            "data": [r['count'] for r in rows_types]
-        }
+        stats["charts"]["mix"] = _chart(series["mix"], 'tecnologia')
+        stats["charts"]["status"] = _chart(series["status"], 'estatus', limit=5)
+        stats["charts"]["request_types"] = _chart(series["request_types"], 'tipo')
         
         return stats
 
@@ -260,17 +194,22 @@ class DashboardService:
                 id_oportunidad
             )
             if sites_rows:
-                df_sites = pd.DataFrame([dict(r) for r in sites_rows])
-                df_sites.columns = ["NOMBRE", "# DE SERVICIO", "DIRECCION", "TARIFA", "LINK GOOGLE", "COMENTARIOS"]
-                
-                buf = io.BytesIO()
-                with pd.ExcelWriter(buf, engine='xlsxwriter') as writer:
-                    df_sites.to_excel(writer, index=False, sheet_name='Sitios')
-                
+                columnas = [
+                    XlsxColumn("NOMBRE", 30), XlsxColumn("# DE SERVICIO", 16),
+                    XlsxColumn("DIRECCION", 45), XlsxColumn("TARIFA", 10),
+                    XlsxColumn("LINK GOOGLE", 40), XlsxColumn("COMENTARIOS", 40),
+                ]
+
+                def _build(wb):
+                    ws = wb.add_sheet("Sitios", columnas)
+                    ws.write_header(freeze=False)
+                    for r in sites_rows:
+                        ws.append(list(r.values()))
+
                 return {
                     "name": f"Listado_Multisitios_{id_interno}.xlsx",
-                    "content_bytes": buf.getvalue(),
-                    "contentType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    "content_bytes": await build_xlsx(_build),
+                    "contentType": MIME_XLSX
                 }
         except Exception as e:
             logger.error(f"Error generando excel adjunto: {e}")
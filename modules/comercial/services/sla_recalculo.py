@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from datetime import date, datetime, time as dt_time
+from typing import List, Tuple
+from zoneinfo import ZoneInfo
+
+from core.config_service import ConfigService
+
+from ..constants import STATUS_CANCELADO, STATUS_ENTREGADO, STATUS_GANADA, STATUS_PERDIDO
+from ..db_service import (
+    QUERY_GET_DIAS_FESTIVOS,
+    QUERY_GET_OPORTUNIDADES_ABIERTAS_SLA,
+    QUERY_UPDATE_SLA_BULK,
+)
+from ..sla_calculator import HORA_CORTE_DEFAULT, SLACalculator
+
+logger = logging.getLogger("ComercialServices")
+
+TZ_MX = ZoneInfo("America/Mexico_City")
+
+# Estatus cerrados: su deadline ya no se mueve al cambiar las reglas
+ESTATUS_CERRADOS = [STATUS_ENTREGADO, STATUS_CANCELADO, STATUS_PERDIDO, STATUS_GANADA]
+
+# Arriba de este tamaño el cálculo NumPy se pasa a un hilo
+_UMBRAL_HILO = 5000
+
+
+class SLARecalculoService:
+    """
+    Calendario de SLA (hora de corte, fin de semana, días SLA y festivos) y
+    recálculo masivo de deadlines.
+
+    El mismo motor vectorizado (SLACalculator.calculate_deadlines_bulk) sirve
+    para una oportunidad nueva y para recalcular todas las abiertas cuando
+    cambia la configuración global: un SELECT, una pasada NumPy y un solo
+    UPDATE ... FROM unnest(...).
+    """
+
+    async def get_calendario(self, conn) -> Tuple[dt_time, List[int], int, List[date]]:
+        """(hora_corte, dias_fin_semana, dias_sla, festivos) desde la configuración global (cache)."""
+        config = {
+            "HORA_CORTE_L_V": await ConfigService.get_global_config(conn, "HORA_CORTE_L_V", HORA_CORTE_DEFAULT),
+            "DIAS_FIN_SEMANA": await ConfigService.get_global_config(conn, "DIAS_FIN_SEMANA", "[5, 6]"),
+            "DIAS_SLA_DEFAULT": await ConfigService.get_global_config(conn, "DIAS_SLA_DEFAULT", "7"),
+        }
+        hora_corte, dias_fin_semana, dias_sla = SLACalculator.parse_config(config)
+        return hora_corte, dias_fin_semana, dias_sla, await self.get_festivos(conn)
+
+    async def get_festivos(self, conn) -> List[date]:
+        """Días festivos (cache compartido con la configuración global)."""
+        cached = await ConfigService.get_cached_value("SLA_DIAS_FESTIVOS")
+        if cached is not None:
+            return cached
+        rows = await conn.fetch(QUERY_GET_DIAS_FESTIVOS)
+        festivos = [r["fecha"] for r in rows]
+        await ConfigService.set_cached_value("SLA_DIAS_FESTIVOS", festivos)
+        return festivos
+
+    async def calcular(self, conn, fecha_creacion: datetime) -> Tuple[datetime, bool]:
+        """(deadline, es_fuera_horario) de una oportunidad nueva."""
+        hora_corte, dias_fin_semana, dias_sla, festivos = await self.get_calendario(conn)
+        deadlines, fuera = SLACalculator.calculate_deadlines_bulk(
+            [fecha_creacion], hora_corte, dias_fin_semana, dias_sla, festivos
+        )
+        return deadlines[0], fuera[0]
+
+    async def calcular_inicio(self, conn, fecha: datetime) -> datetime:
+        """
+        Inicio de SLA (fecha_cambio_sla del historial de estatus) de un cambio
+        en `fecha`: el motor con dias_sla=0, es decir el mismo día si es hábil
+        antes del corte o el siguiente día hábil, a la hora de corte.
+        """
+        hora_corte, dias_fin_semana, _, festivos = await self.get_calendario(conn)
+        inicios, _ = SLACalculator.calculate_deadlines_bulk(
+            [fecha], hora_corte, dias_fin_semana, 0, festivos
+        )
+        return inicios[0]
+
+    async def recalcular_abiertas(self, conn) -> int:
+        """
+        Recalcula deadline_calculado y es_fuera_horario de todas las
+        oportunidades abiertas con la configuración vigente.
+
+        Returns:
+            Número de oportunidades cuyo deadline o bandera cambió.
+        """
+        hora_corte, dias_fin_semana, dias_sla, festivos = await self.get_calendario(conn)
+        rows = await conn.fetch(QUERY_GET_OPORTUNIDADES_ABIERTAS_SLA, ESTATUS_CERRADOS)
+        if not rows:
+            return 0
+
+        ids = [r["id_oportunidad"] for r in rows]
+        fechas = [r["fecha_solicitud"].astimezone(TZ_MX) for r in rows]
+
+        def _calcular():
+            return SLACalculator.calculate_deadlines_bulk(
+                fechas, hora_corte, dias_fin_semana, dias_sla, festivos
+            )
+
+        if len(fechas) > _UMBRAL_HILO:
+            deadlines, fuera = await asyncio.to_thread(_calcular)
+        else:
+            deadlines, fuera = _calcular()
+
+        result = await conn.execute(QUERY_UPDATE_SLA_BULK, ids, deadlines, fuera)
+        actualizadas = int(result.split()[-1])
+        logger.info(f"Recalculo SLA: {actualizadas} de {len(ids)} oportunidades abiertas actualizadas")
+        return actualizadas
+
+
+def get_sla_recalculo_service() -> SLARecalculoService:
+    return SLARecalculoService()
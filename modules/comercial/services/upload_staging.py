@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import secrets
+import time
+from typing import List, Optional
+from uuid import UUID
+
+logger = logging.getLogger("ComercialServices")
+
+# Mismo directorio que limpia core/tasks.cleanup_temp_uploads_periodically (1h)
+STAGING_DIR = "temp_uploads"
+STAGING_TTL_SECONDS = 1800  # 30 min entre previsualizar y confirmar
+
+
+class SiteUploadStaging:
+    """
+    Staging server-side de la carga masiva de sitios.
+
+    La previsualización guarda las filas ya validadas en disco bajo un token
+    aleatorio (compartido entre workers de gunicorn); la confirmación solo
+    envía el token. El navegador nunca recibe ni reenvía el contenido del Excel.
+    """
+
+    @staticmethod
+    def _path(token: str) -> str:
+        return os.path.join(STAGING_DIR, f"sitios_{token}.json")
+
+    def stage(self, id_oportunidad: UUID, usuario_id, rows: List[list]) -> str:
+        """
+        Guarda filas validadas y retorna el token de la carga.
+
+        Args:
+            rows: [nombre_sitio, direccion, tipo_tarifa, google_maps_link, numero_servicio, comentarios]
+        """
+        os.makedirs(STAGING_DIR, exist_ok=True)
+        token = secrets.token_urlsafe(24)
+        payload = {
+            "id_oportunidad": str(id_oportunidad),
+            "usuario_id": str(usuario_id),
+            "expires_at": time.time() + STAGING_TTL_SECONDS,
+            "rows": rows,
+        }
+        path = self._path(token)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, default=str)
+        os.replace(tmp_path, path)
+        return token
+
+    def load(self, token: str, id_oportunidad: UUID, usuario_id) -> Optional[List[list]]:
+        """
+        Recupera las filas de una carga. None si el token no existe, expiró o
+        pertenece a otra oportunidad/usuario.
+        """
+        # El token es url-safe base64; cualquier otro caracter es un intento de path traversal
+        if not token or not token.replace("-", "").replace("_", "").isalnum():
+            return None
+        try:
+            with open(self._path(token), encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if payload["expires_at"] < time.time():
+            self.discard(token)
+            return None
+        if payload["id_oportunidad"] != str(id_oportunidad) or payload["usuario_id"] != str(usuario_id):
+            logger.warning(f"Token de carga {token[:8]}... usado con otra oportunidad/usuario")
+            return None
+        return payload["rows"]
+
+    def discard(self, token: str):
+        try:
+            os.remove(self._path(token))
+        except OSError:
+            pass
+
+
+def get_upload_staging() -> SiteUploadStaging:
+    return SiteUploadStaging()
@@ -1,6 +1,11 @@
-from datetime import datetime, time as dt_time, timedelta
+from datetime import date, datetime, time as dt_time, timedelta
 import json
-from typing import List, Tuple
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Hora de corte L-V cuando HORA_CORTE_L_V no está en tb_configuracion_global
+HORA_CORTE_DEFAULT = "18:00"
 
 class SLACalculator:
     """
@@ -12,12 +17,12 @@ class SLACalculator:
     def parse_config(config: dict) -> Tuple[dt_time, List[int], int]:
         """Helper to parse configuration strings into Python objects."""
         # Hora de Corte
-        hora_corte_str = config.get("HORA_CORTE_L_V", "17:30")
+        hora_corte_str = config.get("HORA_CORTE_L_V", HORA_CORTE_DEFAULT)
         try:
             h, m = map(int, hora_corte_str.split(":"))
             hora_corte = dt_time(h, m)
         except ValueError:
-             hora_corte = dt_time(17, 30)
+             hora_corte = dt_time(*map(int, HORA_CORTE_DEFAULT.split(":")))
 
         # Días Fin de Semana
         dias_fin_semana_str = config.get("DIAS_FIN_SEMANA", "[5, 6]")
@@ -85,3 +90,69 @@ class SLACalculator:
         deadline_final = deadline_final.replace(hour=hora_corte.hour, minute=hora_corte.minute)
         
         return deadline_final
+
+    # --- Vectorized engine (NumPy business days) ---
+
+    @staticmethod
+    def build_weekmask(dias_fin_semana: Iterable[int]) -> str:
+        """NumPy weekmask (Mon..Sun, '1' = business day) from weekend weekday numbers."""
+        fin_semana = set(dias_fin_semana)
+        return "".join("0" if d in fin_semana else "1" for d in range(7))
+
+    @staticmethod
+    def calculate_deadlines_bulk(
+        fechas: Sequence[datetime],
+        hora_corte: dt_time,
+        dias_fin_semana: Sequence[int],
+        dias_sla: int,
+        festivos: Sequence[date] = ()
+    ) -> Tuple[List[datetime], List[bool]]:
+        """
+        Deadline and out-of-hours flag for many creation dates in one pass.
+
+        Same rules as is_out_of_hours/calculate_deadline, generalized to the
+        configured weekend days and a holiday calendar:
+        - Out of hours: non-business day (weekend or holiday) or after hora_corte.
+        - SLA start: the creation day if it is a business day before the cutoff,
+          otherwise the next business day.
+        - Deadline: start + dias_sla calendar days, rolled forward to a business
+          day, at hora_corte (in each date's own timezone).
+
+        Args:
+            fechas: Local (tz-aware) creation datetimes.
+        Returns:
+            (deadlines, fuera_de_horario) aligned with `fechas`.
+        """
+        if not fechas:
+            return [], []
+
+        weekmask = SLACalculator.build_weekmask(dias_fin_semana)
+        if "1" not in weekmask:
+            weekmask = "1111100"  # Configuración inválida (todos fin de semana): L-V
+        holidays = np.array(list(festivos), dtype="datetime64[D]")
+
+        dias = np.array([f.date() for f in fechas], dtype="datetime64[D]")
+        segundos = np.array(
+            [f.hour * 3600 + f.minute * 60 + f.second + f.microsecond / 1e6 for f in fechas]
+        )
+        corte = hora_corte.hour * 3600 + hora_corte.minute * 60 + hora_corte.second
+
+        habil = np.is_busday(dias, weekmask=weekmask, holidays=holidays)
+        tarde = segundos > corte
+        fuera = ~habil | tarde
+
+        # Día hábil después del corte: cuenta desde el día siguiente
+        inicio = np.busday_offset(
+            dias + (habil & tarde).astype("timedelta64[D]"), 0,
+            roll="forward", weekmask=weekmask, holidays=holidays
+        )
+        vencimiento = np.busday_offset(
+            inicio + np.timedelta64(dias_sla, "D"), 0,
+            roll="forward", weekmask=weekmask, holidays=holidays
+        )
+
+        deadlines = [
+            datetime.combine(d, dt_time(hora_corte.hour, hora_corte.minute), tzinfo=f.tzinfo)
+            for d, f in zip(vencimiento.astype(date), fechas)
+        ]
+        return deadlines, fuera.tolist()
@@ -8,8 +8,50 @@ from fastapi import HTTPException
 import logging
 import json
 
+import asyncpg
+
+from core.query_builder import Filtro, FiltroSQL
+from core.materials.db_service import get_materials_db_service
+
 logger = logging.getLogger("Compras.DBService")
 
+# Filtros de la lista, exportacion y estadisticas de comprobantes (alias c)
+FILTROS_COMPROBANTES = FiltroSQL(
+    Filtro('fecha_inicio', 'c.fecha_pago >= {p}'),
+    Filtro('fecha_fin', 'c.fecha_pago <= {p}'),
+    Filtro('estatus', 'c.estatus = {p}'),
+    Filtro('id_zona', 'c.id_zona = {p}'),
+    Filtro('id_proyecto', 'c.id_proyecto = {p}'),
+    Filtro('id_categoria', 'c.id_categoria = {p}'),
+)
+
+# Ingesta de conceptos CFDI a tb_materiales_historial (COPY binario + staging)
+CONCEPTOS_BATCH_SIZE = 5000
+
+COLUMNAS_CONCEPTOS_HISTORIAL = [
+    'uuid_factura', 'id_comprobante', 'id_proveedor',
+    'descripcion_proveedor', 'cantidad', 'precio_unitario',
+    'importe', 'unidad', 'clave_prod_serv', 'clave_unidad',
+    'id_categoria', 'origen', 'fecha_factura', 'created_by_id',
+]
+
+# Temporal por transaccion con los mismos tipos que el historial (sin constraints)
+QUERY_STAGING_CONCEPTOS = f"""
+    CREATE TEMP TABLE IF NOT EXISTS tmp_conceptos_historial ON COMMIT DROP AS
+    SELECT {', '.join(COLUMNAS_CONCEPTOS_HISTORIAL)}
+    FROM tb_materiales_historial
+    WITH NO DATA
+"""
+
+QUERY_INSERT_CONCEPTOS_STAGING = f"""
+    INSERT INTO tb_materiales_historial ({', '.join(COLUMNAS_CONCEPTOS_HISTORIAL)})
+    SELECT {', '.join(COLUMNAS_CONCEPTOS_HISTORIAL)}
+    FROM tmp_conceptos_historial
+    ON CONFLICT (uuid_factura, descripcion_proveedor, cantidad, precio_unitario)
+    DO NOTHING
+"""
+
+
 class ComprasDBService:
     """Capa de Acceso a Datos para el Módulo Compras"""
 
@@ -62,7 +104,7 @@ class ComprasDBService:
                 c.id_comprobante,
                 c.fecha_pago,
                 c.beneficiario_orig,
-                c.monto,
+                c.monto::float8 AS monto,
                 c.moneda,
                 c.estatus,
                 c.uuid_factura,
@@ -77,10 +119,10 @@ class ComprasDBService:
                 z.nombre as zona_nombre,
                 pr.proyecto_id_estandar as proyecto_nombre,
                 cat.nombre as categoria_nombre,
-                (SELECT COUNT(*) 
-                 FROM tb_documentos_attachments da 
-                 WHERE da.activo = true 
-                 AND da.metadata->>'id_comprobante' = c.id_comprobante::text
+                (SELECT COUNT(*)
+                 FROM tb_documentos_attachments da
+                 WHERE da.id_comprobante = c.id_comprobante
+                 AND da.activo = true
                 ) as count_archivos
             FROM tb_comprobantes_pago c
             LEFT JOIN tb_usuarios u ON c.capturado_por_id = u.id_usuario
@@ -94,39 +136,9 @@ class ComprasDBService:
         if count_only:
             base_query = "SELECT COUNT(*) FROM tb_comprobantes_pago c WHERE 1=1"
 
-        params = []
-        param_idx = 1
-        
-        # Apply filters
-        if filtros.get('fecha_inicio'):
-            base_query += f" AND c.fecha_pago >= ${param_idx}"
-            params.append(filtros['fecha_inicio'])
-            param_idx += 1
-        
-        if filtros.get('fecha_fin'):
-            base_query += f" AND c.fecha_pago <= ${param_idx}"
-            params.append(filtros['fecha_fin'])
-            param_idx += 1
-        
-        if filtros.get('estatus'):
-            base_query += f" AND c.estatus = ${param_idx}"
-            params.append(filtros['estatus'])
-            param_idx += 1
-        
-        if filtros.get('id_zona'):
-            base_query += f" AND c.id_zona = ${param_idx}"
-            params.append(filtros['id_zona'])
-            param_idx += 1
-        
-        if filtros.get('id_proyecto'):
-            base_query += f" AND c.id_proyecto = ${param_idx}"
-            params.append(filtros['id_proyecto'])
-            param_idx += 1
-        
-        if filtros.get('id_categoria'):
-            base_query += f" AND c.id_categoria = ${param_idx}"
-            params.append(filtros['id_categoria'])
-            param_idx += 1
+        filtros_sql, params = self._build_comprobantes_filters(filtros)
+        base_query += filtros_sql
+        param_idx = len(params) + 1
             
         if count_only:
             return await conn.fetchval(base_query, *params)
@@ -141,6 +153,47 @@ class ComprasDBService:
         
         return await conn.fetch(base_query, *params)
 
+    @staticmethod
+    def _build_comprobantes_filters(filtros: dict) -> Tuple[str, list]:
+        """Condiciones AND (alias c) y parámetros para los filtros de comprobantes."""
+        return FILTROS_COMPROBANTES.bind(filtros)
+
+    def build_export_query(self, filtros: dict) -> Tuple[str, list]:
+        """
+        Query de exportación (sin paginación) para iterar con cursor.
+        Las facturas del junction se agregan en SQL para no hacer un batch
+        fetch aparte por lote.
+        """
+        filtros_sql, params = self._build_comprobantes_filters(filtros)
+        query = f"""
+            SELECT
+                u.nombre as comprador_nombre,
+                COALESCE(p.razon_social, c.beneficiario_orig, '') as proveedor_nombre,
+                pr.proyecto_id_estandar as proyecto_nombre,
+                z.nombre as zona_nombre,
+                c.fecha_pago,
+                c.estatus,
+                c.monto,
+                c.moneda,
+                cat.nombre as categoria_nombre,
+                c.uuid_factura,
+                (SELECT string_agg(DISTINCT f.tipo, ', ')
+                 FROM tb_comprobante_facturas f
+                 WHERE f.id_comprobante = c.id_comprobante) as tipos_factura,
+                (SELECT string_agg(left(f.uuid_factura::text, 8), ', ' ORDER BY f.created_at)
+                 FROM tb_comprobante_facturas f
+                 WHERE f.id_comprobante = c.id_comprobante) as uuids_relacionados
+            FROM tb_comprobantes_pago c
+            LEFT JOIN tb_usuarios u ON c.capturado_por_id = u.id_usuario
+            LEFT JOIN tb_proveedores p ON c.id_proveedor = p.id_proveedor
+            LEFT JOIN tb_cat_zonas_compra z ON c.id_zona = z.id
+            LEFT JOIN tb_proyectos_gate pr ON c.id_proyecto = pr.id_proyecto
+            LEFT JOIN tb_cat_categorias_compra cat ON c.id_categoria = cat.id
+            WHERE 1=1{filtros_sql}
+            ORDER BY c.fecha_pago DESC, c.created_at DESC
+        """
+        return query, params
+
     async def get_comprobante_by_id(self, conn, id_comprobante: UUID) -> Optional[dict]:
         row = await conn.fetchrow("""
             SELECT 
@@ -247,37 +300,11 @@ class ComprasDBService:
                 COUNT(*) FILTER (WHERE estatus = 'ANTICIPO') as anticipos,
                 COALESCE(SUM(monto) FILTER (WHERE moneda = 'MXN'), 0) as total_mxn,
                 COALESCE(SUM(monto) FILTER (WHERE moneda = 'USD'), 0) as total_usd
-            FROM tb_comprobantes_pago
+            FROM tb_comprobantes_pago c
             WHERE 1=1
         """
-        params = []
-        param_idx = 1
-        
-        # Reusar logica de filtros simplificada
-        if filtros.get('fecha_inicio'):
-            base_query += f" AND fecha_pago >= ${param_idx}"
-            params.append(filtros['fecha_inicio'])
-            param_idx += 1
-        if filtros.get('fecha_fin'):
-            base_query += f" AND fecha_pago <= ${param_idx}"
-            params.append(filtros['fecha_fin'])
-            param_idx += 1
-        if filtros.get('estatus'):
-            base_query += f" AND estatus = ${param_idx}"
-            params.append(filtros['estatus'])
-            param_idx += 1
-        if filtros.get('id_zona'):
-            base_query += f" AND id_zona = ${param_idx}"
-            params.append(filtros['id_zona'])
-            param_idx += 1
-        if filtros.get('id_proyecto'):
-            base_query += f" AND id_proyecto = ${param_idx}"
-            params.append(filtros['id_proyecto'])
-            param_idx += 1
-        if filtros.get('id_categoria'):
-            base_query += f" AND id_categoria = ${param_idx}"
-            params.append(filtros['id_categoria'])
-            param_idx += 1
+        filtros_sql, params = self._build_comprobantes_filters(filtros)
+        base_query += filtros_sql
 
         row = await conn.fetchrow(base_query, *params)
         return dict(row)
@@ -517,50 +544,110 @@ class ComprasDBService:
         """, claves)
         return {r['clave_prod_serv']: r['id_categoria'] for r in rows}
 
-    async def guardar_conceptos_historial(
-        self, conn, uuid_factura: str, id_comprobante: Optional[UUID],
-        id_proveedor: UUID, conceptos: List[dict],
-        fecha_factura: date, user_id: UUID
-    ):
-        """Guarda los conceptos/items del XML en tb_materiales_historial.
+    async def guardar_conceptos_historial_lote(
+        self, conn, facturas: List[dict], user_id: UUID,
+        batch_size: int = CONCEPTOS_BATCH_SIZE, capturar_errores: bool = True
+    ) -> dict:
+        """Ingesta en lote de conceptos de varias facturas a tb_materiales_historial.
+
+        facturas: dicts con uuid_factura, id_comprobante, id_proveedor,
+        fecha_factura y conceptos (descripcion, cantidad, valor_unitario,
+        importe, unidad, clave_prod_serv, clave_unidad).
+
+        - Auto-categoriza por clave SAT con un solo lookup para todo el lote:
+          si existen items previamente categorizados con la misma
+          clave_prod_serv, asigna la misma categoria.
+        - Cada batch (~batch_size conceptos, sin partir facturas) se manda con
+          COPY binario a una tabla temporal y se inserta con un solo
+          INSERT ... SELECT ... ON CONFLICT DO NOTHING (duplicados se omiten).
+        - Cada batch corre en su propia transaccion/savepoint junto con el
+          refresco de la proyeccion de ultimo precio y del rollup mensual de
+          precios; si falla se reporta y
+          se continua con el siguiente (capturar_errores=False lo propaga).
 
-        Auto-categoriza por clave SAT: si existen items previamente
-        categorizados con la misma clave_prod_serv, asigna la misma categoria.
+        Returns:
+            {'insertados', 'omitidos', 'auto_categorizados', 'errores': [{'facturas', 'error'}]}
         """
-        # Batch: obtener categorias conocidas por clave SAT
-        claves_sat = list(set(
-            c.get('clave_prod_serv') for c in conceptos if c.get('clave_prod_serv')
-        ))
-        cat_map = await self.get_categorias_by_claves_sat(conn, claves_sat) if claves_sat else {}
-
-        auto_cat_count = 0
-        for c in conceptos:
-            clave_sat = c.get('clave_prod_serv')
-            id_categoria = cat_map.get(clave_sat) if clave_sat else None
-            if id_categoria:
-                auto_cat_count += 1
+        resultado = {'insertados': 0, 'omitidos': 0, 'auto_categorizados': 0, 'errores': []}
 
-            await conn.execute("""
-                INSERT INTO tb_materiales_historial (
-                    uuid_factura, id_comprobante, id_proveedor,
-                    descripcion_proveedor, cantidad, precio_unitario,
-                    importe, unidad, clave_prod_serv, clave_unidad,
-                    id_categoria, origen, fecha_factura, created_by_id
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-                ON CONFLICT (uuid_factura, descripcion_proveedor, cantidad, precio_unitario)
-                DO NOTHING
-            """,
-                uuid_factura, id_comprobante, id_proveedor,
-                c['descripcion'], c['cantidad'], c['valor_unitario'],
-                c['importe'], c.get('unidad'), clave_sat,
-                c.get('clave_unidad'), id_categoria, 'XML', fecha_factura, user_id
-            )
+        claves_sat = list({
+            c.get('clave_prod_serv')
+            for f in facturas for c in f['conceptos'] if c.get('clave_prod_serv')
+        })
+        cat_map = await self.get_categorias_by_claves_sat(conn, claves_sat) if claves_sat else {}
 
-        if auto_cat_count:
+        # Registros por factura (una factura con datos invalidos no tumba el lote)
+        batches, batch, facturas_batch = [], [], []
+        for f in facturas:
+            try:
+                registros = [
+                    (
+                        f['uuid_factura'], f.get('id_comprobante'), f['id_proveedor'],
+                        c['descripcion'], Decimal(str(c['cantidad'])),
+                        Decimal(str(c['valor_unitario'])), Decimal(str(c['importe'])),
+                        c.get('unidad'), c.get('clave_prod_serv'), c.get('clave_unidad'),
+                        cat_map.get(c.get('clave_prod_serv')), 'XML',
+                        f['fecha_factura'], user_id
+                    )
+                    for c in f['conceptos']
+                ]
+            except (KeyError, TypeError, ArithmeticError) as e:
+                if not capturar_errores:
+                    raise
+                logger.warning("Conceptos invalidos en factura %s: %r", f.get('uuid_factura'), e)
+                resultado['errores'].append({
+                    'facturas': [f.get('uuid_factura')],
+                    'error': "Conceptos con datos faltantes o invalidos (cantidad, precio o importe)"
+                })
+                continue
+
+            batch.extend(registros)
+            facturas_batch.append(f['uuid_factura'])
+            if len(batch) >= batch_size:
+                batches.append((batch, facturas_batch))
+                batch, facturas_batch = [], []
+        if batch:
+            batches.append((batch, facturas_batch))
+
+        materials_db = get_materials_db_service()
+        for registros, uuids in batches:
+            try:
+                async with conn.transaction():
+                    await conn.execute(QUERY_STAGING_CONCEPTOS)
+                    await conn.execute("TRUNCATE tmp_conceptos_historial")
+                    await conn.copy_records_to_table(
+                        'tmp_conceptos_historial', records=registros,
+                        columns=COLUMNAS_CONCEPTOS_HISTORIAL
+                    )
+                    result = await conn.execute(QUERY_INSERT_CONCEPTOS_STAGING)
+                    await materials_db.refrescar_ultimo_precio(
+                        conn, [(r[3], r[2]) for r in registros]
+                    )
+                    await materials_db.refrescar_precio_mensual(
+                        conn, [(r[3], r[2], r[12]) for r in registros]
+                    )
+            except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                if not capturar_errores:
+                    raise
+                logger.error("Error en batch de conceptos (%d facturas): %s", len(uuids), e)
+                resultado['errores'].append({'facturas': uuids, 'error': str(e)})
+                continue
+
+            insertados = int(result.split()[-1])
+            resultado['insertados'] += insertados
+            resultado['omitidos'] += len(registros) - insertados
+            resultado['auto_categorizados'] += sum(1 for r in registros if r[10] is not None)
+
+        if resultado['auto_categorizados']:
             logger.info(
-                "Auto-categorizado %d/%d conceptos por clave SAT (UUID=%s)",
-                auto_cat_count, len(conceptos), uuid_factura[:8]
+                "Auto-categorizado %d conceptos por clave SAT (%d facturas)",
+                resultado['auto_categorizados'], len(facturas)
             )
+        logger.info(
+            "Conceptos historial: %d insertados, %d omitidos (duplicados), %d batches con error",
+            resultado['insertados'], resultado['omitidos'], len(resultado['errores'])
+        )
+        return resultado
 
     async def guardar_cfdi_relacionados(
         self, conn, uuid_factura: str, relacionados: List[dict]
@@ -592,8 +679,8 @@ class ComprasDBService:
                 id_documento, nombre_archivo, url_sharepoint,
                 drive_item_id, parent_drive_id,
                 tipo_contenido, tamano_bytes,
-                subido_por_id, origen_slug, activo, metadata
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, TRUE, $10::jsonb)
+                subido_por_id, origen_slug, activo, metadata, id_comprobante
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, TRUE, $10::jsonb, $11)
         """,
             doc_id,
             upload_result.get('name', ''),
@@ -604,7 +691,8 @@ class ComprasDBService:
             upload_result.get('size', 0),
             user_id,
             origen_slug,
-            json.dumps(metadata_extra)
+            json.dumps(metadata_extra),
+            id_comprobante
         )
         return doc_id
 
@@ -671,6 +759,7 @@ class ComprasDBService:
                 - subido_por_id
                 - origen_slug
                 - metadata (dict)
+                - id_comprobante (optional)
         
         Returns:
             UUID del documento creado
@@ -682,8 +771,8 @@ class ComprasDBService:
             INSERT INTO tb_documentos_attachments (
                 id_documento, nombre_archivo, url_sharepoint, drive_item_id, parent_drive_id,
                 tipo_contenido, tamano_bytes, id_oportunidad, subido_por_id,
-                origen_slug, activo, metadata
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, TRUE, $11::jsonb)
+                origen_slug, activo, metadata, id_comprobante
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, TRUE, $11::jsonb, $12)
         """,
             doc_id,
             doc_data.get('nombre_archivo', ''),
@@ -695,7 +784,8 @@ class ComprasDBService:
             doc_data.get('id_oportunidad'),
             doc_data['subido_por_id'],
             doc_data.get('origen_slug', 'comprobante_pago'),
-            json.dumps(doc_data.get('metadata', {}))
+            json.dumps(doc_data.get('metadata', {})),
+            doc_data.get('id_comprobante')
         )
         return doc_id
 
@@ -704,27 +794,13 @@ class ComprasDBService:
         rows = await conn.fetch("""
             SELECT
                 id_documento, nombre_archivo, url_sharepoint,
-                origen_slug, tamano_bytes, fecha_subida, metadata
+                origen_slug, tipo_contenido, tamano_bytes, fecha_subida
             FROM tb_documentos_attachments
-            WHERE activo = true
-            AND (
-                metadata->>'id_comprobante' = $1
-            )
+            WHERE id_comprobante = $1
+            AND activo = true
             ORDER BY fecha_subida DESC
-        """, str(id_comprobante))
-        
-        # Parsear metadata JSON si es string (fix asyncpg default)
-        results = []
-        for r in rows:
-            d = dict(r)
-            if d.get('metadata') and isinstance(d['metadata'], str):
-                try:
-                    d['metadata'] = json.loads(d['metadata'])
-                except (json.JSONDecodeError, TypeError):
-                    d['metadata'] = {}
-            results.append(d)
-        
-        return results
+        """, id_comprobante)
+        return [dict(r) for r in rows]
 
 
     # ========================================
@@ -26,6 +26,7 @@ from starlette.datastructures import Headers
 
 # Core imports
 from core.database import get_db_connection
+from core.csv_export import csv_streaming_response
 from core.security import get_current_user_context
 from core.permissions import require_module_access
 from core.config import settings
@@ -38,6 +39,8 @@ from .schemas import (
     ComprobanteFilter,
     ComprobanteUpdateForm,
     CfdiData,
+    XmlConfirmMatch,
+    XmlConfirmMatchLote,
 )
 from typing import Annotated
 
@@ -481,6 +484,20 @@ async def export_excel(
     )
 
 
+@router.get("/export-csv")
+async def export_csv(
+    filtros: Annotated[ComprobanteFilter, Query()],
+    service: ComprasService = Depends(get_compras_service),
+    _ = require_module_access("compras")
+):
+    """
+    Exporta comprobantes a CSV en streaming (cursor en servidor, memoria constante).
+    """
+    chunks = service.export_csv(filtros.model_dump(exclude_none=True))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return csv_streaming_response(f"comprobantes_pago_{timestamp}.csv", chunks)
+
+
 # ========================================
 # CATÁLOGOS
 # ========================================
@@ -621,6 +638,70 @@ async def upload_xmls(
     )
 
 
+def _cfdi_data_desde_match(match: XmlConfirmMatch) -> dict:
+    """Reconstruye el dict cfdi_data que espera el service a partir del form del match."""
+    try:
+        conceptos = json.loads(match.conceptos_json) if match.conceptos_json else []
+    except json.JSONDecodeError as e:
+        logger.warning("Error parsing conceptos_json: %s (primeros 100 chars: %s)", e, (match.conceptos_json or "")[:100])
+        conceptos = []
+
+    try:
+        relacionados = json.loads(match.relacionados_json) if match.relacionados_json else []
+    except json.JSONDecodeError as e:
+        logger.warning("Error parsing relacionados_json: %s (primeros 100 chars: %s)", e, (match.relacionados_json or "")[:100])
+        relacionados = []
+
+    return {
+        "uuid": match.uuid_factura,
+        "emisor_rfc": match.emisor_rfc,
+        "emisor_nombre": match.emisor_nombre,
+        "total": match.total,
+        "subtotal": match.subtotal,
+        "moneda": match.moneda,
+        "fecha": match.fecha,
+        "tipo_factura": match.tipo_factura,
+        "tipo_comprobante": match.tipo_comprobante,
+        "metodo_pago": match.metodo_pago,
+        "forma_pago": match.forma_pago,
+        "conceptos": conceptos,
+        "relacionados": relacionados,
+    }
+
+
+async def _subir_xml_confirmado(service, conn, match: XmlConfirmMatch, user_id) -> Optional[str]:
+    """Sube el XML de un match ya confirmado a SharePoint. Retorna la URL o None."""
+    if not match.xml_content_b64:
+        return None
+    try:
+        xml_bytes = base64.b64decode(match.xml_content_b64)
+        xml_file = UploadFile(
+            filename=f"{match.uuid_factura[:8]}_factura.xml",
+            file=BytesIO(xml_bytes),
+            headers=Headers({"content-type": "application/xml"}),
+        )
+
+        now = datetime.now()
+        subcarpeta = f"compras/facturas_xml/{now.strftime('%Y-%m')}"
+
+        sp_result = await service.upload_archivo_sharepoint(
+            conn, xml_file, subcarpeta,
+            match.id_comprobante, "factura_xml", user_id,
+            metadata_extra={
+                "uuid_factura": match.uuid_factura,
+                "emisor_rfc": match.emisor_rfc,
+                "tipo_factura": match.tipo_factura,
+            }
+        )
+        if sp_result:
+            sp_url = sp_result.get("url_sharepoint")
+            logger.info("XML subido a SharePoint: %s", sp_url)
+            return sp_url
+    except Exception as e:
+        logger.error("Error subiendo XML a SharePoint post-confirm: %s", e)
+    return None
+
+
 @router.post("/xml-confirm-match", response_class=HTMLResponse)
 async def confirm_xml_match(
     request: Request,
@@ -659,38 +740,19 @@ async def confirm_xml_match(
     if not user_id:
         raise HTTPException(status_code=401, detail="Usuario no identificado")
 
-    # Reconstruir cfdi_data como dict
-    try:
-        conceptos = json.loads(conceptos_json) if conceptos_json else []
-    except json.JSONDecodeError as e:
-        logger.warning("Error parsing conceptos_json: %s (primeros 100 chars: %s)", e, (conceptos_json or "")[:100])
-        conceptos = []
-
-    try:
-        relacionados = json.loads(relacionados_json) if relacionados_json else []
-    except json.JSONDecodeError as e:
-        logger.warning("Error parsing relacionados_json: %s (primeros 100 chars: %s)", e, (relacionados_json or "")[:100])
-        relacionados = []
-
-    cfdi_data = {
-        "uuid": uuid_factura,
-        "emisor_rfc": emisor_rfc,
-        "emisor_nombre": emisor_nombre,
-        "total": total,
-        "subtotal": subtotal,
-        "moneda": moneda,
-        "fecha": fecha,
-        "tipo_factura": tipo_factura,
-        "tipo_comprobante": tipo_comprobante,
-        "metodo_pago": metodo_pago,
-        "forma_pago": forma_pago,
-        "conceptos": conceptos,
-        "relacionados": relacionados,
-    }
+    match = XmlConfirmMatch(
+        uuid_factura=uuid_factura, id_comprobante=id_comprobante,
+        emisor_rfc=emisor_rfc, emisor_nombre=emisor_nombre,
+        total=total, moneda=moneda, fecha=fecha, tipo_factura=tipo_factura,
+        tipo_comprobante=tipo_comprobante, metodo_pago=metodo_pago,
+        forma_pago=forma_pago, subtotal=subtotal,
+        conceptos_json=conceptos_json, relacionados_json=relacionados_json,
+        xml_content_b64=xml_content_b64, guardar_relacion=guardar_relacion,
+    )
 
     try:
         resultado = await service.confirmar_match_xml(
-            conn, cfdi_data, id_comprobante, user_id,
+            conn, _cfdi_data_desde_match(match), id_comprobante, user_id,
             guardar_relacion=guardar_relacion
         )
     except ValueError as e:
@@ -704,33 +766,7 @@ async def confirm_xml_match(
         )
 
     # Subir XML a SharePoint DESPUES de confirmar el match
-    sp_url = None
-    if xml_content_b64:
-        try:
-            xml_bytes = base64.b64decode(xml_content_b64)
-            xml_file = UploadFile(
-                filename=f"{uuid_factura[:8]}_factura.xml",
-                file=BytesIO(xml_bytes),
-                headers=Headers({"content-type": "application/xml"}),
-            )
-
-            now = datetime.now()
-            subcarpeta = f"compras/facturas_xml/{now.strftime('%Y-%m')}"
-
-            sp_result = await service.upload_archivo_sharepoint(
-                conn, xml_file, subcarpeta,
-                id_comprobante, "factura_xml", user_id,
-                metadata_extra={
-                    "uuid_factura": uuid_factura,
-                    "emisor_rfc": emisor_rfc,
-                    "tipo_factura": tipo_factura,
-                }
-            )
-            if sp_result:
-                sp_url = sp_result.get("url_sharepoint")
-                logger.info("XML subido a SharePoint: %s", sp_url)
-        except Exception as e:
-            logger.error("Error subiendo XML a SharePoint post-confirm: %s", e)
+    await _subir_xml_confirmado(service, conn, match, user_id)
 
     # Construir mensaje de exito
     items_msg = f", {resultado['conceptos_guardados']} items guardados"
@@ -759,6 +795,71 @@ async def confirm_xml_match(
     return HTMLResponse(content=result_html + toast_html)
 
 
+@router.post("/xml-confirm-match-lote", response_class=HTMLResponse)
+async def confirm_xml_match_lote(
+    request: Request,
+    datos: XmlConfirmMatchLote,
+    conn = Depends(get_db_connection),
+    context = Depends(get_current_user_context),
+    service: ComprasService = Depends(get_compras_service),
+    _ = require_module_access("compras", "editor")
+):
+    """
+    Confirma de una vez los matches de una carga multiple de XMLs
+    (boton "Confirmar todos" de xml_upload_result.html).
+
+    Cada match se aplica en su propia transaccion; los conceptos de todas
+    las facturas se ingieren con una sola llamada en lote. Los XML se suben
+    a SharePoint despues, solo los de matches confirmados.
+
+    Returns:
+        HTML con el resumen por factura + toast OOB
+    """
+    user_id = context.get("user_db_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Usuario no identificado")
+
+    por_uuid = {m.uuid_factura: m for m in datos.matches}
+    resultado = await service.confirmar_matches_xml(
+        conn,
+        [(_cfdi_data_desde_match(m), m.id_comprobante, m.guardar_relacion) for m in datos.matches],
+        user_id
+    )
+
+    for confirmado in resultado['confirmados']:
+        await _subir_xml_confirmado(service, conn, por_uuid[confirmado['uuid_factura']], user_id)
+
+    conceptos = resultado['conceptos'] or {}
+    n_ok, n_error = len(resultado['confirmados']), len(resultado['errores'])
+    errores_conceptos = conceptos.get('errores', [])
+    mensaje = f"{n_ok} factura(s) vinculada(s), {conceptos.get('insertados', 0)} items guardados"
+    if n_error:
+        mensaje += f", {n_error} con error"
+    if errores_conceptos:
+        mensaje += " (advertencia: no se guardaron los items de algunas facturas)"
+
+    toast_html = templates.TemplateResponse(
+        "shared/toast.html",
+        {
+            "request": request,
+            "message": mensaje,
+            "type": "success" if not (n_error or errores_conceptos) else "warning",
+        }
+    ).body.decode("utf-8")
+
+    result_html = templates.TemplateResponse(
+        "compras/partials/xml_confirm_lote_result.html",
+        {
+            "request": request,
+            "confirmados": resultado['confirmados'],
+            "errores": resultado['errores'],
+            "errores_conceptos": errores_conceptos,
+        }
+    ).body.decode("utf-8")
+
+    return HTMLResponse(content=result_html + toast_html)
+
+
 @router.get("/comprobantes-pendientes", response_class=HTMLResponse)
 async def search_comprobantes_pendientes(
     request: Request,
@@ -425,4 +425,28 @@ class XmlUploadResult(BaseModel):
 
     @property
     def pendientes_match(self) -> int:
-        return sum(1 for r in self.procesados if r.match_type != "AUTO_MATCH")
\ No newline at end of file
+        return sum(1 for r in self.procesados if r.match_type != "AUTO_MATCH")
+
+class XmlConfirmMatch(BaseModel):
+    """Un match a confirmar (mismos campos que el form de /xml-confirm-match)."""
+    uuid_factura: str
+    id_comprobante: UUID
+    emisor_rfc: str
+    emisor_nombre: str
+    total: str
+    moneda: str = "MXN"
+    fecha: str = ""
+    tipo_factura: str = "NORMAL"
+    tipo_comprobante: Optional[str] = None
+    metodo_pago: Optional[str] = None
+    forma_pago: Optional[str] = None
+    subtotal: Optional[str] = None
+    conceptos_json: str = "[]"
+    relacionados_json: str = "[]"
+    xml_content_b64: str = ""
+    guardar_relacion: bool = True
+
+
+class XmlConfirmMatchLote(BaseModel):
+    """Confirmacion en lote de matches de una carga multiple (JSON, hx-ext="json-enc")."""
+    matches: List[XmlConfirmMatch] = Field(..., min_length=1)
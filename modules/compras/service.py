@@ -12,8 +12,10 @@ from decimal import Decimal
 import logging
 import time
 import json
+import asyncpg
 
 import base64
+from core.excel_export import XlsxColumn
 from .pdf_extractor import process_uploaded_pdf, process_pdf_bytes, ComprobantePDFData
 from .xml_extractor import parse_cfdi_xml, validate_xml_content, process_uploaded_xml
 from .schemas import (
@@ -25,6 +27,40 @@ logger = logging.getLogger("ComprasService")
 # Tolerancia de matching por monto (pesos/dolares)
 MATCH_TOLERANCIA = Decimal("0.50")
 
+# Columnas de exportación (Excel y CSV comparten encabezados y orden)
+EXPORT_COLUMNS = [
+    XlsxColumn("Comprador", 20),
+    XlsxColumn("Proveedor", 35),
+    XlsxColumn("Proyecto", 30),
+    XlsxColumn("Zona", 15),
+    XlsxColumn("Fecha de Pago", 15),
+    XlsxColumn("Estatus", 15),
+    XlsxColumn("Monto", 15, "money"),
+    XlsxColumn("Moneda", 10),
+    XlsxColumn("Categoría", 20),
+    XlsxColumn("UUID Factura", 40),
+    XlsxColumn("Tipo Factura", 18),
+    XlsxColumn("UUIDs Relacionados", 40),
+]
+
+
+def _export_row(comp) -> list:
+    """Fila de exportación a partir de un registro de build_export_query."""
+    return [
+        comp['comprador_nombre'],
+        comp['proveedor_nombre'],
+        comp['proyecto_nombre'],
+        comp['zona_nombre'],
+        comp['fecha_pago'].strftime("%d/%m/%Y") if comp['fecha_pago'] else '',
+        comp['estatus'],
+        comp['monto'] or 0,
+        comp['moneda'] or 'MXN',
+        comp['categoria_nombre'],
+        str(comp['uuid_factura']) if comp['uuid_factura'] else '',
+        comp['tipos_factura'],
+        comp['uuids_relacionados'],
+    ]
+
 
 class ComprasService:
     """Lógica de negocio del módulo Compras - Comprobantes de Pago."""
@@ -174,21 +210,12 @@ class ComprasService:
             conn, filtros, page, per_page, count_only=True
         )
 
-        # Obtener datos
+        # Obtener datos (monto ya llega como float: cast float8 en la query)
         rows = await db_svc.get_comprobantes_filtered(
             conn, filtros, page, per_page, count_only=False
         )
         
-        # Convertir a diccionarios
-        comprobantes = []
-        for row in rows:
-            comp = dict(row)
-            # Convertir Decimal a float para serialización
-            if comp.get('monto'):
-                comp['monto'] = float(comp['monto'])
-            comprobantes.append(comp)
-        
-        return comprobantes, total
+        return [dict(row) for row in rows], total
     
     async def get_comprobantes_default_view(self, conn) -> Tuple[List[dict], int]:
         """
@@ -303,115 +330,32 @@ class ComprasService:
     ) -> bytes:
         """
         Genera archivo Excel con los comprobantes filtrados.
+        Las filas se leen con cursor y se escriben en un hilo (core.excel_export).
         """
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        from io import BytesIO
-        
-        # Obtener datos (sin límite de paginación logic handled inside get_comprobantes via per_page=0 trick or similar in db_service if implemented, 
-        # but here we reuse get_comprobantes which expects per_page.
-        # Let's adjust get_comprobantes call to request all.
-        
-        comprobantes, _ = await self.get_comprobantes(
-            conn,
-            filtros=filtros,
-            per_page=100000
-        )
-
-        # Batch fetch de facturas junction para todos los comprobantes
+        from core.database import iter_cursor_batches
+        from core.excel_export import stream_xlsx
         from .db_service import get_db_service
-        db_svc = get_db_service()
-        comp_ids = [c['id_comprobante'] for c in comprobantes if c.get('id_comprobante')]
-        facturas_map = await db_svc.get_facturas_for_comprobantes(conn, comp_ids)
-
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Comprobantes de Pago"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
 
-        # Headers
-        headers = [
-            "Comprador",
-            "Proveedor",
-            "Proyecto",
-            "Zona",
-            "Fecha de Pago",
-            "Estatus",
-            "Monto",
-            "Moneda",
-            "Categoría",
-            "UUID Factura",
-            "Tipo Factura",
-            "UUIDs Relacionados"
-        ]
-
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-
-        # Datos
-        for row_num, comp in enumerate(comprobantes, 2):
-            # Determinar nombre de proveedor
-            proveedor = comp.get('proveedor_nombre') or comp.get('beneficiario_orig', '')
-
-            # Obtener facturas junction para este comprobante
-            comp_facturas = facturas_map.get(comp.get('id_comprobante'), [])
-            tipos_factura = ", ".join(set(f.get('tipo', '') for f in comp_facturas)) if comp_facturas else ""
-            uuids_rel = ", ".join(f.get('uuid_factura', '')[:8] for f in comp_facturas) if comp_facturas else ""
-
-            row_data = [
-                comp.get('comprador_nombre', ''),
-                proveedor,
-                comp.get('proyecto_nombre', ''),
-                comp.get('zona_nombre', ''),
-                comp['fecha_pago'].strftime("%d/%m/%Y") if comp.get('fecha_pago') else '',
-                comp.get('estatus', ''),
-                comp.get('monto', 0),
-                comp.get('moneda', 'MXN'),
-                comp.get('categoria_nombre', ''),
-                str(comp.get('uuid_factura', '')) if comp.get('uuid_factura') else '',
-                tipos_factura,
-                uuids_rel,
-            ]
+        query, params = get_db_service().build_export_query(filtros)
 
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num, value=value)
-                cell.border = thin_border
+        def _build(wb, rows):
+            ws = wb.add_sheet("Comprobantes de Pago", EXPORT_COLUMNS)
+            ws.write_header()
+            for comp in rows:
+                ws.append(_export_row(comp))
 
-                # Formato especial para monto
-                if col_num == 7:  # Columna Monto
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal="right")
+        return await stream_xlsx(_build, iter_cursor_batches(conn, query, *params))
 
-        # Ajustar anchos de columna
-        column_widths = [20, 35, 30, 15, 15, 15, 15, 10, 20, 40, 18, 40]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-        
-        # Congelar primera fila
-        ws.freeze_panes = "A2"
-        
-        # Exportar a bytes
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return buffer.getvalue()
+    def export_csv(self, filtros: dict):
+        """
+        CSV de comprobantes filtrados como generador de bloques (streaming).
+        Usa su propia conexión del pool, ver core.csv_export.
+        """
+        from core.csv_export import stream_csv_rows
+        from .db_service import get_db_service
+
+        query, params = get_db_service().build_export_query(filtros)
+        return stream_csv_rows(query, params, [c.header for c in EXPORT_COLUMNS], _export_row)
     
     # ========================================
     # CATÁLOGOS
@@ -701,6 +645,83 @@ class ComprasService:
         from .db_service import get_db_service
         db_svc = get_db_service()
 
+        resultado, factura = await self._aplicar_match_xml(
+            conn, db_svc, cfdi_data, id_comprobante, user_id, guardar_relacion
+        )
+        if factura:
+            await db_svc.guardar_conceptos_historial_lote(
+                conn, [factura], user_id, capturar_errores=False
+            )
+        return resultado
+
+    async def confirmar_matches_xml(
+        self,
+        conn,
+        matches: List[Tuple[dict, UUID, bool]],
+        user_id: UUID
+    ) -> dict:
+        """
+        Confirma varios matches XML ↔ comprobante de una carga multiple.
+
+        Cada match se aplica en su propia transaccion (un error no deshace los
+        demas). Los conceptos de todas las facturas confirmadas se ingieren al
+        final con una sola llamada a guardar_conceptos_historial_lote (COPY por
+        batch, errores reportados por batch).
+
+        Args:
+            conn: Conexion a BD
+            matches: tuplas (cfdi_data, id_comprobante, guardar_relacion)
+            user_id: UUID del usuario
+
+        Returns:
+            {'confirmados': [resultado], 'errores': [{'uuid_factura', 'error'}],
+             'conceptos': resultado de guardar_conceptos_historial_lote o None}
+        """
+        from .db_service import get_db_service
+        db_svc = get_db_service()
+
+        confirmados, errores, facturas = [], [], []
+        for cfdi_data, id_comprobante, guardar_relacion in matches:
+            uuid_factura = cfdi_data.get('uuid', '')
+            try:
+                async with conn.transaction():
+                    resultado, factura = await self._aplicar_match_xml(
+                        conn, db_svc, cfdi_data, id_comprobante, user_id, guardar_relacion
+                    )
+            except ValueError as e:
+                errores.append({'uuid_factura': uuid_factura, 'error': str(e)})
+                continue
+            except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.error("Error de BD confirmando match UUID=%s: %s", uuid_factura[:8], e)
+                errores.append({'uuid_factura': uuid_factura, 'error': "Error interno al confirmar"})
+                continue
+
+            confirmados.append(resultado)
+            if factura:
+                facturas.append(factura)
+
+        conceptos = None
+        if facturas:
+            conceptos = await db_svc.guardar_conceptos_historial_lote(conn, facturas, user_id)
+
+        logger.info(
+            "Matches XML en lote: %d confirmados, %d con error, %d facturas con conceptos",
+            len(confirmados), len(errores), len(facturas)
+        )
+        return {'confirmados': confirmados, 'errores': errores, 'conceptos': conceptos}
+
+    async def _aplicar_match_xml(
+        self, conn, db_svc, cfdi_data: dict, id_comprobante: UUID,
+        user_id: UUID, guardar_relacion: bool
+    ) -> Tuple[dict, Optional[dict]]:
+        """
+        Aplica un match (comprobante, junction, relaciones, CFDI relacionados)
+        sin ingerir los conceptos.
+
+        Returns:
+            (resultado, factura) donde factura es la entrada para
+            guardar_conceptos_historial_lote (None si el XML no trae conceptos).
+        """
         uuid_factura = cfdi_data['uuid']
         emisor_rfc = cfdi_data['emisor_rfc']
         tipo_factura = cfdi_data.get('tipo_factura', 'NORMAL')
@@ -772,8 +793,9 @@ class ComprasService:
                     conn, nombre_com, id_proveedor, user_id
                 )
 
-        # 3. Guardar conceptos en historial de materiales
+        # 3. Conceptos para el historial de materiales (los ingiere el llamador)
         conceptos = cfdi_data.get('conceptos', [])
+        factura = None
         if conceptos:
             fecha_str = cfdi_data.get('fecha', '')
             try:
@@ -794,10 +816,13 @@ class ComprasService:
                 for c in conceptos
             ]
 
-            await db_svc.guardar_conceptos_historial(
-                conn, uuid_factura, id_comprobante, id_proveedor,
-                conceptos_dicts, fecha_factura, user_id
-            )
+            factura = {
+                'uuid_factura': uuid_factura,
+                'id_comprobante': id_comprobante,
+                'id_proveedor': id_proveedor,
+                'fecha_factura': fecha_factura,
+                'conceptos': conceptos_dicts,
+            }
 
         # 4. Guardar CFDI relacionados
         relacionados = cfdi_data.get('relacionados', [])
@@ -861,7 +886,7 @@ class ComprasService:
             "conceptos_guardados": len(conceptos),
             "relacionados_guardados": len(relacionados),
             "validacion_ok": validacion_ok,
-        }
+        }, factura
 
     async def buscar_comprobantes_pendientes(
         self, conn, q: Optional[str] = None, limit: int = 20
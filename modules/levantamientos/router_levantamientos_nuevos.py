@@ -732,8 +732,7 @@ def register_nuevos_endpoints(router: APIRouter):
         Genera y descarga un reporte Excel con los gastos (viaticos)
         y el historial de envios de un levantamiento.
         """
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from core.excel_export import XlsxColumn, build_xlsx, MIME_XLSX
 
         lev = await db_svc.get_levantamiento_base(conn, id_levantamiento)
         if not lev:
@@ -742,128 +741,76 @@ def register_nuevos_endpoints(router: APIRouter):
         viaticos = await db_svc.get_viaticos(conn, id_levantamiento)
         historial = await db_svc.get_historial_envios(conn, id_levantamiento)
 
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-        header_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        title_font = Font(bold=True, size=14, color="1F4E79")
-        subtitle_font = Font(bold=True, size=11, color="333333")
-        thin_border = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
-        money_format = '#,##0.00'
-
-        wb = Workbook()
-
-        # ===================== HOJA 1: RESUMEN =====================
-        ws1 = wb.active
-        ws1.title = "Resumen"
-
-        # Titulo
-        ws1.merge_cells('A1:D1')
-        cell_title = ws1.cell(row=1, column=1, value="Reporte de Gastos - Levantamiento")
-        cell_title.font = title_font
-        cell_title.alignment = Alignment(horizontal="center")
-
-        # Info del proyecto
-        info_data = [
-            ("OP-ID:", lev.get("op_id_estandar", "")),
-            ("Cliente:", lev.get("cliente_nombre", "")),
-            ("Proyecto:", lev.get("nombre_proyecto") or lev.get("titulo_proyecto") or "Sin nombre"),
-            ("Direccion:", lev.get("direccion") or lev.get("sitio_direccion") or "Sin direccion"),
-        ]
-        for i, (label, value) in enumerate(info_data, start=3):
-            ws1.cell(row=i, column=1, value=label).font = subtitle_font
-            ws1.cell(row=i, column=2, value=value)
-
-        # Tabla de viaticos
-        viaticos_start_row = len(info_data) + 5
-        ws1.cell(row=viaticos_start_row - 1, column=1, value="Detalle de Viaticos").font = subtitle_font
-
-        viat_headers = ["Usuario", "Concepto", "Monto"]
-        for col_num, header in enumerate(viat_headers, 1):
-            cell = ws1.cell(row=viaticos_start_row, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_align
-            cell.border = thin_border
-
-        total_monto = 0
-        for row_num, v in enumerate(viaticos, start=viaticos_start_row + 1):
-            ws1.cell(row=row_num, column=1, value=v.get("usuario_nombre", "")).border = thin_border
-            ws1.cell(row=row_num, column=2, value=v.get("concepto", "")).border = thin_border
-            monto_cell = ws1.cell(row=row_num, column=3, value=float(v.get("monto", 0)))
-            monto_cell.number_format = money_format
-            monto_cell.border = thin_border
-            total_monto += float(v.get("monto", 0))
-
-        # Fila total
-        total_row = viaticos_start_row + len(viaticos) + 1
-        ws1.cell(row=total_row, column=2, value="TOTAL:").font = Font(bold=True, size=11)
-        total_cell = ws1.cell(row=total_row, column=3, value=total_monto)
-        total_cell.font = Font(bold=True, size=11)
-        total_cell.number_format = money_format
-
-        # Ajustar anchos
-        ws1.column_dimensions['A'].width = 25
-        ws1.column_dimensions['B'].width = 40
-        ws1.column_dimensions['C'].width = 18
-        ws1.column_dimensions['D'].width = 40
-
-        # ===================== HOJA 2: HISTORIAL ENVIOS =====================
-        ws2 = wb.create_sheet("Historial Envios")
-
-        ws2.merge_cells('A1:F1')
-        cell_title2 = ws2.cell(row=1, column=1, value="Historial de Solicitudes de Viaticos")
-        cell_title2.font = title_font
-        cell_title2.alignment = Alignment(horizontal="center")
-
-        hist_headers = ["Fecha Envio", "Enviado Por", "Destinatarios TO", "Destinatarios CC", "Total", "Estatus"]
-        for col_num, header in enumerate(hist_headers, 1):
-            cell = ws2.cell(row=3, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_align
-            cell.border = thin_border
-
-        for row_num, h in enumerate(historial, start=4):
-            fecha = h.get("fecha_envio")
-            fecha_str = fecha.strftime("%d/%m/%Y %H:%M") if fecha else ""
-
-            to_list = h.get("to_destinatarios") or []
-            cc_list = h.get("cc_destinatarios") or []
-            to_str = ", ".join(to_list) if isinstance(to_list, list) else str(to_list)
-            cc_str = ", ".join(cc_list) if isinstance(cc_list, list) else str(cc_list)
-
-            ws2.cell(row=row_num, column=1, value=fecha_str).border = thin_border
-            ws2.cell(row=row_num, column=2, value=h.get("enviado_por_nombre", "")).border = thin_border
-            ws2.cell(row=row_num, column=3, value=to_str).border = thin_border
-            ws2.cell(row=row_num, column=4, value=cc_str).border = thin_border
-            monto_h = ws2.cell(row=row_num, column=5, value=float(h.get("total_monto", 0)))
-            monto_h.number_format = money_format
-            monto_h.border = thin_border
-            ws2.cell(row=row_num, column=6, value=h.get("estatus", "")).border = thin_border
-
-        # Ajustar anchos
-        ws2.column_dimensions['A'].width = 20
-        ws2.column_dimensions['B'].width = 25
-        ws2.column_dimensions['C'].width = 35
-        ws2.column_dimensions['D'].width = 35
-        ws2.column_dimensions['E'].width = 18
-        ws2.column_dimensions['F'].width = 15
-
-        # Guardar a BytesIO
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        def _build(wb):
+            # ===================== HOJA 1: RESUMEN =====================
+            ws1 = wb.add_sheet("Resumen", [
+                XlsxColumn("Usuario", 25),
+                XlsxColumn("Concepto", 40),
+                XlsxColumn("Monto", 18, "money"),
+            ])
+            ws1.set_width(3, 40)
+            ws1.write_title("Reporte de Gastos - Levantamiento", last_col=3)
+            ws1.skip()
+
+            # Info del proyecto
+            ws1.write_info("OP-ID:", lev.get("op_id_estandar", ""), style="subtitle")
+            ws1.write_info("Cliente:", lev.get("cliente_nombre", ""), style="subtitle")
+            ws1.write_info("Proyecto:", lev.get("nombre_proyecto") or lev.get("titulo_proyecto") or "Sin nombre", style="subtitle")
+            ws1.write_info("Direccion:", lev.get("direccion") or lev.get("sitio_direccion") or "Sin direccion", style="subtitle")
+
+            # Tabla de viaticos
+            ws1.skip()
+            ws1.write_text("Detalle de Viaticos")
+            ws1.write_header(freeze=False)
+
+            total_monto = 0
+            for v in viaticos:
+                monto = float(v.get("monto", 0))
+                ws1.append([v.get("usuario_nombre", ""), v.get("concepto", ""), monto])
+                total_monto += monto
+
+            # Fila total
+            ws1.write_cells({1: ("TOTAL:", "total"), 2: (total_monto, "total_money")})
+
+            # ===================== HOJA 2: HISTORIAL ENVIOS =====================
+            ws2 = wb.add_sheet("Historial Envios", [
+                XlsxColumn("Fecha Envio", 20),
+                XlsxColumn("Enviado Por", 25),
+                XlsxColumn("Destinatarios TO", 35),
+                XlsxColumn("Destinatarios CC", 35),
+                XlsxColumn("Total", 18, "money"),
+                XlsxColumn("Estatus", 15),
+            ])
+            ws2.write_title("Historial de Solicitudes de Viaticos", last_col=5)
+            ws2.skip()
+            ws2.write_header(freeze=False)
+
+            for h in historial:
+                fecha = h.get("fecha_envio")
+                fecha_str = fecha.strftime("%d/%m/%Y %H:%M") if fecha else ""
+
+                to_list = h.get("to_destinatarios") or []
+                cc_list = h.get("cc_destinatarios") or []
+                to_str = ", ".join(to_list) if isinstance(to_list, list) else str(to_list)
+                cc_str = ", ".join(cc_list) if isinstance(cc_list, list) else str(cc_list)
+
+                ws2.append([
+                    fecha_str,
+                    h.get("enviado_por_nombre", ""),
+                    to_str,
+                    cc_str,
+                    float(h.get("total_monto", 0)),
+                    h.get("estatus", ""),
+                ])
+
+        buffer = BytesIO(await build_xlsx(_build))
 
         op_id = lev.get("op_id_estandar", "SIN_ID").replace("/", "-")
         filename = f"Reporte_Gastos_{op_id}.xlsx"
 
         return StreamingResponse(
             buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            media_type=MIME_XLSX,
             headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
 
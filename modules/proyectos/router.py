@@ -11,6 +11,7 @@ from core.config import settings
 from core.security import get_current_user_context
 from core.permissions import require_module_access
 from core.database import get_db_connection
+from core.pagination import next_page_url
 from .service import ProyectosService, get_service
 
 templates = Jinja2Templates(directory="templates")
@@ -46,6 +47,10 @@ async def get_proyectos_ui(
         "proyectos": proyectos,
         "area": None,
         "vista_global": True,
+        "next_url": next_page_url(
+            request, proyectos, 50, "created_at", "id_proyecto",
+            path="/proyectos/partials/proyectos"
+        ),
     }
 
     if request.headers.get("hx-request"):
@@ -60,19 +65,23 @@ async def get_proyectos_partial(
     status: Optional[str] = Query(None),
     q: Optional[str] = Query(None),
     limit: int = Query(50),
+    cursor: Optional[str] = Query(None),
     context=Depends(get_current_user_context),
     _=require_module_access("proyectos"),
     conn=Depends(get_db_connection),
     service: ProyectosService = Depends(get_service),
 ):
-    proyectos = await service.get_proyectos(conn, area, status, q, limit)
+    proyectos = await service.get_proyectos(conn, area, status, q, limit, cursor)
 
-    return templates.TemplateResponse("shared/partials/lista_proyectos.html", {
+    # Con cursor solo se devuelven las tarjetas de la siguiente pagina (scroll infinito)
+    template = "shared/partials/lista_proyectos_items.html" if cursor else "shared/partials/lista_proyectos.html"
+    return templates.TemplateResponse(template, {
         "request": request,
         "proyectos": proyectos,
         "area": area,
         "current_module_role": context.get("module_roles", {}).get("proyectos", "viewer"),
         "vista_global": True,
+        "next_url": next_page_url(request, proyectos, limit, "created_at", "id_proyecto"),
     })
 
 
@@ -21,10 +21,11 @@ class ProyectosService:
         area_filter: Optional[str] = None,
         status_filter: Optional[str] = None,
         q: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         return await self.transfers.get_all_proyectos(
-            conn, area_filter, status_filter, q, limit
+            conn, area_filter, status_filter, q, limit, cursor
         )
 
     async def get_kpis(self, conn) -> Dict[str, Any]:
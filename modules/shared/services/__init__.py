@@ -1,7 +1,13 @@
 from .id_generator import IdGeneratorService
 from .client_service import ClientService
+from .client_index import ClientIndex, get_client_index, normalize_client_name
+from .client_autocomplete import ClientAutocomplete, get_client_autocomplete
 from .bess_service import BessService
 from .site_service import SiteService
 
-__all__ = ["IdGeneratorService", "ClientService", "BessService", "SiteService"]
+__all__ = [
+    "IdGeneratorService", "ClientService", "ClientIndex", "get_client_index",
+    "normalize_client_name", "ClientAutocomplete", "get_client_autocomplete",
+    "BessService", "SiteService"
+]
 
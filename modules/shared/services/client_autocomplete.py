@@ -0,0 +1,137 @@
+import bisect
+import heapq
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .client_index import ClientIndex, get_client_index, normalize_client_name
+
+logger = logging.getLogger("SharedServices")
+
+
+class ClientAutocomplete:
+    """
+    Autocompletado de clientes sin tocar la BD.
+
+    Índice ordenado de (token, id) sobre los nombres normalizados del
+    ClientIndex (misma normalización que el matcher fuzzy). Una búsqueda es una
+    bisección por token: cada token escrito debe ser prefijo de algún token del
+    nombre. Si ningún nombre coincide por prefijo se busca la subcadena en el
+    nombre fiscal (la semántica del ILIKE '%term%' anterior: medio de palabra o
+    sufijos que la normalización descarta, p.ej. "GROUP"). Los resultados de
+    búsquedas frecuentes quedan en un LRU que se descarta cuando cambia la
+    versión del ClientIndex (recarga o alta).
+
+    Coalescing por sesión: si llega una búsqueda más reciente de la misma
+    sesión mientras la anterior espera la carga del índice, la anterior se
+    descarta (retorna None) para no pisar resultados más nuevos.
+    """
+
+    MAX_RESULTS = 10
+    MIN_QUERY_LENGTH = 2
+    CACHE_MAX_ITEMS = 512
+
+    def __init__(self, index: ClientIndex):
+        self._index = index
+        # Listas paralelas ordenadas por token: bisección sobre _token_keys, ids por slice
+        self._token_keys: List[str] = []
+        self._token_ids: List[UUID] = []
+        self._built_version: int = -1
+        self._cache: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._session_seq: Dict[str, int] = {}
+
+    def _rebuild_if_stale(self):
+        if self._built_version == self._index.version:
+            return
+        tokens: List[Tuple[str, UUID]] = []
+        for client_id, (_, normalized) in self._index.entries().items():
+            for token in set(normalized.split()):
+                tokens.append((token, client_id))
+        tokens.sort(key=lambda t: t[0])
+        self._token_keys = [t[0] for t in tokens]
+        self._token_ids = [t[1] for t in tokens]
+        self._built_version = self._index.version
+        self._cache.clear()
+
+    def _ids_with_prefix(self, prefix: str) -> set:
+        lo = bisect.bisect_left(self._token_keys, prefix)
+        hi = bisect.bisect_left(self._token_keys, prefix + "\uffff", lo)
+        return set(self._token_ids[lo:hi])
+
+    def lookup(self, query: str) -> List[dict]:
+        """Sugerencias para `query` con el índice ya cargado (síncrono, sin I/O)."""
+        self._rebuild_if_stale()
+
+        termino = query.strip().upper()
+        if not termino:
+            return []
+
+        cached = self._cache.get(termino)
+        if cached is not None:
+            self._cache.move_to_end(termino)
+            return cached
+
+        normalized = normalize_client_name(query)
+        query_tokens = normalized.split()
+        entries = self._index.entries()
+
+        # Intersección empezando por el token más largo (el más selectivo)
+        ids = set()
+        if query_tokens:
+            query_tokens.sort(key=len, reverse=True)
+            ids = self._ids_with_prefix(query_tokens[0])
+            for token in query_tokens[1:]:
+                if not ids:
+                    break
+                ids &= self._ids_with_prefix(token)
+
+        if not ids:
+            # Sin coincidencias por prefijo: subcadena sobre el nombre fiscal
+            ids = {i for i, (nombre, _) in entries.items() if termino in nombre.upper()}
+
+        # Primero los que empiezan con lo escrito, luego alfabético
+        ordered = heapq.nsmallest(
+            self.MAX_RESULTS,
+            (entries[i] + (i,) for i in ids if i in entries),
+            key=lambda e: (not e[1].startswith(normalized), e[0])
+        )
+        results = [
+            {"id": str(client_id), "nombre_fiscal": nombre}
+            for nombre, _, client_id in ordered
+        ]
+
+        self._cache[termino] = results
+        if len(self._cache) > self.CACHE_MAX_ITEMS:
+            self._cache.popitem(last=False)
+        return results
+
+    async def suggest(self, conn, query: str, session_key: Optional[str] = None) -> Optional[List[dict]]:
+        """
+        Top-10 sugerencias. Retorna None si una búsqueda más reciente de la
+        misma sesión ya reemplazó a esta.
+        """
+        if not query or len(query.strip()) < self.MIN_QUERY_LENGTH:
+            return []
+
+        seq = None
+        if session_key:
+            seq = self._session_seq.get(session_key, 0) + 1
+            self._session_seq[session_key] = seq
+
+        try:
+            await self._index.ensure_loaded(conn)
+            if session_key and self._session_seq.get(session_key) != seq:
+                return None
+            return self.lookup(query)
+        finally:
+            if session_key and self._session_seq.get(session_key) == seq:
+                del self._session_seq[session_key]
+
+
+# Instancia por worker
+_client_autocomplete = ClientAutocomplete(get_client_index())
+
+
+def get_client_autocomplete() -> ClientAutocomplete:
+    return _client_autocomplete
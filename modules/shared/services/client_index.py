@@ -0,0 +1,187 @@
+import asyncio
+import difflib
+import re
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+logger = logging.getLogger("SharedServices")
+
+
+# Sufijos legales a ignorar en la comparación (orden importa: se aplican en secuencia)
+CLIENT_NAME_SUFFIXES = [
+    r"\bS\.?A\.? DE C\.?V\.?\b",
+    r"\bS\.?A\.?\b",
+    r"\bS\.? DE R\.?L\.?\b",
+    r"\bLTD\b",
+    r"\bINC\b",
+    r"\bLLC\b",
+    r"\bS\.?A\.?P\.?I\.?\b",
+    r"\bS\.?C\.?\b",
+    r"\bA\.?C\.?\b",
+    r"\bCORP\b",
+    r"\bS\.?A\.?S\.?\b",
+    r"\bGROUP\b",
+    r"\bS\.?A\.?B\.?\b",
+    r"\bDE C\.?V\.?\b"
+]
+
+_SUFFIX_PATTERNS = [re.compile(s, re.IGNORECASE) for s in CLIENT_NAME_SUFFIXES]
+_NON_ALNUM = re.compile(r"[^A-Z0-9\s]")
+
+
+def normalize_client_name(name: str) -> str:
+    """
+    Normaliza un nombre de cliente para comparación:
+    1. Mayúsculas
+    2. Elimina sufijos legales (SA de CV, etc)
+    3. Elimina caracteres especiales y espacios extra
+    """
+    clean = name.upper()
+    for pattern in _SUFFIX_PATTERNS:
+        clean = pattern.sub("", clean)
+    clean = _NON_ALNUM.sub("", clean)
+    return clean.strip()
+
+
+def _trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ClientIndex:
+    """
+    Índice en memoria (por worker) de nombres de clientes normalizados.
+
+    - `_by_normalized`: nombre normalizado -> ids (coincidencia exacta O(1))
+    - `_postings`: trigrama -> ids, para podar candidatos antes de difflib
+
+    El matching fuzzy solo corre SequenceMatcher sobre los TOP_CANDIDATES
+    con más trigramas en común, en lugar de sobre todos los clientes.
+
+    Se mantiene fresco con `add()` al insertar un cliente en este worker y con
+    recarga completa cuando expira el TTL (altas hechas en otros workers).
+    """
+
+    TOP_CANDIDATES = 10
+    TTL_SECONDS = 300
+    # Antes de crear un cliente nuevo se recarga si el índice tiene más de esto
+    MISS_RELOAD_SECONDS = 30
+
+    def __init__(self):
+        self._names: Dict[UUID, Tuple[str, str]] = {}  # id -> (nombre_fiscal, normalizado)
+        self._by_normalized: Dict[str, Set[UUID]] = {}
+        self._postings: Dict[str, Set[UUID]] = {}
+        self._loaded_at: float = 0.0
+        self._lock = asyncio.Lock()
+        # Cambia con cada recarga/alta; los índices derivados (autocomplete) lo comparan
+        self.version: int = 0
+
+    # ─── Carga / invalidación ───
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self._loaded_at if self._loaded_at else float("inf")
+
+    def _index_entry(self, names, by_normalized, postings, client_id: UUID, nombre: str):
+        normalized = normalize_client_name(nombre or "")
+        names[client_id] = (nombre, normalized)
+        by_normalized.setdefault(normalized, set()).add(client_id)
+        for gram in _trigrams(normalized):
+            postings.setdefault(gram, set()).add(client_id)
+
+    def _build(self, rows: Iterable[Tuple[UUID, str]]):
+        names: Dict[UUID, Tuple[str, str]] = {}
+        by_normalized: Dict[str, Set[UUID]] = {}
+        postings: Dict[str, Set[UUID]] = {}
+        for client_id, nombre in rows:
+            self._index_entry(names, by_normalized, postings, client_id, nombre)
+        return names, by_normalized, postings
+
+    async def reload(self, conn):
+        """Recarga completa desde tb_clientes. La normalización corre en un hilo."""
+        rows = await conn.fetch("SELECT id, nombre_fiscal FROM tb_clientes")
+        built = await asyncio.to_thread(self._build, [(r['id'], r['nombre_fiscal']) for r in rows])
+        # Reemplazo atómico: las lecturas concurrentes ven el índice viejo o el nuevo
+        self._names, self._by_normalized, self._postings = built
+        self._loaded_at = time.monotonic()
+        self.version += 1
+        logger.info(f"Índice de clientes cargado: {len(self._names)} clientes")
+
+    async def ensure_loaded(self, conn, max_age_seconds: Optional[float] = None):
+        """Carga el índice si no existe o es más viejo que max_age_seconds (default TTL)."""
+        max_age = self.TTL_SECONDS if max_age_seconds is None else max_age_seconds
+        if self.age_seconds <= max_age:
+            return
+        async with self._lock:
+            if self.age_seconds > max_age:
+                await self.reload(conn)
+
+    def add(self, client_id: UUID, nombre: str):
+        """Registra un cliente recién insertado (sin esperar al TTL)."""
+        if not self._loaded_at:
+            return
+        self._index_entry(self._names, self._by_normalized, self._postings, client_id, nombre)
+        self.version += 1
+
+    def invalidate(self):
+        """Fuerza recarga completa en el siguiente uso."""
+        self._loaded_at = 0.0
+
+    # ─── Consulta ───
+
+    def candidates(self, normalized: str, limit: int) -> List[UUID]:
+        """Ids con más trigramas en común (coeficiente de Dice), mejores primero."""
+        grams = _trigrams(normalized)
+        shared: Counter = Counter()
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if ids:
+                shared.update(ids)
+        if not shared:
+            return []
+
+        def dice(client_id: UUID) -> float:
+            other = len(self._names[client_id][1]) + 1  # trigramas del nombre acolchado
+            return 2.0 * shared[client_id] / (len(grams) + other)
+
+        return sorted(shared, key=dice, reverse=True)[:limit]
+
+    def best_match(self, nombre: str, threshold: float) -> Optional[Tuple[UUID, str, float]]:
+        """
+        Mejor coincidencia fuzzy para `nombre`.
+
+        Returns:
+            (id, nombre_fiscal, score) si score >= threshold, si no None.
+        """
+        normalized = normalize_client_name(nombre)
+
+        if len(normalized) > 2:
+            exactos = self._by_normalized.get(normalized)
+            if exactos:
+                client_id = next(iter(exactos))
+                return client_id, self._names[client_id][0], 1.0
+
+        best_id, best_score = None, 0.0
+        for client_id in self.candidates(normalized, self.TOP_CANDIDATES):
+            score = difflib.SequenceMatcher(None, normalized, self._names[client_id][1]).ratio()
+            if score > best_score:
+                best_id, best_score = client_id, score
+
+        if best_id is not None and best_score >= threshold:
+            return best_id, self._names[best_id][0], best_score
+        return None
+
+    def entries(self) -> Dict[UUID, Tuple[str, str]]:
+        """Snapshot de {id: (nombre_fiscal, normalizado)} para otros índices."""
+        return self._names
+
+
+# Instancia por worker
+_client_index = ClientIndex()
+
+
+def get_client_index() -> ClientIndex:
+    return _client_index
@@ -1,9 +1,9 @@
 import difflib
-import re
 from uuid import UUID, uuid4
 import logging
 from typing import Optional, Tuple
 from modules.shared.utils import sanitize_input_string
+from .client_index import ClientIndex, get_client_index, normalize_client_name, CLIENT_NAME_SUFFIXES
 
 logger = logging.getLogger("SharedServices")
 
@@ -14,22 +14,10 @@ class ClientService:
     """
 
     # Sufijos comunes a ignorar para la comparación
-    SUFFIXES = [
-        r"\bS\.?A\.? DE C\.?V\.?\b",
-        r"\bS\.?A\.?\b",
-        r"\bS\.? DE R\.?L\.?\b",
-        r"\bLTD\b",
-        r"\bINC\b",
-        r"\bLLC\b",
-        r"\bS\.?A\.?P\.?I\.?\b",
-        r"\bS\.?C\.?\b",
-        r"\bA\.?C\.?\b",
-        r"\bCORP\b",
-        r"\bS\.?A\.?S\.?\b",
-        r"\bGROUP\b",
-        r"\bS\.?A\.?B\.?\b",
-        r"\bDE C\.?V\.?\b"
-    ]
+    SUFFIXES = CLIENT_NAME_SUFFIXES
+
+    # Score mínimo (SequenceMatcher) para considerar que es el mismo cliente
+    FUZZY_THRESHOLD = 0.88
 
     @classmethod
     def _normalize_name(cls, name: str) -> str:
@@ -39,16 +27,7 @@ class ClientService:
         2. Elimina sufijos legales (SA de CV, etc)
         3. Elimina caracteres especiales y espacios extra
         """
-        clean = name.upper()
-        
-        # Eliminar sufijos
-        for suffix in cls.SUFFIXES:
-            clean = re.sub(suffix, "", clean, flags=re.IGNORECASE)
-            
-        # Eliminar caracteres no alfanuméricos (excepto espacios)
-        clean = re.sub(r"[^A-Z0-9\s]", "", clean)
-        
-        return clean.strip()
+        return normalize_client_name(name)
 
     @staticmethod
     def _sanitize_for_storage(name: str) -> str:
@@ -75,7 +54,7 @@ class ClientService:
         Strategy:
         1. ID Explícito (si user seleccionó dropdown)
         2. Coincidencia Exacta (ILIKE) -> Rápido
-        3. Coincidencia Fuzzy (Normalización + Difflib) -> Lento pero seguro
+        3. Coincidencia Fuzzy (índice en memoria: trigramas + Difflib sobre los mejores candidatos)
         
         Args:
             conn: Conexión a BD
@@ -106,32 +85,27 @@ class ClientService:
         if existing_client:
             return existing_client['id'], existing_client['nombre_fiscal'], existing_client['id_interno_simulacion']
             
-        # 3. Búsqueda Fuzzy (Smart Match)
+        # 3. Búsqueda Fuzzy (Smart Match) sobre el índice en memoria del worker
         if len(final_nombre) > 3:
-            all_clients = await conn.fetch("SELECT id, nombre_fiscal, id_interno_simulacion FROM tb_clientes")
-            
-            normalized_input = ClientService._normalize_name(final_nombre)
-            best_match = None
-            highest_score = 0.0
+            index = get_client_index()
+            await index.ensure_loaded(conn)
+            match = index.best_match(final_nombre, ClientService.FUZZY_THRESHOLD)
             
-            THRESHOLD = 0.88 
+            # Sin match: el cliente pudo darse de alta en otro worker; recargar antes de crear
+            if not match and index.age_seconds > ClientIndex.MISS_RELOAD_SECONDS:
+                await index.ensure_loaded(conn, max_age_seconds=ClientIndex.MISS_RELOAD_SECONDS)
+                match = index.best_match(final_nombre, ClientService.FUZZY_THRESHOLD)
             
-            for row in all_clients:
-                db_name = row['nombre_fiscal']
-                normalized_db = ClientService._normalize_name(db_name)
-                
-                if normalized_input == normalized_db and len(normalized_input) > 2:
-                    score = 1.0
-                else:
-                    score = ClientService._calculate_similarity(normalized_input, normalized_db)
-                
-                if score > highest_score:
-                    highest_score = score
-                    best_match = row
-                    
-            if best_match and highest_score >= THRESHOLD:
-                logger.info(f"SMART MATCH: '{final_nombre}' -> '{best_match['nombre_fiscal']}' (Score: {highest_score:.2f})")
-                return best_match['id'], best_match['nombre_fiscal'], best_match['id_interno_simulacion']
+            if match:
+                match_id, match_nombre, score = match
+                row = await conn.fetchrow(
+                    "SELECT id, nombre_fiscal, id_interno_simulacion FROM tb_clientes WHERE id = $1", match_id
+                )
+                if row:
+                    logger.info(f"SMART MATCH: '{final_nombre}' -> '{row['nombre_fiscal']}' (Score: {score:.2f})")
+                    return row['id'], row['nombre_fiscal'], row['id_interno_simulacion']
+                # El cliente ya no existe: el índice está desfasado
+                index.invalidate()
         
         # 4. Si no hubo match, crear nuevo
         new_id = uuid4()
@@ -142,5 +116,6 @@ class ClientService:
             "INSERT INTO tb_clientes (id, nombre_fiscal, id_interno_simulacion) VALUES ($1, $2, $3)",
             new_id, final_nombre, initial_id_interno
         )
+        get_client_index().add(new_id, final_nombre)
         logger.info(f"Nuevo cliente creado: {final_nombre} ({new_id}) | ID Maestro: {initial_id_interno}")
         return new_id, final_nombre, initial_id_interno
@@ -0,0 +1,294 @@
+# modules/simulacion/chart_renderer.py
+"""
+Renderizado server-side de gráficas para el PDF de Reportes de Simulación.
+
+Dibuja los `DatosGrafica` que produce `ReportesSimulacionService.get_datos_graficas`
+con matplotlib (backend Agg) en un pool de procesos, de modo que el PDF se puede
+generar sin navegador.
+
+Los PNG se guardan en un caché direccionado por contenido: la llave es el hash
+SHA-256 de los datos de la gráfica (tipo, labels, datasets, opciones y tamaño),
+por lo que una gráfica idéntica no se vuelve a dibujar.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from typing import Dict, Optional, Tuple
+
+from .report_service import DatosGrafica
+
+logger = logging.getLogger("ChartRenderer")
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Llaves de get_datos_graficas -> llaves que espera ReportePDFGenerator
+CHART_KEYS_PDF = {
+    'estatus_pie': 'estatus',
+    'mensual_bar': 'mensual',
+    'tecnologia_pie': 'tecnologia',
+    'kpi_bar': 'kpi',
+    'motivos_bar': 'motivos',
+}
+
+# Tamaño (pulgadas) por gráfica, proporcional al espacio que ocupa en el PDF
+CHART_SIZES: Dict[str, Tuple[float, float]] = {
+    'estatus': (5.0, 5.0),
+    'mensual': (9.0, 3.5),
+    'tecnologia': (5.0, 5.0),
+    'kpi': (9.0, 3.0),
+    'motivos': (9.0, 4.5),
+}
+
+CHART_DPI = 110
+MAX_WORKERS = 2
+CACHE_MAX_ITEMS = 256
+
+COLOR_DEFAULT = '#6B7280'
+
+
+# =============================================================================
+# RENDER (se ejecuta dentro del proceso worker)
+# =============================================================================
+
+def _render_png(spec: dict, size: Tuple[float, float], dpi: int) -> bytes:
+    """
+    Dibuja una gráfica a PNG. Función de módulo para poder enviarse al pool.
+
+    Usa la API orientada a objetos (Figure + FigureCanvasAgg) en lugar de
+    pyplot para no depender de estado global.
+    """
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    tipo = spec.get('tipo', 'bar')
+    labels = spec.get('labels') or []
+    datasets = spec.get('datasets') or []
+    opciones = spec.get('opciones') or {}
+
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+
+    if not labels or not datasets:
+        ax.axis('off')
+        ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center', color=COLOR_DEFAULT, fontsize=12)
+
+    elif tipo in ('pie', 'doughnut'):
+        ds = datasets[0]
+        valores = [float(v or 0) for v in ds.get('data', [])]
+        colores = ds.get('backgroundColor')
+        if isinstance(colores, str):
+            colores = [colores] * len(valores)
+
+        if sum(valores) <= 0:
+            ax.axis('off')
+            ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center', color=COLOR_DEFAULT, fontsize=12)
+        else:
+            wedgeprops = {'width': 0.45, 'edgecolor': 'white'} if tipo == 'doughnut' else {'edgecolor': 'white'}
+            ax.pie(
+                valores,
+                colors=colores or None,
+                autopct=lambda p: f"{p:.0f}%" if p >= 4 else '',
+                pctdistance=0.78 if tipo == 'doughnut' else 0.65,
+                startangle=90,
+                counterclock=False,
+                wedgeprops=wedgeprops,
+                textprops={'fontsize': 8, 'color': 'white'},
+            )
+            ax.axis('equal')
+            ax.legend(labels, loc='center left', bbox_to_anchor=(1.0, 0.5), fontsize=8, frameon=False)
+
+    else:
+        horizontal = opciones.get('indexAxis') == 'y'
+        n_series = len(datasets)
+        ancho = 0.8 / max(n_series, 1)
+        posiciones = list(range(len(labels)))
+
+        for i, ds in enumerate(datasets):
+            valores = [float(v or 0) for v in ds.get('data', [])]
+            offset = (i - (n_series - 1) / 2) * ancho
+            pos = [p + offset for p in posiciones[:len(valores)]]
+            color = ds.get('backgroundColor') or COLOR_DEFAULT
+            if horizontal:
+                ax.barh(pos, valores, height=ancho, color=color, label=ds.get('label'))
+            else:
+                ax.bar(pos, valores, width=ancho, color=color, label=ds.get('label'))
+
+        if horizontal:
+            ax.set_yticks(posiciones)
+            ax.set_yticklabels(labels, fontsize=8)
+            ax.invert_yaxis()
+            ax.grid(axis='x', alpha=0.3)
+        else:
+            ax.set_xticks(posiciones)
+            ax.set_xticklabels(labels, fontsize=8)
+            ax.grid(axis='y', alpha=0.3)
+
+        for lado in ('top', 'right'):
+            ax.spines[lado].set_visible(False)
+        ax.tick_params(labelsize=8)
+        ax.set_axisbelow(True)
+
+        if n_series > 1:
+            ax.legend(fontsize=8, frameon=False)
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+# =============================================================================
+# SERVICIO
+# =============================================================================
+
+class ChartRenderer:
+    """
+    Renderiza gráficas a PNG en un pool de procesos con caché por contenido.
+
+    Un solo pool por worker de gunicorn (se crea bajo demanda). El caché es un
+    LRU en memoria acotado a CACHE_MAX_ITEMS entradas.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, cache_max_items: int = CACHE_MAX_ITEMS):
+        self._max_workers = max_workers
+        self._cache_max_items = cache_max_items
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def chart_hash(grafica: DatosGrafica, size: Tuple[float, float], dpi: int = CHART_DPI) -> str:
+        """Hash estable de los datos de la gráfica + dimensiones de salida."""
+        payload = {'grafica': asdict(grafica), 'size': list(size), 'dpi': dpi}
+        canonical = json.dumps(payload, sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    def _descartar_executor(self, executor: ProcessPoolExecutor):
+        """Libera un pool roto; el siguiente _get_executor crea uno nuevo."""
+        # Otra request pudo haberlo recreado ya: no cerrar el pool nuevo
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _render_en_pool(self, grafica: dict, size: Tuple[float, float]) -> bytes:
+        """
+        Dibuja en el pool de procesos. Si un proceso hijo murió (OOM, kill) el
+        pool queda roto para siempre: se descarta y se reintenta una vez.
+        """
+        loop = asyncio.get_running_loop()
+        for intento in range(2):
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, _render_png, grafica, size, CHART_DPI)
+            except BrokenProcessPool:
+                if intento:
+                    raise
+                logger.warning("Pool de gráficas roto, se recrea y se reintenta")
+                self._descartar_executor(executor)
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+        return png
+
+    def _cache_put(self, key: str, png: bytes):
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_max_items:
+            self._cache.popitem(last=False)
+
+    async def render(self, grafica: DatosGrafica, size: Tuple[float, float] = (8.0, 4.0)) -> bytes:
+        """Retorna el PNG de una gráfica, usando el caché si ya fue dibujada."""
+        key = self.chart_hash(grafica, size)
+
+        png = self._cache_get(key)
+        if png is not None:
+            return png
+
+        # Si otra request ya está dibujando la misma gráfica, esperar su resultado
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.ensure_future(self._render_en_pool(asdict(grafica), size))
+        self._inflight[key] = future
+        try:
+            png = await future
+            self._cache_put(key, png)
+            return png
+        finally:
+            self._inflight.pop(key, None)
+
+    async def render_report_charts(
+        self,
+        graficas: Dict[str, DatosGrafica],
+        omitir: Optional[set] = None
+    ) -> Dict[str, bytes]:
+        """
+        Renderiza las gráficas de get_datos_graficas con las llaves del PDF.
+
+        Args:
+            graficas: Resultado de get_datos_graficas
+            omitir: Llaves del PDF que ya vienen del cliente y no hay que dibujar
+
+        Returns:
+            Dict {llave_pdf: png_bytes}. Las gráficas que fallen se omiten
+            (el PDF muestra su placeholder de error).
+        """
+        omitir = omitir or set()
+        pendientes = {
+            CHART_KEYS_PDF[k]: g for k, g in graficas.items()
+            if k in CHART_KEYS_PDF and CHART_KEYS_PDF[k] not in omitir
+        }
+
+        resultados = await asyncio.gather(
+            *(self.render(g, CHART_SIZES.get(k, (8.0, 4.0))) for k, g in pendientes.items()),
+            return_exceptions=True
+        )
+
+        imagenes = {}
+        for key, res in zip(pendientes.keys(), resultados):
+            if isinstance(res, Exception):
+                logger.error(f"Error renderizando gráfica {key}: {res}")
+                continue
+            imagenes[key] = res
+        return imagenes
+
+    def shutdown(self):
+        """Libera el pool de procesos (llamado en el shutdown de la app)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# =============================================================================
+# HELPER PARA INYECCIÓN DE DEPENDENCIAS
+# =============================================================================
+
+_chart_renderer = ChartRenderer()
+
+
+def get_chart_renderer() -> ChartRenderer:
+    return _chart_renderer
+
+
+async def shutdown_chart_renderer():
+    _chart_renderer.shutdown()
@@ -5,9 +5,21 @@ from decimal import Decimal
 import logging
 
 from core.database import get_db_connection
+from core.pagination import decode_cursor
+from core.search import prepare_search_term, search_match, search_rank
+from core.dashboard_stats import DashboardScan
+from core.query_builder import Filtro, FiltroSQL
 
 logger = logging.getLogger("SimulacionDBService")
 
+# Filtros opcionales de reportes (el rango de fechas siempre va)
+FILTROS_REPORTE = FiltroSQL(
+    Filtro('id_tecnologia', 'o.id_tecnologia = {p}'),
+    Filtro('id_tipo_solicitud', 'o.id_tipo_solicitud = {p}'),
+    Filtro('id_estatus', 'o.id_estatus_global = {p}'),
+    Filtro('responsable_id', 'o.responsable_simulacion_id = {p}'),
+)
+
 class SimulacionDBService:
     """
     Data Access Layer para el módulo de Simulación.
@@ -347,46 +359,26 @@ class SimulacionDBService:
 
     # --- KPIs & Dashboard Stats ---
 
-    async def get_kpi_total_oportunidades(self, conn, email_enviado: bool = True) -> int:
-        """Cuenta total de oportunidades con filtro parametrizado."""
-        return await conn.fetchval(
-            "SELECT count(*) FROM tb_oportunidades WHERE email_enviado = $1",
-            email_enviado
+    async def get_dashboard_scan(self, conn) -> Dict[str, Any]:
+        """
+        KPIs y gráficas del dashboard en un solo escaneo (core.dashboard_stats).
+        Ganadas = Entregado + Ganada; Perdidas = Perdido + Cancelado.
+        """
+        scan = DashboardScan(
+            """tb_oportunidades o
+                LEFT JOIN tb_cat_estatus_global e ON o.id_estatus_global = e.id
+                LEFT JOIN tb_cat_tipos_solicitud t ON o.id_tipo_solicitud = t.id
+                LEFT JOIN tb_cat_tecnologias tec ON o.id_tecnologia = tec.id""",
+            "WHERE o.email_enviado = true"
         )
-
-    async def get_kpi_conteo_estatus(self, conn, status_ids: List[int]) -> int:
-        return await conn.fetchval(
-            "SELECT COUNT(*) FROM tb_oportunidades WHERE id_estatus_global = ANY($1) AND email_enviado = true",
-            status_ids
-        )
-    
-    async def get_kpi_levantamientos(self, conn, id_levantamiento: int) -> int:
-        return await conn.fetchval(
-            "SELECT COUNT(*) FROM tb_oportunidades WHERE id_tipo_solicitud = $1 AND email_enviado = true",
-            id_levantamiento
-        )
-    
-    async def get_chart_tech_mix(self, conn) -> List[Dict[str, Any]]:
-        rows = await conn.fetch("""
-            SELECT t.nombre, COUNT(o.id_oportunidad) as total 
-            FROM tb_oportunidades o
-            JOIN tb_cat_tecnologias t ON o.id_tecnologia = t.id
-            WHERE o.email_enviado = true
-            GROUP BY t.nombre
-            ORDER BY total DESC
-            LIMIT 5
-        """)
-        return [dict(r) for r in rows]
-    
-    async def get_chart_trend(self, conn) -> List[Dict[str, Any]]:
-        rows = await conn.fetch("""
-            SELECT to_char(fecha_solicitud, 'YYYY-MM-DD') as fecha, COUNT(*) as total
-            FROM tb_oportunidades
-            WHERE fecha_solicitud >= NOW() - INTERVAL '30 days' AND email_enviado = true
-            GROUP BY 1
-            ORDER BY 1 ASC
-        """)
-        return [dict(r) for r in rows]
+        scan.kpi("ganadas", "LOWER(e.nombre) IN ('entregado', 'ganada')")
+        scan.kpi("perdidas", "LOWER(e.nombre) IN ('perdido', 'cancelado')")
+        scan.kpi("levantamientos", "LOWER(t.nombre) = 'levantamiento'")
+        scan.series("mix", tecnologia="tec.nombre")
+        scan.series("trend", fecha="""
+            CASE WHEN o.fecha_solicitud >= NOW() - INTERVAL '30 days'
+                 THEN to_char(o.fecha_solicitud, 'YYYY-MM-DD') END""")
+        return await scan.fetch(conn)
 
     async def get_status_map(self, conn) -> Dict[str, int]:
         rows = await conn.fetch("SELECT id, LOWER(nombre) as nombre FROM tb_cat_estatus_global WHERE activo = true")
@@ -397,7 +389,7 @@ class SimulacionDBService:
             "SELECT id FROM tb_cat_tipos_solicitud WHERE LOWER(nombre) = 'levantamiento' LIMIT 1"
         )
 
-    async def get_oportunidades_filtradas(self, conn, tab: str, subtab: Optional[str], q: Optional[str], limit: int, filtro_tecnologia_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    async def get_oportunidades_filtradas(self, conn, tab: str, subtab: Optional[str], q: Optional[str], limit: int, filtro_tecnologia_id: Optional[int] = None, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         status_map = await self.get_status_map(conn)
         
         # Query base
@@ -503,13 +495,36 @@ class SimulacionDBService:
             query += f" AND o.id_tecnologia = ${len(params) + 1}"
             params.append(filtro_tecnologia_id)
 
-        # Búsqueda
-        if q:
-            param_ph = f"${len(params) + 1}"
-            query += f" AND (o.op_id_estandar ILIKE {param_ph} OR o.nombre_proyecto ILIKE {param_ph} OR o.cliente_nombre ILIKE {param_ph})"
-            params.append(f"%{q}%")
+        # Búsqueda (documento sin acentos con índice trigram, ver core/search.py)
+        search_term = prepare_search_term(q)
+        param_ph = f"${len(params) + 1}"
+        if search_term:
+            query += f" AND {search_match('o.search_doc', param_ph)}"
+            params.append(search_term)
+
+        # Keyset: registros estrictamente anteriores al último de la página previa.
+        # Con búsqueda el orden es (relevancia, fecha, id); la relevancia del
+        # último registro se recalcula en SQL a partir de su id.
+        cursor_values = decode_cursor(cursor)
+        if cursor_values:
+            fecha_ph, id_ph = f"${len(params) + 1}", f"${len(params) + 2}::uuid"
+            if search_term:
+                rank_cursor = (
+                    f"(SELECT {search_rank('c.search_doc', param_ph)} "
+                    f"FROM tb_oportunidades c WHERE c.id_oportunidad = {id_ph})"
+                )
+                query += (
+                    f" AND ({search_rank('o.search_doc', param_ph)}, o.fecha_solicitud, o.id_oportunidad)"
+                    f" < ({rank_cursor}, {fecha_ph}, {id_ph})"
+                )
+            else:
+                query += f" AND (o.fecha_solicitud, o.id_oportunidad) < ({fecha_ph}, {id_ph})"
+            params.extend(cursor_values)
 
-        query += " ORDER BY o.fecha_solicitud DESC"
+        if search_term:
+            query += f" ORDER BY {search_rank('o.search_doc', param_ph)} DESC, o.fecha_solicitud DESC, o.id_oportunidad DESC"
+        else:
+            query += " ORDER BY o.fecha_solicitud DESC, o.id_oportunidad DESC"
         
         if limit > 0:
             query += f" LIMIT {limit}"
@@ -521,32 +536,17 @@ class SimulacionDBService:
 
     def _build_report_where_clause(self, filters: Dict[str, Any], param_offset: int = 0) -> Tuple[str, List]:
         """
-        Construye cláusula WHERE dinámica para reportes.
+        Construye cláusula WHERE para reportes (forma canónica, ver core/query_builder.py).
         filters keys: fecha_inicio, fecha_fin, id_tecnologia, id_tipo_solicitud, id_estatus, responsable_id
         """
         conditions = [
             "e.modulo_aplicable = 'SIMULACION'",
             f"o.fecha_solicitud >= ${param_offset + 1}::timestamptz",
-            f"o.fecha_solicitud < ${param_offset + 2}::timestamptz + INTERVAL '1 day'"
+            f"o.fecha_solicitud < ${param_offset + 2}::timestamptz + INTERVAL '1 day'",
+            *FILTROS_REPORTE.condiciones(param_offset + 2)
         ]
-        params = [filters['fecha_inicio'], filters['fecha_fin']]
-        
-        if filters.get('id_tecnologia'):
-            conditions.append(f"o.id_tecnologia = ${param_offset + len(params) + 1}")
-            params.append(filters['id_tecnologia'])
-        
-        if filters.get('id_tipo_solicitud'):
-            conditions.append(f"o.id_tipo_solicitud = ${param_offset + len(params) + 1}")
-            params.append(filters['id_tipo_solicitud'])
-        
-        if filters.get('id_estatus'):
-            conditions.append(f"o.id_estatus_global = ${param_offset + len(params) + 1}")
-            params.append(filters['id_estatus'])
-        
-        if filters.get('responsable_id'):
-            conditions.append(f"o.responsable_simulacion_id = ${param_offset + len(params) + 1}")
-            params.append(filters['responsable_id'])
-        
+        params = [filters['fecha_inicio'], filters['fecha_fin'], *FILTROS_REPORTE.valores(filters)]
+
         where_clause = " AND ".join(conditions)
         return f"WHERE {where_clause}", params
 
@@ -971,14 +971,5 @@ class SimulacionDBService:
         rows = await conn.fetch(query, *params)
         return [dict(r) for r in rows]
 
-QUERY_INSERT_HISTORIAL_ESTATUS = """
-    INSERT INTO tb_historial_estatus (
-        id_oportunidad, id_estatus_anterior, id_estatus_nuevo, 
-        fecha_cambio_real, fecha_cambio_sla, cambiado_por_id
-    ) VALUES (
-        $1, $2, $3, $4, $5, $6
-    )
-"""
-
 def get_db_service() -> SimulacionDBService:
     return SimulacionDBService()
@@ -4,6 +4,11 @@ Servicio de Métricas Operativas para Simulación.
 
 Proporciona análisis de tiempos entre estatus, cuellos de botella
 y ciclos de retrabajo para el dashboard de administradores.
+
+Fuente: tb_intervalos_estatus (una fila por estancia en un estatus), que se
+mantiene al insertar en tb_historial_estatus (ver insertar_historial_estatus en
+modules/comercial/db_service.py).
+Las métricas son agregados indexados sobre intervalos ya calculados.
 """
 
 from dataclasses import dataclass
@@ -88,11 +93,11 @@ class MetricsService:
         Calcula tiempo promedio en cada estatus.
         
         Lógica:
-        - Para cada oportunidad, calcula tiempo entre cambios de estatus
-        - Agrupa por estatus y promedia
+        - Toma los intervalos cerrados que iniciaron en el rango
+        - Agrupa por estatus y promedia su duración
         """
         
-        filters = ["h1.fecha_cambio_sla >= $1", "h1.fecha_cambio_sla <= $2"]
+        filters = ["i.entered_at >= $1", "i.entered_at <= $2", "i.exited_at IS NOT NULL"]
         params: list = [fecha_inicio, fecha_fin]
         
         if user_id:
@@ -106,38 +111,19 @@ class MetricsService:
         where_clause = " AND ".join(filters)
         
         query = f"""
-            WITH transiciones AS (
-                SELECT 
-                    h1.id_oportunidad,
-                    e.nombre as estatus,
-                    h1.fecha_cambio_sla as inicio,
-                    LEAD(h1.fecha_cambio_sla) OVER (
-                        PARTITION BY h1.id_oportunidad 
-                        ORDER BY h1.fecha_cambio_sla
-                    ) as fin
-                FROM tb_historial_estatus h1
-                JOIN tb_cat_estatus_global e ON h1.id_estatus_nuevo = e.id
-                JOIN tb_oportunidades o ON h1.id_oportunidad = o.id_oportunidad
-                WHERE {where_clause}
-            ),
-            tiempos_por_estatus AS (
-                SELECT 
-                    estatus,
-                    EXTRACT(EPOCH FROM (fin - inicio)) / 86400.0 as dias,
-                    COUNT(*) OVER (PARTITION BY estatus) as cantidad
-                FROM transiciones
-                WHERE fin IS NOT NULL  -- Excluir estatus actual (sin fin)
-            )
             SELECT 
-                estatus,
-                AVG(dias) as tiempo_promedio_dias,
-                MAX(cantidad) as cantidad_transiciones,
+                e.nombre as estatus,
+                AVG(i.duracion_dias) as tiempo_promedio_dias,
+                COUNT(*) as cantidad_transiciones,
                 COALESCE(
-                    SUM(dias) * 100.0 / NULLIF(SUM(SUM(dias)) OVER (), 0),
+                    SUM(i.duracion_dias) * 100.0 / NULLIF(SUM(SUM(i.duracion_dias)) OVER (), 0),
                     0
                 ) as porcentaje_tiempo_total
-            FROM tiempos_por_estatus
-            GROUP BY estatus
+            FROM tb_intervalos_estatus i
+            JOIN tb_cat_estatus_global e ON i.id_estatus = e.id
+            JOIN tb_oportunidades o ON i.id_oportunidad = o.id_oportunidad
+            WHERE {where_clause}
+            GROUP BY e.nombre
             ORDER BY tiempo_promedio_dias DESC
         """
         
@@ -210,22 +196,22 @@ class MetricsService:
         query = """
             WITH cambios_ida_vuelta AS (
                 SELECT 
-                    h1.id_oportunidad,
+                    i1.id_oportunidad,
                     e1.nombre as estatus_a,
                     e2.nombre as estatus_b,
                     COUNT(*) as veces
-                FROM tb_historial_estatus h1
-                JOIN tb_historial_estatus h2 ON (
-                    h1.id_oportunidad = h2.id_oportunidad
-                    AND h1.fecha_cambio_sla < h2.fecha_cambio_sla
-                    AND h1.id_estatus_nuevo = h2.id_estatus_anterior
-                    AND h1.id_estatus_anterior = h2.id_estatus_nuevo
+                FROM tb_intervalos_estatus i1
+                JOIN tb_intervalos_estatus i2 ON (
+                    i1.id_oportunidad = i2.id_oportunidad
+                    AND i1.entered_at < i2.entered_at
+                    AND i1.id_estatus = i2.id_estatus_origen
+                    AND i1.id_estatus_origen = i2.id_estatus
                 )
-                JOIN tb_cat_estatus_global e1 ON h1.id_estatus_nuevo = e1.id
-                JOIN tb_cat_estatus_global e2 ON h2.id_estatus_nuevo = e2.id
-                WHERE h1.fecha_cambio_sla >= $1
-                  AND h1.fecha_cambio_sla <= $2
-                GROUP BY h1.id_oportunidad, estatus_a, estatus_b
+                JOIN tb_cat_estatus_global e1 ON i1.id_estatus = e1.id
+                JOIN tb_cat_estatus_global e2 ON i2.id_estatus = e2.id
+                WHERE i1.entered_at >= $1
+                  AND i1.entered_at <= $2
+                GROUP BY i1.id_oportunidad, estatus_a, estatus_b
             )
             SELECT 
                 estatus_a || ' ↔ ' || estatus_b as transicion,
@@ -269,7 +255,7 @@ class MetricsService:
             Lista de oportunidades con información completa para análisis
         """
         
-        filters = ["h.fecha_cambio_sla >= $1", "h.fecha_cambio_sla <= $2", "e.nombre = $3"]
+        filters = ["i.entered_at >= $1", "i.entered_at <= $2", "e.nombre = $3"]
         params = [fecha_inicio, fecha_fin, estatus_nombre]
         
         if user_id:
@@ -280,17 +266,15 @@ class MetricsService:
         
         query = f"""
             WITH oportunidades_estatus AS (
-                SELECT DISTINCT ON (h.id_oportunidad)
-                    h.id_oportunidad,
-                    h.fecha_cambio_sla as fecha_inicio_estatus,
-                    LEAD(h.fecha_cambio_sla) OVER (
-                        PARTITION BY h.id_oportunidad 
-                        ORDER BY h.fecha_cambio_sla
-                    ) as fecha_fin_estatus
-                FROM tb_historial_estatus h
-                JOIN tb_cat_estatus_global e ON h.id_estatus_nuevo = e.id
+                SELECT DISTINCT ON (i.id_oportunidad)
+                    i.id_oportunidad,
+                    i.entered_at as fecha_inicio_estatus,
+                    i.exited_at as fecha_fin_estatus
+                FROM tb_intervalos_estatus i
+                JOIN tb_cat_estatus_global e ON i.id_estatus = e.id
+                JOIN tb_oportunidades o ON i.id_oportunidad = o.id_oportunidad
                 WHERE {where_clause}
-                ORDER BY h.id_oportunidad, h.fecha_cambio_sla DESC
+                ORDER BY i.id_oportunidad, i.entered_at DESC
             )
             SELECT 
                 o.id_oportunidad,
@@ -356,7 +340,7 @@ class MetricsService:
         Obtiene métricas de transiciones agrupadas por par (origen → destino).
         
         Muestra el estado ACTUAL del pipeline: para cada oportunidad activa,
-        identifica su última transición y agrupa por par de estatus.
+        toma su intervalo abierto (última transición) y agrupa por par de estatus.
         """
         
         filters = ["o.id_estatus_global NOT IN (SELECT id FROM tb_cat_estatus_global WHERE nombre IN ('Entregado', 'Cancelado', 'Perdido', 'Ganada'))"]
@@ -374,16 +358,16 @@ class MetricsService:
         
         query = f"""
             WITH ultima_transicion AS (
-                SELECT DISTINCT ON (h.id_oportunidad)
-                    h.id_oportunidad,
-                    h.id_estatus_anterior,
-                    h.id_estatus_nuevo,
-                    h.fecha_cambio_sla
-                FROM tb_historial_estatus h
-                JOIN tb_oportunidades o ON h.id_oportunidad = o.id_oportunidad
+                SELECT
+                    i.id_oportunidad,
+                    i.id_estatus_origen as id_estatus_anterior,
+                    i.id_estatus as id_estatus_nuevo,
+                    i.entered_at as fecha_cambio_sla
+                FROM tb_intervalos_estatus i
+                JOIN tb_oportunidades o ON i.id_oportunidad = o.id_oportunidad
                 WHERE {where_clause}
-                  AND h.id_estatus_anterior IS NOT NULL
-                ORDER BY h.id_oportunidad, h.fecha_cambio_sla DESC
+                  AND i.exited_at IS NULL
+                  AND i.id_estatus_origen IS NOT NULL
             )
             SELECT 
                 COALESCE(e_ant.nombre, 'Inicio') as estatus_origen,
@@ -449,14 +433,14 @@ class MetricsService:
         
         query = f"""
             WITH ultima_transicion AS (
-                SELECT DISTINCT ON (h.id_oportunidad)
-                    h.id_oportunidad,
-                    h.id_estatus_anterior,
-                    h.id_estatus_nuevo,
-                    h.fecha_cambio_sla as fecha_transicion
-                FROM tb_historial_estatus h
-                WHERE h.id_estatus_anterior IS NOT NULL
-                ORDER BY h.id_oportunidad, h.fecha_cambio_sla DESC
+                SELECT
+                    i.id_oportunidad,
+                    i.id_estatus_origen as id_estatus_anterior,
+                    i.id_estatus as id_estatus_nuevo,
+                    i.entered_at as fecha_transicion
+                FROM tb_intervalos_estatus i
+                WHERE i.exited_at IS NULL
+                  AND i.id_estatus_origen IS NOT NULL
             )
             SELECT 
                 o.id_oportunidad,
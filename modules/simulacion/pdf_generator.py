@@ -3,7 +3,7 @@ from datetime import datetime
 import io
 import base64
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Union
 
 logger = logging.getLogger("PDFGenerator")
 
@@ -34,7 +34,7 @@ class PDFConFooter(FPDF):
 
 
 class ReportePDFGenerator:
-    def __init__(self, filtros: Any, datos: Dict[str, Any], chart_images: Dict[str, str]):
+    def __init__(self, filtros: Any, datos: Dict[str, Any], chart_images: Dict[str, Union[str, bytes]]):
         self.pdf = PDFConFooter(orientation='L', unit='mm', format='Letter')
         self.filtros = filtros
         self.datos = datos
@@ -72,39 +72,33 @@ class ReportePDFGenerator:
     # Footer ahora es automático via PDFConFooter.footer()
 
     def insert_chart_image(self, chart_key: str, x: int, y: int, w: int, h: int = 0) -> bool:
-        """Decodifica base64 y dibuja la imagen. Retorna False si no hay imagen."""
+        """
+        Dibuja la imagen de una gráfica. Retorna False si no hay imagen.
+
+        Acepta PNG en bytes (render server-side) o base64/data-URI (enviado por el navegador).
+        """
         if chart_key not in self.chart_images or not self.chart_images[chart_key]:
             return False
 
-        b64_str = self.chart_images[chart_key]
-        if ',' in b64_str:
-            b64_str = b64_str.split(',')[1]
-            
+        imagen = self.chart_images[chart_key]
+
         try:
-            img_data = base64.b64decode(b64_str)
-            
-            # FPDF 1.7.2 trick: use a temporary file
-            import tempfile
-            import os
-            
-            # Create a named temporary file that FPDF can read
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp:
-                tmp.write(img_data)
-                tmp_path = tmp.name
-                
-            self.pdf.image(tmp_path, x=x, y=y, w=w, h=h)
-            
-            # Clean up
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
-                
+            if isinstance(imagen, (bytes, bytearray)):
+                img_data = bytes(imagen)
+            else:
+                b64_str = imagen.split(',')[1] if ',' in imagen else imagen
+                img_data = base64.b64decode(b64_str)
+
+            # fpdf2 acepta streams en memoria; evita escribir archivos temporales
+            self.pdf.image(io.BytesIO(img_data), x=x, y=y, w=w, h=h)
+            return True
+
         except Exception as e:
             logger.error(f"Error insertando imagen {chart_key}: {e}")
             self.pdf.set_xy(x, y)
             self.pdf.set_font('Arial', '', 8)
             self.pdf.cell(w, 10, f"[Error gráfico: {chart_key}]", border=1, align='C')
+            return False
 
     def _draw_kpi_card(self, x, y, title, value, subtitle=None, color_key='primary'):
         # Card background
@@ -0,0 +1,343 @@
+# modules/simulacion/report_presets.py
+"""
+Pre-generación de los reportes de simulación más solicitados.
+
+Los gerentes descargan casi siempre los mismos reportes (mes actual, mes
+anterior y año en curso, sin filtros adicionales). Una tarea periódica
+(core/tasks.py) los genera en un solo worker y guarda en tb_reportes_presets
+el snapshot de `get_all_report_data` (JSONB, ver snapshot_a_json /
+snapshot_desde_json) y el PDF ya armado. Cuando un request
+pide exactamente esos filtros se sirve el resultado guardado en lugar de
+recalcular todo.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from dataclasses import asdict, fields
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from core.config import settings
+from core.config_service import UmbralesKPI
+from .report_service import (
+    FiltrosReporte, get_reportes_service,
+    MetricasGenerales, MetricaTecnologia, FilaContabilizacion,
+    DetalleUsuario, ResumenUsuario, FilaMensual,
+)
+from .pdf_generator import ReportePDFGenerator
+from .chart_renderer import get_chart_renderer
+
+logger = logging.getLogger("ReportPresets")
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Lease en tb_tareas_lease que elige al worker líder (migrations/011)
+LEASE_TAREA = "reportes_presets"
+# Si el líder muere a media corrida, otro worker puede tomar el lease tras este tiempo
+LEASE_SECONDS = 900
+
+QUERY_TOMAR_LEASE = """
+    INSERT INTO tb_tareas_lease (tarea, lider, expira_at)
+    VALUES ($1, $2, NOW() + make_interval(secs => $3))
+    ON CONFLICT (tarea) DO UPDATE SET
+        lider = EXCLUDED.lider,
+        expira_at = EXCLUDED.expira_at
+    WHERE tb_tareas_lease.expira_at < NOW()
+    RETURNING lider
+"""
+
+QUERY_LIBERAR_LEASE = """
+    UPDATE tb_tareas_lease SET expira_at = NOW()
+    WHERE tarea = $1 AND lider = $2
+"""
+
+QUERY_GET_PRESET = """
+    SELECT clave, snapshot, pdf, generado_at
+    FROM tb_reportes_presets
+    WHERE fecha_inicio = $1 AND fecha_fin = $2
+      AND generado_at >= NOW() - make_interval(secs => $3)
+    ORDER BY generado_at DESC
+    LIMIT 1
+"""
+
+QUERY_PRESETS_VIGENTES = """
+    SELECT clave, fecha_inicio, fecha_fin
+    FROM tb_reportes_presets
+    WHERE generado_at >= NOW() - make_interval(secs => $1)
+"""
+
+QUERY_UPSERT_PRESET = """
+    INSERT INTO tb_reportes_presets (clave, fecha_inicio, fecha_fin, snapshot, pdf, generado_at)
+    VALUES ($1, $2, $3, $4, $5, NOW())
+    ON CONFLICT (clave) DO UPDATE SET
+        fecha_inicio = EXCLUDED.fecha_inicio,
+        fecha_fin = EXCLUDED.fecha_fin,
+        snapshot = EXCLUDED.snapshot,
+        pdf = EXCLUDED.pdf,
+        generado_at = EXCLUDED.generado_at
+"""
+
+
+def calcular_presets(hoy: Optional[date] = None) -> Dict[str, FiltrosReporte]:
+    """
+    Rangos de los presets para la fecha dada.
+
+    'mes_actual' coincide con los defaults de parse_filtros (primer día del
+    mes a hoy), que es lo que abre el dashboard sin tocar filtros.
+    """
+    hoy = hoy or date.today()
+    inicio_mes = hoy.replace(day=1)
+    fin_mes_anterior = inicio_mes - timedelta(days=1)
+
+    presets = {
+        'mes_actual': FiltrosReporte(fecha_inicio=inicio_mes, fecha_fin=hoy),
+        'mes_anterior': FiltrosReporte(
+            fecha_inicio=fin_mes_anterior.replace(day=1),
+            fecha_fin=fin_mes_anterior
+        ),
+    }
+    # En enero el año en curso es el mismo rango que el mes actual
+    if hoy.month > 1:
+        presets['anio_actual'] = FiltrosReporte(fecha_inicio=hoy.replace(month=1, day=1), fecha_fin=hoy)
+    return presets
+
+
+# =============================================================================
+# SNAPSHOT JSON
+# =============================================================================
+# El snapshot se guarda con dataclasses.asdict y se reconstruye aquí de forma
+# explícita. Llaves desconocidas se ignoran; si falta un campo obligatorio
+# (dataclass de otra versión) la reconstrucción falla y el preset se descarta.
+# Decimal, fechas y UUID se guardan marcados con su tipo ({"__decimal__": ...})
+# para que vuelvan como el mismo tipo y no como texto.
+
+# Sube cuando cambia el formato; snapshots de otra versión se descartan
+SNAPSHOT_VERSION = 2
+
+
+def _codificar(valor: Any) -> Dict[str, str]:
+    """`default` de json.dumps: marca los tipos que JSON no tiene."""
+    if isinstance(valor, Decimal):
+        return {'__decimal__': str(valor)}
+    if isinstance(valor, datetime):
+        return {'__datetime__': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'__date__': valor.isoformat()}
+    if isinstance(valor, UUID):
+        return {'__uuid__': str(valor)}
+    raise TypeError(f"Tipo no serializable en snapshot: {type(valor).__name__}")
+
+
+_DECODIFICADORES = {
+    '__decimal__': Decimal,
+    '__datetime__': datetime.fromisoformat,
+    '__date__': date.fromisoformat,
+    '__uuid__': UUID,
+}
+
+
+def _decodificar(valor: Any) -> Any:
+    """Inverso de _codificar, recursivo sobre listas y dicts."""
+    if isinstance(valor, dict):
+        if len(valor) == 1:
+            (marca, texto), = valor.items()
+            if marca in _DECODIFICADORES:
+                return _DECODIFICADORES[marca](texto)
+        return {k: _decodificar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_decodificar(v) for v in valor]
+    return valor
+
+
+def snapshot_a_json(datos_reporte: dict) -> str:
+    """Serializa el resultado de get_all_report_data para la columna JSONB."""
+    return json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'metricas': asdict(datos_reporte['metricas']),
+        'tecnologias': [asdict(t) for t in datos_reporte['tecnologias']],
+        'contabilizacion': [asdict(f) for f in datos_reporte['contabilizacion']],
+        'usuarios': [asdict(u) for u in datos_reporte['usuarios']],
+        'mensual': {k: asdict(f) for k, f in datos_reporte['mensual'].items()},
+    }, default=_codificar)
+
+
+def _construir(cls, data: Dict[str, Any], **anidados):
+    """
+    Instancia `cls` con los campos conocidos de `data`, devolviendo a su tipo
+    los valores marcados (anidados ya convertidos).
+    """
+    nombres = {f.name for f in fields(cls)}
+    kwargs = {k: _decodificar(v) for k, v in data.items() if k in nombres and k not in anidados}
+    kwargs.update(anidados)
+    return cls(**kwargs)
+
+
+def _umbrales(data: Optional[dict]) -> Optional[UmbralesKPI]:
+    return _construir(UmbralesKPI, data) if data else None
+
+
+def _con_umbrales(cls, data: dict):
+    return _construir(
+        cls, data,
+        umbrales_interno=_umbrales(data.get('umbrales_interno')),
+        umbrales_compromiso=_umbrales(data.get('umbrales_compromiso')),
+    )
+
+
+def _detalle_usuario(data: dict) -> DetalleUsuario:
+    resumen = data.get('resumen_datos')
+    return _construir(
+        DetalleUsuario, data,
+        metricas_generales=_con_umbrales(MetricasGenerales, data['metricas_generales']),
+        metricas_por_tecnologia=[_con_umbrales(MetricaTecnologia, t) for t in data.get('metricas_por_tecnologia', [])],
+        tabla_contabilizacion=[_con_umbrales(FilaContabilizacion, f) for f in data.get('tabla_contabilizacion', [])],
+        resumen_datos=_construir(ResumenUsuario, resumen) if resumen else None,
+    )
+
+
+def _fila_mensual(data: dict) -> FilaMensual:
+    # JSON convierte las llaves de mes (int) a texto
+    return _construir(FilaMensual, data, valores={int(k): _decodificar(v) for k, v in data.get('valores', {}).items()})
+
+
+def snapshot_desde_json(data: dict) -> dict:
+    """Reconstruye las dataclasses de get_all_report_data desde el snapshot JSONB."""
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"versión de snapshot {data.get('version')!r}, se espera {SNAPSHOT_VERSION}")
+    return {
+        'metricas': _con_umbrales(MetricasGenerales, data['metricas']),
+        'tecnologias': [_con_umbrales(MetricaTecnologia, t) for t in data['tecnologias']],
+        'contabilizacion': [_con_umbrales(FilaContabilizacion, f) for f in data['contabilizacion']],
+        'usuarios': [_detalle_usuario(u) for u in data['usuarios']],
+        'mensual': {k: _fila_mensual(f) for k, f in data['mensual'].items()},
+    }
+
+
+# =============================================================================
+# SERVICIO
+# =============================================================================
+
+class ReportPresetsService:
+    """Genera y sirve los reportes pre-generados."""
+
+    @staticmethod
+    def es_preset(filtros: FiltrosReporte) -> bool:
+        """True si los filtros solo acotan fechas (sin tecnología, tipo, estatus ni usuario)."""
+        return (
+            filtros.id_tecnologia is None
+            and filtros.id_tipo_solicitud is None
+            and filtros.id_estatus is None
+            and filtros.responsable_id is None
+            and not filtros.incluir_levantamientos_en_kpi
+        )
+
+    async def get_preset(self, conn, filtros: FiltrosReporte) -> Optional[dict]:
+        """
+        Busca un preset vigente para los filtros dados.
+
+        Returns:
+            {'clave', 'datos_reporte', 'pdf', 'generado_at'} o None si los
+            filtros no corresponden a un preset o aún no se ha generado.
+        """
+        if not self.es_preset(filtros):
+            return None
+
+        row = await conn.fetchrow(
+            QUERY_GET_PRESET,
+            filtros.fecha_inicio,
+            filtros.fecha_fin,
+            float(settings.REPORT_PRESETS_MAX_AGE_SECONDS)
+        )
+        if not row:
+            return None
+
+        try:
+            datos_reporte = snapshot_desde_json(row['snapshot'])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Snapshot de preset {row['clave']} ilegible, se ignora: {e}")
+            return None
+
+        return {
+            'clave': row['clave'],
+            'datos_reporte': datos_reporte,
+            'pdf': bytes(row['pdf']),
+            'generado_at': row['generado_at'],
+        }
+
+    async def generar_preset(self, conn, clave: str, filtros: FiltrosReporte):
+        """
+        Calcula snapshot + gráficas + PDF de un preset y lo guarda.
+
+        Las lecturas y el armado corren fuera de transacción; el guardado es un
+        solo UPSERT (transacción propia y corta).
+        """
+        service = get_reportes_service()
+
+        datos_reporte = await service.get_all_report_data(conn, filtros)
+        graficas = await service.get_datos_graficas(conn, filtros, datos_reporte['metricas'])
+        chart_images = await get_chart_renderer().render_report_charts(graficas)
+
+        generator = ReportePDFGenerator(filtros, datos_reporte, chart_images)
+        pdf_content = await asyncio.to_thread(generator.generate)
+
+        await conn.execute(
+            QUERY_UPSERT_PRESET,
+            clave,
+            filtros.fecha_inicio,
+            filtros.fecha_fin,
+            snapshot_a_json(datos_reporte),
+            bytes(pdf_content)
+        )
+
+    async def generar_presets(self, conn, min_intervalo_seconds: int) -> int:
+        """
+        Regenera todos los presets si este worker obtiene el lease.
+
+        El lease (tb_tareas_lease) se toma con un solo UPSERT condicional y se
+        libera al terminar; ninguna transacción queda abierta durante la
+        generación, así que detrás de pgbouncer (Transaction Mode) no se fija
+        una conexión del servidor. Si el líder muere, el lease expira solo
+        (LEASE_SECONDS). Como cada worker tiene su propio timer, además se
+        omite la corrida si otro worker ya regeneró dentro del intervalo.
+
+        Returns:
+            Número de presets generados (0 si otro worker es el líder).
+        """
+        presets = calcular_presets()
+
+        vigentes = await conn.fetch(QUERY_PRESETS_VIGENTES, float(min_intervalo_seconds) * 0.9)
+        rangos_vigentes = {(r['clave'], r['fecha_inicio'], r['fecha_fin']) for r in vigentes}
+        if all((c, f.fecha_inicio, f.fecha_fin) in rangos_vigentes for c, f in presets.items()):
+            return 0
+
+        lider = f"{socket.gethostname()}:{os.getpid()}"
+        if not await conn.fetchval(QUERY_TOMAR_LEASE, LEASE_TAREA, lider, float(LEASE_SECONDS)):
+            return 0
+
+        try:
+            generados = 0
+            for clave, filtros in presets.items():
+                try:  # un preset fallido no tira los demás
+                    await self.generar_preset(conn, clave, filtros)
+                    generados += 1
+                except Exception as e:
+                    logger.error(f"Error generando preset {clave}: {e}")
+            return generados
+        finally:
+            await conn.execute(QUERY_LIBERAR_LEASE, LEASE_TAREA, lider)
+
+
+# =============================================================================
+# HELPER PARA INYECCIÓN DE DEPENDENCIAS
+# =============================================================================
+
+def get_report_presets_service() -> ReportPresetsService:
+    return ReportPresetsService()
@@ -23,7 +23,8 @@ from core.permissions import require_module_access
 from .report_service import (
     ReportesSimulacionService, 
     get_reportes_service,
-    FiltrosReporte
+    FiltrosReporte,
+    precalcular_kpis_reporte
 )
 from core.config_service import ConfigService
 from core.config import settings
@@ -192,6 +193,7 @@ async def get_analisis_detallado(
     tabla_contab = await service.get_tabla_contabilizacion(conn, filtros)
     metricas_usuarios = await service.get_detalle_por_usuario(conn, filtros)
     resumen_mensual = await service.get_resumen_mensual(conn, filtros)
+    precalcular_kpis_reporte(metricas, metricas_tech, tabla_contab, metricas_usuarios)
     
     # Obtener motivo de retrabajo principal
     motivo_retrabajo = await service.get_motivo_retrabajo_principal(conn, filtros)
@@ -416,20 +418,33 @@ from pydantic import BaseModel
 from typing import Dict, Any
 from fastapi import Response
 from .pdf_generator import ReportePDFGenerator
+from .chart_renderer import ChartRenderer, get_chart_renderer, CHART_KEYS_PDF
+from .report_presets import ReportPresetsService, get_report_presets_service
 
 class PDFGenerationRequest(BaseModel):
     filtros: dict
-    charts: Dict[str, str]
+    # Opcional: las gráficas que no se envíen se renderizan en el servidor
+    charts: Dict[str, str] = {}
 
 @router.post("/pdf/generar")
 async def generar_reporte_pdf(
     datos_pdf: PDFGenerationRequest,
     conn = Depends(get_db_connection),
     service: ReportesSimulacionService = Depends(get_reportes_service),
+    renderer: ChartRenderer = Depends(get_chart_renderer),
+    presets: ReportPresetsService = Depends(get_report_presets_service),
     _ = require_module_access("simulacion")
 ):
     """
     Genera el reporte PDF completo con gráficas y tablas.
+
+    Las gráficas enviadas por el navegador (base64) se usan tal cual; las
+    faltantes se dibujan en el servidor, por lo que el PDF puede generarse
+    sin navegador enviando solo los filtros.
+
+    Si los filtros coinciden con un preset pre-generado (mes actual, mes
+    anterior, año en curso) se usa el snapshot guardado: sin gráficas del
+    cliente se devuelve el PDF tal cual; con gráficas se rearma solo el PDF.
     """
     try:
         # 1. Parsear filtros desde el JSON recibido
@@ -442,11 +457,32 @@ async def generar_reporte_pdf(
             user_id=str(filtros_dict.get('usuario') or '')
         )
         
-        # 2. Obtener todos los datos concentrados
-        datos_reporte = await service.get_all_report_data(conn, filtros)
+        filename = f"Reporte_Simulacion_{filtros.fecha_inicio}_{filtros.fecha_fin}.pdf"
+        chart_images = {k: v for k, v in datos_pdf.charts.items() if v}
+        
+        # 2. Obtener todos los datos concentrados (preset pre-generado si aplica)
+        preset = await presets.get_preset(conn, filtros)
+        if preset and not chart_images:
+            return Response(
+                content=preset['pdf'],
+                media_type="application/pdf",
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
         
-        # 3. Generar PDF
-        generator = ReportePDFGenerator(filtros, datos_reporte, datos_pdf.charts)
+        if preset:
+            datos_reporte = preset['datos_reporte']
+        else:
+            datos_reporte = await service.get_all_report_data(conn, filtros)
+        
+        # 3. Completar gráficas faltantes con render server-side
+        if not set(CHART_KEYS_PDF.values()).issubset(chart_images):
+            graficas = await service.get_datos_graficas(conn, filtros, datos_reporte['metricas'])
+            chart_images.update(
+                await renderer.render_report_charts(graficas, omitir=set(chart_images))
+            )
+        
+        # 4. Generar PDF
+        generator = ReportePDFGenerator(filtros, datos_reporte, chart_images)
         pdf_content = generator.generate()
         
         # Asegurar que sea bytes (Starlette no acepta bytearray directamente)
@@ -455,9 +491,7 @@ async def generar_reporte_pdf(
         else:
             pdf_bytes = pdf_content
         
-        # 4. Retornar archivo
-        filename = f"Reporte_Simulacion_{filtros.fecha_inicio}_{filtros.fecha_fin}.pdf"
-        
+        # 5. Retornar archivo
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
@@ -23,6 +23,7 @@ from enum import Enum
 import logging
 from dateutil.relativedelta import relativedelta
 import asyncio
+import numpy as np
 
 from .constants import (
     UMBRAL_MIN_ENTREGAS,
@@ -57,6 +58,15 @@ UMBRAL_AMBAR = 85.0
 # DATACLASSES PARA RESPUESTAS TIPADAS
 # =============================================================================
 
+# Columnas que devuelve calcular_kpis_columnar (mismos nombres que las propiedades)
+COLUMNAS_KPI = (
+    'porcentaje_a_tiempo_interno', 'porcentaje_tarde_interno',
+    'porcentaje_a_tiempo_compromiso', 'porcentaje_tarde_compromiso',
+    'semaforo_interno', 'semaforo_compromiso',
+    'semaforo_interno_label', 'semaforo_compromiso_label',
+)
+
+
 @dataclass
 class KPIMetricsMixin:
     """
@@ -68,82 +78,62 @@ class KPIMetricsMixin:
     - entregas_tarde_compromiso: int
     - umbrales_interno: Optional[UmbralesKPI]
     - umbrales_compromiso: Optional[UmbralesKPI]
+
+    Los valores se cachean en el objeto (`_kpi_cache`) junto con los campos de
+    los que dependen; si alguno cambia, el siguiente acceso recalcula.
+    `calcular_kpis_columnar` llena el cache de una lista completa en un pase.
     """
 
+    def _kpi_llave(self) -> Tuple[Any, ...]:
+        return (
+            self.entregas_a_tiempo_interno or 0, self.entregas_tarde_interno or 0,
+            self.entregas_a_tiempo_compromiso or 0, self.entregas_tarde_compromiso or 0,
+            bool(getattr(self, 'es_levantamiento', False)),
+            self.umbrales_interno, self.umbrales_compromiso,
+        )
+
+    def _kpi(self, key: str):
+        cache = self.__dict__.get('_kpi_cache')
+        if cache is None or cache[0] != self._kpi_llave():
+            calcular_kpis_columnar([self])
+            cache = self.__dict__['_kpi_cache']
+        return cache[1][key]
+
     @property
     def porcentaje_a_tiempo_interno(self) -> float:
         """% entregas a tiempo según KPI Interno."""
-        # Check for optional override (e.g., FilaContabilizacion)
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return 0.0
-            
-        total_con_kpi = self.entregas_a_tiempo_interno + self.entregas_tarde_interno
-        if total_con_kpi == 0:
-            return 0.0
-        return round((self.entregas_a_tiempo_interno / total_con_kpi) * 100, 1)
+        return self._kpi('porcentaje_a_tiempo_interno')
     
     @property
     def porcentaje_tarde_interno(self) -> float:
         """% entregas tarde según KPI Interno."""
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return 0.0
-
-        total_con_kpi = self.entregas_a_tiempo_interno + self.entregas_tarde_interno
-        if total_con_kpi == 0:
-            return 0.0
-        return round((self.entregas_tarde_interno / total_con_kpi) * 100, 1)
+        return self._kpi('porcentaje_tarde_interno')
     
     @property
     def porcentaje_a_tiempo_compromiso(self) -> float:
         """% entregas a tiempo según KPI Compromiso."""
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return 0.0
-
-        total_con_kpi = self.entregas_a_tiempo_compromiso + self.entregas_tarde_compromiso
-        if total_con_kpi == 0:
-            return 0.0
-        return round((self.entregas_a_tiempo_compromiso / total_con_kpi) * 100, 1)
+        return self._kpi('porcentaje_a_tiempo_compromiso')
     
     @property
     def porcentaje_tarde_compromiso(self) -> float:
         """% entregas tarde según KPI Compromiso."""
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return 0.0
-
-        total_con_kpi = self.entregas_a_tiempo_compromiso + self.entregas_tarde_compromiso
-        if total_con_kpi == 0:
-            return 0.0
-        return round((self.entregas_tarde_compromiso / total_con_kpi) * 100, 1)
+        return self._kpi('porcentaje_tarde_compromiso')
 
     @property
     def semaforo_interno(self) -> str:
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return "gray"
-            
-        pct = self.porcentaje_a_tiempo_interno
-        if self.umbrales_interno:
-            return self.umbrales_interno.get_color(pct)
-        # Fallback
-        if pct >= UMBRAL_VERDE:
-            return "green"
-        elif pct >= UMBRAL_AMBAR:
-            return "amber"
-        return "red"
+        return self._kpi('semaforo_interno')
 
     @property
     def semaforo_compromiso(self) -> str:
-        if hasattr(self, 'es_levantamiento') and self.es_levantamiento:
-            return "gray"
-
-        pct = self.porcentaje_a_tiempo_compromiso
-        if self.umbrales_compromiso:
-            return self.umbrales_compromiso.get_color(pct)
-        # Fallback
-        if pct >= UMBRAL_VERDE:
-            return "green"
-        elif pct >= UMBRAL_AMBAR:
-            return "amber"
-        return "red"
+        return self._kpi('semaforo_compromiso')
+
+    @property
+    def semaforo_interno_label(self) -> str:
+        return self._kpi('semaforo_interno_label')
+
+    @property
+    def semaforo_compromiso_label(self) -> str:
+        return self._kpi('semaforo_compromiso_label')
 
 @dataclass
 class ConfiguracionScore:
@@ -300,28 +290,8 @@ class FilaContabilizacion(KPIMetricsMixin):
     es_levantamiento: bool = False
     licitaciones: int = 0  # ← Solicitudes que son licitaciones
     
-    # Properties KPI Interno (Managed by Mixin)
-    
-    @property
-    def semaforo_interno_label(self) -> str:
-        if self.es_levantamiento:
-            return "No aplica"
-        pct = self.porcentaje_a_tiempo_interno
-        if self.umbrales_interno:
-            return self.umbrales_interno.get_label(pct)
-        return f"{pct}%"
-    
-    # Properties KPI Compromiso (Managed by Mixin)
-        
-    @property
-    def semaforo_compromiso_label(self) -> str:
-        if self.es_levantamiento:
-            return "No aplica"
-        pct = self.porcentaje_a_tiempo_compromiso
-        if self.umbrales_compromiso:
-            return self.umbrales_compromiso.get_label(pct)
-        return f"{pct}%"
-        
+    # Properties KPI Interno/Compromiso y etiquetas de semáforo (Managed by Mixin)
+
     @property
     def porcentaje_licitaciones(self) -> float:
         """% de solicitudes que son licitaciones."""
@@ -439,85 +409,318 @@ class ScoreUsuario:
     categoria: str = "evaluacion"
     motivo_retrabajo_principal: str = None
     config: Optional['ConfiguracionScore'] = field(default=None, repr=False)
-    
-    def calcular(self):
-        """Calcula score base, multiplicador y score final con config dinámica"""
-        
-        cfg = self.config or ConfiguracionScore()
 
-        # Score Base
-        self.score_base = (
-            self.cumplimiento_compromiso * cfg.peso_compromiso +
-            self.cumplimiento_interno * cfg.peso_interno +
-            self.factor_volumen * cfg.peso_volumen
-        )
-        
-        # Multiplicador de Complejidad
-        bonus_licitaciones = self.ratio_licitaciones * cfg.mult_licitaciones
-        bonus_actualizaciones = self.ratio_actualizaciones * cfg.mult_actualizaciones
-        penalizacion = self.ratio_retrabajos * cfg.penalizacion_retrabajos
-        
-        self.multiplicador = 1.0 + bonus_licitaciones + bonus_actualizaciones + penalizacion
-        
-        # Score Final (sin techo: el multiplicador puede llevar >1.0)
-        self.score_final = max(0.0, self.score_base * self.multiplicador)
-        
-        return self
 
+# =============================================================================
+# MODELO COLUMNAR (NumPy)
+# =============================================================================
+# Los KPIs de usuarios, tecnologías, tipos y meses se calculan en un solo pase
+# vectorizado sobre arrays por métrica, en lugar de propiedad por objeto.
+
+CATEGORIAS_SCORE = np.array(["evaluacion", "alta_complejidad", "eficiencia"], dtype=object)
 
-def categorizar_usuario(entregas: int, ratio_licitaciones: float, config: 'ConfiguracionScore' = None) -> str:
+
+def _porcentaje(parte: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """parte/total * 100 redondeado a 1 decimal; 0.0 donde total == 0."""
+    pct = np.divide(parte * 100.0, total, out=np.zeros(len(total), dtype=float), where=total > 0)
+    return np.round(pct, 1)
+
+
+def _semaforos(pct: np.ndarray, umbrales: List[Optional[UmbralesKPI]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Color y etiqueta del semáforo por fila.
+    Las filas se agrupan por objeto de umbrales (normalmente uno solo por batch).
+    Sin umbrales se usan UMBRAL_VERDE/UMBRAL_AMBAR y la etiqueta es el porcentaje.
+    """
+    colores = np.empty(len(pct), dtype=object)
+    etiquetas = np.empty(len(pct), dtype=object)
+
+    grupos: Dict[int, Tuple[Optional[UmbralesKPI], List[int]]] = {}
+    for i, u in enumerate(umbrales):
+        grupos.setdefault(id(u), (u, []))[1].append(i)
+
+    for u, indices in grupos.values():
+        idx = np.asarray(indices, dtype=np.intp)
+        p = pct[idx]
+        if u is not None:
+            colores[idx] = np.select(
+                [p >= u.umbral_excelente, p >= u.umbral_bueno],
+                [u.color_excelente, u.color_bueno],
+                default=u.color_critico
+            )
+            etiquetas[idx] = np.select(
+                [p >= u.umbral_excelente, p >= u.umbral_bueno],
+                ["Excelente", "Bueno"],
+                default="Crítico"
+            )
+        else:
+            colores[idx] = np.select([p >= UMBRAL_VERDE, p >= UMBRAL_AMBAR], ["green", "amber"], default="red")
+            etiquetas[idx] = [f"{v}%" for v in p.tolist()]
+
+    return colores, etiquetas
+
+
+def calcular_kpis_columnar(objetos: List['KPIMetricsMixin']) -> Dict[str, List[Any]]:
+    """
+    Calcula porcentajes y semáforos de todos los objetos en un pase vectorizado.
+
+    Devuelve columnas (llave -> lista alineada con `objetos`) con las mismas
+    llaves que las propiedades de KPIMetricsMixin y deja cada fila en el
+    `_kpi_cache` de su objeto, con la llave de los campos usados.
+    Los objetos con `es_levantamiento=True` reportan 0% y semáforo gris.
+    """
+    n = len(objetos)
+    if n == 0:
+        return {k: [] for k in COLUMNAS_KPI}
+
+    # Llave de cada objeto: (a_tiempo_int, tarde_int, a_tiempo_comp, tarde_comp, es_lev, u_int, u_comp)
+    llaves = [o._kpi_llave() for o in objetos]
+
+    def col(pos: int, dtype=np.int64) -> np.ndarray:
+        return np.fromiter((llave[pos] for llave in llaves), dtype=dtype, count=n)
+
+    a_tiempo_int = col(0)
+    tarde_int = col(1)
+    a_tiempo_comp = col(2)
+    tarde_comp = col(3)
+    es_lev = col(4, dtype=bool)
+
+    total_int = a_tiempo_int + tarde_int
+    total_comp = a_tiempo_comp + tarde_comp
+
+    pct_int = np.where(es_lev, 0.0, _porcentaje(a_tiempo_int, total_int))
+    pct_tarde_int = np.where(es_lev, 0.0, _porcentaje(tarde_int, total_int))
+    pct_comp = np.where(es_lev, 0.0, _porcentaje(a_tiempo_comp, total_comp))
+    pct_tarde_comp = np.where(es_lev, 0.0, _porcentaje(tarde_comp, total_comp))
+
+    color_int, label_int = _semaforos(pct_int, [llave[5] for llave in llaves])
+    color_comp, label_comp = _semaforos(pct_comp, [llave[6] for llave in llaves])
+    color_int[es_lev] = "gray"
+    color_comp[es_lev] = "gray"
+    label_int[es_lev] = "No aplica"
+    label_comp[es_lev] = "No aplica"
+
+    columnas = {
+        'porcentaje_a_tiempo_interno': pct_int.tolist(),
+        'porcentaje_tarde_interno': pct_tarde_int.tolist(),
+        'porcentaje_a_tiempo_compromiso': pct_comp.tolist(),
+        'porcentaje_tarde_compromiso': pct_tarde_comp.tolist(),
+        'semaforo_interno': color_int.tolist(),
+        'semaforo_compromiso': color_comp.tolist(),
+        'semaforo_interno_label': label_int.tolist(),
+        'semaforo_compromiso_label': label_comp.tolist(),
+    }
+    for i, (obj, llave) in enumerate(zip(objetos, llaves)):
+        obj.__dict__['_kpi_cache'] = (llave, {k: v[i] for k, v in columnas.items()})
+    return columnas
+
+
+def precalcular_kpis_reporte(
+    metricas: Optional['MetricasGenerales'],
+    tecnologias: List['MetricaTecnologia'],
+    contabilizacion: List['FilaContabilizacion'],
+    usuarios: List['DetalleUsuario']
+) -> None:
     """
-    Categoriza al usuario según sus entregas y ratio de licitaciones.
+    Llena el cache KPI de todos los objetos de un reporte (generales, por
+    tecnología, por tipo y por usuario) en un solo pase columnar, antes de que
+    templates y PDF lean las propiedades.
+    """
+    objetos: List[KPIMetricsMixin] = []
+    if metricas is not None:
+        objetos.append(metricas)
+    objetos.extend(tecnologias)
+    objetos.extend(contabilizacion)
+    for usuario in usuarios:
+        objetos.append(usuario.metricas_generales)
+        objetos.extend(usuario.metricas_por_tecnologia)
+        objetos.extend(usuario.tabla_contabilizacion)
+    calcular_kpis_columnar(objetos)
+
+
+def categorizar_usuarios(entregas: np.ndarray, ratio_licitaciones: np.ndarray, config: 'ConfiguracionScore' = None) -> np.ndarray:
+    """
+    Categoriza a cada usuario según sus entregas y ratio de licitaciones.
     """
     cfg = config or ConfiguracionScore()
-    
-    if entregas < cfg.umbral_min_entregas:
-        return "evaluacion"
-    elif ratio_licitaciones >= cfg.umbral_ratio_licitaciones:
-        return "alta_complejidad"
-    else:
-        return "eficiencia"
+    indices = np.where(
+        entregas < cfg.umbral_min_entregas, 0,
+        np.where(ratio_licitaciones >= cfg.umbral_ratio_licitaciones, 1, 2)
+    )
+    return CATEGORIAS_SCORE[indices]
 
 
-def calcular_score_usuario(usuario: MetricaUsuario, config: 'ConfiguracionScore' = None) -> ScoreUsuario:
+def calcular_scores_columnar(usuarios: List['MetricaUsuario'], config: 'ConfiguracionScore' = None) -> List['ScoreUsuario']:
     """
-    Calcula el score ponderado de un usuario con configuración dinámica.
+    Calcula el score ponderado de todos los usuarios (configuración dinámica)
+    en un pase vectorizado.
     """
     cfg = config or ConfiguracionScore()
-    
-    # Componente 1: Cumplimientos (ya están como % en usuario, normalizar a 0-1)
-    cumplimiento_compromiso = usuario.porcentaje_a_tiempo_compromiso / 100.0
-    cumplimiento_interno = usuario.porcentaje_a_tiempo_interno / 100.0
-    
+    n = len(usuarios)
+    if n == 0:
+        return []
+
+    kpis = calcular_kpis_columnar(usuarios)
+
+    def col(attr: str) -> np.ndarray:
+        return np.fromiter((getattr(u, attr) or 0 for u in usuarios), dtype=float, count=n)
+
+    # Componente 1: Cumplimientos (normalizados 0-1)
+    cumplimiento_compromiso = np.asarray(kpis['porcentaje_a_tiempo_compromiso'], dtype=float) / 100.0
+    cumplimiento_interno = np.asarray(kpis['porcentaje_a_tiempo_interno'], dtype=float) / 100.0
+
     # Componente 2: Factor volumen (normalizado 0-1)
-    # Usar config max volumen
-    factor_volumen = min(usuario.total_ofertas / cfg.volumen_max, 1.0)
-    
+    total_ofertas = col('total_ofertas')
+    factor_volumen = np.minimum(total_ofertas / cfg.volumen_max, 1.0)
+
     # Componente 3: Ratios de complejidad
-    ratio_licitaciones = usuario.licitaciones / usuario.total_solicitudes if usuario.total_solicitudes > 0 else 0.0
-    ratio_actualizaciones = usuario.versiones / usuario.total_solicitudes if usuario.total_solicitudes > 0 else 0.0
-    ratio_retrabajos = usuario.retrabajados / usuario.total_solicitudes if usuario.total_solicitudes > 0 else 0.0
-    
-    # Categorizar usuario
-    categoria = categorizar_usuario(usuario.total_ofertas, ratio_licitaciones, cfg)
-    
-    # Crear y calcular score
-    score = ScoreUsuario(
-        cumplimiento_compromiso=cumplimiento_compromiso,
-        cumplimiento_interno=cumplimiento_interno,
-        factor_volumen=factor_volumen,
-        ratio_licitaciones=ratio_licitaciones,
-        ratio_actualizaciones=ratio_actualizaciones,
-        ratio_retrabajos=ratio_retrabajos,
-        entregas_total=usuario.total_ofertas,
-        licitaciones_total=usuario.licitaciones,
-        actualizaciones_total=usuario.versiones,
-        retrabajos_total=usuario.retrabajados,
-        categoria=categoria,
-        config=cfg
-    ).calcular()
-    
-    return score
+    total_solicitudes = col('total_solicitudes')
+    licitaciones = col('licitaciones')
+    versiones = col('versiones')
+    retrabajados = col('retrabajados')
+
+    def ratio(parte: np.ndarray) -> np.ndarray:
+        return np.divide(parte, total_solicitudes, out=np.zeros(n, dtype=float), where=total_solicitudes > 0)
+
+    ratio_licitaciones = ratio(licitaciones)
+    ratio_actualizaciones = ratio(versiones)
+    ratio_retrabajos = ratio(retrabajados)
+
+    categorias = categorizar_usuarios(total_ofertas, ratio_licitaciones, cfg)
+
+    # Score base, multiplicador y final
+    score_base = (
+        cumplimiento_compromiso * cfg.peso_compromiso +
+        cumplimiento_interno * cfg.peso_interno +
+        factor_volumen * cfg.peso_volumen
+    )
+    multiplicador = (
+        1.0
+        + ratio_licitaciones * cfg.mult_licitaciones
+        + ratio_actualizaciones * cfg.mult_actualizaciones
+        + ratio_retrabajos * cfg.penalizacion_retrabajos
+    )
+    score_final = np.maximum(0.0, score_base * multiplicador)
+
+    columnas = zip(
+        cumplimiento_compromiso.tolist(), cumplimiento_interno.tolist(), factor_volumen.tolist(),
+        ratio_licitaciones.tolist(), ratio_actualizaciones.tolist(), ratio_retrabajos.tolist(),
+        score_base.tolist(), multiplicador.tolist(), score_final.tolist(), categorias.tolist()
+    )
+    return [
+        ScoreUsuario(
+            cumplimiento_compromiso=c_comp,
+            cumplimiento_interno=c_int,
+            factor_volumen=f_vol,
+            ratio_licitaciones=r_lic,
+            ratio_actualizaciones=r_act,
+            ratio_retrabajos=r_ret,
+            score_base=s_base,
+            multiplicador=mult,
+            score_final=s_final,
+            entregas_total=u.total_ofertas,
+            licitaciones_total=u.licitaciones,
+            actualizaciones_total=u.versiones,
+            retrabajos_total=u.retrabajados,
+            categoria=cat,
+            config=cfg
+        )
+        for u, (c_comp, c_int, f_vol, r_lic, r_act, r_ret, s_base, mult, s_final, cat) in zip(usuarios, columnas)
+    ]
+
+
+# Métricas del resumen mensual (orden de filas en tabla y PDF)
+METRICAS_MENSUALES = [
+    'solicitudes_recibidas',
+    'ofertas_generadas', 
+    'porcentaje_en_plazo_interno',
+    'porcentaje_fuera_plazo_interno',
+    'entregas_a_tiempo_interno',
+    'entregas_tarde_interno',
+    'porcentaje_en_plazo_compromiso',
+    'porcentaje_fuera_plazo_compromiso',
+    'entregas_a_tiempo_compromiso',
+    'entregas_tarde_compromiso',
+    'tiempo_promedio',
+    'en_espera',
+    'canceladas',
+    'no_viables',
+    'perdidas',
+    'extraordinarias',
+    'versiones',
+    'retrabajos',
+    'total_sitios'
+]
+
+# Métricas cuyo total es promedio de meses con valor (el resto se suma)
+METRICAS_MENSUALES_PROMEDIO = {
+    'porcentaje_en_plazo_interno',
+    'porcentaje_fuera_plazo_interno',
+    'porcentaje_en_plazo_compromiso',
+    'porcentaje_fuera_plazo_compromiso',
+    'tiempo_promedio'
+}
+
+# Columnas de conteo que vienen directo de la query mensual
+_COLUMNAS_CONTEO_MENSUAL = [
+    'solicitudes_recibidas', 'ofertas_generadas',
+    'entregas_a_tiempo_interno', 'entregas_tarde_interno',
+    'entregas_a_tiempo_compromiso', 'entregas_tarde_compromiso',
+    'en_espera', 'canceladas', 'no_viables', 'perdidas',
+    'extraordinarias', 'versiones', 'retrabajos', 'total_sitios'
+]
+
+
+def pivot_resumen_mensual(rows: List[Any]) -> Dict[str, 'FilaMensual']:
+    """
+    Convierte las filas mensuales (una por mes) en el pivot métrica -> mes
+    calculando porcentajes y totales por columna de forma vectorizada.
+    """
+    resultado = {nombre: FilaMensual(metrica=nombre) for nombre in METRICAS_MENSUALES}
+    if not rows:
+        return resultado
+
+    n = len(rows)
+    meses = [row['mes'] for row in rows]
+    conteos = {
+        c: np.fromiter((row[c] or 0 for row in rows), dtype=np.int64, count=n)
+        for c in _COLUMNAS_CONTEO_MENSUAL
+    }
+    tiempo_horas = np.fromiter((float(row['tiempo_promedio'] or 0) for row in rows), dtype=float, count=n)
+
+    total_interno = conteos['entregas_a_tiempo_interno'] + conteos['entregas_tarde_interno']
+    total_compromiso = conteos['entregas_a_tiempo_compromiso'] + conteos['entregas_tarde_compromiso']
+
+    pct_interno = _porcentaje(conteos['entregas_a_tiempo_interno'], total_interno)
+    columnas: Dict[str, np.ndarray] = dict(conteos)
+    columnas['porcentaje_en_plazo_interno'] = pct_interno
+    columnas['porcentaje_fuera_plazo_interno'] = np.where(total_interno > 0, np.round(100 - pct_interno, 1), 0.0)
+    columnas['porcentaje_en_plazo_compromiso'] = _porcentaje(conteos['entregas_a_tiempo_compromiso'], total_compromiso)
+    columnas['porcentaje_fuera_plazo_compromiso'] = _porcentaje(conteos['entregas_tarde_compromiso'], total_compromiso)
+    columnas['tiempo_promedio'] = np.round(tiempo_horas / 24, 1)  # A días
+
+    # Sin entregas evaluables el porcentaje se muestra como 0 (entero), igual que antes
+    sin_kpi = {
+        'porcentaje_en_plazo_interno': total_interno == 0,
+        'porcentaje_fuera_plazo_interno': total_interno == 0,
+        'porcentaje_en_plazo_compromiso': total_compromiso == 0,
+        'porcentaje_fuera_plazo_compromiso': total_compromiso == 0,
+    }
+
+    for nombre, fila in resultado.items():
+        valores = columnas[nombre]
+        lista = valores.tolist()
+        if nombre in sin_kpi:
+            lista = [0 if vacio else v for v, vacio in zip(lista, sin_kpi[nombre].tolist())]
+        fila.valores = dict(zip(meses, lista))
+
+        if nombre in METRICAS_MENSUALES_PROMEDIO:
+            positivos = valores[valores > 0]
+            fila.total = round(float(positivos.mean()), 1) if positivos.size else 0
+        else:
+            fila.total = int(valores.sum())
+
+    return resultado
 
 
 @dataclass
@@ -1037,10 +1240,9 @@ class ReportesSimulacionService:
         # =====================================================================
         score_config = await self._get_score_config(conn)
         
-        usuarios_con_score = []
-        for usuario in usuarios:
-            # Crear MetricaUsuario a partir de DetalleUsuario para calcular score
-            metrica_usuario = MetricaUsuario(
+        # Crear MetricaUsuario a partir de DetalleUsuario para calcular score
+        usuarios_con_score = [
+            MetricaUsuario(
                 usuario_id=usuario.usuario_id,
                 nombre=usuario.nombre,
                 total_solicitudes=usuario.metricas_generales.total_solicitudes,
@@ -1056,9 +1258,13 @@ class ReportesSimulacionService:
                 total_sitios_entregados=usuario.metricas_generales.total_sitios_entregados,
                 oportunidades_multisitio=usuario.metricas_generales.oportunidades_multisitio,
             )
-            
-            # Calcular score
-            score = calcular_score_usuario(metrica_usuario, score_config)
+            for usuario in usuarios
+        ]
+        
+        # Calcular scores de todos los usuarios en un pase vectorizado
+        scores = calcular_scores_columnar(usuarios_con_score, score_config)
+        
+        for metrica_usuario, score in zip(usuarios_con_score, scores):
             metrica_usuario.score = score
             
             # Obtener motivo de retrabajo principal del usuario
@@ -1067,8 +1273,6 @@ class ReportesSimulacionService:
                     conn, filtros, user_id=metrica_usuario.usuario_id
                 )
                 score.motivo_retrabajo_principal = motivo_usuario
-            
-            usuarios_con_score.append(metrica_usuario)
         
         # Categorizar usuarios
         categorias = {
@@ -1229,80 +1433,7 @@ class ReportesSimulacionService:
         cats = await self.db.get_report_catalog_ids(conn)
         rows = await self.db.get_report_resumen_mensual(conn, asdict(filtros), cats)
         
-        # Inicializar estructura de respuesta con nuevas métricas
-        metricas_nombres = [
-            'solicitudes_recibidas',
-            'ofertas_generadas', 
-            'porcentaje_en_plazo_interno',
-            'porcentaje_fuera_plazo_interno',
-            'entregas_a_tiempo_interno',
-            'entregas_tarde_interno',
-            'porcentaje_en_plazo_compromiso',
-            'porcentaje_fuera_plazo_compromiso',
-            'entregas_a_tiempo_compromiso',
-            'entregas_tarde_compromiso',
-            'tiempo_promedio',
-            'en_espera',
-            'canceladas',
-            'no_viables',
-            'perdidas',
-            'extraordinarias',
-            'versiones',
-            'retrabajos',
-            'total_sitios'
-        ]
-        
-        resultado = {nombre: FilaMensual(metrica=nombre) for nombre in metricas_nombres}
-        
-        # Procesar filas
-        for row in rows:
-            mes = row['mes']
-            
-            # Calcular porcentajes KPI INTERNO
-            total_kpi_interno = (row['entregas_a_tiempo_interno'] or 0) + (row['entregas_tarde_interno'] or 0)
-            pct_interno = round((row['entregas_a_tiempo_interno'] or 0) / total_kpi_interno * 100, 1) if total_kpi_interno > 0 else 0
-            
-            # Calcular porcentajes KPI COMPROMISO
-            total_kpi_compromiso = (row['entregas_a_tiempo_compromiso'] or 0) + (row['entregas_tarde_compromiso'] or 0)
-            pct_compromiso = round((row['entregas_a_tiempo_compromiso'] or 0) / total_kpi_compromiso * 100, 1) if total_kpi_compromiso > 0 else 0
-            pct_tarde = round((row['entregas_tarde_compromiso'] or 0) / total_kpi_compromiso * 100, 1) if total_kpi_compromiso > 0 else 0
-            
-            resultado['solicitudes_recibidas'].valores[mes] = row['solicitudes_recibidas'] or 0
-            resultado['ofertas_generadas'].valores[mes] = row['ofertas_generadas'] or 0
-            
-            # KPIs Internos (Porcentajes y Conteos)
-            resultado['porcentaje_en_plazo_interno'].valores[mes] = pct_interno
-            resultado['porcentaje_fuera_plazo_interno'].valores[mes] = round(100 - pct_interno, 1) if total_kpi_interno > 0 else 0
-            resultado['entregas_a_tiempo_interno'].valores[mes] = row['entregas_a_tiempo_interno'] or 0
-            resultado['entregas_tarde_interno'].valores[mes] = row['entregas_tarde_interno'] or 0
-            
-            # KPIs Compromiso (Porcentajes y Conteos)
-            resultado['porcentaje_en_plazo_compromiso'].valores[mes] = pct_compromiso
-            resultado['porcentaje_fuera_plazo_compromiso'].valores[mes] = pct_tarde
-            resultado['entregas_a_tiempo_compromiso'].valores[mes] = row['entregas_a_tiempo_compromiso'] or 0
-            resultado['entregas_tarde_compromiso'].valores[mes] = row['entregas_tarde_compromiso'] or 0
-            
-            resultado['tiempo_promedio'].valores[mes] = round(float(row['tiempo_promedio'] or 0) / 24, 1)  # A días
-            resultado['en_espera'].valores[mes] = row['en_espera'] or 0
-            resultado['canceladas'].valores[mes] = row['canceladas'] or 0
-            resultado['no_viables'].valores[mes] = row['no_viables'] or 0
-            resultado['perdidas'].valores[mes] = row['perdidas'] or 0
-            resultado['extraordinarias'].valores[mes] = row['extraordinarias'] or 0
-            resultado['versiones'].valores[mes] = row['versiones'] or 0
-            resultado['retrabajos'].valores[mes] = row['retrabajos'] or 0
-            resultado['total_sitios'].valores[mes] = row['total_sitios'] or 0
-        
-        # Calcular totales
-        for nombre, fila in resultado.items():
-            if nombre in ['porcentaje_en_plazo_interno', 'porcentaje_fuera_plazo_interno', 'porcentaje_en_plazo_compromiso', 'porcentaje_fuera_plazo_compromiso', 'tiempo_promedio']:
-                # Promedios
-                valores = [v for v in fila.valores.values() if v > 0]
-                fila.total = round(sum(valores) / len(valores), 1) if valores else 0
-            else:
-                # Sumas
-                fila.total = sum(fila.valores.values())
-        
-        return resultado
+        return pivot_resumen_mensual(rows)
     
     # =========================================================================
     # DATOS PARA GRÁFICAS
@@ -1310,13 +1441,17 @@ class ReportesSimulacionService:
     
     async def get_all_report_data(self, conn, filtros: FiltrosReporte) -> dict:
         """Obtiene TODOS los datos necesarios para el PDF en una sola llamada."""
-        return {
+        datos = {
             'metricas': await self.get_metricas_generales(conn, filtros),
             'tecnologias': await self.get_metricas_por_tecnologia(conn, filtros),
             'contabilizacion': await self.get_tabla_contabilizacion(conn, filtros),
             'usuarios': await self.get_detalle_por_usuario(conn, filtros),
             'mensual': await self.get_resumen_mensual(conn, filtros)
         }
+        precalcular_kpis_reporte(
+            datos['metricas'], datos['tecnologias'], datos['contabilizacion'], datos['usuarios']
+        )
+        return datos
 
     async def get_datos_graficas(self, conn, filtros: FiltrosReporte, metricas: Optional[MetricasGenerales] = None) -> Dict[str, DatosGrafica]:
         """
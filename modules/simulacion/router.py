@@ -20,6 +20,7 @@ from core.permissions import require_module_access, require_manager_access, requ
 from core.config import settings
 
 from core.database import get_db_connection
+from core.pagination import next_page_url, SCROLL_PAGE_SIZE
 
 # Import del Service Layer
 from .service import SimulacionService, get_simulacion_service
@@ -337,16 +338,24 @@ async def get_cards_partial(
     limit: int = 30,  # Default 30 para simulación
     subtab: Optional[str] = None,
     filtro_tecnologia_id: Optional[str] = None,
+    cursor: Optional[str] = None,
     context = Depends(get_current_user_context),
     service: SimulacionService = Depends(get_simulacion_service),
     conn = Depends(get_db_connection),
     _ = require_module_access("simulacion")
 ):
-    """Partial: Tabla de oportunidades con filtros."""
+    """
+    Partial: Tabla de oportunidades con filtros.
+    Con `cursor` devuelve solo las filas de la siguiente página (scroll infinito).
+    """
     f_tecnologia = _safe_int(filtro_tecnologia_id)
     
+    # "Mostrar Todo" (limit=0) también pagina; el resto llega por scroll
+    page_size = limit if limit > 0 else SCROLL_PAGE_SIZE
+    
     oportunidades = await service.get_oportunidades_list(
-        conn, context, tab=tab, q=q, limit=limit, subtab=subtab, filtro_tecnologia_id=f_tecnologia
+        conn, context, tab=tab, q=q, limit=page_size, subtab=subtab,
+        filtro_tecnologia_id=f_tecnologia, cursor=cursor
     )
 
     # Inject persistent multisite flag
@@ -356,16 +365,24 @@ async def get_cards_partial(
         d['es_multisitio'] = ComercialService.is_originally_multisite(d)
         ops_processed.append(d)
     
-    return templates.TemplateResponse("simulacion/partials/cards.html", {
+    template_data = {
         "request": request,
         "oportunidades": ops_processed,
         "current_tab": tab,
         "subtab": subtab,
         "limit": limit,
         "context": context,
-        "catalogos": await service.get_tecnologias_only(conn),
-        "filtro_tecnologia_id": f_tecnologia
-    })
+        "cursor": cursor,
+        "next_url": next_page_url(request, oportunidades, page_size, "fecha_solicitud", "id_oportunidad")
+    }
+    
+    # Páginas siguientes: solo filas (sin barra de filtros ni catálogos)
+    if cursor:
+        return templates.TemplateResponse("simulacion/partials/cards_rows.html", template_data)
+    
+    template_data["catalogos"] = await service.get_tecnologias_only(conn)
+    template_data["filtro_tecnologia_id"] = f_tecnologia
+    return templates.TemplateResponse("simulacion/partials/cards.html", template_data)
 
 @router.get("/partials/comentarios/{id_oportunidad}", include_in_schema=False)
 async def get_comentarios_partial(
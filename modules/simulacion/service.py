@@ -14,6 +14,8 @@ from .schemas import SimulacionUpdate, DetalleBessCreate, OportunidadCreateCompl
 from core.workflow.notification_service import get_notification_service
 from modules.shared.services import IdGeneratorService, ClientService, BessService, SiteService
 from core.config_service import ConfigService
+from core.dashboard_stats import cached_dashboard
+from modules.comercial.sla_calculator import HORA_CORTE_DEFAULT
 
 
 from .db_service import SimulacionDBService
@@ -42,7 +44,7 @@ class SimulacionService:
     async def get_configuracion_global(self, conn):
         """Obtiene la configuración de horarios desde la BD (usando cache)."""
         # Obtenemos valores individuales cacheados
-        hora_corte = await ConfigService.get_global_config(conn, "HORA_CORTE_L_V", "18:00")
+        hora_corte = await ConfigService.get_global_config(conn, "HORA_CORTE_L_V", HORA_CORTE_DEFAULT)
         return {"HORA_CORTE_L_V": hora_corte}
     
     # --- MÉTODOS PRIVADOS DE RESOLUCIÓN (NO HARDCODING) ---
@@ -265,17 +267,15 @@ class SimulacionService:
 
         # 3.5. Insertar Historial (Si Cambio Estatus)
         if datos.id_estatus_global != current_data['id_estatus_global']:
-            from modules.comercial.sla_calculator import SLACalculator
-            from .db_service import QUERY_INSERT_HISTORIAL_ESTATUS
+            from modules.comercial.services import get_sla_recalculo_service
+            from modules.comercial.db_service import insertar_historial_estatus
             
-            # Calcular Fecha SLA (Inicio día siguiente si fuera de horario)
-            config = await self.get_configuracion_global(conn)
-            hora_corte, dias_fin_semana, _ = SLACalculator.parse_config(config)
+            # Calcular Fecha SLA (siguiente día hábil si fuera de horario o festivo),
+            # mismo calendario que deadline_calculado
             now_mx = await self.get_current_datetime_mx(conn)
+            fecha_inicio_sla = await get_sla_recalculo_service().calcular_inicio(conn, now_mx)
             
-            fecha_inicio_sla = SLACalculator.calculate_deadline(now_mx, hora_corte, 0)
-            
-            await conn.execute(QUERY_INSERT_HISTORIAL_ESTATUS,
+            await insertar_historial_estatus(conn,
                 id_oportunidad,
                 current_data['id_estatus_global'],
                 datos.id_estatus_global,
@@ -653,73 +653,21 @@ class SimulacionService:
 
     # --- CONSULTAS (CORREGIDO: LISTA COMPLETA) ---
 
-    async def get_oportunidades_list(self, conn, user_context: dict, tab: str = "activos", q: str = None, limit: int = 30, subtab: str = None, filtro_tecnologia_id: Optional[int] = None) -> List[dict]:
+    async def get_oportunidades_list(self, conn, user_context: dict, tab: str = "activos", q: str = None, limit: int = 30, subtab: str = None, filtro_tecnologia_id: Optional[int] = None, cursor: Optional[str] = None) -> List[dict]:
         """
         Recupera lista filtrada de oportunidades para Simulación.
+        Paginación por cursor sobre (fecha_solicitud, id_oportunidad).
         """
-        return await self.db.get_oportunidades_filtradas(conn, tab, subtab, q, limit, filtro_tecnologia_id)
+        return await self.db.get_oportunidades_filtradas(conn, tab, subtab, q, limit, filtro_tecnologia_id, cursor)
 
     async def get_dashboard_stats(self, conn, user_context: dict) -> dict:
-        """Calcula KPIs globales."""
-        # Total Activas (email_enviado = true)
-        total = await self.db.get_kpi_total_oportunidades(conn, email_enviado=True)
-        
+        """
+        Calcula KPIs globales y gráficas con una sola query (ver
+        SimulacionDBService.get_dashboard_scan), con cache corto: los datos
+        son globales, la clave no depende del usuario.
+        """
         try:
-            # 2. Obtener IDs clave dinámicamente
-            status_map = await self._get_status_ids(conn)
-            id_entregado = status_map.get("entregado")
-            id_perdido = status_map.get("perdido")
-            id_cancelado = status_map.get("cancelado")
-            id_ganada = status_map.get("ganada")
-            
-            stats = {
-                "kpis": {
-                    "total": total or 0,
-                    "levantamientos": 0,
-                    "ganadas": 0,
-                    "perdidas": 0
-                },
-                "charts": {
-                    "trend": {"labels": [], "data": []},
-                    "mix": {"labels": [], "data": []}
-                }
-            }
-
-            # 4. KPIs: Ganadas/Perdidas
-            # Ganadas = Entregado + Ganada (Incluimos estado final de éxito)
-            ids_positivos = [i for i in [id_entregado, id_ganada] if i is not None]
-            if ids_positivos:
-                stats["kpis"]["ganadas"] = await self.db.get_kpi_conteo_estatus(conn, ids_positivos) or 0
-            
-            # Perdidas = Perdido + Cancelado
-            ids_negativos = [i for i in [id_perdido, id_cancelado] if i is not None]
-            if ids_negativos:
-                stats["kpis"]["perdidas"] = await self.db.get_kpi_conteo_estatus(conn, ids_negativos) or 0
-
-            # 5. KPIs: Levantamientos (Conteo real por Tipo de Solicitud)
-            try:
-                # Obtener ID del tipo 'Levantamiento'
-                id_levantamiento = await self._get_catalog_id_by_name(conn, "tb_cat_tipos_solicitud", "Levantamiento")
-                if id_levantamiento:
-                    # Contar registros activos de ese tipo
-                    stats["kpis"]["levantamientos"] = await self.db.get_kpi_levantamientos(conn, id_levantamiento) or 0
-            except Exception as e_lev:
-                logger.warning(f"No se pudo calcular KPI Levantamientos: {e_lev}")
-                # Fallbback seguro (pero preferimos 0 a un cálculo erróneo)
-                stats["kpis"]["levantamientos"] = 0
-
-            # 6. Chart: Mix por Tecnología
-            rows_tech = await self.db.get_chart_tech_mix(conn)
-            stats["charts"]["mix"]["labels"] = [r["nombre"] for r in rows_tech]
-            stats["charts"]["mix"]["data"] = [r["total"] for r in rows_tech]
-
-            # 7. Chart: Tendencia (Últimos 30 días) - Simplificado por fecha de creación
-            rows_trend = await self.db.get_chart_trend(conn)
-            stats["charts"]["trend"]["labels"] = [r["fecha"] for r in rows_trend]
-            stats["charts"]["trend"]["data"] = [r["total"] for r in rows_trend]
-            
-            return stats
-
+            return await cached_dashboard("DASH_SIMULACION", lambda: self._compute_dashboard_stats(conn))
         except Exception as e:
             logger.error(f"Error calculando dashboard stats: {e}")
             # Retorno seguro completo para que Jinja2 no falle
@@ -736,6 +684,33 @@ class SimulacionService:
                 }
             } 
 
+    async def _compute_dashboard_stats(self, conn) -> dict:
+        result = await self.db.get_dashboard_scan(conn)
+        kpis = result["kpis"]
+
+        # Mix por Tecnología (top 5) y Tendencia (últimos 30 días)
+        rows_tech = sorted(result["series"]["mix"], key=lambda r: r["count"], reverse=True)[:5]
+        rows_trend = sorted(result["series"]["trend"], key=lambda r: r["fecha"])
+
+        return {
+            "kpis": {
+                "total": result["total"],
+                "levantamientos": kpis["levantamientos"],
+                "ganadas": kpis["ganadas"],
+                "perdidas": kpis["perdidas"]
+            },
+            "charts": {
+                "trend": {
+                    "labels": [r["fecha"] for r in rows_trend],
+                    "data": [r["count"] for r in rows_trend]
+                },
+                "mix": {
+                    "labels": [r["tecnologia"] for r in rows_tech],
+                    "data": [r["count"] for r in rows_tech]
+                }
+            }
+        }
+
     async def crear_oportunidad_transaccional(self, conn, datos: OportunidadCreateCompleta, user_context: dict) -> tuple:
         """
         Crea una oportunidad de manera transaccional (Formulario Extraordinario).
@@ -749,7 +724,7 @@ class SimulacionService:
             
         # Calcular si es fuera de horario usando configuración global
         config = await self.get_configuracion_global(conn)
-        hora_corte_str = config.get("HORA_CORTE_L_V", "18:00")
+        hora_corte_str = config.get("HORA_CORTE_L_V", HORA_CORTE_DEFAULT)
         h, m = map(int, hora_corte_str.split(":"))
         hora_corte = dt_time(h, m)
         
@@ -0,0 +1,17 @@
+# tests/conftest.py
+"""
+Configuración común de pytest.
+
+core/config.py exige SECRET_KEY y las credenciales de Azure al importarse;
+para las pruebas unitarias (sin base de datos ni Graph) basta con valores
+de relleno si el entorno no los define.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+for _var in ("SECRET_KEY", "CLIENT_ID", "CLIENT_SECRET", "TENANT_ID"):
+    os.environ.setdefault(_var, "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,143 @@
+# tests/test_report_presets.py
+"""Snapshot JSONB de los presets de reportes (modules/simulacion/report_presets.py)."""
+
+import json
+from dataclasses import asdict
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from core.config_service import UmbralesKPI
+from modules.simulacion.report_presets import snapshot_a_json, snapshot_desde_json
+from modules.simulacion.report_service import (
+    MetricasGenerales, MetricaTecnologia, FilaContabilizacion,
+    DetalleUsuario, ResumenUsuario, pivot_resumen_mensual,
+)
+
+U_INTERNO = UmbralesKPI("kpi_interno", 90.0, 80.0, "green", "amber", "red")
+U_COMPROMISO = UmbralesKPI("kpi_compromiso", 95.0, 85.0, "green", "amber", "red")
+
+
+def _reporte() -> dict:
+    """Reporte con los tipos que devuelve asyncpg (Decimal en promedios, UUID)."""
+    metricas = MetricasGenerales(
+        umbrales_interno=U_INTERNO,
+        umbrales_compromiso=U_COMPROMISO,
+        total_solicitudes=40,
+        total_ofertas=32,
+        entregas_a_tiempo_interno=27,
+        entregas_tarde_interno=3,
+        entregas_a_tiempo_compromiso=25,
+        entregas_tarde_compromiso=5,
+        licitaciones=6,
+        tiempo_promedio_horas=Decimal("52.75"),
+    )
+    tecnologia = MetricaTecnologia(
+        id_tecnologia=1,
+        nombre="FV",
+        umbrales_interno=U_INTERNO,
+        umbrales_compromiso=U_COMPROMISO,
+        total_solicitudes=20,
+        total_ofertas=18,
+        entregas_a_tiempo_interno=15,
+        entregas_tarde_interno=3,
+        tiempo_promedio_horas=30.5,
+        potencia_total_kwp=120.0,
+    )
+    fila = FilaContabilizacion(
+        id_tipo_solicitud=2,
+        nombre="Cotización",
+        codigo_interno="COTIZACION",
+        umbrales_interno=U_INTERNO,
+        umbrales_compromiso=U_COMPROMISO,
+        total=12,
+        entregas_a_tiempo_interno=10,
+        entregas_tarde_interno=2,
+    )
+    usuario = DetalleUsuario(
+        usuario_id=UUID("3f2b8c1e-5d7a-4e0f-9b6c-1a2d3e4f5a6b"),
+        nombre="Ana",
+        metricas_generales=metricas,
+        metricas_por_tecnologia=[tecnologia],
+        tabla_contabilizacion=[fila],
+        tiempo_promedio_por_tipo={"Cotización": 2.2},
+        resumen_datos=ResumenUsuario(
+            nombre="Ana",
+            total_ofertas=32,
+            tecnologia_principal={"nombre": "FV", "solicitudes": 20},
+            porcentaje_interno=90.0,
+            porcentaje_compromiso=83.3,
+            tiempo_promedio_por_tipo=[{"tipo": "Cotización", "dias": Decimal("2.2")}],
+            licitaciones=6,
+            porcentaje_licitaciones=15.0,
+            extraordinarias=0,
+            versiones=1,
+        ),
+    )
+    mensual = pivot_resumen_mensual([
+        {
+            "mes": 3, "solicitudes_recibidas": 10, "ofertas_generadas": 8,
+            "entregas_a_tiempo_interno": 7, "entregas_tarde_interno": 1,
+            "entregas_a_tiempo_compromiso": 6, "entregas_tarde_compromiso": 2,
+            "tiempo_promedio": Decimal("49.5"), "en_espera": 1, "canceladas": 0,
+            "no_viables": 0, "perdidas": 1, "extraordinarias": 0, "versiones": 1,
+            "retrabajos": 0, "total_sitios": 9,
+        },
+    ])
+    return {
+        "metricas": metricas,
+        "tecnologias": [tecnologia],
+        "contabilizacion": [fila],
+        "usuarios": [usuario],
+        "mensual": mensual,
+    }
+
+
+def _ida_y_vuelta(datos: dict) -> dict:
+    # El pool decodifica JSONB a dict (orjson); json.loads es equivalente
+    return snapshot_desde_json(json.loads(snapshot_a_json(datos)))
+
+
+def test_snapshot_conserva_tipos_y_valores():
+    datos = _reporte()
+    restaurado = _ida_y_vuelta(datos)
+
+    metricas = restaurado["metricas"]
+    assert metricas.tiempo_promedio_horas == Decimal("52.75")
+    assert isinstance(metricas.tiempo_promedio_horas, Decimal)
+    assert metricas.tiempo_promedio_dias == datos["metricas"].tiempo_promedio_dias
+
+    usuario = restaurado["usuarios"][0]
+    assert usuario.usuario_id == datos["usuarios"][0].usuario_id
+    assert isinstance(usuario.resumen_datos, ResumenUsuario)
+    assert usuario.resumen_datos.tiempo_promedio_por_tipo[0]["dias"] == Decimal("2.2")
+
+    for clave in ("metricas", "tecnologias", "contabilizacion", "usuarios"):
+        original, copia = datos[clave], restaurado[clave]
+        if isinstance(original, list):
+            assert [asdict(o) for o in original] == [asdict(c) for c in copia]
+        else:
+            assert asdict(original) == asdict(copia)
+    assert {k: asdict(f) for k, f in datos["mensual"].items()} == \
+        {k: asdict(f) for k, f in restaurado["mensual"].items()}
+
+
+def test_snapshot_conserva_kpis():
+    datos = _reporte()
+    restaurado = _ida_y_vuelta(datos)
+
+    for original, copia in (
+        (datos["metricas"], restaurado["metricas"]),
+        (datos["tecnologias"][0], restaurado["tecnologias"][0]),
+        (datos["contabilizacion"][0], restaurado["contabilizacion"][0]),
+    ):
+        assert copia.porcentaje_a_tiempo_interno == original.porcentaje_a_tiempo_interno
+        assert copia.semaforo_compromiso == original.semaforo_compromiso
+
+
+def test_snapshot_de_otra_version_se_rechaza():
+    data = json.loads(snapshot_a_json(_reporte()))
+    data["version"] = 1
+    with pytest.raises(ValueError):
+        snapshot_desde_json(data)
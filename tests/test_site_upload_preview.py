@@ -0,0 +1,70 @@
+# tests/test_site_upload_preview.py
+"""Previsualización de la carga masiva de sitios (ComercialService.preview_site_upload)."""
+
+import asyncio
+import io
+from datetime import datetime
+from uuid import uuid4
+
+from openpyxl import Workbook
+
+from modules.comercial.service import ComercialService
+
+
+class _StagingFalso:
+    """Guarda en memoria las filas que se mandarían a disco."""
+
+    def __init__(self):
+        self.rows = None
+
+    def stage(self, id_oportunidad, usuario_id, rows):
+        self.rows = rows
+        return "token"
+
+
+class _ConexionFalsa:
+    def __init__(self, cantidad_sitios: int):
+        self.cantidad_sitios = cantidad_sitios
+
+    async def fetchval(self, query, *args):
+        return self.cantidad_sitios
+
+
+def _excel(filas) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["NOMBRE", "DIRECCION", "TARIFA", "LINK GOOGLE", "# DE SERVICIO", "COMENTARIOS"])
+    for fila in filas:
+        ws.append(fila)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _preview(contenido: bytes, cantidad_sitios: int):
+    staging = _StagingFalso()
+    service = ComercialService(upload_staging=staging)
+
+    async def _sin_verificar(conn, id_oportunidad, user_context):
+        return None
+
+    service.verify_ownership = _sin_verificar
+    result = asyncio.run(service.preview_site_upload(
+        _ConexionFalsa(cantidad_sitios), contenido, uuid4(), {"user_db_id": uuid4()}
+    ))
+    return result, staging.rows
+
+
+def test_celdas_no_texto_se_validan_como_texto():
+    contenido = _excel([
+        ["Sitio 1", "Calle 1", "GDMTH", None, 123456789, datetime(2026, 3, 1, 9, 30)],
+        [1001, "Calle 2", None, None, None, "ok"],
+    ])
+
+    result, rows = _preview(contenido, cantidad_sitios=2)
+
+    assert result["invalid_rows"] == 0
+    assert rows[0][4] == "123456789"
+    assert rows[0][5] == str(datetime(2026, 3, 1, 9, 30))
+    assert rows[1][0] == "1001"
+